@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Benchmarks building Elasticsearch crash documents from processed crashes with
+a DocumentPlan created for each crash (``build_document``) versus one reused
+DocumentPlan like ESCrashStorage does.
+
+Processed crashes are JSON files like the ones ``socorro-cmd fetch_crash_data
+--processed`` saves. Directories are searched recursively for files in a
+``processed_crash`` directory.
+
+Usage::
+
+    python bin/benchmark_es_document.py [--iterations=N] PATH [PATH...]
+
+"""
+
+import time
+
+import click
+
+from socorro.external.es.crashstorage import build_document, DocumentPlan
+from socorro.external.es.super_search_fields import (
+    FIELDS,
+    get_destination_keys,
+    is_indexable,
+)
+from socorro.lib.libbenchmark import load_processed_crashes, time_it
+
+
+def run_build_document(processed_crash, all_keys):
+    crash_document = {"crash_id": processed_crash["uuid"], "processed_crash": {}}
+    build_document(
+        {"processed_crash": processed_crash},
+        crash_document,
+        fields=FIELDS,
+        all_keys=all_keys,
+    )
+    return crash_document
+
+
+def run_document_plan(processed_crash, document_plan):
+    crash_document = {"crash_id": processed_crash["uuid"], "processed_crash": {}}
+    document_plan.build({"processed_crash": processed_crash}, crash_document)
+    return crash_document
+
+
+@click.command()
+@click.option(
+    "--iterations", default=100, type=int, help="number of times to build each crash"
+)
+@click.argument("paths", nargs=-1, required=True)
+@click.pass_context
+def cmd_benchmark_es_document(ctx, iterations, paths):
+    processed_crashes = load_processed_crashes(paths)
+    if not processed_crashes:
+        raise click.ClickException("no processed crashes found")
+
+    all_keys = {
+        key
+        for field in FIELDS.values()
+        if is_indexable(field)
+        for key in get_destination_keys(field)
+    }
+
+    start_time = time.perf_counter()
+    document_plan = DocumentPlan(fields=FIELDS, all_keys=all_keys)
+    plan_time = time.perf_counter() - start_time
+
+    old_time = time_it(
+        lambda crash: run_build_document(crash, all_keys),
+        processed_crashes,
+        iterations,
+        timer=time.perf_counter,
+    )
+    new_time = time_it(
+        lambda crash: run_document_plan(crash, document_plan),
+        processed_crashes,
+        iterations,
+        timer=time.perf_counter,
+    )
+
+    click.echo(f"crashes:         {len(processed_crashes)}")
+    click.echo(f"iterations:      {iterations}")
+    click.echo(f"plan creation:   {plan_time * 1_000_000:,.1f} us")
+    click.echo(f"build_document:  {old_time * 1_000_000:,.1f} us/crash")
+    click.echo(f"DocumentPlan:    {new_time * 1_000_000:,.1f} us/crash")
+    click.echo(f"speedup:         {old_time / new_time:,.1f}x")
+
+
+if __name__ == "__main__":
+    cmd_benchmark_es_document()
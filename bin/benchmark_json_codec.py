@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Benchmarks serializing and parsing processed crashes with the JSON codec backends in
+socorro.lib.libjson and with the json module the way crash storage used to.
+
+Processed crashes are JSON files like the ones ``socorro-cmd fetch_crash_data
+--processed`` saves. Directories are searched recursively for files in a
+``processed_crash`` directory.
+
+Usage::
+
+    python bin/benchmark_json_codec.py [--iterations=N] PATH [PATH...]
+
+"""
+
+import json
+
+import click
+
+from socorro.lib import libjson
+from socorro.lib.libbenchmark import load_processed_crashes, time_it
+
+
+class LegacyJsonCodec:
+    """What crash storage did before socorro.lib.libjson."""
+
+    name = "json (legacy)"
+
+    def encode(self, obj, default=None):
+        return json.dumps(obj, default=default).encode("utf-8")
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+@click.command()
+@click.option(
+    "--iterations", default=20, type=int, help="number of times to run each crash"
+)
+@click.argument("paths", nargs=-1, required=True)
+@click.pass_context
+def cmd_benchmark_json_codec(ctx, iterations, paths):
+    processed_crashes = load_processed_crashes(paths)
+    if not processed_crashes:
+        raise click.ClickException("no processed crashes found")
+
+    codecs = [LegacyJsonCodec(), libjson.StdlibJsonBackend()]
+    if libjson.orjson is not None:
+        codecs.append(libjson.OrjsonBackend())
+
+    # Make sure every codec round-trips every crash
+    for codec in codecs:
+        for processed_crash in processed_crashes:
+            data = codec.encode(processed_crash, default=libjson.isoformat_default)
+            if libjson.decode(data) != processed_crash:
+                raise click.ClickException(
+                    f"{codec.name} changed {processed_crash.get('uuid')}"
+                )
+
+    total_size = sum(
+        len(libjson.encode(processed_crash)) for processed_crash in processed_crashes
+    )
+    mean_size = total_size / len(processed_crashes)
+
+    click.echo(f"backend:     {libjson.BACKEND.name}")
+    click.echo(f"crashes:     {len(processed_crashes)}")
+    click.echo(f"mean size:   {mean_size / 1024:,.1f} kb")
+    click.echo(f"iterations:  {iterations}")
+    click.echo("")
+    click.echo(
+        f"{'codec':<16} {'encode us/crash':>16} {'decode us/crash':>16} "
+        + f"{'encode MB/s':>12} {'decode MB/s':>12}"
+    )
+    for codec in codecs:
+        encoded = [
+            codec.encode(processed_crash, default=libjson.isoformat_default)
+            for processed_crash in processed_crashes
+        ]
+        encode_time = time_it(
+            lambda item, codec=codec: codec.encode(
+                item, default=libjson.isoformat_default
+            ),
+            processed_crashes,
+            iterations,
+        )
+        decode_time = time_it(codec.decode, encoded, iterations)
+        click.echo(
+            f"{codec.name:<16} {encode_time * 1_000_000:>16,.1f} "
+            + f"{decode_time * 1_000_000:>16,.1f} "
+            + f"{mean_size / encode_time / 1_000_000:>12,.1f} "
+            + f"{mean_size / decode_time / 1_000_000:>12,.1f}"
+        )
+
+
+if __name__ == "__main__":
+    cmd_benchmark_json_codec()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Benchmarks matching normalized frames against the siglists with a SiglistMatcher
+versus the alternation of all the siglist lines CSignatureTool used to use.
+
+Frames are the normalized frames of all the threads in processed crashes. Processed
+crashes are JSON files like the ones ``socorro-cmd fetch_crash_data --processed``
+saves. Directories are searched recursively for files in a ``processed_crash``
+directory. Without processed crashes, this uses text built from the siglist lines.
+
+Usage::
+
+    python bin/benchmark_siglist_matcher.py [--iterations=N] [PATH...]
+
+"""
+
+import re
+
+import click
+
+from socorro.lib import libjson
+from socorro.lib.libbenchmark import find_processed_crashes, time_it
+from socorro.signature.rules import CSignatureTool
+from socorro.signature.siglists_utils import get_signature_list_content, SiglistMatcher
+
+
+SIGLISTS = ["irrelevant_signature_re", "prefix_signature_re"]
+
+
+def get_frames(paths):
+    tool = CSignatureTool()
+    frames = []
+    for path in find_processed_crashes(paths):
+        processed_crash = libjson.decode(path.read_bytes())
+        for thread in processed_crash.get("json_dump", {}).get("threads", []):
+            frames.extend(tool.create_frame_list(thread))
+    return frames
+
+
+def get_siglist_frames():
+    frames = []
+    for name in SIGLISTS:
+        for line in get_signature_list_content(name):
+            text = line.replace("\\", "")
+            frames.extend([text, f"{text}::Method", f"x{text}"])
+    return frames
+
+
+@click.command()
+@click.option(
+    "--iterations", default=20, type=int, help="number of times to match each frame"
+)
+@click.argument("paths", nargs=-1)
+@click.pass_context
+def cmd_benchmark_siglist_matcher(ctx, iterations, paths):
+    frames = get_frames(paths) if paths else get_siglist_frames()
+    if not frames:
+        raise click.ClickException("no frames found")
+
+    click.echo(f"frames:      {len(frames)}")
+    click.echo(f"iterations:  {iterations}")
+    click.echo("")
+    click.echo(
+        f"{'siglist':<26} {'alternation ns':>15} {'matcher ns':>11} {'speedup':>8}"
+    )
+    for name in SIGLISTS:
+        lines = get_signature_list_content(name)
+        alternation = re.compile("|".join(lines))
+        matcher = SiglistMatcher(lines)
+
+        # Make sure both match the same frames
+        for frame in frames:
+            if bool(alternation.match(frame)) != bool(matcher.match(frame)):
+                raise click.ClickException(f"{name} differs for {frame!r}")
+
+        old_time = time_it(alternation.match, frames, iterations)
+        new_time = time_it(matcher.match, frames, iterations)
+        click.echo(
+            f"{name:<26} {old_time * 1_000_000_000:>15,.0f} "
+            + f"{new_time * 1_000_000_000:>11,.0f} {old_time / new_time:>7,.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    cmd_benchmark_siglist_matcher()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Benchmarks reducing processed crashes to Telemetry crash reports with the two-pass
+SocorroDataReducer and JsonSchemaReducer versus a PublicTelemetryReducer.
+
+Processed crashes are JSON files like the ones ``socorro-cmd fetch_crash_data
+--processed`` saves. Directories are searched recursively for files in a
+``processed_crash`` directory.
+
+Usage::
+
+    python bin/benchmark_telemetry_reducer.py [--iterations=N] PATH [PATH...]
+
+"""
+
+import tracemalloc
+
+import click
+
+from socorro.external.crashstorage_base import dict_to_str
+from socorro.external.gcs.crashstorage import TelemetryGcsCrashStorage
+from socorro.lib.libbenchmark import load_processed_crashes, time_it
+from socorro.lib.libjsonschema import JsonSchemaReducer
+from socorro.lib.libsocorrodataschema import (
+    get_schema,
+    permissions_transform_function,
+    SocorroDataReducer,
+    transform_schema,
+)
+from socorro.lib.libtelemetry import PublicTelemetryReducer
+from socorro.schemas import TELEMETRY_SOCORRO_CRASH_SCHEMA
+
+
+def build_two_pass(public_schema):
+    processed_crash_reducer = SocorroDataReducer(schema=public_schema)
+    telemetry_reducer = JsonSchemaReducer(schema=TELEMETRY_SOCORRO_CRASH_SCHEMA)
+
+    def run_two_pass(processed_crash):
+        # This is what TelemetryGcsCrashStorage.save_processed_crash used to do
+        public_data = processed_crash_reducer.traverse(document=processed_crash)
+        telemetry_data = telemetry_reducer.traverse(document=public_data)
+        for source_key, target_key in TelemetryGcsCrashStorage.HISTORICAL_MANUAL_KEYS:
+            if source_key in public_data:
+                telemetry_data[target_key] = public_data[source_key]
+        return telemetry_data
+
+    return run_two_pass
+
+
+def measure_memory(func, processed_crashes):
+    """Returns mean peak memory allocated while reducing a crash."""
+    total_peak = 0
+    tracemalloc.start()
+    try:
+        for processed_crash in processed_crashes:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            func(processed_crash)
+            _, peak = tracemalloc.get_traced_memory()
+            total_peak += peak - baseline
+    finally:
+        tracemalloc.stop()
+    return total_peak / len(processed_crashes)
+
+
+@click.command()
+@click.option(
+    "--iterations", default=100, type=int, help="number of times to reduce each crash"
+)
+@click.argument("paths", nargs=-1, required=True)
+@click.pass_context
+def cmd_benchmark_telemetry_reducer(ctx, iterations, paths):
+    processed_crashes = load_processed_crashes(paths)
+    if not processed_crashes:
+        raise click.ClickException("no processed crashes found")
+
+    processed_crash_schema = get_schema("processed_crash.schema.yaml")
+    only_public = permissions_transform_function(
+        permissions_have=["public"],
+        default_permissions=processed_crash_schema["default_permissions"],
+    )
+    public_schema = transform_schema(
+        schema=processed_crash_schema, transform_function=only_public
+    )
+
+    run_two_pass = build_two_pass(public_schema)
+    reducer = PublicTelemetryReducer(
+        public_schema=public_schema,
+        telemetry_schema=TELEMETRY_SOCORRO_CRASH_SCHEMA,
+        renamed_keys=TelemetryGcsCrashStorage.HISTORICAL_MANUAL_KEYS,
+    )
+
+    # Make sure both produce the same bytes
+    for processed_crash in processed_crashes:
+        expected = dict_to_str(run_two_pass(processed_crash)).encode("utf-8")
+        actual = dict_to_str(reducer.traverse(processed_crash)).encode("utf-8")
+        if expected != actual:
+            raise click.ClickException(
+                f"crash reports differ for {processed_crash.get('uuid')}"
+            )
+
+    old_time = time_it(run_two_pass, processed_crashes, iterations)
+    new_time = time_it(reducer.traverse, processed_crashes, iterations)
+    old_memory = measure_memory(run_two_pass, processed_crashes)
+    new_memory = measure_memory(reducer.traverse, processed_crashes)
+
+    click.echo(f"crashes:                 {len(processed_crashes)}")
+    click.echo(f"iterations:              {iterations}")
+    click.echo(f"two-pass cpu:            {old_time * 1_000_000:,.1f} us/crash")
+    click.echo(f"PublicTelemetryReducer:  {new_time * 1_000_000:,.1f} us/crash")
+    click.echo(f"speedup:                 {old_time / new_time:,.1f}x")
+    click.echo(f"two-pass peak alloc:     {old_memory / 1024:,.1f} kb/crash")
+    click.echo(f"PublicTelemetryReducer:  {new_memory / 1024:,.1f} kb/crash")
+
+
+if __name__ == "__main__":
+    cmd_benchmark_telemetry_reducer()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Stackwalker server that wraps minidump-stackwalk.
+
+This speaks the stackwalker server protocol described in
+``socorro.processor.stackwalker_pool``. For each request, it runs the stackwalker
+with the request arguments, writing output and logging to files in a temporary
+directory, and sends the output and log back over stdout.
+
+It still runs a stackwalker process for every minidump. It stands in for a
+stackwalker that speaks the protocol itself so the processor can use the
+``STACKWALKER_SERVER_COMMAND`` setting.
+
+The processor kills a server that doesn't respond within
+``STACKWALKER_KILL_TIMEOUT`` which would leave the stackwalker process running, so
+set ``--timeout`` lower than that. When the stackwalker takes longer than
+``--timeout`` seconds, this kills it and responds with returncode -9.
+
+Usage::
+
+    STACKWALKER_SERVER_COMMAND="python bin/stackwalker_server.py --timeout=590 {command_path}"
+
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import click
+
+
+def read_file(path):
+    """Returns the contents of a file or b"" if it doesn't exist."""
+    try:
+        with open(path, "rb") as fp:
+            return fp.read()
+    except FileNotFoundError:
+        return b""
+
+
+def handle_request(command_path, args, tmpdir, timeout):
+    """Run the stackwalker for a request.
+
+    :arg command_path: path to the stackwalker
+    :arg args: the stackwalker arguments from the request
+    :arg tmpdir: directory for the output and log files
+    :arg timeout: seconds before the stackwalker is killed
+
+    :returns: ``(returncode, output, log)`` with output and log as bytes
+
+    """
+    output_path = os.path.join(tmpdir, "output.json")
+    log_path = os.path.join(tmpdir, "output.log")
+    for path in (output_path, log_path):
+        if os.path.exists(path):
+            os.remove(path)
+
+    command = [
+        command_path,
+        f"--output-file={output_path}",
+        f"--log-file={log_path}",
+        *args,
+    ]
+    try:
+        returncode = subprocess.run(
+            command,
+            timeout=timeout,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+        ).returncode
+    except subprocess.TimeoutExpired:
+        # subprocess.run killed the stackwalker with SIGKILL
+        returncode = -9
+
+    output = read_file(output_path) if returncode == 0 else b""
+    return returncode, output, read_file(log_path)
+
+
+@click.command()
+@click.option(
+    "--timeout",
+    default=590,
+    type=float,
+    help="Seconds before the stackwalker is killed.",
+)
+@click.argument("command_path")
+def cmd_stackwalker_server(timeout, command_path):
+    """Runs COMMAND_PATH for requests read from stdin."""
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+
+    with tempfile.TemporaryDirectory(prefix="stackwalker_server") as tmpdir:
+        for line in stdin:
+            args = json.loads(line)["args"]
+            returncode, output, log = handle_request(
+                command_path, args, tmpdir, timeout
+            )
+
+            header = {
+                "returncode": returncode,
+                "output_length": len(output),
+                "log_length": len(log),
+            }
+            stdout.write(json.dumps(header).encode("utf-8") + b"\n")
+            stdout.write(output)
+            stdout.write(log)
+            stdout.flush()
+
+
+if __name__ == "__main__":
+    cmd_stackwalker_server()
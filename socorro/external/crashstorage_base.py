@@ -5,14 +5,29 @@
 """Base classes for crashstorage system."""
 
 from contextlib import suppress
-import datetime
-import json
 import logging
 import os
 
+from socorro.lib import libjson
 from socorro.lib.libooid import date_from_ooid
 
 
+def get_dump_file_path(temp_path, crash_id, dump_name, dump_file_suffix):
+    """Return the path of the temporary file for a dump.
+
+    :arg temp_path: the directory to put the file in
+    :arg crash_id: the crash id
+    :arg dump_name: the name of the dump in a FileDumpsMapping
+    :arg dump_file_suffix: the suffix for the file name
+
+    :returns: path as a string
+
+    """
+    return os.path.join(
+        temp_path, "%s.%s.TEMPORARY%s" % (crash_id, dump_name, dump_file_suffix)
+    )
+
+
 class MemoryDumpsMapping(dict):
     """there has been a bifurcation in the crash storage data throughout the
     history of the classes.  The crash dumps have two different
@@ -40,9 +55,8 @@ class MemoryDumpsMapping(dict):
         for a_dump_name, a_dump in self.items():
             if a_dump_name in (None, "", "dump"):
                 a_dump_name = "upload_file_minidump"
-            dump_pathname = os.path.join(
-                temp_path,
-                "%s.%s.TEMPORARY%s" % (crash_id, a_dump_name, dump_file_suffix),
+            dump_pathname = get_dump_file_path(
+                temp_path, crash_id, a_dump_name, dump_file_suffix
             )
             name_to_pathname_mapping[a_dump_name] = dump_pathname
             with open(dump_pathname, "wb") as f:
@@ -133,6 +147,19 @@ class CrashStorageBase:
         """
         raise NotImplementedError("save_processed_crash not implemented")
 
+    def update_processed_crash(self, raw_crash, processed_crash, fields):
+        """Save changes to some fields of a processed crash to crash storage
+
+        Crash storage that can update part of a stored processed crash only saves
+        the listed fields. By default, this saves the whole processed crash.
+
+        :param raw_crash: the raw crash data (no dumps)
+        :param processed_crash: the whole processed crash data
+        :param fields: the top-level fields of the processed crash that changed
+
+        """
+        self.save_processed_crash(raw_crash, processed_crash)
+
     def get_raw_crash(self, crash_id):
         """Fetch raw crash
 
@@ -310,20 +337,18 @@ def get_datestamp(crashid):
     return datestamp
 
 
-class JSONISOEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime.date):
-            return obj.isoformat()
-        raise NotImplementedError(f"Don't know about {obj!r}")
+def dict_to_bytes(a_mapping):
+    """Serialize a mapping to JSON encoding dates and datetimes in ISO 8601."""
+    return libjson.encode(a_mapping, default=libjson.isoformat_default)
 
 
 def dict_to_str(a_mapping):
-    return json.dumps(a_mapping, cls=JSONISOEncoder)
+    return dict_to_bytes(a_mapping).decode("utf-8")
 
 
 def list_to_str(a_list):
-    return json.dumps(list(a_list))
+    return libjson.encode(list(a_list)).decode("utf-8")
 
 
 def str_to_list(a_string):
-    return json.loads(a_string)
+    return libjson.decode(a_string)
@@ -3,8 +3,46 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 from contextlib import contextmanager
+import os
+import threading
 
+from elastic_transport import Urllib3HttpNode
 from elasticsearch import Elasticsearch, RequestError
+import markus
+
+from socorro.lib.libconnectionpool import ConnectionPoolMetrics, build_socket_options
+from socorro.libmarkus import METRICS, build_prefix
+
+
+# Process-wide Elasticsearch clients keyed on (pid, url, pool settings); the
+# Elasticsearch client is thread-safe, so everything in a process shares one client
+# and its connection pool rather than building a new one for every request
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+class PooledUrllib3HttpNode(Urllib3HttpNode):
+    """Urllib3HttpNode that sets TCP keep-alive and tracks connection pool usage."""
+
+    pool_metrics = None
+
+    def set_up_pool(self, pool_metrics, keep_alive):
+        """Set up keep-alive and metrics for this node's connection pool.
+
+        :arg pool_metrics: a ConnectionPoolMetrics
+        :arg keep_alive: seconds a connection is idle before TCP keep-alive probes are
+            sent; 0 disables TCP keep-alive
+
+        """
+        self.pool_metrics = pool_metrics
+        self.pool.conn_kw["socket_options"] = build_socket_options(keep_alive)
+
+    def perform_request(self, *args, **kwargs):
+        if self.pool_metrics is None:
+            return super().perform_request(*args, **kwargs)
+
+        with self.pool_metrics.track(lambda: self.pool.num_connections, node=self):
+            return super().perform_request(*args, **kwargs)
 
 
 class ConnectionContext:
@@ -12,36 +50,91 @@ class ConnectionContext:
 
     Used for accessing Elasticsearch and managing indexes.
 
+    All ConnectionContext instances in a process with the same url and pool settings
+    share a single thread-safe Elasticsearch client and its connection pool.
+
     """
 
     def __init__(
         self,
         url="http://localhost:9200",
         timeout=30,
+        pool_maxsize=10,
+        keep_alive=60,
+        metrics_prefix="processor.es",
         **kwargs,
     ):
         """
         :arg url: the url to the elasticsearch instances
         :arg timeout: the time in seconds before a query to elasticsearch fails
+        :arg pool_maxsize: maximum number of connections to each Elasticsearch node;
+            requests wait for a free connection when they're all in use
+        :arg keep_alive: seconds a connection is idle before TCP keep-alive probes are
+            sent; 0 disables TCP keep-alive
+        :arg metrics_prefix: prefix for connection pool metrics
         """
         self.url = url
         self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.metrics_prefix = metrics_prefix
+
+    def build_client(self):
+        """Build a new Elasticsearch client with a connection pool."""
+        client = Elasticsearch(
+            hosts=self.url,
+            request_timeout=self.timeout,
+            verify_certs=False,
+            connections_per_node=self.pool_maxsize,
+            node_class=PooledUrllib3HttpNode,
+        )
+
+        metrics = markus.get_metrics(
+            build_prefix(METRICS.prefix, self.metrics_prefix),
+            filters=list(METRICS.filters),
+        )
+        pool_metrics = ConnectionPoolMetrics(metrics=metrics, maxsize=self.pool_maxsize)
+        for node in client.transport.node_pool.all():
+            node.set_up_pool(pool_metrics=pool_metrics, keep_alive=self.keep_alive)
+        return client
+
+    def get_client(self):
+        """Return the process-wide Elasticsearch client for this context's settings.
+
+        The client is built the first time it's needed in a process. Forked processes
+        build their own client rather than sharing sockets with the parent.
+
+        """
+        key = (
+            os.getpid(),
+            self.url,
+            self.pool_maxsize,
+            self.keep_alive,
+            self.metrics_prefix,
+        )
+        client = _CLIENTS.get(key)
+        if client is None:
+            with _CLIENTS_LOCK:
+                client = _CLIENTS.get(key)
+                if client is None:
+                    client = _CLIENTS[key] = self.build_client()
+        return client
 
     def connection(self, name=None, timeout=None):
         """Returns an instance of elasticsearch-py's Elasticsearch class as
         encapsulated by the Connection class above.
 
+        The returned client shares the process-wide connection pool. If ``timeout``
+        is specified, it overrides the request timeout for requests made with the
+        returned client.
+
         Documentation: http://elasticsearch-py.readthedocs.org
 
         """
         if timeout is None:
             timeout = self.timeout
 
-        return Elasticsearch(
-            hosts=self.url,
-            request_timeout=timeout,
-            verify_certs=False,
-        )
+        return self.get_client().options(request_timeout=timeout)
 
     def indices_client(self, name=None):
         """Returns an instance of elasticsearch-py's Index client class as
@@ -2,16 +2,19 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import concurrent.futures
 import copy
 import datetime
-import json
+import functools
+import math
 import re
+import threading
 import time
 
 import elasticsearch
 from elasticsearch.exceptions import NotFoundError
+from elasticsearch.serializer import JsonSerializer
 from elasticsearch_dsl import Search
-import glom
 import markus
 
 from socorro.external.crashstorage_base import CrashStorageBase
@@ -27,7 +30,8 @@ from socorro.external.es.super_search_fields import (
     parse_mapping,
 )
 from socorro.libmarkus import METRICS, build_prefix
-from socorro.lib.libdatetime import JsonDTEncoder, string_to_datetime, utc_now
+from socorro.lib.batcher import Batcher
+from socorro.lib.libdatetime import string_to_datetime, utc_now
 
 
 # Additional custom analyzers for crash report data
@@ -44,6 +48,14 @@ MAX_KEYWORD_FIELD_VALUE_SIZE = 10_000
 # Maximum size in utf-8 encoded characters for a string field value
 MAX_STRING_FIELD_VALUE_SIZE = 32_766
 
+# Serializer for documents sent to Elasticsearch; this is the same serializer the
+# Elasticsearch client uses so documents look the same whether they're indexed one
+# at a time or in bulk
+BULK_SERIALIZER = JsonSerializer()
+
+# Fields with values at least this many bytes get a crash_document_field_size metric
+FIELD_SIZE_METRIC_MIN = 1024
+
 # Valid Elasticsearch keys contain one or more ascii alphanumeric characters,
 # underscore, and hyphen and that's it
 VALID_KEY = re.compile(r"^[a-zA-Z0-9_-]+$")
@@ -205,55 +217,409 @@ def fix_datetime(value):
     return value
 
 
+def estimate_json_size(value):
+    """Return the size of a value serialized the way the Elasticsearch client does it
+
+    This adds up the size without building the serialized value. It doesn't count
+    the backslashes added when escaping quotes, backslashes, and control characters
+    in strings because finding those costs about as much as serializing. Otherwise
+    it's exact for the types of values that are in crash documents.
+
+    :param value: the value
+
+    :returns: size in bytes
+
+    """
+    if isinstance(value, str):
+        if value.isascii():
+            return len(value) + 2
+        return len(value.encode("utf-8", "surrogatepass")) + 2
+
+    if value is None or value is True:
+        return 4
+    if value is False:
+        return 5
+    if isinstance(value, int):
+        return len(int.__repr__(value))
+    if isinstance(value, float):
+        if math.isfinite(value):
+            return len(float.__repr__(value))
+        if math.isnan(value):
+            return len("NaN")
+        return len("Infinity") if value > 0 else len("-Infinity")
+
+    if isinstance(value, dict):
+        size = 2 + max(len(value) - 1, 0)
+        for key, item in value.items():
+            key = key if isinstance(key, str) else str(key)
+            size += estimate_json_size(key) + 1 + estimate_json_size(item)
+        return size
+
+    if isinstance(value, (list, tuple)):
+        size = 2 + max(len(value) - 1, 0)
+        for item in value:
+            size += estimate_json_size(item)
+        return size
+
+    if isinstance(value, (datetime.date, datetime.time)):
+        return len(value.isoformat()) + 2
+
+    return len(str(value)) + 2
+
+
 def build_document(src, crash_document, fields, all_keys):
     """Given a source document and fields and valid keys, builds a document to index.
 
+    This builds a ``DocumentPlan`` every time. Use ``DocumentPlan`` directly to build
+    more than one document with the same fields and keys.
+
     :param dict src: the source document with "processed_crash" key
     :param dict crash_document: the document to fill
     :param list fields: the list of fields in super search fields
     :param set all_keys: the list of valid keys
 
     """
-    for field in fields.values():
-        # There are some fields that aren't indexable--skip those
-        if not is_indexable(field):
-            continue
+    DocumentPlan(fields=fields, all_keys=all_keys).build(src, crash_document)
 
-        src_key = get_source_key(field)
-        value = glom.glom(src, src_key, default=None)
-        if value is None:
-            continue
 
-        # Fix values so they index correctly
-        storage_type = field.get("type", field["storage_mapping"].get("type"))
+# Storage types whose fixed values are always small
+SMALL_STORAGE_TYPES = {"integer", "long", "date", "boolean"}
 
-        if storage_type == "keyword":
-            value = fix_keyword(value, max_size=MAX_KEYWORD_FIELD_VALUE_SIZE)
 
-        elif storage_type == "text":
-            value = fix_string(value, max_size=MAX_STRING_FIELD_VALUE_SIZE)
+def get_fix_function(storage_type):
+    """Return the function that fixes values of a given storage type.
 
-        elif storage_type == "integer":
-            value = fix_integer(value)
-            if value is None:
+    :param str storage_type: the storage type of the field
+
+    :returns: function that takes a value and returns the fixed value or None if the
+        value should be dropped, or None if values of this type aren't fixed
+
+    """
+    if storage_type == "keyword":
+        return functools.partial(fix_keyword, max_size=MAX_KEYWORD_FIELD_VALUE_SIZE)
+    if storage_type == "text":
+        return functools.partial(fix_string, max_size=MAX_STRING_FIELD_VALUE_SIZE)
+    if storage_type == "integer":
+        return fix_integer
+    if storage_type == "long":
+        return fix_long
+    if storage_type == "date":
+        return fix_datetime
+    if storage_type == "boolean":
+        return fix_boolean
+    return None
+
+
+class DocumentPlan:
+    """Precompiled plan for building documents to index.
+
+    This figures out which fields are indexable, where their values come from, how to
+    fix them, and where they go in the document once when the plan is created rather
+    than for every crash.
+
+    Values are read from the source document without copying it. Values that are
+    passed through without being fixed are copied if they're lists or dicts so the
+    document never shares structure with the source document.
+
+    """
+
+    def __init__(self, fields, all_keys):
+        """
+        :param dict fields: the super search fields
+        :param set all_keys: the set of valid keys
+        """
+        self.steps = []
+        for field in fields.values():
+            # There are some fields that aren't indexable--skip those
+            if not is_indexable(field):
                 continue
 
-        elif storage_type == "long":
-            value = fix_long(value)
-            if value is None:
+            dest_paths = [
+                tuple(dest_key.split("."))
+                for dest_key in get_destination_keys(field)
+                if dest_key in all_keys
+            ]
+            if not dest_paths:
                 continue
 
-        elif storage_type == "date":
-            value = fix_datetime(value)
+            storage_type = field.get("type", field["storage_mapping"].get("type"))
+            self.steps.append(
+                (
+                    tuple(get_source_key(field).split(".")),
+                    get_fix_function(storage_type),
+                    [
+                        (dest_path[:-1], dest_path[-1], ".".join(dest_path))
+                        for dest_path in dest_paths
+                    ],
+                    storage_type not in SMALL_STORAGE_TYPES,
+                )
+            )
+
+    def build(self, src, crash_document, field_sizes=None, min_field_size=0):
+        """Build a document to index.
+
+        :param dict src: the source document with "processed_crash" key
+        :param dict crash_document: the document to fill
+        :param dict field_sizes: if not None, this is filled with a map of destination
+            key to the ``estimate_json_size`` of the value for string, list, and dict
+            values
+        :param int min_field_size: strings that can't be at least this many bytes
+            aren't added to ``field_sizes``
+
+        """
+        for src_path, fix, dests, can_be_big in self.steps:
+            value = src
+            for part in src_path:
+                if not isinstance(value, dict):
+                    value = None
+                    break
+                value = value.get(part)
             if value is None:
                 continue
 
-        elif storage_type == "boolean":
-            value = fix_boolean(value)
+            if fix is not None:
+                value = fix(value)
+                if value is None:
+                    continue
+            elif isinstance(value, (dict, list)):
+                value = copy.deepcopy(value)
+
+            for parent_path, key, _ in dests:
+                parent = crash_document
+                for part in parent_path:
+                    parent = parent.setdefault(part, {})
+                parent[key] = value
+
+            # A character is at most 4 bytes in UTF-8, so only measure values that
+            # might be big enough
+            if (
+                field_sizes is not None
+                and can_be_big
+                and (
+                    isinstance(value, (list, dict))
+                    or (isinstance(value, str) and len(value) * 4 + 2 >= min_field_size)
+                )
+            ):
+                size = estimate_json_size(value)
+                for _, _, dest_key in dests:
+                    field_sizes[dest_key] = size
+
+
+def is_index_not_found(error):
+    """Return whether an Elasticsearch error is for an index that doesn't exist.
+
+    :arg error: the "error" structure from the Elasticsearch response
+
+    :returns: bool
+
+    """
+    return isinstance(error, dict) and error.get("type") == "index_not_found_exception"
+
 
-        for dest_key in get_destination_keys(field):
-            if dest_key in all_keys:
-                glom.assign(crash_document, dest_key, value, missing=dict)
+class BulkIndexError(Exception):
+    """A crash document could not be indexed with the _bulk API."""
+
+
+class BulkIndexRequest:
+    """A crash document waiting to be indexed."""
+
+    def __init__(self, crash_id, index_name, crash_document):
+        self.crash_id = crash_id
+        self.index_name = index_name
+        self.crash_document = crash_document
+        self.future = concurrent.futures.Future()
+        self.serialize()
+
+    def serialize(self):
+        """Serialize the action and document lines for the _bulk request."""
+        self.action = BULK_SERIALIZER.dumps(
+            {"index": {"_index": self.index_name, "_id": self.crash_id}}
+        )
+        self.data = BULK_SERIALIZER.dumps(self.crash_document)
+
+    @property
+    def size(self):
+        return len(self.action) + len(self.data) + 2
+
+
+class ESBulkIndexer:
+    """Buffers crash documents and indexes them in batches with the _bulk API.
+
+    Documents are buffered until there are ``max_documents`` of them, they take up
+    ``max_bytes``, no document has been added for ``linger`` seconds, or the oldest
+    one has been waiting ``max_age`` seconds. Then they're sent in a single _bulk
+    request.
+
+    Each document gets a future that's resolved when the document is indexed (or
+    fails to index), so callers can wait for their document before acknowledging
+    the crash. Callers that wait can't add more documents, so the buffer holds at
+    most one document per caller. ``linger`` sends it once they've all added theirs
+    rather than after ``max_age``.
+
+    Documents that fail with errors we know how to fix are fixed the same way as
+    documents indexed one at a time and retried.
+
+    """
+
+    def __init__(self, crashstorage, max_documents, max_bytes, max_age, linger=None):
+        """
+        :arg crashstorage: the ESCrashStorage instance to index with
+        :arg max_documents: maximum number of documents in a batch
+        :arg max_bytes: maximum size of a batch in bytes
+        :arg max_age: maximum time in seconds a document waits before its batch
+            is sent
+        :arg linger: time in seconds without new documents after which the batch is
+            sent or None to wait for ``max_age``
+        """
+        self.crashstorage = crashstorage
+        self.logger = crashstorage.logger
+        self.metrics = crashstorage.metrics
+        self.max_documents = max_documents
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.linger = linger
+
+        self._batcher = Batcher(
+            send=self.index_batch,
+            max_items=max_documents,
+            max_bytes=max_bytes,
+            max_age=max_age,
+            linger=linger,
+            name="es_bulk_flusher",
+        )
+
+    def submit(self, crash_id, index_name, crash_document):
+        """Add a crash document to the buffer.
+
+        :arg crash_id: the crash id
+        :arg index_name: the name of the index to index the document into
+        :arg crash_document: the document to index
+
+        :returns: a ``concurrent.futures.Future`` that is resolved when the document
+            is indexed
+
+        :raises BatcherClosedError: if the indexer is closed
+
+        """
+        return self.submit_request(
+            BulkIndexRequest(crash_id, index_name, crash_document)
+        )
+
+    def submit_request(self, request):
+        """Add a BulkIndexRequest to the buffer.
+
+        :arg request: the BulkIndexRequest
+
+        :returns: a ``concurrent.futures.Future`` that is resolved when the document
+            is indexed
+
+        :raises BatcherClosedError: if the indexer is closed
+
+        """
+        self._batcher.add(request, size=request.size)
+        return request.future
+
+    def flush(self):
+        """Send whatever is in the buffer now."""
+        self._batcher.flush()
+
+    def close(self):
+        """Send whatever is in the buffer and reject documents after that."""
+        self._batcher.close()
+
+    def _send(self, requests):
+        lines = []
+        for request in requests:
+            lines.append(request.action)
+            lines.append(request.data)
+
+        start_time = time.time()
+        outcome = "failed"
+        try:
+            with self.crashstorage.client() as conn:
+                resp = conn.bulk(operations=lines)
+            outcome = "successful"
+        finally:
+            elapsed_time = time.time() - start_time
+            self.metrics.histogram(
+                "bulk_index", value=elapsed_time * 1000.0, tags=[f"outcome:{outcome}"]
+            )
+            self.metrics.histogram("bulk_documents", value=len(requests))
+        return resp
+
+    def index_batch(self, batch):
+        """Index a batch of documents and resolve their futures.
+
+        :arg batch: list of BulkIndexRequest instances
+
+        """
+        pending = batch
+        try:
+            # Don't retry more than 5 times. That is to avoid infinite loops in case of
+            # an unhandled exception.
+            for _ in range(5):
+                # Make sure the indexes exist
+                for index_name in sorted({request.index_name for request in pending}):
+                    self.crashstorage.ensure_index(index_name)
+
+                try:
+                    resp = self._send(pending)
+                except elasticsearch.ConnectionError:
+                    # If this is a connection error, sleep a second and then try again
+                    time.sleep(1.0)
+                    continue
+
+                retry = []
+                for request, item in zip(pending, resp["items"]):
+                    result = item["index"]
+                    error = result.get("error")
+                    if error is None:
+                        request.future.set_result(result)
+                        continue
+
+                    if is_index_not_found(error):
+                        # The index was deleted out from under us; forget it so the
+                        # next attempt creates it
+                        self.crashstorage.forget_index(request.index_name)
+                        retry.append(request)
+                        continue
+
+                    field_name = None
+                    if result.get("status") == 400:
+                        field_name = self.crashstorage._remove_field_for_error(
+                            request.crash_document, error
+                        )
+                    if field_name:
+                        request.serialize()
+                        retry.append(request)
+                        continue
+
+                    self.logger.critical(
+                        "Submission to Elasticsearch failed for %s (%s)",
+                        request.crash_id,
+                        error,
+                    )
+                    self.metrics.incr("indexerror", tags=["error:unhandled"])
+                    request.future.set_exception(
+                        BulkIndexError(f"{request.crash_id}: {error!r}")
+                    )
+
+                pending = retry
+                if not pending:
+                    return
+
+            for request in pending:
+                request.future.set_exception(
+                    BulkIndexError(f"{request.crash_id}: too many attempts")
+                )
+
+        except Exception as exc:
+            self.logger.critical(
+                "Bulk submission to Elasticsearch failed (%s)", exc, exc_info=True
+            )
+            for request in pending:
+                if not request.future.done():
+                    request.future.set_exception(exc)
 
 
 class ESCrashStorage(CrashStorageBase):
@@ -276,10 +642,41 @@ class ESCrashStorage(CrashStorageBase):
         metrics_prefix="processor.es",
         timeout=30,
         shards_per_index=10,
+        pool_maxsize=10,
+        keep_alive=60,
+        bulk_max_documents=0,
+        bulk_max_bytes=5_000_000,
+        bulk_max_age=1.0,
+        bulk_linger=0.05,
     ):
+        """
+        :arg url: the url for the Elasticsearch cluster
+        :arg index: template for index names
+        :arg index_regex: regex for matching index names
+        :arg retention_policy: number of weeks to keep indices for
+        :arg metrics_prefix: prefix for metrics emitted by this crash storage
+        :arg timeout: the time in seconds before a request to Elasticsearch fails
+        :arg shards_per_index: number of shards for new indices
+        :arg pool_maxsize: maximum number of connections to each Elasticsearch node
+        :arg keep_alive: seconds a connection is idle before TCP keep-alive probes are
+            sent; 0 disables TCP keep-alive
+        :arg bulk_max_documents: if greater than 0, crash documents are indexed in
+            batches of up to this many documents with the _bulk API
+        :arg bulk_max_bytes: maximum size in bytes of a _bulk request
+        :arg bulk_max_age: maximum time in seconds a crash document waits for its
+            batch to fill up before it's sent
+        :arg bulk_linger: time in seconds without new crash documents after which a
+            batch is sent
+        """
         super().__init__()
 
-        self.client = self.build_client(url=url, timeout=timeout)
+        self.client = self.build_client(
+            url=url,
+            timeout=timeout,
+            pool_maxsize=pool_maxsize,
+            keep_alive=keep_alive,
+            metrics_prefix=metrics_prefix,
+        )
 
         # Create a MetricsInterface that includes the base prefix plus the prefix passed
         # into __init__
@@ -293,14 +690,33 @@ class ESCrashStorage(CrashStorageBase):
         self.retention_policy = retention_policy
         self.shards_per_index = shards_per_index
 
+        self.bulk_indexer = None
+        if bulk_max_documents and bulk_max_documents > 0:
+            self.bulk_indexer = ESBulkIndexer(
+                crashstorage=self,
+                max_documents=bulk_max_documents,
+                max_bytes=bulk_max_bytes,
+                max_age=bulk_max_age,
+                linger=bulk_linger,
+            )
+
+        # Names of indices known to exist; None until it's loaded from Elasticsearch
+        self._known_indices = None
+        self._known_indices_lock = threading.Lock()
+
         # Cached answers for things that don't change
         self._keys_for_indexable_fields_cache = None
         self._keys_for_mapping_cache = {}
         self._mapping_cache = {}
+        self._document_plan_cache = {}
+
+    def close(self):
+        if self.bulk_indexer is not None:
+            self.bulk_indexer.close()
 
     @classmethod
-    def build_client(cls, url, timeout):
-        return ConnectionContext(url=url, timeout=timeout)
+    def build_client(cls, **kwargs):
+        return ConnectionContext(**kwargs)
 
     def build_query(self):
         """Return new instance of Query."""
@@ -397,7 +813,38 @@ class ESCrashStorage(CrashStorageBase):
             index_settings=index_settings,
         )
 
+    def ensure_index(self, index_name):
+        """Create an index if it's not already known to exist.
+
+        The first time this is called, it loads the list of existing indices from
+        Elasticsearch. After that, it only talks to Elasticsearch when it sees an
+        index it doesn't know about, which happens about once a week.
+
+        :arg index_name: the name of the index
+
+        """
+        with self._known_indices_lock:
+            if self._known_indices is None:
+                self._known_indices = set(self.get_indices())
+            if index_name in self._known_indices:
+                return
+
+        self.create_index(index_name)
+        with self._known_indices_lock:
+            self._known_indices.add(index_name)
+
+    def forget_index(self, index_name):
+        """Remove an index from the known indices.
+
+        :arg index_name: the name of the index
+
+        """
+        with self._known_indices_lock:
+            if self._known_indices is not None:
+                self._known_indices.discard(index_name)
+
     def delete_index(self, index_name):
+        self.forget_index(index_name)
         return self.client.delete_index(index_name=index_name)
 
     def get_indices(self):
@@ -428,7 +875,7 @@ class ESCrashStorage(CrashStorageBase):
             if index_name > cutoff:
                 continue
 
-            self.client.delete_index(index_name)
+            self.delete_index(index_name)
             was_deleted.append(index_name)
 
         return was_deleted
@@ -488,6 +935,26 @@ class ESCrashStorage(CrashStorageBase):
 
         return all_valid_keys
 
+    def get_document_plan(self, index_name):
+        """Return the DocumentPlan for building documents for a given index
+
+        Plans are cached on this ESCrashStorage instance by the set of
+        valid keys.
+
+        :arg str index_name: the name of the index
+
+        :returns: DocumentPlan
+
+        """
+        all_valid_keys = frozenset(self.get_keys(index_name))
+        document_plan = self._document_plan_cache.get(all_valid_keys)
+        if document_plan is None:
+            document_plan = DocumentPlan(
+                fields=self.SUPERSEARCH_FIELDS, all_keys=all_valid_keys
+            )
+            self._document_plan_cache[all_valid_keys] = document_plan
+        return document_plan
+
     def save_processed_crash(self, raw_crash, processed_crash):
         """Save processed crash report to Elasticsearch"""
         crash_id = processed_crash["uuid"]
@@ -495,46 +962,132 @@ class ESCrashStorage(CrashStorageBase):
         index_name = self.get_index_for_date(
             string_to_datetime(processed_crash["date_processed"])
         )
-        all_valid_keys = self.get_keys(index_name)
-
-        src = {"processed_crash": copy.deepcopy(processed_crash)}
+        document_plan = self.get_document_plan(index_name)
 
         crash_document = {
             "crash_id": crash_id,
             "processed_crash": {},
         }
-        build_document(
-            src, crash_document, fields=self.SUPERSEARCH_FIELDS, all_keys=all_valid_keys
+        field_sizes = {}
+        document_plan.build(
+            {"processed_crash": processed_crash},
+            crash_document,
+            field_sizes=field_sizes,
+            min_field_size=FIELD_SIZE_METRIC_MIN,
         )
 
-        # Capture crash data size metrics
-        self.capture_crash_metrics(crash_document)
+        if self.bulk_indexer is not None:
+            request = BulkIndexRequest(crash_id, index_name, crash_document)
+            self.capture_crash_metrics(
+                crash_document, document_size=len(request.data), field_sizes=field_sizes
+            )
+
+            # Wait for the document to be indexed so the crash isn't acknowledged
+            # until it's in Elasticsearch
+            future = self.bulk_indexer.submit_request(request)
+            future.result()
+            return
+
+        # Serialize the document here so the size metric is the size of what's sent
+        data = BULK_SERIALIZER.dumps(crash_document)
+        self.capture_crash_metrics(
+            crash_document, document_size=len(data), field_sizes=field_sizes
+        )
 
         self._submit_crash_to_elasticsearch(
             crash_id=crash_id,
             index_name=index_name,
             crash_document=crash_document,
+            data=data,
         )
 
-    def capture_crash_metrics(self, crash_document):
-        """Capture metrics about crash data being saved to Elasticsearch"""
+    def update_processed_crash(self, raw_crash, processed_crash, fields):
+        """Update some fields of a processed crash report in Elasticsearch
 
-        def _capture(key, data):
-            try:
-                self.metrics.histogram(
-                    key, value=len(json.dumps(data, cls=JsonDTEncoder))
-                )
-            except Exception:
-                # NOTE(willkg): An error here shouldn't screw up saving data. Log it so
-                # we can fix it later.
-                self.logger.exception(f"something went wrong when capturing {key}")
+        This sends only the parts of the crash document built from the listed fields
+        as a partial update. If the crash document isn't in Elasticsearch, a listed
+        field was removed from the processed crash, or Elasticsearch rejects the
+        update, this indexes the whole crash document. Indexing the whole document
+        removes fields Elasticsearch can't index and notes them in
+        ``removed_fields``.
+
+        """
+        if any(key not in processed_crash for key in fields):
+            # Partial updates can't remove fields
+            self.save_processed_crash(raw_crash, processed_crash)
+            return
+
+        crash_id = processed_crash["uuid"]
+
+        index_name = self.get_index_for_date(
+            string_to_datetime(processed_crash["date_processed"])
+        )
+        document_plan = self.get_document_plan(index_name)
+
+        crash_document = {"processed_crash": {}}
+        document_plan.build(
+            {"processed_crash": {key: processed_crash[key] for key in fields}},
+            crash_document,
+        )
+
+        try:
+            with self.client() as conn:
+                self._update_crash(conn, index_name, crash_document, crash_id)
+        except elasticsearch.NotFoundError:
+            self.save_processed_crash(raw_crash, processed_crash)
+        except elasticsearch.BadRequestError:
+            # A value doesn't fit the mapping; retrying the update would fail the
+            # same way every time, so index the whole document which removes the
+            # field
+            self.save_processed_crash(raw_crash, processed_crash)
+
+    def capture_crash_metrics(
+        self, crash_document, document_size=None, field_sizes=None
+    ):
+        """Capture metrics about crash data being saved to Elasticsearch
+
+        :arg crash_document: the crash document
+        :arg document_size: the size in bytes of the serialized crash document; if
+            this is None, it's computed with ``estimate_json_size``
+        :arg field_sizes: map of destination key to size in bytes of the serialized
+            value from ``DocumentPlan.build``
+
+        """
+        try:
+            if document_size is None:
+                document_size = estimate_json_size(crash_document)
+            self.metrics.histogram("crash_document_size", value=document_size)
+
+            # Only emit sizes for big fields so this doesn't emit a metric for every
+            # field for every crash
+            for key, size in (field_sizes or {}).items():
+                if size >= FIELD_SIZE_METRIC_MIN:
+                    self.metrics.histogram(
+                        "crash_document_field_size", value=size, tags=[f"field:{key}"]
+                    )
+        except Exception:
+            # NOTE(willkg): An error here shouldn't screw up saving data. Log it so
+            # we can fix it later.
+            self.logger.exception("something went wrong when capturing crash metrics")
+
+    def _index_crash(self, connection, es_index, crash_document, crash_id, data=None):
+        """Index a crash document
 
-        _capture("crash_document_size", crash_document)
+        :arg connection: the Elasticsearch client
+        :arg es_index: the name of the index
+        :arg crash_document: the crash document
+        :arg crash_id: the crash id
+        :arg data: the serialized crash document or None to have the client
+            serialize it
 
-    def _index_crash(self, connection, es_index, crash_document, crash_id):
+        """
         try:
             start_time = time.time()
-            connection.index(index=es_index, body=crash_document, id=crash_id)
+            connection.index(
+                index=es_index,
+                body=data if data is not None else crash_document,
+                id=crash_id,
+            )
             index_outcome = "successful"
         except Exception:
             index_outcome = "failed"
@@ -545,13 +1098,128 @@ class ESCrashStorage(CrashStorageBase):
                 "index", value=elapsed_time * 1000.0, tags=["outcome:" + index_outcome]
             )
 
-    def _submit_crash_to_elasticsearch(self, crash_id, index_name, crash_document):
-        """Submit a crash report to elasticsearch"""
-        # Attempt to create the index; it's OK if it already exists.
+    def _update_crash(self, connection, es_index, crash_document, crash_id):
+        """Update part of a crash document
 
-        # FIXME(willkg): we shouldn't do this--instead we should try to index and create
-        # the index if the index doesn't exist
-        self.create_index(index_name)
+        :arg connection: the Elasticsearch client
+        :arg es_index: the name of the index
+        :arg crash_document: the parts of the crash document to update
+        :arg crash_id: the crash id
+
+        """
+        try:
+            start_time = time.time()
+            connection.update(index=es_index, id=crash_id, doc=crash_document)
+            update_outcome = "successful"
+        except Exception:
+            update_outcome = "failed"
+            raise
+        finally:
+            elapsed_time = time.time() - start_time
+            self.metrics.histogram(
+                "update",
+                value=elapsed_time * 1000.0,
+                tags=["outcome:" + update_outcome],
+            )
+
+    def _remove_field_for_error(self, crash_document, error):
+        """Remove the field that caused an indexing error from the crash document.
+
+        This handles errors for values that are too big, numbers that aren't numbers,
+        and values that are the wrong shape. For those, it removes the field from the
+        crash document and notes that in ``removed_fields``.
+
+        :arg crash_document: the crash document that failed to index
+        :arg error: the "error" structure from the Elasticsearch response
+
+        :returns: the name of the field that was removed or None if the error isn't
+            one we can fix
+
+        """
+        field_name = None
+
+        if (
+            error["type"] == "document_parsing_exception"
+            and error["caused_by"]["type"] == "illegal_argument_exception"
+            and error["reason"].startswith(
+                "Document contains at least one immense term"
+            )
+        ):
+            # This is caused by a string that is way too long for
+            # Elasticsearch, specifically 32_766 bytes when UTF8 encoded.
+            matches = self.field_name_string_error_re.findall(error["reason"])
+            if matches:
+                field_name = matches[0]
+                self.metrics.incr("indexerror", tags=["error:maxbyteslengthexceeded"])
+
+        elif (
+            error["type"] == "document_parsing_exception"
+            and error["caused_by"]["type"] == "number_format_exception"
+        ):
+            # This is caused by a number that is either too big for
+            # Elasticsearch or just not a number.
+            matches = self.field_name_number_error_re.findall(error["reason"])
+            if matches:
+                field_name = matches[0]
+                self.metrics.incr("indexerror", tags=["error:numberformatexception"])
+
+        elif (
+            error["type"] == "document_parsing_exception"
+            and error["caused_by"]["type"] == "illegal_argument_exception"
+        ):
+            # This is caused by field values that are nested for a field where a
+            # previously indexed value was a string. For example, the processor
+            # first indexes ModuleSignatureInfo value as a string, then tries to
+            # index ModuleSignatureInfo as a nested dict.
+            matches = self.field_name_unknown_property_error_re.findall(error["reason"])
+            if matches:
+                field_name = matches[0]
+                self.metrics.incr("indexerror", tags=["error:unknownproperty"])
+
+        if not field_name:
+            return None
+
+        if field_name.endswith(".full"):
+            # Remove the `.full` at the end, that is a special mapping construct
+            # that is not part of the real field name.
+            field_name = field_name.removesuffix(".full")
+
+        # Now remove that field from the document before trying again.
+        field_path = field_name.split(".")
+        parent = crash_document
+        for i, field in enumerate(field_path):
+            if i == len(field_path) - 1:
+                # This is the last level, so `field` contains the name
+                # of the field that we want to remove from `parent`.
+                del parent[field]
+            else:
+                parent = parent[field]
+
+        # Add a note in the document that a field has been removed.
+        if crash_document.get("removed_fields"):
+            crash_document["removed_fields"] = "{} {}".format(
+                crash_document["removed_fields"], field_name
+            )
+        else:
+            crash_document["removed_fields"] = field_name
+
+        return field_name
+
+    def _submit_crash_to_elasticsearch(
+        self, crash_id, index_name, crash_document, data=None
+    ):
+        """Submit a crash report to elasticsearch
+
+        :arg crash_id: the crash id
+        :arg index_name: the name of the index
+        :arg crash_document: the crash document
+        :arg data: the serialized crash document or None to have the client
+            serialize it
+
+        """
+        # Make sure the index exists; this only talks to Elasticsearch if it's an
+        # index we haven't seen before
+        self.ensure_index(index_name)
 
         # Submit the crash for indexing.
         # Don't retry more than 5 times. That is to avoid infinite loops in
@@ -559,63 +1227,31 @@ class ESCrashStorage(CrashStorageBase):
         for _ in range(5):
             try:
                 with self.client() as conn:
-                    return self._index_crash(conn, index_name, crash_document, crash_id)
+                    return self._index_crash(
+                        conn, index_name, crash_document, crash_id, data=data
+                    )
 
             except elasticsearch.ConnectionError:
                 # If this is a connection error, sleep a second and then try again
                 time.sleep(1.0)
 
+            except elasticsearch.NotFoundError as exc:
+                error = exc.body.get("error") if isinstance(exc.body, dict) else None
+                if not is_index_not_found(error):
+                    raise
+                # The index was deleted out from under us; forget it so the next
+                # attempt creates it
+                self.forget_index(index_name)
+                self.ensure_index(index_name)
+
             except elasticsearch.BadRequestError as e:
                 # If this is a BadRequestError, we try to figure out what the error
                 # is and fix the document and try again
-                field_name = None
-
-                error = e.body["error"]
-
-                if (
-                    error["type"] == "document_parsing_exception"
-                    and error["caused_by"]["type"] == "illegal_argument_exception"
-                    and error["reason"].startswith(
-                        "Document contains at least one immense term"
-                    )
-                ):
-                    # This is caused by a string that is way too long for
-                    # Elasticsearch, specifically 32_766 bytes when UTF8 encoded.
-                    matches = self.field_name_string_error_re.findall(error["reason"])
-                    if matches:
-                        field_name = matches[0]
-                        self.metrics.incr(
-                            "indexerror", tags=["error:maxbyteslengthexceeded"]
-                        )
-
-                elif (
-                    error["type"] == "document_parsing_exception"
-                    and error["caused_by"]["type"] == "number_format_exception"
-                ):
-                    # This is caused by a number that is either too big for
-                    # Elasticsearch or just not a number.
-                    matches = self.field_name_number_error_re.findall(error["reason"])
-                    if matches:
-                        field_name = matches[0]
-                        self.metrics.incr(
-                            "indexerror", tags=["error:numberformatexception"]
-                        )
-
-                elif (
-                    error["type"] == "document_parsing_exception"
-                    and error["caused_by"]["type"] == "illegal_argument_exception"
-                ):
-                    # This is caused by field values that are nested for a field where a
-                    # previously indexed value was a string. For example, the processor
-                    # first indexes ModuleSignatureInfo value as a string, then tries to
-                    # index ModuleSignatureInfo as a nested dict.
-                    matches = self.field_name_unknown_property_error_re.findall(
-                        error["reason"]
-                    )
-                    if matches:
-                        field_name = matches[0]
-                        self.metrics.incr("indexerror", tags=["error:unknownproperty"])
-
+                field_name = self._remove_field_for_error(
+                    crash_document, e.body["error"]
+                )
+                # The serialized document no longer matches the fixed one
+                data = None
                 if not field_name:
                     # We are unable to parse which field to remove, we cannot
                     # try to fix the document. Let it raise.
@@ -628,30 +1264,6 @@ class ESCrashStorage(CrashStorageBase):
                     self.metrics.incr("indexerror", tags=["error:unhandled"])
                     raise
 
-                if field_name.endswith(".full"):
-                    # Remove the `.full` at the end, that is a special mapping construct
-                    # that is not part of the real field name.
-                    field_name = field_name.removesuffix(".full")
-
-                # Now remove that field from the document before trying again.
-                field_path = field_name.split(".")
-                parent = crash_document
-                for i, field in enumerate(field_path):
-                    if i == len(field_path) - 1:
-                        # This is the last level, so `field` contains the name
-                        # of the field that we want to remove from `parent`.
-                        del parent[field]
-                    else:
-                        parent = parent[field]
-
-                # Add a note in the document that a field has been removed.
-                if crash_document.get("removed_fields"):
-                    crash_document["removed_fields"] = "{} {}".format(
-                        crash_document["removed_fields"], field_name
-                    )
-                else:
-                    crash_document["removed_fields"] = field_name
-
             except elasticsearch.ApiError as exc:
                 self.logger.critical(
                     "Submission to Elasticsearch failed for %s (%s)",
@@ -5,7 +5,6 @@
 from contextlib import contextmanager, closing, suppress
 import gzip
 from io import BytesIO
-import json
 import os
 import shutil
 
@@ -15,7 +14,8 @@ from socorro.external.crashstorage_base import (
     FileDumpsMapping,
     MemoryDumpsMapping,
 )
-from socorro.lib.libdatetime import utc_now, JsonDTEncoder
+from socorro.lib import libjson
+from socorro.lib.libdatetime import utc_now
 from socorro.lib.libooid import date_from_ooid, depth_from_ooid
 
 
@@ -151,9 +151,7 @@ class FSPermanentStorage(CrashStorageBase):
         if isinstance(dumps, dict):
             dumps = MemoryDumpsMapping(dumps)
 
-        files = {
-            crash_id + self.json_file_suffix: json.dumps(raw_crash).encode("utf-8")
-        }
+        files = {crash_id + self.json_file_suffix: libjson.encode(raw_crash)}
         in_memory_dumps = dumps.as_memory_dumps_mapping()
         files.update(
             {
@@ -168,8 +166,7 @@ class FSPermanentStorage(CrashStorageBase):
         processed_crash = processed_crash.copy()
         f = BytesIO()
         with closing(gzip.GzipFile(mode="wb", fileobj=f)) as fz:
-            data = json.dumps(processed_crash, cls=JsonDTEncoder)
-            fz.write(data.encode("utf-8"))
+            fz.write(libjson.encode(processed_crash, default=libjson.datetime_default))
         self._save_files(crash_id, {crash_id + self.jsonz_file_suffix: f.getvalue()})
 
     def get_raw_crash(self, crash_id):
@@ -178,8 +175,8 @@ class FSPermanentStorage(CrashStorageBase):
             raise CrashIDNotFound
         path = os.sep.join([parent_dir, crash_id + self.json_file_suffix])
 
-        with open(path) as f:
-            data = json.load(f)
+        with open(path, "rb") as f:
+            data = libjson.load(f)
 
         return data
 
@@ -222,7 +219,7 @@ class FSPermanentStorage(CrashStorageBase):
         if not os.path.exists(pathname):
             raise CrashIDNotFound
         with closing(gzip.GzipFile(pathname, "rb")) as f:
-            return json.load(f)
+            return libjson.load(f)
 
     def _get_radixed_parent_directory(self, crash_id):
         return os.sep.join(
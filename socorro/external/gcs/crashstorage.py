@@ -2,31 +2,42 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import concurrent.futures
 import json
 import os
+import time
 
 from google.auth.credentials import AnonymousCredentials
 from google.api_core.exceptions import NotFound
 from google.cloud import storage
+import markus
 from more_itertools import chunked
 
 from socorro.external.crashstorage_base import (
     CrashStorageBase,
     CrashIDNotFound,
+    FileDumpsMapping,
     MemoryDumpsMapping,
     get_datestamp,
-    dict_to_str,
+    get_dump_file_path,
+    dict_to_bytes,
     list_to_str,
     str_to_list,
 )
-from socorro.lib import external_common, MissingArgumentError, BadArgumentError, libooid
-from socorro.lib.libjsonschema import JsonSchemaReducer
+from socorro.lib import (
+    external_common,
+    libjson,
+    libooid,
+    MissingArgumentError,
+    BadArgumentError,
+)
 from socorro.lib.libsocorrodataschema import (
     get_schema,
     permissions_transform_function,
-    SocorroDataReducer,
     transform_schema,
 )
+from socorro.lib.libtelemetry import PublicTelemetryReducer
+from socorro.libmarkus import METRICS, build_prefix
 from socorro.schemas import TELEMETRY_SOCORRO_CRASH_SCHEMA
 
 
@@ -60,6 +71,23 @@ def build_keys(name_of_thing, crashid):
     return [f"v1/{name_of_thing}/{crashid}"]
 
 
+def get_dump_kind(dump_name):
+    """Return the kind of dump for metrics tags.
+
+    Dump names come from the crash report, so this keeps tag values to a known set.
+
+    :arg dump_name: the name of the dump
+
+    :returns: "minidump", "memory_report", or "other"
+
+    """
+    if dump_name in (None, "", "dump") or dump_name.startswith("upload_file_minidump"):
+        return "minidump"
+    if dump_name == "memory_report":
+        return "memory_report"
+    return "other"
+
+
 class GcsCrashStorage(CrashStorageBase):
     """Saves and loads crash data to GCS"""
 
@@ -68,16 +96,27 @@ class GcsCrashStorage(CrashStorageBase):
         bucket="crashstats",
         dump_file_suffix=".dump",
         metrics_prefix="processor.gcs",
+        download_max_workers=4,
     ):
         """
         :arg bucket: the GCS bucket to save to
         :arg dump_file_suffix: the suffix used to identify a dump file (for use in temp
             files)
         :arg metrics_prefix: the metrics prefix for markus
+        :arg download_max_workers: maximum number of dumps to download at once across
+            all callers of ``get_dumps_as_files``
 
         """
         super().__init__()
 
+        self.metrics = markus.get_metrics(
+            build_prefix(METRICS.prefix, metrics_prefix),
+            filters=list(METRICS.filters),
+        )
+        self.download_max_workers = download_max_workers or 4
+        # Created on first use so forked worker processes don't share it
+        self._download_executor = None
+
         if emulator := os.environ.get("STORAGE_EMULATOR_HOST"):
             self.logger.debug(
                 "STORAGE_EMULATOR_HOST detected, connecting to emulator: %s",
@@ -120,7 +159,7 @@ class GcsCrashStorage(CrashStorageBase):
             dumps = MemoryDumpsMapping()
 
         path = build_keys("raw_crash", crash_id)[0]
-        raw_crash_data = dict_to_str(raw_crash).encode("utf-8")
+        raw_crash_data = dict_to_bytes(raw_crash)
         self.save_file(path, raw_crash_data)
 
         path = build_keys("dump_names", crash_id)[0]
@@ -140,7 +179,7 @@ class GcsCrashStorage(CrashStorageBase):
     def save_processed_crash(self, raw_crash, processed_crash):
         """Save the processed crash file."""
         crash_id = processed_crash["uuid"]
-        data = dict_to_str(processed_crash).encode("utf-8")
+        data = dict_to_bytes(processed_crash)
         path = build_keys("processed_crash", crash_id)[0]
         self.save_file(path, data)
 
@@ -183,7 +222,7 @@ class GcsCrashStorage(CrashStorageBase):
         for path in build_keys("raw_crash", crash_id):
             try:
                 raw_crash_as_string = self.load_file(path)
-                data = json.loads(raw_crash_as_string)
+                data = libjson.decode(raw_crash_as_string)
                 return data
             except NotFound:
                 continue
@@ -230,21 +269,94 @@ class GcsCrashStorage(CrashStorageBase):
         except NotFound as exc:
             raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
 
+    def get_download_executor(self):
+        if self._download_executor is None:
+            self._download_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.download_max_workers,
+                thread_name_prefix="gcs_download",
+            )
+        return self._download_executor
+
+    def download_dump_to_file(self, crash_id, dump_name, file_path):
+        """Stream a dump into a file.
+
+        :arg crash_id: the crash id
+        :arg dump_name: the name of the dump in the bucket
+        :arg file_path: the path of the file to write
+
+        :raises NotFound: if the dump does not exist
+
+        """
+        path = build_keys(dump_name, crash_id)[0]
+        bucket = self.client.bucket(self.bucket)
+        blob = bucket.blob(path)
+
+        start_time = time.perf_counter()
+        blob.download_to_filename(file_path)
+        delta = (time.perf_counter() - start_time) * 1000
+
+        size = os.path.getsize(file_path)
+        tags = [f"dump_kind:{get_dump_kind(dump_name)}"]
+        self.metrics.timing("download_dump", value=delta, tags=tags)
+        self.metrics.histogram("download_dump_size", value=size, tags=tags)
+        self.logger.debug(
+            "downloaded %s %s: %d bytes in %.1fms", crash_id, dump_name, size, delta
+        )
+
     def get_dumps_as_files(self, crash_id, tmpdir):
         """Get the dump files for given crash id and save them to tmp.
 
+        Dumps are downloaded concurrently and streamed to disk, so they're never held
+        in memory in their entirety.
+
         :returns: dict of dumpname -> file path
 
         :raises CrashIDNotFound: if file does not exist
 
         """
-        in_memory_dumps = self.get_dumps(crash_id)
-        # convert our native memory dump mapping into a file dump mapping.
-        return in_memory_dumps.as_file_dumps_mapping(
-            crash_id,
-            tmpdir,
-            self.dump_file_suffix,
-        )
+        try:
+            path = build_keys("dump_names", crash_id)[0]
+            dump_names = str_to_list(self.load_file(path))
+        except NotFound as exc:
+            raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
+
+        dumps = FileDumpsMapping()
+        downloads = []
+        for dump_name in dump_names:
+            if dump_name in (None, "", "upload_file_minidump"):
+                dump_name = "dump"
+            file_dump_name = (
+                "upload_file_minidump" if dump_name == "dump" else dump_name
+            )
+            file_path = get_dump_file_path(
+                tmpdir, crash_id, file_dump_name, self.dump_file_suffix
+            )
+            dumps[file_dump_name] = file_path
+            downloads.append((dump_name, file_path))
+
+        try:
+            if len(downloads) == 1:
+                self.download_dump_to_file(crash_id, *downloads[0])
+            elif downloads:
+                executor = self.get_download_executor()
+                futures = [
+                    executor.submit(self.download_dump_to_file, crash_id, *download)
+                    for download in downloads
+                ]
+                # Wait for all downloads so nothing is writing to tmpdir after this
+                # returns
+                concurrent.futures.wait(futures)
+                for future in futures:
+                    future.result()
+        except NotFound as exc:
+            raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
+
+        return dumps
+
+    def close(self):
+        if self._download_executor is not None:
+            self._download_executor.shutdown(wait=True)
+            self._download_executor = None
 
     def get_processed_crash(self, crash_id):
         """Get the processed crash.
@@ -259,7 +371,7 @@ class GcsCrashStorage(CrashStorageBase):
             processed_crash_as_string = self.load_file(path)
         except NotFound as exc:
             raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
-        return json.loads(processed_crash_as_string)
+        return libjson.decode(processed_crash_as_string)
 
     def get(self, **kwargs):
         """Return JSON data of a crash report, given its uuid."""
@@ -318,7 +430,7 @@ class GcsCrashStorage(CrashStorageBase):
 
         for key in build_keys("dump_names", crash_id):
             try:
-                dump_names = json.loads(self.load_file(key))
+                dump_names = libjson.decode(self.load_file(key))
                 contents.append("gcs_dump_names")
                 for dump_name in dump_names:
                     contents.append(f"gcs_dump_{dump_name}")
@@ -349,7 +461,7 @@ class GcsCrashStorage(CrashStorageBase):
         # delete dumps
         for key in build_keys("dump_names", crash_id):
             try:
-                dump_names = json.loads(self.load_file(key))
+                dump_names = libjson.decode(self.load_file(key))
             except NotFound:
                 pass
             except json.JSONDecodeError:
@@ -399,12 +511,12 @@ class TelemetryGcsCrashStorage(GcsCrashStorage):
             schema=processed_crash_schema,
             transform_function=only_public,
         )
-        self.processed_crash_reducer = SocorroDataReducer(
-            schema=public_processed_crash_schema
-        )
-
-        self.telemetry_reducer = JsonSchemaReducer(
-            schema=TELEMETRY_SOCORRO_CRASH_SCHEMA
+        # Reduces the processed crash to public-only fields, then to the telemetry
+        # schema fields, and then adds historical fields in one pass
+        self.telemetry_reducer = PublicTelemetryReducer(
+            public_schema=public_processed_crash_schema,
+            telemetry_schema=TELEMETRY_SOCORRO_CRASH_SCHEMA,
+            renamed_keys=self.HISTORICAL_MANUAL_KEYS,
         )
 
     # List of source -> target keys which have different names for historical reasons
@@ -423,22 +535,13 @@ class TelemetryGcsCrashStorage(GcsCrashStorage):
         For Telemetry, we reduce the processed crash into a crash report that matches
         the telemetry_socorro_crash.json schema.
 
-        For historical reasons, we then add some additional fields manually.
+        For historical reasons, some fields are also added under different names.
 
         """
-        # Reduce processed crash to public-only fields
-        public_data = self.processed_crash_reducer.traverse(document=processed_crash)
-
-        # Reduce public processed_crash to telemetry schema fields
-        telemetry_data = self.telemetry_reducer.traverse(document=public_data)
-
-        # Add additional fields that have different names for historical reasons
-        for source_key, target_key in self.HISTORICAL_MANUAL_KEYS:
-            if source_key in public_data:
-                telemetry_data[target_key] = public_data[source_key]
+        telemetry_data = self.telemetry_reducer.traverse(document=processed_crash)
 
         crash_id = telemetry_data["uuid"]
-        data = dict_to_str(telemetry_data).encode("utf-8")
+        data = dict_to_bytes(telemetry_data)
         path = build_keys("crash_report", crash_id)[0]
         self.save_file(path, data)
 
@@ -455,7 +558,7 @@ class TelemetryGcsCrashStorage(GcsCrashStorage):
             crash_report_as_str = self.load_file(path)
         except NotFound as exc:
             raise CrashIDNotFound(f"{crash_id} not found: {exc}") from exc
-        return json.loads(crash_report_as_str)
+        return libjson.decode(crash_report_as_str)
 
     def get(self, **kwargs):
         """Return JSON data of a crash report, given its uuid."""
@@ -3,8 +3,68 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 import contextlib
+import os
+import threading
 
 import elasticsearch_1_9_0 as elasticsearch
+import markus
+from requests.adapters import HTTPAdapter
+
+from socorro.lib.libconnectionpool import ConnectionPoolMetrics, build_socket_options
+from socorro.libmarkus import METRICS, build_prefix
+
+
+# Process-wide Elasticsearch clients keyed on (pid, url, timeout, pool settings); the
+# Elasticsearch client is thread-safe, so everything in a process shares one client
+# and its connection pool rather than building a new one for every request
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """requests HTTPAdapter that sets TCP keep-alive on its connections."""
+
+    def __init__(self, keep_alive, **kwargs):
+        self.keep_alive = keep_alive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = build_socket_options(self.keep_alive)
+        super().init_poolmanager(*args, **kwargs)
+
+
+class PooledRequestsHttpConnection(elasticsearch.connection.RequestsHttpConnection):
+    """RequestsHttpConnection with a bounded connection pool that tracks usage."""
+
+    def __init__(self, pool_maxsize=10, keep_alive=60, pool_metrics=None, **kwargs):
+        """
+        :arg pool_maxsize: maximum number of connections in the pool; requests wait
+            for a free connection when they're all in use
+        :arg keep_alive: seconds a connection is idle before TCP keep-alive probes are
+            sent; 0 disables TCP keep-alive
+        :arg pool_metrics: a ConnectionPoolMetrics or None
+        """
+        super().__init__(**kwargs)
+        self.adapter = KeepAliveHTTPAdapter(
+            keep_alive=keep_alive,
+            pool_connections=1,
+            pool_maxsize=pool_maxsize,
+            pool_block=True,
+        )
+        self.session.mount("http://", self.adapter)
+        self.session.mount("https://", self.adapter)
+        self.pool_metrics = pool_metrics
+
+    def get_num_connections(self):
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def perform_request(self, *args, **kwargs):
+        if self.pool_metrics is None:
+            return super().perform_request(*args, **kwargs)
+
+        with self.pool_metrics.track(self.get_num_connections, node=self):
+            return super().perform_request(*args, **kwargs)
 
 
 class LegacyConnectionContext:
@@ -12,37 +72,87 @@ class LegacyConnectionContext:
 
     Used for accessing Elasticsearch and managing indexes.
 
+    All LegacyConnectionContext instances in a process with the same url, timeout, and
+    pool settings share a single thread-safe Elasticsearch client and its connection
+    pool.
+
     """
 
     def __init__(
         self,
         url="http://legacy-elasticsearch:9200",
         timeout=30,
+        pool_maxsize=10,
+        keep_alive=60,
+        metrics_prefix="processor.es",
         **kwargs,
     ):
         """
         :arg url: the url to the elasticsearch instances
         :arg timeout: the time in seconds before a query to elasticsearch fails
+        :arg pool_maxsize: maximum number of connections to each Elasticsearch node;
+            requests wait for a free connection when they're all in use
+        :arg keep_alive: seconds a connection is idle before TCP keep-alive probes are
+            sent; 0 disables TCP keep-alive
+        :arg metrics_prefix: prefix for connection pool metrics
         """
         self.url = url
         self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.metrics_prefix = metrics_prefix
+
+    def build_client(self, timeout):
+        """Build a new Elasticsearch client with a connection pool.
+
+        :arg timeout: the default request timeout for the client
+
+        """
+        metrics = markus.get_metrics(
+            build_prefix(METRICS.prefix, self.metrics_prefix),
+            filters=list(METRICS.filters),
+        )
+        return elasticsearch.Elasticsearch(
+            hosts=self.url,
+            timeout=timeout,
+            connection_class=PooledRequestsHttpConnection,
+            verify_certs=True,
+            pool_maxsize=self.pool_maxsize,
+            keep_alive=self.keep_alive,
+            pool_metrics=ConnectionPoolMetrics(
+                metrics=metrics, maxsize=self.pool_maxsize
+            ),
+        )
 
     def connection(self, name=None, timeout=None):
         """Returns an instance of elasticsearch-py's Elasticsearch class as
         encapsulated by the Connection class above.
 
+        The client is built the first time it's needed in a process for a given
+        timeout and shared after that. Forked processes build their own client rather
+        than sharing sockets with the parent.
+
         Documentation: http://elasticsearch-py.readthedocs.org
 
         """
         if timeout is None:
             timeout = self.timeout
 
-        return elasticsearch.Elasticsearch(
-            hosts=self.url,
-            timeout=timeout,
-            connection_class=elasticsearch.connection.RequestsHttpConnection,
-            verify_certs=True,
+        key = (
+            os.getpid(),
+            self.url,
+            timeout,
+            self.pool_maxsize,
+            self.keep_alive,
+            self.metrics_prefix,
         )
+        client = _CLIENTS.get(key)
+        if client is None:
+            with _CLIENTS_LOCK:
+                client = _CLIENTS.get(key)
+                if client is None:
+                    client = _CLIENTS[key] = self.build_client(timeout)
+        return client
 
     def indices_client(self, name=None):
         """Returns an instance of elasticsearch-py's Index client class as
@@ -4,7 +4,6 @@
 
 import copy
 import datetime
-import json
 import re
 import time
 
@@ -27,7 +26,8 @@ from socorro.external.legacy_es.super_search_fields import (
     parse_mapping,
 )
 from socorro.libmarkus import METRICS, build_prefix
-from socorro.lib.libdatetime import JsonDTEncoder, string_to_datetime, utc_now
+from socorro.lib import libjson
+from socorro.lib.libdatetime import string_to_datetime, utc_now
 
 
 # Additional custom analyzers for crash report data
@@ -282,10 +282,18 @@ class LegacyESCrashStorage(CrashStorageBase):
         metrics_prefix="processor.es",
         timeout=30,
         shards_per_index=10,
+        pool_maxsize=10,
+        keep_alive=60,
     ):
         super().__init__()
 
-        self.client = self.build_client(url=url, timeout=timeout)
+        self.client = self.build_client(
+            url=url,
+            timeout=timeout,
+            pool_maxsize=pool_maxsize,
+            keep_alive=keep_alive,
+            metrics_prefix=metrics_prefix,
+        )
 
         # Create a MetricsInterface that includes the base prefix plus the prefix passed
         # into __init__
@@ -306,8 +314,8 @@ class LegacyESCrashStorage(CrashStorageBase):
         self._mapping_cache = {}
 
     @classmethod
-    def build_client(cls, url, timeout):
-        return LegacyConnectionContext(url=url, timeout=timeout)
+    def build_client(cls, **kwargs):
+        return LegacyConnectionContext(**kwargs)
 
     def build_query(self):
         """Return new  instance of LegacyQuery."""
@@ -535,7 +543,8 @@ class LegacyESCrashStorage(CrashStorageBase):
         def _capture(key, data):
             try:
                 self.metrics.histogram(
-                    key, value=len(json.dumps(data, cls=JsonDTEncoder))
+                    key,
+                    value=len(libjson.encode(data, default=libjson.datetime_default)),
                 )
             except Exception:
                 # NOTE(willkg): An error here shouldn't screw up saving data. Log it so
@@ -2,25 +2,104 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import collections
+from contextlib import suppress
 from functools import partial
 import logging
 import os
+import threading
 
 from google.cloud.pubsub_v1 import PublisherClient, SubscriberClient
-from google.cloud.pubsub_v1.types import BatchSettings, PublisherOptions
+from google.cloud.pubsub_v1.types import BatchSettings, FlowControl, PublisherOptions
 from more_itertools import chunked
 import sentry_sdk
 
 from socorro.external.crashqueue_base import CrashQueueBase
+from socorro.lib.batcher import Batcher, BatcherClosedError
+from socorro.lib.task_manager import JOB_SOURCE_KWARG
 
 
 logger = logging.getLogger(__name__)
 
 
+# Maximum number of ack ids in a single acknowledge request
+MAX_ACK_IDS = 2500
+
+# Order queues are preferred in when streaming pull
+STREAMING_QUEUE_PREFERENCE = ["priority", "standard", "reprocessing"]
+
+
 class CrashIdsFailedToPublish(Exception):
     """Crash ids that failed to publish."""
 
 
+class AckBatcher:
+    """Coalesces message acknowledgements into batched acknowledge requests.
+
+    Ack ids are buffered and sent when there are ``max_size`` of them or the oldest
+    one has been waiting for ``max_age`` seconds, whichever comes first.
+
+    """
+
+    def __init__(self, subscriber, max_size, max_age):
+        """
+        :arg subscriber: the SubscriberClient to send acknowledge requests with
+        :arg max_size: maximum number of ack ids to buffer before sending them
+        :arg max_age: maximum time in seconds an ack id waits before it's sent
+        """
+        self.subscriber = subscriber
+        self.max_size = max_size
+        self.max_age = max_age
+
+        self._batcher = Batcher(
+            send=self.send,
+            max_items=max_size,
+            max_age=max_age,
+            name="pubsub_ack_flusher",
+        )
+
+    def ack(self, subscription_path, ack_id):
+        """Add an ack id to the buffer.
+
+        :arg subscription_path: the subscription path for the queue
+        :arg ack_id: the ack_id for the message to acknowledge
+
+        """
+        self._batcher.add((subscription_path, ack_id))
+
+    def send(self, batch):
+        """Send acknowledge requests for a batch of ack ids.
+
+        :arg batch: list of (subscription path, ack id) tuples
+
+        """
+        ack_ids_by_path = {}
+        for subscription_path, ack_id in batch:
+            ack_ids_by_path.setdefault(subscription_path, []).append(ack_id)
+
+        for subscription_path, ack_ids in ack_ids_by_path.items():
+            for chunk in chunked(ack_ids, MAX_ACK_IDS):
+                try:
+                    self.subscriber.acknowledge(
+                        subscription=subscription_path, ack_ids=chunk
+                    )
+                    logger.debug("ack %d from %s", len(chunk), subscription_path)
+                except Exception:
+                    # If this fails, the messages get redelivered after the ack
+                    # deadline and the crashes get processed again
+                    logger.exception(
+                        "error acking %d from %s", len(chunk), subscription_path
+                    )
+
+    def flush(self):
+        """Send whatever is in the buffer now."""
+        self._batcher.flush()
+
+    def close(self):
+        """Send whatever is in the buffer and reject ack ids after that."""
+        self._batcher.close()
+
+
 class PubSubCrashQueue(CrashQueueBase):
     """Crash queue that uses Google Cloud Pub/Sub.
 
@@ -81,6 +160,17 @@ class PubSubCrashQueue(CrashQueueBase):
         $ export GOOGLE_APPLICATION_CREDENTIALS="/path/to/keyfile.json"
 
 
+    **Streaming pull**
+
+    By default, this pulls messages from each subscription in turn with synchronous
+    pull requests. If ``streaming_pull`` is True, it opens a streaming pull for each
+    subscription instead. Received messages are held until the processor asks for
+    them, with priority messages handed out first. Flow control limits how many
+    messages each subscription holds, and the Pub/Sub client extends the ack deadline
+    of held messages until they're acknowledged, so crashes that take a long time to
+    process don't get redelivered.
+
+
     **Local emulator**
 
     If you set the environment variable ``PUBSUB_EMULATOR_HOST=host:port``,
@@ -100,6 +190,12 @@ class PubSubCrashQueue(CrashQueueBase):
         pull_max_messages=5,
         publish_max_messages=10,
         publish_timeout=5,
+        ack_batch_size=1,
+        ack_batch_max_age=1.0,
+        streaming_pull=False,
+        streaming_max_messages=12,
+        streaming_max_lease_duration=3600,
+        streaming_wait=1.0,
     ):
         """
         :arg project_id: Google Compute Platform project_id
@@ -115,6 +211,18 @@ class PubSubCrashQueue(CrashQueueBase):
         :arg publish_max_messages: maximum number of messages to publish to Google
             Pub/Sub in a single request
         :arg publish_timeout: rpc timeout for publish requests
+        :arg ack_batch_size: maximum number of acks to batch into a single acknowledge
+            request when not streaming; 1 acks each crash as soon as it's done
+        :arg ack_batch_max_age: maximum time in seconds an ack waits for its batch to
+            fill up before it's sent
+        :arg streaming_pull: if True, use streaming pull rather than synchronous pull
+        :arg streaming_max_messages: maximum number of unacknowledged messages to
+            hold per subscription when streaming; this should be about the size of
+            the processor's task manager queue
+        :arg streaming_max_lease_duration: maximum time in seconds to extend the ack
+            deadline for a message that hasn't been acknowledged when streaming
+        :arg streaming_wait: time in seconds to wait for a message before returning
+            when streaming
         """
 
         if emulator := os.environ.get("PUBSUB_EMULATOR_HOST"):
@@ -173,6 +281,45 @@ class PubSubCrashQueue(CrashQueueBase):
         self.pull_max_messages = pull_max_messages
         self.publish_max_messages = publish_max_messages
 
+        self.ack_batcher = None
+        if ack_batch_size > 1:
+            self.ack_batcher = AckBatcher(
+                subscriber=self.subscriber,
+                max_size=ack_batch_size,
+                max_age=ack_batch_max_age,
+            )
+
+        self.streaming_pull = streaming_pull
+        self.streaming_max_messages = streaming_max_messages
+        self.streaming_max_lease_duration = streaming_max_lease_duration
+        self.streaming_wait = streaming_wait
+
+        # Streaming pull futures; these are created when iteration starts
+        self._streaming_pull_futures = []
+        # queue name -> deque of (queue, subscription_path, message) received by
+        # streaming pull that haven't been handed out yet
+        self._received = {
+            queue: collections.deque() for queue in self.queue_to_subscription_path
+        }
+        self._received_condition = threading.Condition()
+
+    def close(self):
+        # Nack messages that were never handed out so they're redelivered right away
+        with self._received_condition:
+            for messages in self._received.values():
+                while messages:
+                    _, _, message = messages.popleft()
+                    message.nack()
+
+        # Close the streaming pulls and wait for them to shut down
+        for future in self._streaming_pull_futures:
+            future.cancel()
+            future.result()
+        self._streaming_pull_futures = []
+
+        if self.ack_batcher is not None:
+            self.ack_batcher.close()
+
     def ack_crash(self, subscription_path, ack_id):
         """Acknowledges a crash
 
@@ -180,20 +327,93 @@ class PubSubCrashQueue(CrashQueueBase):
         :arg ack_id: the ack_id for the message to acknowledge
 
         """
+        if self.ack_batcher is not None:
+            with suppress(BatcherClosedError):
+                self.ack_batcher.ack(subscription_path, ack_id)
+                return
+            # Crashes that finish after the batcher is closed are acked one at a time
+
         self.subscriber.acknowledge(subscription=subscription_path, ack_ids=[ack_id])
         logger.debug("ack %s from %s", ack_id, subscription_path)
 
+    def _receive_message(self, queue, subscription_path, message):
+        """Streaming pull callback that holds a message until it's handed out."""
+        with self._received_condition:
+            self._received[queue].append((queue, subscription_path, message))
+            self._received_condition.notify()
+
+    def _start_streaming_pull(self):
+        """Open streaming pulls for all the subscriptions if they're not open."""
+        if self._streaming_pull_futures:
+            return
+
+        flow_control = FlowControl(
+            max_messages=self.streaming_max_messages,
+            max_lease_duration=self.streaming_max_lease_duration,
+        )
+        for queue, subscription_path in self.queue_to_subscription_path.items():
+            if subscription_path is None:
+                continue
+
+            future = self.subscriber.subscribe(
+                subscription_path,
+                callback=partial(self._receive_message, queue, subscription_path),
+                flow_control=flow_control,
+            )
+            self._streaming_pull_futures.append(future)
+
+    def _next_received_message(self):
+        """Return the next message to hand out or None. Must be called with the lock
+        held.
+        """
+        for queue in STREAMING_QUEUE_PREFERENCE:
+            if self._received[queue]:
+                return self._received[queue].popleft()
+        return None
+
+    def _iter_streaming(self):
+        self._start_streaming_pull()
+
+        while True:
+            with self._received_condition:
+                item = self._next_received_message()
+                if item is None:
+                    self._received_condition.wait(self.streaming_wait)
+                    item = self._next_received_message()
+
+            if item is None:
+                # There's nothing to process, so return
+                return
+
+            queue, subscription_path, message = item
+            crash_id = message.data.decode("utf-8")
+            logger.debug("got %s from %s", crash_id, subscription_path)
+            if crash_id == "test":
+                # Ack and drop any test crash ids
+                message.ack()
+                continue
+
+            yield (
+                (crash_id,),
+                {"finished_func": message.ack, JOB_SOURCE_KWARG: queue},
+            )
+
     def __iter__(self):
         """Return iterator over crash ids from Pub/Sub.
 
         Each returned crash is a ``(crash_id, {kwargs})`` tuple with
-        ``finished_func`` as the only key in ``kwargs``. The caller should call
-        ``finished_func`` when it's done processing the crash.
+        ``finished_func`` and ``job_source`` keys in ``kwargs``. The caller should
+        call ``finished_func`` when it's done processing the crash. ``job_source`` is
+        the name of the queue the crash id came from.
 
         """
+        if self.streaming_pull:
+            yield from self._iter_streaming()
+            return
+
         while True:
             has_msgs = {}
-            for subscription_path in self.queue_to_subscription_path.values():
+            for queue, subscription_path in self.queue_to_subscription_path.items():
                 if subscription_path is None:
                     continue
 
@@ -224,7 +444,8 @@ class PubSubCrashQueue(CrashQueueBase):
                         {
                             "finished_func": partial(
                                 self.ack_crash, subscription_path, ack_id
-                            )
+                            ),
+                            JOB_SOURCE_KWARG: queue,
                         },
                     )
 
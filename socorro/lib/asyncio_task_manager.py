@@ -0,0 +1,194 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Defines the AsyncioTaskManager.
+
+This module defines a task manager that runs tasks as asyncio tasks in a single event
+loop. The job source iterator is read in the event loop's executor (it does blocking
+I/O) and each job becomes an asyncio task. The number of tasks in flight at once is
+limited to ``number_of_threads + maximum_queue_size``.
+
+If the task function is a coroutine function, it's awaited in the event loop and
+uses the executor for blocking and CPU-bound parts. Otherwise the task function is run
+in the executor. Either way, the executor has a thread for every task in flight plus
+one for reading the job source.
+
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import signal
+import threading
+
+from socorro.lib.task_manager import (
+    default_iterator,
+    default_task_func,
+    pop_job_source,
+    TaskManager,
+)
+
+
+# Returned by the job source iterator when it's exhausted
+ITERATOR_EXHAUSTED = object()
+
+
+class AsyncioTaskManager(TaskManager):
+    """Task manager that runs tasks in an asyncio event loop."""
+
+    # The ProcessorApp passes a coroutine function as the task_func to task managers
+    # with this set
+    async_task_func = True
+
+    def __init__(
+        self,
+        idle_delay=7,
+        quit_on_empty_queue=False,
+        number_of_threads=4,
+        maximum_queue_size=8,
+        job_source_iterator=default_iterator,
+        task_func=default_task_func,
+        reserved_priority_threads=0,
+        min_number_of_threads=None,
+        concurrency_interval=30,
+        target_cpu_utilization=0.8,
+    ):
+        """
+        :arg idle_delay: the delay in seconds if no job is found
+        :arg quit_on_empty_queue: stop if the queue is empty
+        :arg number_of_threads: number of tasks that should be actively working at
+            once; the task function can use this to size things like the number of
+            concurrent stackwalker processes
+        :arg maximum_queue_size: number of tasks allowed in flight beyond
+            ``number_of_threads``; these are tasks that are fetching or saving data
+        :arg job_source_iterator: an iterator to serve as the source of data. it can
+            be of the form of a generator or iterator; a function that returns an
+            iterator; a instance of an iterable object; or a class that when
+            instantiated with a config object can be iterated. The iterator must
+            yield a tuple consisting of a function's tuple of args and, optionally,
+            a mapping of kwargs. Ex:  (('a', 17), {'x': 23})
+        :arg task_func: a function or coroutine function that will accept the args
+            and kwargs yielded by the job_source_iterator
+        :arg reserved_priority_threads: ignored; tasks are started in the order the
+            job source iterator yields them, so there's nothing to reorder
+        :arg min_number_of_threads: ignored; adaptive concurrency isn't supported
+        :arg concurrency_interval: ignored
+        :arg target_cpu_utilization: ignored
+        """
+        # If number of threads is None, set it to default
+        if number_of_threads is None:
+            number_of_threads = 4
+
+        # If maximum queue size is None, set it to default
+        if maximum_queue_size is None:
+            maximum_queue_size = 8
+
+        super().__init__(
+            idle_delay=idle_delay,
+            quit_on_empty_queue=quit_on_empty_queue,
+            job_source_iterator=job_source_iterator,
+            task_func=task_func,
+        )
+        self.number_of_threads = number_of_threads
+        self.maximum_queue_size = maximum_queue_size
+        self.max_in_flight = number_of_threads + maximum_queue_size
+
+    def _handle_quit_signal(self, signal_number):
+        self.logger.info(
+            "%s: draining tasks and stopping", signal.Signals(signal_number).name
+        )
+        self.quit = True
+
+    async def _async_responsive_sleep(self, seconds):
+        """Sleep in one second increments checking the quit flag."""
+        for _ in range(int(seconds)):
+            if self.quit:
+                return
+            await asyncio.sleep(1.0)
+
+    async def _run_task(self, job_params, in_flight):
+        try:
+            try:
+                args, kwargs = job_params
+            except ValueError:
+                args = job_params
+                kwargs = {}
+
+            if asyncio.iscoroutinefunction(self.task_func):
+                await self.task_func(*args, **kwargs)
+            else:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, functools.partial(self.task_func, *args, **kwargs)
+                )
+        except Exception:
+            self.logger.error("Error in processing a job", exc_info=True)
+        finally:
+            in_flight.release()
+
+    async def run(self):
+        """Run tasks until the iterator is exhausted or the task manager quits.
+
+        When stopping, this waits for all in-flight tasks to complete.
+
+        """
+        loop = asyncio.get_running_loop()
+
+        # The executor reads the job source and runs the blocking parts of tasks or
+        # whole tasks if the task function isn't a coroutine function
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_in_flight + 1,
+            thread_name_prefix="asyncio_task_manager",
+        )
+        loop.set_default_executor(executor)
+
+        handled_signals = []
+        if threading.current_thread() is threading.main_thread():
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                loop.add_signal_handler(
+                    signal_number, self._handle_quit_signal, signal_number
+                )
+                handled_signals.append(signal_number)
+
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = set()
+        iterator = self._get_iterator()
+
+        try:
+            while not self.quit:
+                job_params = await loop.run_in_executor(
+                    None, next, iterator, ITERATOR_EXHAUSTED
+                )
+                if job_params is ITERATOR_EXHAUSTED:
+                    break
+
+                if job_params is None:
+                    if self.quit_on_empty_queue:
+                        break
+                    await self._async_responsive_sleep(self.idle_delay)
+                    continue
+
+                self.logger.debug("received %r", job_params)
+                job_params, _ = pop_job_source(job_params)
+                await in_flight.acquire()
+                task = asyncio.create_task(self._run_task(job_params, in_flight))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except Exception:
+            self.logger.error("queueing jobs has failed", exc_info=True)
+        finally:
+            self.logger.debug("waiting for %d in-flight tasks", len(tasks))
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for signal_number in handled_signals:
+                loop.remove_signal_handler(signal_number)
+            self.logger.debug("all tasks completed")
+
+    def blocking_start(self):
+        """Runs the event loop until the task manager is done."""
+        try:
+            asyncio.run(self.run())
+        except KeyboardInterrupt:
+            self.logger.debug("quit request detected")
+        finally:
+            self.quit = True
@@ -0,0 +1,160 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Buffer items and send them in batches from a background thread.
+"""
+
+import threading
+import time
+
+
+class BatcherClosedError(Exception):
+    """An item was added to a batcher after it was closed."""
+
+
+class Batcher:
+    """Buffers items and sends them in batches.
+
+    The buffer is sent when any of these happen:
+
+    * it has ``max_items`` items
+    * it has ``max_bytes`` bytes of items
+    * no item has been added for ``linger`` seconds
+    * the oldest item has been waiting ``max_age`` seconds
+
+    Full buffers are sent by the thread that filled them. Otherwise, a flusher
+    thread sends them.
+
+    ``linger`` matters when callers block until their item is sent. Then the
+    buffer can't hold more items than there are callers, so a buffer that's not
+    full when callers stop adding items won't fill up and would wait for
+    ``max_age``.
+
+    After ``close()``, adding items raises ``BatcherClosedError``.
+
+    """
+
+    def __init__(
+        self,
+        send,
+        max_items,
+        max_age,
+        max_bytes=None,
+        linger=None,
+        name="batcher",
+    ):
+        """
+        :arg send: function that takes a list of items and sends them
+        :arg max_items: maximum number of items in a batch
+        :arg max_age: maximum time in seconds an item waits before it's sent
+        :arg max_bytes: maximum size of a batch in bytes or None for no maximum
+        :arg linger: time in seconds without new items after which the buffer is
+            sent or None to wait for ``max_age``
+        :arg name: name of the flusher thread
+        """
+        self.send = send
+        self.max_items = max_items
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.linger = linger
+        self.name = name
+
+        self._condition = threading.Condition()
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_started = None
+        self._last_added = None
+        self._flusher_thread = None
+        self._closed = False
+
+    def _start_flusher(self):
+        # The flusher thread is started lazily so that the batcher can be created
+        # before worker processes are forked.
+        if self._flusher_thread is None:
+            self._flusher_thread = threading.Thread(
+                name=self.name, target=self._flusher_func, daemon=True
+            )
+            self._flusher_thread.start()
+
+    def _take_batch(self):
+        """Take the contents of the buffer. Must be called with the lock held."""
+        batch = self._buffer
+        self._buffer = []
+        self._buffer_bytes = 0
+        self._buffer_started = None
+        return batch
+
+    def _deadline(self):
+        """Return when the buffer should be sent. Must be called with the lock held."""
+        deadline = self._buffer_started + self.max_age
+        if self.linger is not None:
+            deadline = min(deadline, self._last_added + self.linger)
+        return deadline
+
+    def add(self, item, size=0):
+        """Add an item to the buffer.
+
+        :arg item: the item
+        :arg size: the size of the item in bytes
+
+        :raises BatcherClosedError: if the batcher is closed
+
+        """
+        batch = None
+        with self._condition:
+            if self._closed:
+                raise BatcherClosedError(f"{self.name} is closed")
+
+            self._start_flusher()
+            now = time.monotonic()
+            if not self._buffer:
+                self._buffer_started = now
+            self._last_added = now
+            self._buffer.append(item)
+            self._buffer_bytes += size
+            if len(self._buffer) >= self.max_items or (
+                self.max_bytes is not None and self._buffer_bytes >= self.max_bytes
+            ):
+                # The buffer is full, so this thread sends it
+                batch = self._take_batch()
+            else:
+                self._condition.notify()
+
+        if batch:
+            self.send(batch)
+
+    def _flusher_func(self):
+        """Sends batches that are due."""
+        while True:
+            with self._condition:
+                while not self._buffer and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+                timeout = self._deadline() - time.monotonic()
+                if timeout > 0:
+                    self._condition.wait(timeout)
+                    continue
+                batch = self._take_batch()
+
+            self.send(batch)
+
+    def flush(self):
+        """Send whatever is in the buffer now."""
+        with self._condition:
+            batch = self._take_batch()
+        if batch:
+            self.send(batch)
+
+    def close(self):
+        """Stop the flusher thread and send whatever is in the buffer."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+            flusher_thread = self._flusher_thread
+        if flusher_thread is not None:
+            flusher_thread.join()
+        self.flush()
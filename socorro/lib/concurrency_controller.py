@@ -0,0 +1,343 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Adaptive worker concurrency for task managers.
+
+The ConcurrencyController periodically looks at how the processor is doing and grows
+or shrinks the number of active workers between a minimum and a maximum:
+
+* If the process and its children (the stackwalker) are using more than the target
+  CPU utilization, adding workers won't help, so it shrinks.
+* If stackwalker wall time or save latency are much higher than their baselines,
+  something downstream is contended (CPU, disk, symbols server, crash storage),
+  so it shrinks to back off.
+* If jobs are backing up in the queue and neither of those is happening, it grows.
+* If the queue is empty and workers spend most of their time waiting for work, it
+  shrinks. An empty queue alone isn't enough: that's normal for a processor that's
+  keeping up.
+
+Code doing the work records wall times in ``WORKLOAD_SIGNALS``. Worker threads
+record how long they spend running tasks. Task managers that run tasks in worker
+processes pass the signals recorded there back to the parent process.
+
+"""
+
+import logging
+import os
+import threading
+import time
+
+from socorro.libmarkus import METRICS
+
+
+# Names of timing signals code records in WORKLOAD_SIGNALS
+STACKWALKER_SIGNAL = "stackwalker"
+SAVE_SIGNAL = "save"
+
+# Seconds worker threads spent running tasks; the controller divides this by the
+# time active workers had to find out how busy they are
+BUSY_SIGNAL = "busy"
+
+# CPU seconds used by worker processes; task managers that run tasks in other
+# processes record this so the controller sees CPU used outside this process
+CPU_SIGNAL = "cpu"
+
+# Fraction of the way a baseline moves toward a slower mean wall time per update
+BASELINE_DRIFT = 0.1
+
+
+class WorkloadSignals:
+    """Thread-safe collector of wall times for parts of processing a crash."""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, name, seconds):
+        """Record a wall time.
+
+        :arg name: the signal name
+        :arg seconds: the wall time in seconds
+
+        """
+        with self._lock:
+            total, count = self._totals.get(name, (0.0, 0))
+            self._totals[name] = (total + seconds, count + 1)
+
+    def add(self, totals):
+        """Add totals taken from another WorkloadSignals.
+
+        :arg totals: dict of signal name -> ``(total seconds, count)``
+
+        """
+        with self._lock:
+            for name, (other_total, other_count) in totals.items():
+                total, count = self._totals.get(name, (0.0, 0))
+                self._totals[name] = (total + other_total, count + other_count)
+
+    def take(self):
+        """Return totals recorded since the last take and reset.
+
+        :returns: dict of signal name -> ``(total seconds, count)``
+
+        """
+        with self._lock:
+            totals = self._totals
+            self._totals = {}
+        return totals
+
+
+WORKLOAD_SIGNALS = WorkloadSignals()
+
+# Forked worker processes start with no totals and a lock nobody holds
+os.register_at_fork(after_in_child=WORKLOAD_SIGNALS._reset)
+
+
+def get_cpu_seconds():
+    """Return CPU seconds used by this process and its waited-for children."""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class ConcurrencyController:
+    """Decides how many workers should be active.
+
+    Call ``update()`` periodically. It measures what happened since the last call,
+    decides whether to grow, shrink, or hold, and calls ``set_workers`` when the
+    number of active workers changes.
+
+    Emits:
+
+    * processor.concurrency.workers
+    * processor.concurrency.decision
+    * processor.concurrency.cpu_utilization
+    * processor.concurrency.queue_depth
+    * processor.concurrency.busy_fraction
+
+    """
+
+    def __init__(
+        self,
+        min_workers,
+        max_workers,
+        get_queue_depth,
+        queue_capacity,
+        set_workers,
+        target_cpu_utilization=0.8,
+        latency_ratio=2.0,
+        idle_busy_fraction=0.5,
+        signals=WORKLOAD_SIGNALS,
+        cpu_count=None,
+    ):
+        """
+        :arg min_workers: the fewest active workers
+        :arg max_workers: the most active workers
+        :arg get_queue_depth: callable returning the number of jobs waiting
+        :arg queue_capacity: callable returning the number of jobs that can wait
+        :arg set_workers: callable that takes the new number of active workers
+        :arg target_cpu_utilization: fraction of all CPUs above which the controller
+            shrinks and below which it's allowed to grow
+        :arg latency_ratio: shrink when stackwalker or save wall time is this many
+            times the baseline
+        :arg idle_busy_fraction: with an empty queue, shrink when the remaining
+            workers would be busy less than this fraction of the time
+        :arg signals: the WorkloadSignals to read wall times from
+        :arg cpu_count: number of CPUs available; defaults to ``os.cpu_count()``
+        """
+        if not 1 <= min_workers <= max_workers:
+            raise ValueError(
+                f"min_workers ({min_workers}) must be between 1 and max_workers "
+                f"({max_workers})"
+            )
+
+        self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.get_queue_depth = get_queue_depth
+        self.queue_capacity = queue_capacity
+        self.set_workers = set_workers
+        self.target_cpu_utilization = target_cpu_utilization
+        self.latency_ratio = latency_ratio
+        self.idle_busy_fraction = idle_busy_fraction
+        self.signals = signals
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+
+        self.workers = min_workers
+        # signal name -> baseline mean wall time
+        self.baselines = {}
+        self._last_time = time.monotonic()
+        self._last_cpu_seconds = get_cpu_seconds()
+        self._queue_depth_total = 0
+        self._queue_depth_count = 0
+
+    def sample_queue_depth(self):
+        """Sample the queue depth; call this more often than ``update()``."""
+        self._queue_depth_total += self.get_queue_depth()
+        self._queue_depth_count += 1
+
+    def _take_queue_depth(self):
+        if self._queue_depth_count:
+            depth = self._queue_depth_total / self._queue_depth_count
+        else:
+            depth = self.get_queue_depth()
+        self._queue_depth_total = 0
+        self._queue_depth_count = 0
+        return depth
+
+    def _take_elapsed(self):
+        now = time.monotonic()
+        elapsed = now - self._last_time
+        self._last_time = now
+        return elapsed
+
+    def _take_cpu_utilization(self, elapsed, worker_cpu_seconds):
+        cpu_seconds = get_cpu_seconds()
+        used = cpu_seconds - self._last_cpu_seconds + worker_cpu_seconds
+        self._last_cpu_seconds = cpu_seconds
+        if elapsed <= 0:
+            return 0.0
+        return used / (elapsed * self.cpu_count)
+
+    def _busy_fraction(self, elapsed, busy_seconds):
+        if elapsed <= 0:
+            # Nothing to go on, so don't call the workers idle
+            return 1.0
+        return busy_seconds / (elapsed * self.workers)
+
+    def _find_slow_signal(self, timings):
+        """Return the name of a signal much slower than its baseline or None.
+
+        The baseline for a signal is the best mean wall time seen. It drifts up
+        slowly so a short run of unusually fast crashes doesn't stick around forever.
+
+        """
+        slow = None
+        for name in sorted(timings):
+            mean = timings[name]
+            baseline = self.baselines.get(name)
+            if baseline is None or mean < baseline:
+                self.baselines[name] = mean
+                continue
+
+            if baseline > 0 and mean > baseline * self.latency_ratio:
+                slow = slow or name
+            self.baselines[name] = baseline + (mean - baseline) * BASELINE_DRIFT
+        return slow
+
+    def decide(self, cpu_utilization, queue_depth, timings, busy_fraction):
+        """Decide how many workers should be active.
+
+        :arg cpu_utilization: fraction of all CPUs used since the last decision
+        :arg queue_depth: mean number of jobs waiting since the last decision
+        :arg timings: dict of signal name -> mean wall time since the last decision
+        :arg busy_fraction: fraction of the time active workers spent running tasks
+            since the last decision
+
+        :returns: ``(workers, reason)`` tuple
+
+        """
+        slow_signal = self._find_slow_signal(timings)
+
+        if cpu_utilization > self.target_cpu_utilization:
+            if self.workers > self.min_workers:
+                return self.workers - 1, "cpu"
+            return self.workers, "cpu"
+
+        if slow_signal is not None:
+            if self.workers > self.min_workers:
+                return self.workers - 1, slow_signal
+            return self.workers, slow_signal
+
+        if queue_depth >= max(1, self.queue_capacity() / 2):
+            if self.workers < self.max_workers:
+                return self.workers + 1, "backlog"
+            return self.workers, "backlog"
+
+        if queue_depth == 0 and self.workers > self.min_workers:
+            # Shrink only if the work would still leave one fewer worker mostly idle;
+            # otherwise this would shrink a processor that's just keeping up
+            remaining_busy_fraction = busy_fraction * self.workers / (self.workers - 1)
+            if remaining_busy_fraction < self.idle_busy_fraction:
+                return self.workers - 1, "idle"
+
+        return self.workers, "steady"
+
+    def update(self):
+        """Measure, decide, and apply a new number of active workers.
+
+        :returns: the number of active workers
+
+        """
+        totals = self.signals.take()
+        worker_cpu_seconds, _ = totals.pop(CPU_SIGNAL, (0.0, 0))
+        busy_seconds, _ = totals.pop(BUSY_SIGNAL, (0.0, 0))
+        timings = {name: total / count for name, (total, count) in totals.items()}
+
+        elapsed = self._take_elapsed()
+        cpu_utilization = self._take_cpu_utilization(elapsed, worker_cpu_seconds)
+        busy_fraction = self._busy_fraction(elapsed, busy_seconds)
+        queue_depth = self._take_queue_depth()
+
+        workers, reason = self.decide(
+            cpu_utilization, queue_depth, timings, busy_fraction
+        )
+        if workers > self.workers:
+            action = "grow"
+        elif workers < self.workers:
+            action = "shrink"
+        else:
+            action = "hold"
+
+        METRICS.gauge("processor.concurrency.cpu_utilization", cpu_utilization)
+        METRICS.gauge("processor.concurrency.queue_depth", queue_depth)
+        METRICS.gauge("processor.concurrency.busy_fraction", busy_fraction)
+        METRICS.incr(
+            "processor.concurrency.decision",
+            tags=[f"action:{action}", f"reason:{reason}"],
+        )
+
+        if workers != self.workers:
+            self.logger.info(
+                "%s workers %d -> %d (%s)", action, self.workers, workers, reason
+            )
+            self.workers = workers
+            self.set_workers(workers)
+
+        METRICS.gauge("processor.concurrency.workers", self.workers)
+        return self.workers
+
+
+class WorkerGate:
+    """Parks worker threads beyond the number of active workers.
+
+    Worker threads are numbered from 0. Workers with an index at or above the limit
+    wait in ``wait()`` until the limit goes up or the gate is opened.
+
+    """
+
+    def __init__(self, limit):
+        self._limit = limit
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self):
+        return self._limit
+
+    def set_limit(self, limit):
+        with self._condition:
+            self._limit = limit
+            self._condition.notify_all()
+
+    def open(self):
+        """Let all workers through; use this when stopping."""
+        self.set_limit(float("inf"))
+
+    def wait(self, worker_index):
+        """Block while the worker with this index isn't active."""
+        with self._condition:
+            while worker_index >= self._limit:
+                self._condition.wait()
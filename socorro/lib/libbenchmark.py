@@ -0,0 +1,66 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Utilities for the benchmark scripts in ``bin/``.
+
+Benchmarks run over processed crashes saved as JSON files like the ones
+``socorro-cmd fetch_crash_data --processed`` saves.
+
+"""
+
+import pathlib
+import time
+
+from socorro.lib import libjson
+
+
+def find_processed_crashes(paths):
+    """Yields paths of processed crash files.
+
+    Directories are searched recursively for files in a ``processed_crash``
+    directory. Other paths are yielded as is.
+
+    :arg paths: list of file and directory paths
+
+    :returns: generator of ``pathlib.Path``
+
+    """
+    for path in paths:
+        path = pathlib.Path(path)
+        if path.is_dir():
+            yield from sorted(
+                item for item in path.glob("**/processed_crash/*") if item.is_file()
+            )
+        else:
+            yield path
+
+
+def load_processed_crashes(paths):
+    """Returns the processed crashes found by ``find_processed_crashes``.
+
+    :arg paths: list of file and directory paths
+
+    :returns: list of processed crash dicts
+
+    """
+    return [libjson.decode(path.read_bytes()) for path in find_processed_crashes(paths)]
+
+
+def time_it(func, items, iterations, timer=time.process_time):
+    """Returns the mean time it takes to call a function on an item.
+
+    :arg func: the function to time; it's called with each item
+    :arg items: list of items
+    :arg iterations: number of times to call the function on each item
+    :arg timer: the clock to time with
+
+    :returns: mean seconds per call
+
+    """
+    start_time = timer()
+    for _ in range(iterations):
+        for item in items:
+            func(item)
+    return (timer() - start_time) / (iterations * len(items))
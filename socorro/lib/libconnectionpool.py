@@ -0,0 +1,96 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Connection pool helpers for HTTP clients.
+"""
+
+from contextlib import contextmanager
+import socket
+import threading
+
+from urllib3.connection import HTTPConnection
+
+
+def build_socket_options(keep_alive):
+    """Return urllib3 socket options that turn on TCP keep-alive.
+
+    :arg keep_alive: seconds a connection is idle before keep-alive probes are sent;
+        0 leaves the socket options alone
+
+    :returns: list of socket options
+
+    """
+    socket_options = list(HTTPConnection.default_socket_options)
+    if keep_alive:
+        socket_options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            socket_options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, int(keep_alive))
+            )
+        if hasattr(socket, "TCP_KEEPINTVL"):
+            socket_options.append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, int(keep_alive))
+            )
+    return socket_options
+
+
+class ConnectionPoolMetrics:
+    """Tracks connection pool usage and emits metrics for it.
+
+    Emits:
+
+    * ``connection_pool_in_use``: gauge of requests using a connection
+    * ``connection_pool_wait``: incremented when a request has to wait for a
+      connection because all the connections to its node are in use
+    * ``connection_pool_new_connection``: incremented when the pool opens a new
+      connection
+
+    """
+
+    def __init__(self, metrics, maxsize):
+        """
+        :arg metrics: the MetricsInterface to emit metrics with
+        :arg maxsize: the maximum number of connections in the pool for each node
+        """
+        self.metrics = metrics
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.in_use = 0
+        # Requests using a connection and connections opened so far, keyed on node
+        self.node_in_use = {}
+        self.node_num_connections = {}
+
+    @contextmanager
+    def track(self, get_num_connections, node=None):
+        """Track a request for the duration of the context.
+
+        :arg get_num_connections: function that returns the number of connections the
+            node's pool has opened so far
+        :arg node: key for the node the request is sent to; each node has its own
+            pool of ``maxsize`` connections
+
+        """
+        with self.lock:
+            node_in_use = self.node_in_use.get(node, 0)
+            if node_in_use >= self.maxsize:
+                self.metrics.incr("connection_pool_wait")
+            self.node_in_use[node] = node_in_use + 1
+            self.in_use += 1
+            self.metrics.gauge("connection_pool_in_use", value=self.in_use)
+
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.node_in_use[node] -= 1
+                self.in_use -= 1
+                last_num_connections = self.node_num_connections.get(node, 0)
+                num_connections = get_num_connections()
+                new_connections = num_connections - last_num_connections
+                self.node_num_connections[node] = num_connections
+            if new_connections > 0:
+                self.metrics.incr(
+                    "connection_pool_new_connection", value=new_connections
+                )
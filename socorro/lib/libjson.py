@@ -0,0 +1,187 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+JSON codec for crash data.
+
+Crash storage and the processor serialize and parse raw crashes, processed crashes,
+and stackwalker output with ``encode`` and ``decode``. These use orjson when it's
+installed and the ``json`` module otherwise.
+
+Both backends produce compact UTF-8 JSON and return the same values. The orjson
+backend falls back to the ``json`` module for things orjson doesn't handle or
+handles differently, so both backends accept the same documents and raise the same
+errors. orjson parses integers that don't fit in 64 bits as floats, so documents
+with a number that might be one of those are decoded with the ``json`` module.
+
+The one difference is NaN and Infinity: the orjson backend encodes them as ``null``
+while the ``json`` module writes ``NaN`` and ``Infinity`` which aren't valid JSON.
+Crash data doesn't have non-finite floats, so this doesn't look for them.
+
+Float formatting can differ, for example ``1e16`` versus ``1e+16``, but the values
+are the same.
+
+"""
+
+import datetime
+import json
+import string
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def isoformat_default(obj):
+    """Encodes dates and datetimes as ISO 8601 strings."""
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    raise NotImplementedError(f"Don't know about {obj!r}")
+
+
+def datetime_default(obj):
+    """Encodes datetimes as "YYYY-MM-DD HH:MM:SS.ffffff" strings.
+
+    This matches ``JsonDTEncoder``.
+
+    """
+    if isinstance(obj, datetime.datetime):
+        return obj.strftime("%Y-%m-%d %H:%M:%S.%f")
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+class StdlibJsonBackend:
+    """Codec using the ``json`` module."""
+
+    name = "json"
+
+    def encode(self, obj, default=None):
+        try:
+            return json.dumps(
+                obj, default=default, separators=(",", ":"), ensure_ascii=False
+            ).encode("utf-8")
+        except UnicodeEncodeError:
+            # Strings with lone surrogates can't be encoded as UTF-8, so escape
+            # everything that's not ASCII
+            return json.dumps(obj, default=default, separators=(",", ":")).encode(
+                "utf-8"
+            )
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+def _number_table_byte(char):
+    if char in string.digits:
+        return ord("0")
+    if char == "-":
+        return ord("-")
+    if char in ":,[" or char in string.whitespace:
+        return ord(":")
+    return ord(" ")
+
+
+# Maps digits to "0", characters a number can follow to ":", and everything else
+# to " " so numbers with many digits can be found with a substring search; digits
+# in strings follow other characters, so they mostly don't match
+NUMBER_TABLE = bytes.maketrans(
+    bytes(range(256)), bytes(_number_table_byte(chr(i)) for i in range(256))
+)
+
+# orjson parses integers below -2**63 (19 digits) or above 2**64 - 1 (20 digits) as
+# floats
+BIG_INTEGER_NUMBERS = (b":-" + b"0" * 19, b":" + b"0" * 20)
+
+
+def has_big_integer(data):
+    """Returns whether JSON data might have an integer orjson parses as a float."""
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogatepass")
+    # Prepend a character a number can follow for a document that's just a number
+    numbers = b":" + data.translate(NUMBER_TABLE)
+    return any(number in numbers for number in BIG_INTEGER_NUMBERS)
+
+
+class OrjsonBackend:
+    """Codec using orjson with the ``json`` module as a fallback."""
+
+    name = "orjson"
+
+    def __init__(self):
+        # Dates and dataclasses go through the default function like they do with
+        # the json module
+        self.options = (
+            orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+        self.fallback = StdlibJsonBackend()
+
+    def encode(self, obj, default=None):
+        try:
+            return orjson.dumps(obj, default=default, option=self.options)
+        except orjson.JSONEncodeError:
+            # orjson doesn't handle non-str keys, integers over 64 bits, lone
+            # surrogates, or deep nesting; the json module either handles them or
+            # raises the error callers expect
+            return self.fallback.encode(obj, default=default)
+
+    def decode(self, data):
+        if has_big_integer(data):
+            return self.fallback.decode(data)
+
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson doesn't handle NaN, Infinity, or lone surrogates; the json
+            # module either handles them or raises the error callers expect
+            return self.fallback.decode(data)
+
+
+def build_backend():
+    """Returns the fastest available backend."""
+    if orjson is not None:
+        return OrjsonBackend()
+    return StdlibJsonBackend()
+
+
+BACKEND = build_backend()
+
+
+def encode(obj, default=None):
+    """Serialize a document to JSON.
+
+    :arg obj: the document to serialize
+    :arg default: function that takes an object that can't be serialized and returns
+        something that can be or raises an exception
+
+    :returns: compact JSON as UTF-8 bytes
+
+    """
+    return BACKEND.encode(obj, default=default)
+
+
+def decode(data):
+    """Parse JSON.
+
+    :arg data: JSON as bytes or str
+
+    :returns: the document
+
+    :raises json.JSONDecodeError: if the data isn't valid JSON
+
+    """
+    return BACKEND.decode(data)
+
+
+def load(fp):
+    """Parse JSON from a file.
+
+    :arg fp: file-like object opened in text or binary mode
+
+    :returns: the document
+
+    :raises json.JSONDecodeError: if the data isn't valid JSON
+
+    """
+    return decode(fp.read())
@@ -7,7 +7,10 @@ Utilities for working with socorro-data schemas.
 """
 
 import copy
+import hashlib
+import json
 import re
+import threading
 
 import jsonschema
 
@@ -357,6 +360,124 @@ def compile_pattern_re(pattern):
     return PATTERN_CACHE[pattern]
 
 
+def get_basic_types(types):
+    """Returns the set of Python types of basic values valid for schema types
+
+    :arg list types: list of schema types
+
+    :returns: frozenset of Python types
+
+    """
+    if "any" in types:
+        return frozenset(BASIC_TYPES_KEYS)
+    return frozenset(
+        python_type
+        for python_type, type_name in BASIC_TYPES.items()
+        if type_name in types
+    )
+
+
+# Maximum number of names matched against pattern_properties to remember per schema
+# part; documents can have arbitrary keys, so this keeps the lookup tables bounded
+MAX_PATTERN_LOOKUPS = 1000
+
+
+class SchemaNode:
+    """Compiled part of a socorro-data schema
+
+    This holds the things reducing a document needs from the schema part in a form
+    that's fast to use: the types, the set of Python types of valid basic values,
+    compiled child nodes, and compiled pattern_properties regexes.
+
+    """
+
+    __slots__ = (
+        "types",
+        "is_any",
+        "basic_types",
+        "properties",
+        "pattern_properties",
+        "items",
+        "_pattern_lookups",
+    )
+
+    def __init__(self, schema_part):
+        """
+        :arg dict schema_part: the part of the schema with references resolved
+        """
+        self.types = listify(schema_part["type"])
+        self.is_any = "any" in self.types
+        self.basic_types = get_basic_types(self.types)
+        self.properties = {
+            name: SchemaNode(property_schema)
+            for name, property_schema in schema_part.get("properties", {}).items()
+        }
+        self.pattern_properties = [
+            (compile_pattern_re(pattern), SchemaNode(property_schema))
+            for pattern, property_schema in schema_part.get(
+                "pattern_properties", {}
+            ).items()
+        ]
+        self.items = (
+            SchemaNode(schema_part["items"]) if "items" in schema_part else None
+        )
+        self._pattern_lookups = {}
+
+    def get_property(self, name):
+        """Returns the node for the matching property or pattern_properties value
+
+        :arg string name: the name we're looking for
+
+        :returns: SchemaNode or None
+
+        """
+        node = self.properties.get(name)
+        if node is not None or not self.pattern_properties:
+            return node
+
+        try:
+            return self._pattern_lookups[name]
+        except KeyError:
+            pass
+
+        for pattern_re, property_node in self.pattern_properties:
+            if pattern_re.match(name):
+                node = property_node
+                break
+
+        if len(self._pattern_lookups) < MAX_PATTERN_LOOKUPS:
+            self._pattern_lookups[name] = node
+        return node
+
+    def get_items(self):
+        """Returns the node for array items
+
+        :raises KeyError: if the schema part doesn't specify items
+
+        """
+        if self.items is None:
+            raise KeyError("items")
+        return self.items
+
+
+class DocumentPathError(Exception):
+    """Raised while traversing a document; the path is filled in as it unwinds
+
+    This lets traversals skip building the path for every part of the document
+    they look at.
+
+    """
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+        # Path parts from the innermost part outward
+        self.parts = []
+
+    def get_path(self):
+        return "".join(f".{part}" for part in reversed(self.parts))
+
+
 class SocorroDataReducer:
     """Reducer for reducing a document to the structure of the specified socorro-data
     schema
@@ -364,6 +485,9 @@ class SocorroDataReducer:
     This does some light type validation and raises exceptions for documents that
     are invalid.
 
+    The schema is compiled into a tree of ``SchemaNode`` when the reducer is
+    created. Use ``get_reducer()`` to share compiled reducers.
+
     """
 
     def __init__(self, schema):
@@ -375,28 +499,7 @@ class SocorroDataReducer:
             schema = resolve_references(schema)
 
         self.schema = schema
-        self._pattern_cache = {}
-
-    def get_schema_property(self, schema_part, name):
-        """Returns the matching property or pattern_properties value
-
-        :arg dict schema_part: the part of the schema we're looking at now
-        :arg string name: the name we're looking for
-
-        :returns: property schema or None
-
-        """
-        properties = schema_part.get("properties", {})
-        if name in properties:
-            return schema_part["properties"][name]
-
-        pattern_properties = schema_part.get("pattern_properties", {})
-        for pattern, property_schema in pattern_properties.items():
-            pattern_re = compile_pattern_re(pattern)
-            if pattern_re.match(name):
-                return property_schema
-
-        return None
+        self.root = SchemaNode(schema)
 
     def traverse(self, document):
         """Following the schema, traverses the document
@@ -409,27 +512,31 @@ class SocorroDataReducer:
 
         :returns: new document
 
+        :raises InvalidDocumentError: if the document is invalid
+
         """
-        return self._traverse(schema_part=self.schema, document_part=document)
+        try:
+            return self._traverse(node=self.root, document_part=document)
+        except DocumentPathError as exc:
+            raise InvalidDocumentError(
+                f"invalid: {exc.get_path()}: {exc.message}"
+            ) from None
 
-    def _traverse(self, schema_part, document_part, path=""):
+    def _traverse(self, node, document_part):
         """Following the schema, traverses the document
 
         This validates types and some type-related restrictions while reducing the
         document to the schema.
 
-        :arg dict schema_part: the part of the schema we're looking at now
+        :arg SchemaNode node: the part of the schema we're looking at now
         :arg dict document_part: the part of the document we're looking at now
-        :arg string path: the path in the structure
 
         :returns: new document
 
-        """
-        schema_part_types = listify(schema_part["type"])
+        :raises DocumentPathError: if the document is invalid
 
-        # If the document_part is a basic type (string, number, etc) and it matches
-        # what's in the schema, then return it so it's included in the reduced document
-        if "any" in schema_part_types:
+        """
+        if node.is_any:
             # This item can be anything, so we're not going to traverse it or type
             # check it.
             #
@@ -437,61 +544,94 @@ class SocorroDataReducer:
             # hold true for children including required permissions.
             return copy.deepcopy(document_part)
 
-        elif isinstance(document_part, BASIC_TYPES_KEYS):
+        # If the document_part is a basic type (string, number, etc) and it matches
+        # what's in the schema, then return it so it's included in the reduced document
+        if type(document_part) in node.basic_types:
+            return document_part
+
+        if isinstance(document_part, BASIC_TYPES_KEYS):
             valid_schema_part_type = BASIC_TYPES[type(document_part)]
-            if valid_schema_part_type in schema_part_types:
+            if valid_schema_part_type in node.types:
                 return document_part
 
-            raise InvalidDocumentError(
-                f"invalid: {path}: type {valid_schema_part_type} not in "
-                + f"{schema_part_types}"
+            raise DocumentPathError(
+                f"type {valid_schema_part_type} not in {node.types}"
             )
 
         elif isinstance(document_part, list):
-            if "array" not in schema_part_types:
-                raise InvalidDocumentError(
-                    f"invalid: {path}: type array not in {schema_part_types}"
-                )
+            if "array" not in node.types:
+                raise DocumentPathError(f"type array not in {node.types}")
 
-            schema_item = schema_part["items"]
+            item_node = node.get_items()
+            item_basic_types = item_node.basic_types
 
             new_doc = []
-            for i in range(0, len(document_part)):
-                new_part = self._traverse(
-                    schema_part=schema_item,
-                    document_part=document_part[i],
-                    path=f"{path}.[{i}]",
-                )
-                new_doc.append(new_part)
+            try:
+                for item in document_part:
+                    if type(item) in item_basic_types:
+                        new_doc.append(item)
+                    else:
+                        new_doc.append(self._traverse(item_node, item))
+            except DocumentPathError as exc:
+                # The item that failed is the next one that would have been added
+                exc.parts.append(f"[{len(new_doc)}]")
+                raise
             return new_doc
 
         elif isinstance(document_part, dict):
-            if "object" not in schema_part_types:
-                raise InvalidDocumentError(
-                    f"invalid: {path}: type object not in {schema_part_types}"
-                )
+            if "object" not in node.types:
+                raise DocumentPathError(f"type object not in {node.types}")
 
             new_doc = {}
-            for name, document_property in document_part.items():
-                schema_property = self.get_schema_property(schema_part, name)
+            name = None
+            try:
+                for name, document_property in document_part.items():
+                    property_node = node.get_property(name)
+
+                    # If the item is in the document, but not in the schema, we don't
+                    # add this part of the document to the new document
+                    if property_node is None:
+                        continue
+
+                    if type(document_property) in property_node.basic_types:
+                        new_doc[name] = document_property
+                    else:
+                        new_doc[name] = self._traverse(property_node, document_property)
+            except DocumentPathError as exc:
+                exc.parts.append(name)
+                raise
+            return new_doc
 
-                # If the item is in the document, but not in the schema, we don't add
-                # this part of the document to the new document
-                if schema_property is None:
-                    continue
+        else:
+            raise DocumentPathError(f"type {type(document_part)} not recognized")
 
-                new_doc[name] = self._traverse(
-                    schema_part=schema_property,
-                    document_part=document_property,
-                    path=f"{path}.{name}",
-                )
 
-            return new_doc
+# Registry of schema fingerprint -> SocorroDataReducer
+_REDUCERS = {}
+_REDUCERS_LOCK = threading.Lock()
 
-        else:
-            raise InvalidDocumentError(
-                f"invalid: {path}: type {type(document_part)} not recognized"
-            )
+
+def get_reducer(schema):
+    """Returns a shared SocorroDataReducer for a schema
+
+    Compiling a schema is expensive, so reducers are shared by everything that
+    reduces documents with the same schema. Reducers are looked up by the content of
+    the schema, so callers can build schemas however they like.
+
+    :arg dict schema: the schema document specifying the structure to traverse
+
+    :returns: SocorroDataReducer
+
+    """
+    fingerprint = hashlib.sha256(
+        json.dumps(schema, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+    with _REDUCERS_LOCK:
+        reducer = _REDUCERS.get(fingerprint)
+        if reducer is None:
+            reducer = SocorroDataReducer(schema=schema)
+            _REDUCERS[fingerprint] = reducer
+    return reducer
 
 
 def validate_instance(instance, schema):
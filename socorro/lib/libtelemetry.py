@@ -0,0 +1,357 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Reducer for turning processed crashes into Telemetry crash reports.
+
+A Telemetry crash report is what you get by reducing a processed crash to its public
+fields with a ``SocorroDataReducer`` and then reducing that to the Telemetry schema
+with a ``JsonSchemaReducer``. ``PublicTelemetryReducer`` produces the same document
+in a single pass over the processed crash without building the intermediate public
+document.
+"""
+
+import copy
+
+from socorro.lib import libjsonschema, libsocorrodataschema
+from socorro.lib.libjsonschema import convert_to, UnknownConvertFormat
+from socorro.lib.libsocorrodataschema import (
+    BASIC_TYPES,
+    BASIC_TYPES_KEYS,
+    get_basic_types,
+    get_reducer,
+    listify,
+)
+
+
+class TelemetryNode:
+    """Compiled part of a jsonschema."""
+
+    __slots__ = ("convert_to", "types", "basic_types", "properties", "items")
+
+    def __init__(self, schema_part):
+        self.convert_to = schema_part.get("socorroConvertTo")
+        self.types = listify(schema_part.get("type", "string"))
+        self.basic_types = get_basic_types(self.types)
+        self.properties = {
+            name: TelemetryNode(property_schema)
+            for name, property_schema in schema_part.get("properties", {}).items()
+        }
+        if "array" in self.types:
+            self.items = TelemetryNode(schema_part.get("items", {"type": "string"}))
+        else:
+            self.items = None
+
+
+def public_error(message):
+    return libsocorrodataschema.InvalidDocumentError(message)
+
+
+def telemetry_error(message):
+    return libjsonschema.InvalidDocumentError(message)
+
+
+class PublicTelemetryReducer:
+    """Reduces a document to a socorro-data schema and then a jsonschema in one pass.
+
+    The result is the same as::
+
+        public = SocorroDataReducer(schema=public_schema).traverse(document)
+        result = JsonSchemaReducer(schema=telemetry_schema).traverse(public)
+        for source_key, target_key in renamed_keys:
+            if source_key in public:
+                result[target_key] = public[source_key]
+
+    including key order and which exception is raised for invalid documents.
+    Parts of the document that are in the public schema but not in the telemetry
+    schema are validated but not copied.
+
+    """
+
+    def __init__(self, public_schema, telemetry_schema, renamed_keys=()):
+        """
+        :arg public_schema: socorro-data schema with the public fields
+        :arg telemetry_schema: jsonschema with the Telemetry fields
+        :arg renamed_keys: list of ``(source key, target key)`` tuples of top-level
+            public fields to add to the result under a different name
+        """
+        # Share the compiled public schema with other reducers using it
+        self.public_root = get_reducer(public_schema).root
+
+        telemetry_schema = libjsonschema.resolve_references(
+            copy.deepcopy(telemetry_schema)
+        )
+        self.telemetry_root = TelemetryNode(telemetry_schema)
+
+        self.renamed_keys = list(renamed_keys)
+
+    def traverse(self, document):
+        """Reduce a document.
+
+        :arg dict document: the document to reduce
+
+        :returns: new document
+
+        :raises libsocorrodataschema.InvalidDocumentError: if the document isn't valid
+            for the public schema
+        :raises libjsonschema.InvalidDocumentError: if the public parts of the
+            document aren't valid for the telemetry schema
+
+        """
+        # The two-pass version raises errors from the public pass first, so errors
+        # from the telemetry schema are held until the whole document is validated
+        telemetry_errors = []
+        new_doc = self._reduce(
+            public_node=self.public_root,
+            telemetry_node=self.telemetry_root,
+            document_part=document,
+            path="",
+            telemetry_errors=telemetry_errors,
+        )
+        if telemetry_errors:
+            raise telemetry_errors[0]
+
+        for source_key, target_key in self.renamed_keys:
+            public_node = self.public_root.get_property(source_key)
+            if public_node is not None and source_key in document:
+                new_doc[target_key] = self._reduce_public(
+                    public_node, document[source_key], f".{source_key}"
+                )
+        return new_doc
+
+    def _reduce(
+        self, public_node, telemetry_node, document_part, path, telemetry_errors
+    ):
+        """Reduce a document part with both schemas."""
+        if public_node.is_any:
+            # Public "any" parts are copied as is, so only the telemetry schema
+            # applies
+            return self._reduce_telemetry_safe(
+                telemetry_node, document_part, path, telemetry_errors
+            )
+
+        if isinstance(document_part, BASIC_TYPES_KEYS):
+            self._validate(public_node, document_part, path)
+            return self._reduce_telemetry_safe(
+                telemetry_node, document_part, path, telemetry_errors
+            )
+
+        if telemetry_errors:
+            # The result is going to be an error, so there's nothing left to build
+            self._validate(public_node, document_part, path)
+            return None
+
+        if telemetry_node.convert_to is not None:
+            # Converting a container turns the public version of it into a string,
+            # so build that
+            public_part = self._reduce_public(public_node, document_part, path)
+            return self._reduce_telemetry_safe(
+                telemetry_node, public_part, path, telemetry_errors
+            )
+
+        if isinstance(document_part, list):
+            if "array" not in public_node.types:
+                raise public_error(
+                    f"invalid: {path}: type array not in {public_node.types}"
+                )
+            if "array" not in telemetry_node.types:
+                telemetry_errors.append(
+                    telemetry_error(
+                        f"invalid: {path}: type array not in {telemetry_node.types}"
+                    )
+                )
+                self._validate(public_node, document_part, path)
+                return None
+
+            public_item = public_node.get_items()
+            telemetry_item = telemetry_node.items
+            return [
+                self._reduce(
+                    public_item,
+                    telemetry_item,
+                    item,
+                    f"{path}.[{i}]",
+                    telemetry_errors,
+                )
+                for i, item in enumerate(document_part)
+            ]
+
+        if isinstance(document_part, dict):
+            if "object" not in public_node.types:
+                raise public_error(
+                    f"invalid: {path}: type object not in {public_node.types}"
+                )
+            if "object" not in telemetry_node.types:
+                telemetry_errors.append(
+                    telemetry_error(
+                        f"invalid: {path}: type object not in {telemetry_node.types}"
+                    )
+                )
+                self._validate(public_node, document_part, path)
+                return None
+
+            telemetry_properties = telemetry_node.properties
+            new_doc = {}
+            for name, document_property in document_part.items():
+                public_property = public_node.get_property(name)
+                if public_property is None:
+                    continue
+
+                property_type = type(document_property)
+                telemetry_property = telemetry_properties.get(name)
+                if telemetry_property is None or telemetry_errors:
+                    if property_type not in public_property.basic_types:
+                        self._validate(
+                            public_property, document_property, f"{path}.{name}"
+                        )
+                    continue
+
+                if (
+                    property_type in public_property.basic_types
+                    and property_type in telemetry_property.basic_types
+                    and telemetry_property.convert_to is None
+                ):
+                    # Valid basic values are copied as is
+                    new_doc[name] = document_property
+                    continue
+
+                new_doc[name] = self._reduce(
+                    public_property,
+                    telemetry_property,
+                    document_property,
+                    f"{path}.{name}",
+                    telemetry_errors,
+                )
+            return new_doc
+
+        raise public_error(
+            f"invalid: {path}: type {type(document_part)} not recognized"
+        )
+
+    def _validate(self, public_node, document_part, path):
+        """Validate a document part with the public schema without copying it."""
+        if public_node.is_any or type(document_part) in public_node.basic_types:
+            return
+
+        if isinstance(document_part, BASIC_TYPES_KEYS):
+            valid_type = BASIC_TYPES[type(document_part)]
+            if valid_type not in public_node.types:
+                raise public_error(
+                    f"invalid: {path}: type {valid_type} not in {public_node.types}"
+                )
+
+        elif isinstance(document_part, list):
+            if "array" not in public_node.types:
+                raise public_error(
+                    f"invalid: {path}: type array not in {public_node.types}"
+                )
+            public_item = public_node.get_items()
+            item_basic_types = public_item.basic_types
+            for i, item in enumerate(document_part):
+                if type(item) not in item_basic_types:
+                    self._validate(public_item, item, f"{path}.[{i}]")
+
+        elif isinstance(document_part, dict):
+            if "object" not in public_node.types:
+                raise public_error(
+                    f"invalid: {path}: type object not in {public_node.types}"
+                )
+            for name, document_property in document_part.items():
+                public_property = public_node.get_property(name)
+                if (
+                    public_property is not None
+                    and type(document_property) not in public_property.basic_types
+                ):
+                    self._validate(public_property, document_property, f"{path}.{name}")
+
+        else:
+            raise public_error(
+                f"invalid: {path}: type {type(document_part)} not recognized"
+            )
+
+    def _reduce_public(self, public_node, document_part, path):
+        """Reduce a document part with the public schema."""
+        if public_node.is_any:
+            return copy.deepcopy(document_part)
+
+        if isinstance(document_part, list):
+            if "array" not in public_node.types:
+                raise public_error(
+                    f"invalid: {path}: type array not in {public_node.types}"
+                )
+            public_item = public_node.get_items()
+            return [
+                self._reduce_public(public_item, item, f"{path}.[{i}]")
+                for i, item in enumerate(document_part)
+            ]
+
+        if isinstance(document_part, dict):
+            if "object" not in public_node.types:
+                raise public_error(
+                    f"invalid: {path}: type object not in {public_node.types}"
+                )
+            new_doc = {}
+            for name, document_property in document_part.items():
+                public_property = public_node.get_property(name)
+                if public_property is not None:
+                    new_doc[name] = self._reduce_public(
+                        public_property, document_property, f"{path}.{name}"
+                    )
+            return new_doc
+
+        # Basic types are returned as is and anything else is invalid
+        self._validate(public_node, document_part, path)
+        return document_part
+
+    def _reduce_telemetry_safe(
+        self, telemetry_node, document_part, path, telemetry_errors
+    ):
+        try:
+            return self._reduce_telemetry(telemetry_node, document_part, path)
+        except (libjsonschema.InvalidDocumentError, UnknownConvertFormat) as exc:
+            telemetry_errors.append(exc)
+            return None
+
+    def _reduce_telemetry(self, telemetry_node, document_part, path):
+        """Reduce a public document part with the telemetry schema."""
+        if telemetry_node.convert_to is not None:
+            document_part = convert_to(document_part, telemetry_node.convert_to)
+
+        if isinstance(document_part, BASIC_TYPES_KEYS):
+            valid_type = BASIC_TYPES[type(document_part)]
+            if valid_type in telemetry_node.types:
+                return document_part
+
+            raise telemetry_error(
+                f"invalid: {path}: type {valid_type} not in {telemetry_node.types}"
+            )
+
+        if isinstance(document_part, list):
+            if "array" not in telemetry_node.types:
+                raise telemetry_error(
+                    f"invalid: {path}: type array not in {telemetry_node.types}"
+                )
+            telemetry_item = telemetry_node.items
+            return [
+                self._reduce_telemetry(telemetry_item, item, f"{path}.[{i}]")
+                for i, item in enumerate(document_part)
+            ]
+
+        if isinstance(document_part, dict):
+            if "object" not in telemetry_node.types:
+                raise telemetry_error(
+                    f"invalid: {path}: type object not in {telemetry_node.types}"
+                )
+            telemetry_properties = telemetry_node.properties
+            new_doc = {}
+            for name, document_property in document_part.items():
+                telemetry_property = telemetry_properties.get(name)
+                if telemetry_property is not None:
+                    new_doc[name] = self._reduce_telemetry(
+                        telemetry_property, document_property, f"{path}.{name}"
+                    )
+            return new_doc
+
+        # JsonSchemaReducer drops parts of other types
+        return None
@@ -0,0 +1,497 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""Defines the ProcessPoolTaskManager.
+
+This module defines a task manager that works like the ThreadedTaskManager, but runs
+the task function in a pool of worker processes so CPU-bound work isn't serialized by
+the GIL.
+
+A single iterator thread pushes jobs into an internal queue. For each worker process,
+there's a proxy thread in the parent process that pulls jobs off the queue, sends the
+job args to its worker process over a pipe, and waits for the result. Anything in the
+job kwargs that can't (or shouldn't) cross the process boundary--notably
+``finished_func``--stays in the parent and is called by the proxy thread when the
+worker process is done with the job.
+
+When the task manager starts, before it starts any threads, it forks a spawner
+process. Worker processes are forked from the spawner, so each one gets its own copy of
+whatever the task function is bound to (for the processor, that's the pipeline and
+crash storage). Worker processes that die are replaced by forking the spawner again
+rather than the parent, which has threads that could be holding locks (logging,
+sentry) that would never be released in the child. Worker processes ignore SIGINT and
+SIGTERM; the parent decides when to stop and drains the queue before telling the
+workers to exit.
+
+"""
+
+import multiprocessing
+from multiprocessing import reduction
+from multiprocessing.connection import Connection
+import os
+import signal
+import threading
+import time
+
+from socorro.lib.concurrency_controller import (
+    BUSY_SIGNAL,
+    CPU_SIGNAL,
+    get_cpu_seconds,
+    WORKLOAD_SIGNALS,
+)
+from socorro.lib.task_manager import (
+    default_iterator,
+    default_task_func,
+)
+from socorro.lib.threaded_task_manager import (
+    STOP_TOKEN,
+    TaskThread,
+    ThreadedTaskManager,
+)
+
+
+# Longest time in seconds between checks for whether a worker process has exited
+WAIT_POLL_INTERVAL = 0.1
+
+# kwargs that are handled in the parent process and not passed to the worker process
+PARENT_ONLY_KWARGS = ("finished_func",)
+
+
+def _worker_process_main(conn, task_func):
+    """Main function for a worker process.
+
+    Receives ``(args, kwargs)`` jobs over the pipe, runs the task function, and sends
+    back a ``(success, error, workload signals)`` result for each job. Exits when it
+    receives a STOP_TOKEN or the pipe is closed.
+
+    :arg conn: the worker process's end of the pipe
+    :arg task_func: the function to run for each job
+
+    """
+    # The parent process handles shutdown signals and tells the worker when to stop,
+    # so ignore them here so they don't interrupt a job in progress.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if job == STOP_TOKEN:
+            break
+
+        args, kwargs = job
+        start_cpu_seconds = get_cpu_seconds()
+        try:
+            task_func(*args, **kwargs)
+            success, error = True, None
+        except Exception as exc:
+            success, error = False, repr(exc)
+
+        # Pass workload signals to the parent for the concurrency controller
+        WORKLOAD_SIGNALS.record(CPU_SIGNAL, get_cpu_seconds() - start_cpu_seconds)
+        result = (success, error, WORKLOAD_SIGNALS.take())
+
+        try:
+            conn.send(result)
+        except (BrokenPipeError, OSError):
+            break
+
+    conn.close()
+
+
+def _spawner_main(conn, task_func):
+    """Main function for the spawner process.
+
+    Receives requests over the pipe until it receives a STOP_TOKEN or the pipe is
+    closed:
+
+    * ``("spawn", None)``: forks a worker process and sends back its pid followed by
+      the parent's end of a pipe to it
+    * ``("wait", pid)``: sends back the exit code of a worker process or None if it
+      hasn't exited yet; like ``multiprocessing.Process.exitcode``, that's ``-N`` if
+      it was killed by signal ``N``
+
+    :arg conn: the spawner process's end of the pipe
+    :arg task_func: the function worker processes run for each job
+
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            break
+
+        if request == STOP_TOKEN:
+            break
+
+        command, pid = request
+        if command == "spawn":
+            parent_conn, child_conn = multiprocessing.Pipe()
+            pid = os.fork()
+            if pid == 0:
+                exitcode = 1
+                try:
+                    conn.close()
+                    parent_conn.close()
+                    _worker_process_main(child_conn, task_func)
+                    exitcode = 0
+                finally:
+                    os._exit(exitcode)
+
+            child_conn.close()
+            conn.send(pid)
+            reduction.send_handle(conn, parent_conn.fileno(), None)
+            parent_conn.close()
+
+        elif command == "wait":
+            # Don't block; other proxy threads may need the spawner in the meantime
+            waited_pid, status = os.waitpid(pid, os.WNOHANG)
+            if waited_pid == 0:
+                conn.send(None)
+            else:
+                conn.send(os.waitstatus_to_exitcode(status))
+
+    conn.close()
+
+
+class WorkerSpawner:
+    """Forks worker processes from a process that has no threads."""
+
+    def __init__(self, task_func, mp_context):
+        """
+        :arg task_func: the function worker processes run for each job
+        :arg mp_context: the multiprocessing context to create the spawner process
+            with
+        """
+        self.task_func = task_func
+        self.mp_context = mp_context
+        self.process = None
+        self.conn = None
+        # Proxy threads share the pipe to the spawner process
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the spawner process; do this before starting any threads."""
+        parent_conn, child_conn = self.mp_context.Pipe()
+        self.process = self.mp_context.Process(
+            target=_spawner_main,
+            args=(child_conn, self.task_func),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def spawn(self):
+        """Fork a worker process.
+
+        :returns: ``(WorkerProcess, Connection)`` tuple with the parent's end of the
+            pipe to the worker process
+
+        """
+        with self._lock:
+            self.conn.send(("spawn", None))
+            pid = self.conn.recv()
+            fd = reduction.recv_handle(self.conn)
+        return WorkerProcess(pid, self), Connection(fd)
+
+    def poll(self, pid):
+        """Return the exit code of a worker process or None if it's running."""
+        with self._lock:
+            self.conn.send(("wait", pid))
+            return self.conn.recv()
+
+    def wait(self, pid):
+        """Wait for a worker process to exit and return its exit code."""
+        delay = 0.001
+        while True:
+            exitcode = self.poll(pid)
+            if exitcode is not None:
+                return exitcode
+            # Poll without holding the lock so other proxy threads can use the
+            # spawner while this worker process finishes exiting
+            time.sleep(delay)
+            delay = min(delay * 2, WAIT_POLL_INTERVAL)
+
+    def stop(self):
+        """Stop the spawner process."""
+        if self.process is None:
+            return
+
+        try:
+            self.conn.send(STOP_TOKEN)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join()
+        self.conn.close()
+        self.process = None
+        self.conn = None
+
+
+class WorkerProcess:
+    """A worker process forked by a WorkerSpawner."""
+
+    def __init__(self, pid, spawner):
+        self.pid = pid
+        self.spawner = spawner
+        self.exitcode = None
+
+    def join(self):
+        """Wait for the worker process to exit and set ``exitcode``."""
+        if self.exitcode is None:
+            self.exitcode = self.spawner.wait(self.pid)
+
+    def is_alive(self):
+        return self.exitcode is None
+
+
+class ProcessPoolTaskManager(ThreadedTaskManager):
+    """Task manager that runs tasks in a pool of worker processes."""
+
+    def __init__(
+        self,
+        idle_delay=7,
+        quit_on_empty_queue=False,
+        number_of_threads=4,
+        maximum_queue_size=8,
+        job_source_iterator=default_iterator,
+        task_func=default_task_func,
+        reserved_priority_threads=0,
+        min_number_of_threads=None,
+        concurrency_interval=30,
+        target_cpu_utilization=0.8,
+    ):
+        """
+        :arg idle_delay: the delay in seconds if no job is found
+        :arg quit_on_empty_queue: stop if the queue is empty
+        :arg number_of_threads: number of worker processes to run; this has the same
+            name as the ThreadedTaskManager argument so the two task managers can
+            share configuration
+        :arg maximum_queue_size: maximum size of the internal queue from which the
+            worker processes are fed
+        :arg job_source_iterator: an iterator to serve as the source of data. it can
+            be of the form of a generator or iterator; a function that returns an
+            iterator; a instance of an iterable object; or a class that when
+            instantiated with a config object can be iterated. The iterator must
+            yield a tuple consisting of a function's tuple of args and, optionally,
+            a mapping of kwargs. Ex:  (('a', 17), {'x': 23})
+        :arg task_func: a function that will accept the args and kwargs yielded
+            by the job_source_iterator; this is run in the worker processes
+        :arg reserved_priority_threads: number of the worker processes that only do
+            jobs from the priority job source
+        :arg min_number_of_threads: if not None, adjust the number of active worker
+            processes between this and ``number_of_threads`` based on load; inactive
+            worker processes are idle, but keep running
+        :arg concurrency_interval: seconds between adjustments
+        :arg target_cpu_utilization: fraction of all CPUs above which the number of
+            active worker processes shrinks
+        """
+        super().__init__(
+            idle_delay=idle_delay,
+            quit_on_empty_queue=quit_on_empty_queue,
+            number_of_threads=number_of_threads,
+            maximum_queue_size=maximum_queue_size,
+            job_source_iterator=job_source_iterator,
+            task_func=task_func,
+            reserved_priority_threads=reserved_priority_threads,
+            min_number_of_threads=min_number_of_threads,
+            concurrency_interval=concurrency_interval,
+            target_cpu_utilization=target_cpu_utilization,
+        )
+        # Worker processes are forked so they inherit the task function and whatever
+        # it's bound to without having to pickle it
+        self.mp_context = multiprocessing.get_context("fork")
+        self.spawner = WorkerSpawner(
+            task_func=self.task_func, mp_context=self.mp_context
+        )
+
+    def _install_sigterm_handler(self):
+        """Install a SIGTERM handler that drains the queue and stops the workers.
+
+        This chains to whatever SIGTERM handler was installed previously. Signal
+        handlers can only be installed from the main thread, so this does nothing
+        otherwise.
+
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        previous_handler = signal.getsignal(signal.SIGTERM)
+
+        def handle_sigterm(signal_number, frame):
+            self.logger.info("SIGTERM: draining queue and stopping worker processes")
+            self.quit = True
+            if callable(previous_handler):
+                previous_handler(signal_number, frame)
+
+        signal.signal(signal.SIGTERM, handle_sigterm)
+
+    def start(self):
+        """Starts the worker processes, their proxy threads, and the queueing thread."""
+        self.logger.debug("start")
+        self._install_sigterm_handler()
+
+        # Fork the spawner process before starting any threads in this process
+        self.spawner.start()
+        for i in range(self.number_of_threads):
+            self.thread_list.append(
+                ProcessProxyThread(
+                    task_queue=self.task_queue,
+                    spawner=self.spawner,
+                    max_priority=self.get_max_priority(i),
+                    worker_gate=self.worker_gate,
+                    worker_index=i,
+                )
+            )
+        for proxy_thread in self.thread_list:
+            proxy_thread.start_process()
+
+        for proxy_thread in self.thread_list:
+            proxy_thread.start()
+
+        self.queueing_thread = threading.Thread(
+            name="queueingThread", target=self._queueing_thread_func
+        )
+        self.queueing_thread.start()
+
+    def _stop_worker_threads(self):
+        """Stop the proxy threads and then the spawner process."""
+        super()._stop_worker_threads()
+        self.spawner.stop()
+
+
+class ProcessProxyThread(TaskThread):
+    """Thread in the parent process that feeds jobs to a single worker process"""
+
+    def __init__(
+        self,
+        task_queue,
+        spawner,
+        max_priority=None,
+        worker_gate=None,
+        worker_index=0,
+    ):
+        """Initialize a new proxy thread.
+
+        :arg task_queue: a reference to the queue from which to fetch jobs
+        :arg spawner: the WorkerSpawner to fork the worker process with
+        :arg max_priority: if not None, only do jobs with this priority or better
+        :arg worker_gate: if not None, the WorkerGate that parks this thread while
+            it's not active
+        :arg worker_index: the index of this thread among the worker threads
+
+        """
+        super().__init__(
+            task_queue,
+            max_priority=max_priority,
+            worker_gate=worker_gate,
+            worker_index=worker_index,
+        )
+        self.spawner = spawner
+        self.process = None
+        self.conn = None
+
+    def start_process(self):
+        """Start (or restart) the worker process."""
+        self.process, self.conn = self.spawner.spawn()
+        self.logger.info("started worker process %s", self.process.pid)
+
+    def stop_process(self):
+        """Tell the worker process to stop and wait for it to exit."""
+        if self.process is None:
+            return
+
+        try:
+            self.conn.send(STOP_TOKEN)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join()
+        self.conn.close()
+        self.logger.info("worker process %s stopped", self.process.pid)
+        self.process = None
+        self.conn = None
+
+    def run_in_process(self, args, kwargs):
+        """Run a job in the worker process and wait for the result.
+
+        If the worker process dies while running the job, this restarts it.
+
+        :arg args: the job args
+        :arg kwargs: the job kwargs minus any kwargs that stay in the parent
+
+        """
+        try:
+            self.conn.send((args, kwargs))
+            success, error, workload_signals = self.conn.recv()
+        except (EOFError, OSError):
+            self.process.join()
+            self.conn.close()
+            self.logger.error(
+                "worker process %s died while processing %r: exitcode %s",
+                self.process.pid,
+                args,
+                self.process.exitcode,
+            )
+            self.start_process()
+            return
+
+        WORKLOAD_SIGNALS.add(workload_signals)
+        if not success:
+            self.logger.error("Error in processing a job %r: %s", args, error)
+
+    def run(self):
+        """The main routine for the proxy thread.
+
+        The thread pulls tasks from the task queue and hands them to its worker
+        process until it encounters a STOP_TOKEN. Then it stops the worker process.
+
+        """
+        try:
+            while True:
+                task = self.get_task()
+                if task is STOP_TOKEN:
+                    self.logger.info("quits")
+                    break
+
+                _, arguments = task
+                try:
+                    args, kwargs = arguments
+                except ValueError:
+                    args = arguments
+                    kwargs = {}
+
+                parent_kwargs = {
+                    key: val for key, val in kwargs.items() if key in PARENT_ONLY_KWARGS
+                }
+                worker_kwargs = {
+                    key: val
+                    for key, val in kwargs.items()
+                    if key not in PARENT_ONLY_KWARGS
+                }
+
+                start_time = time.monotonic()
+                try:
+                    self.run_in_process(args, worker_kwargs)
+                finally:
+                    # No matter what happened in the worker process, the job is done
+                    # so call finished_func; for Pub/Sub, this acks the crash
+                    finished_func = parent_kwargs.get("finished_func")
+                    if finished_func is not None:
+                        try:
+                            finished_func()
+                        except Exception:
+                            self.logger.exception(
+                                "Error calling finished_func() on %r", args
+                            )
+                    WORKLOAD_SIGNALS.record(BUSY_SIGNAL, time.monotonic() - start_time)
+        except Exception:
+            self.logger.critical("Failure in task_queue", exc_info=True)
+        finally:
+            self.stop_process()
@@ -10,6 +10,33 @@ import time
 LOGGER = logging.getLogger(__name__)
 
 
+# Job sources can tag jobs with the name of the queue the job came from by adding this
+# key to the job kwargs. Task managers remove it before calling the task function.
+JOB_SOURCE_KWARG = "job_source"
+
+
+def pop_job_source(job_params):
+    """Split the job source tag from job params.
+
+    :arg job_params: ``(args, kwargs)`` tuple or args tuple from a job source iterator
+
+    :returns: ``(job_params, job_source)`` where ``job_params`` doesn't have the job
+        source tag in its kwargs and ``job_source`` is the tag or None
+
+    """
+    try:
+        args, kwargs = job_params
+    except ValueError:
+        return job_params, None
+
+    if not isinstance(kwargs, dict) or JOB_SOURCE_KWARG not in kwargs:
+        return job_params, None
+
+    kwargs = dict(kwargs)
+    job_source = kwargs.pop(JOB_SOURCE_KWARG)
+    return (args, kwargs), job_source
+
+
 def default_task_func(a_param):
     """Default task function.
 
@@ -74,7 +101,8 @@ class TaskManager:
             iterator; a instance of an iterable object; or a class that when
             instantiated with a config object can be iterated. The iterator must
             yield a tuple consisting of a function's tuple of args and, optionally,
-            a mapping of kwargs. Ex:  (('a', 17), {'x': 23})
+            a mapping of kwargs. Ex:  (('a', 17), {'x': 23}). The kwargs can include
+            a ``job_source`` tag which is removed before calling the task function.
         :arg task_func: a function that will accept the args and kwargs yielded
             by the job_source_iterator
         """
@@ -144,6 +172,7 @@ class TaskManager:
                     )
                     self._responsive_sleep(self.idle_delay)
                     continue
+                job_params, _ = pop_job_source(job_params)
                 try:
                     args, kwargs = job_params
                 except ValueError:
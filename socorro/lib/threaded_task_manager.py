@@ -9,22 +9,152 @@ single iterator thread pushes jobs into an internal queue while a flock of
 consumer/worker threads do the jobs. A job consists of a function and the data applied
 to the function.
 
+Jobs tagged with a job source are handed out by the priority of their source and in
+the order they were received within a priority. Some worker threads can be reserved
+for the most important jobs.
+
+If ``min_number_of_threads`` is set, a ConcurrencyController adjusts how many of the
+worker threads are active between that and ``number_of_threads``. Inactive worker
+threads are parked and the queue shrinks with the number of active workers.
+
 """
 
+import collections
+import heapq
+import itertools
 import logging
-import queue
+import math
 import threading
 import time
 
+from socorro.lib.concurrency_controller import (
+    BUSY_SIGNAL,
+    ConcurrencyController,
+    WorkerGate,
+    WORKLOAD_SIGNALS,
+)
 from socorro.lib.task_manager import (
     default_iterator,
     default_task_func,
+    pop_job_source,
     TaskManager,
 )
 
 
 STOP_TOKEN = (None, None)
 
+# Priority of jobs by job source; lower numbers are handed out first
+JOB_SOURCE_PRIORITIES = {
+    "priority": 0,
+    "standard": 1,
+    "reprocessing": 2,
+}
+
+# Priority of jobs that aren't tagged or have a job source we don't know about
+DEFAULT_PRIORITY = JOB_SOURCE_PRIORITIES["standard"]
+
+# Reserved worker threads only do jobs with this priority
+RESERVED_PRIORITY = JOB_SOURCE_PRIORITIES["priority"]
+
+
+def get_job_priority(job_source):
+    """Return the priority for jobs from a job source.
+
+    :arg job_source: the job source tag or None
+
+    :returns: int; lower numbers are handed out first
+
+    """
+    return JOB_SOURCE_PRIORITIES.get(job_source, DEFAULT_PRIORITY)
+
+
+class JobQueue:
+    """Bounded queue of jobs that hands out jobs by priority.
+
+    Jobs with the same priority are handed out in the order they were added. Each job
+    only waits for room behind jobs that are as or more important, so a full queue of
+    reprocessing jobs doesn't hold up a priority job.
+
+    When the queue is stopped, ``get()`` keeps handing out jobs until there aren't any
+    left that the caller can do and then returns STOP_TOKEN.
+
+    """
+
+    def __init__(self, maxsize):
+        """
+        :arg maxsize: the maximum number of jobs of a given priority or better in the
+            queue
+        """
+        self.maxsize = maxsize
+        self._heap = []
+        self._counter = itertools.count()
+        self._priority_counts = collections.Counter()
+        self._condition = threading.Condition()
+        self._stopped = False
+
+    def _count_at_or_above(self, priority):
+        return sum(
+            count
+            for item_priority, count in self._priority_counts.items()
+            if item_priority <= priority
+        )
+
+    def put(self, job, priority=DEFAULT_PRIORITY):
+        """Add a job to the queue, waiting for room if necessary.
+
+        :arg job: the job
+        :arg priority: the job's priority; lower numbers are handed out first
+
+        """
+        with self._condition:
+            while self._count_at_or_above(priority) >= self.maxsize:
+                self._condition.wait()
+            heapq.heappush(self._heap, (priority, next(self._counter), job))
+            self._priority_counts[priority] += 1
+            self._condition.notify_all()
+
+    def _can_get(self, max_priority):
+        return self._heap and (max_priority is None or self._heap[0][0] <= max_priority)
+
+    def get(self, max_priority=None):
+        """Remove and return the most important job, waiting for one if necessary.
+
+        :arg max_priority: if not None, only return jobs with this priority or better
+
+        :returns: the job or STOP_TOKEN if the queue is stopped and there are no jobs
+            left that the caller can do
+
+        """
+        with self._condition:
+            while not self._can_get(max_priority):
+                if self._stopped:
+                    return STOP_TOKEN
+                self._condition.wait()
+            priority, _, job = heapq.heappop(self._heap)
+            self._priority_counts[priority] -= 1
+            self._condition.notify_all()
+            return job
+
+    def set_maxsize(self, maxsize):
+        """Change the maximum size; jobs already in the queue stay in the queue."""
+        with self._condition:
+            self.maxsize = maxsize
+            self._condition.notify_all()
+
+    def stop(self):
+        """Stop the queue so workers quit once there are no jobs left for them."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def empty(self):
+        with self._condition:
+            return not self._heap
+
+    def qsize(self):
+        with self._condition:
+            return len(self._heap)
+
 
 class ThreadedTaskManager(TaskManager):
     """Threaded task manager."""
@@ -37,11 +167,16 @@ class ThreadedTaskManager(TaskManager):
         maximum_queue_size=8,
         job_source_iterator=default_iterator,
         task_func=default_task_func,
+        reserved_priority_threads=0,
+        min_number_of_threads=None,
+        concurrency_interval=30,
+        target_cpu_utilization=0.8,
     ):
         """
         :arg idle_delay: the delay in seconds if no job is found
         :arg quit_on_empty_queue: stop if the queue is empty
-        :arg number_of_threads: number of worker threads to run
+        :arg number_of_threads: number of worker threads to run; with adaptive
+            concurrency, this is the most that are active at once
         :arg maximum_queue_size: maximum size of the internal queue from which the
             threads poll
         :arg job_source_iterator: an iterator to serve as the source of data. it can
@@ -52,6 +187,13 @@ class ThreadedTaskManager(TaskManager):
             a mapping of kwargs. Ex:  (('a', 17), {'x': 23})
         :arg task_func: a function that will accept the args and kwargs yielded
             by the job_source_iterator
+        :arg reserved_priority_threads: number of the worker threads that only do jobs
+            from the priority job source
+        :arg min_number_of_threads: if not None, adjust the number of active worker
+            threads between this and ``number_of_threads`` based on load
+        :arg concurrency_interval: seconds between adjustments
+        :arg target_cpu_utilization: fraction of all CPUs above which the number of
+            active worker threads shrinks
         """
 
         # If number of threads is None, set it to default
@@ -62,6 +204,24 @@ class ThreadedTaskManager(TaskManager):
         if maximum_queue_size is None:
             maximum_queue_size = 8
 
+        if reserved_priority_threads is None:
+            reserved_priority_threads = 0
+
+        if reserved_priority_threads >= number_of_threads:
+            raise ValueError(
+                f"reserved_priority_threads ({reserved_priority_threads}) must be "
+                f"less than number_of_threads ({number_of_threads})"
+            )
+
+        if min_number_of_threads is not None and not (
+            reserved_priority_threads < min_number_of_threads <= number_of_threads
+        ):
+            raise ValueError(
+                f"min_number_of_threads ({min_number_of_threads}) must be more than "
+                f"reserved_priority_threads ({reserved_priority_threads}) and at most "
+                f"number_of_threads ({number_of_threads})"
+            )
+
         super().__init__(
             idle_delay=idle_delay,
             quit_on_empty_queue=quit_on_empty_queue,
@@ -70,10 +230,30 @@ class ThreadedTaskManager(TaskManager):
         )
         self.thread_list = []  # the thread object storage
         self.number_of_threads = number_of_threads
-        self.task_queue = queue.Queue(maximum_queue_size)
+        self.maximum_queue_size = maximum_queue_size
+        self.reserved_priority_threads = reserved_priority_threads
+        self.task_queue = JobQueue(maximum_queue_size)
 
         self.queueing_thread = None
 
+        self.concurrency_interval = concurrency_interval
+        self.concurrency_controller = None
+        self.controller_thread = None
+        self._controller_stop = threading.Event()
+        if min_number_of_threads is None:
+            self.worker_gate = None
+        else:
+            self.worker_gate = WorkerGate(min_number_of_threads)
+            self.concurrency_controller = ConcurrencyController(
+                min_workers=min_number_of_threads,
+                max_workers=number_of_threads,
+                get_queue_depth=self.task_queue.qsize,
+                queue_capacity=lambda: self.task_queue.maxsize,
+                set_workers=self.set_active_workers,
+                target_cpu_utilization=target_cpu_utilization,
+            )
+            self.set_active_workers(min_number_of_threads)
+
     def start(self):
         """Starts the queueing thread and creates workers.
 
@@ -83,11 +263,16 @@ class ThreadedTaskManager(TaskManager):
         """
         self.logger.debug("start")
         # start each of the task threads.
-        for _ in range(self.number_of_threads):
+        for i in range(self.number_of_threads):
             # each thread is given the config object as well as a reference to
             # this manager class.  The manager class is where the queue lives
             # and the task threads will refer to it to get their next jobs.
-            new_thread = TaskThread(self.task_queue)
+            new_thread = TaskThread(
+                self.task_queue,
+                max_priority=self.get_max_priority(i),
+                worker_gate=self.worker_gate,
+                worker_index=i,
+            )
             self.thread_list.append(new_thread)
             new_thread.start()
 
@@ -95,6 +280,53 @@ class ThreadedTaskManager(TaskManager):
             name="queueingThread", target=self._queueing_thread_func
         )
         self.queueing_thread.start()
+        self.start_controller_thread()
+
+    def set_active_workers(self, number):
+        """Set the number of active worker threads.
+
+        The queue is resized so there's the same amount of queue per active worker.
+
+        """
+        self.worker_gate.set_limit(number)
+        self.task_queue.set_maxsize(
+            max(1, math.ceil(self.maximum_queue_size * number / self.number_of_threads))
+        )
+
+    def start_controller_thread(self):
+        """Start the thread that adjusts the number of active worker threads."""
+        if self.concurrency_controller is None:
+            return
+
+        self.controller_thread = threading.Thread(
+            name="concurrencyControllerThread",
+            target=self._controller_thread_func,
+            daemon=True,
+        )
+        self.controller_thread.start()
+
+    def _controller_thread_func(self):
+        """Sample the queue every second and update the controller every interval."""
+        seconds = 0
+        while not self._controller_stop.wait(1.0):
+            self.concurrency_controller.sample_queue_depth()
+            seconds += 1
+            if seconds >= self.concurrency_interval:
+                seconds = 0
+                try:
+                    self.concurrency_controller.update()
+                except Exception:
+                    self.logger.error("concurrency controller failed", exc_info=True)
+
+    def get_max_priority(self, thread_index):
+        """Return the max_priority for the worker thread with the given index.
+
+        The first ``reserved_priority_threads`` worker threads only do priority jobs.
+
+        """
+        if thread_index < self.reserved_priority_threads:
+            return RESERVED_PRIORITY
+        return None
 
     def wait_for_completion(self):
         """Blocks on queueing thread completion."""
@@ -155,16 +387,18 @@ class ThreadedTaskManager(TaskManager):
     def _stop_worker_threads(self):
         """Stop worker threads.
 
-        When called by the queueing thread, one STOP_TOKEN will be placed on the queue
-        for each thread. Each worker thread works until it hits a STOP_TOKEN and then
-        immediately ends.
+        When called by the queueing thread, this stops the queue. Each worker thread
+        works until there are no jobs left that it can do and then ends.
 
         This is a blocking call. The thread using this function will wait for
         all the worker threads to end.
 
         """
-        for _ in range(self.number_of_threads):
-            self.task_queue.put(STOP_TOKEN)
+        self._controller_stop.set()
+        if self.worker_gate is not None:
+            # Let parked worker threads through so they see the queue is stopped
+            self.worker_gate.open()
+        self.task_queue.stop()
         self.logger.debug("waiting for standard worker threads to stop")
         for t in self.thread_list:
             t.join()
@@ -197,7 +431,10 @@ class ThreadedTaskManager(TaskManager):
                     continue
 
                 self.logger.debug("received %r", job_params)
-                self.task_queue.put((self.task_func, job_params))
+                job_params, job_source = pop_job_source(job_params)
+                self.task_queue.put(
+                    (self.task_func, job_params), priority=get_job_priority(job_source)
+                )
         except Exception:
             self.logger.error("queueing jobs has failed", exc_info=True)
         except KeyboardInterrupt:
@@ -211,16 +448,29 @@ class ThreadedTaskManager(TaskManager):
 class TaskThread(threading.Thread):
     """This class represents a worker thread for the TaskManager class"""
 
-    def __init__(self, task_queue):
+    def __init__(self, task_queue, max_priority=None, worker_gate=None, worker_index=0):
         """Initialize a new thread.
 
         :arg task_queue: a reference to the queue from which to fetch jobs
+        :arg max_priority: if not None, only do jobs with this priority or better
+        :arg worker_gate: if not None, the WorkerGate that parks this thread while
+            it's not active
+        :arg worker_index: the index of this thread among the worker threads
 
         """
         super().__init__()
         self.task_queue = task_queue
+        self.max_priority = max_priority
+        self.worker_gate = worker_gate
+        self.worker_index = worker_index
         self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
 
+    def get_task(self):
+        """Wait until this thread is active and return the next task."""
+        if self.worker_gate is not None:
+            self.worker_gate.wait(self.worker_index)
+        return self.task_queue.get(max_priority=self.max_priority)
+
     def _get_name(self):
         return threading.currentThread().getName()
 
@@ -233,7 +483,7 @@ class TaskThread(threading.Thread):
         try:
             quit_request_detected = False
             while True:
-                task = self.task_queue.get()
+                task = self.get_task()
                 if task is STOP_TOKEN:
                     self.logger.info("quits")
                     break
@@ -241,6 +491,7 @@ class TaskThread(threading.Thread):
                     continue
 
                 function, arguments = task
+                start_time = time.monotonic()
                 try:
                     try:
                         args, kwargs = arguments
@@ -255,5 +506,7 @@ class TaskThread(threading.Thread):
                     quit_request_detected = True
                     # Only needed if signal handler is not registered
                     # thread.interrupt_main()
+                finally:
+                    WORKLOAD_SIGNALS.record(BUSY_SIGNAL, time.monotonic() - start_time)
         except Exception:
             self.logger.critical("Failure in task_queue", exc_info=True)
@@ -3,7 +3,9 @@
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
 from socorro import settings
+from socorro.libclass import build_instance_from_settings
 from socorro.lib.libsocorrodataschema import get_schema
+from socorro.processor.pipeline import Ruleset
 from socorro.processor.rules.android import (
     AndroidCPUInfoRule,
     AndroidOSInfoRule,
@@ -59,74 +61,101 @@ from socorro.processor.rules.mozilla import (
 )
 
 
-DEFAULT_RULESET = [
-    # fix the raw crash removing null characters and Nones
-    DeNullRule(),
-    DeNoneRule(),
-    # capture collector things
-    CrashReportKeysRule(),
-    CollectorMetadataRule(),
-    # fix ModuleSignatureInfo if it needs fixing
-    ConvertModuleSignatureInfoRule(),
-    # rules to transform a raw crash into a processed crash
-    CopyFromRawCrashRule(schema=get_schema("processed_crash.schema.yaml")),
-    FenixVersionRewriteRule(),
-    ESRVersionRewrite(),
-    SubmittedFromRule(),
-    IdentifierRule(),
-    MinidumpSha256HashRule(),
-    MinidumpStackwalkRule(
-        dump_field=settings.STACKWALKER["dump_field"],
-        symbols_urls=settings.STACKWALKER["symbols_urls"],
-        command_line=settings.STACKWALKER["command_line"],
-        command_path=settings.STACKWALKER["command_path"],
-        kill_timeout=settings.STACKWALKER["kill_timeout"],
-        symbol_cache_path=settings.STACKWALKER["symbol_cache_path"],
-        symbol_tmp_path=settings.STACKWALKER["symbol_tmp_path"],
-    ),
-    ModuleURLRewriteRule(),
-    CrashingThreadInfoRule(),
-    TruncateStacksRule(),
-    PossibleBitFlipsRule(),
-    CrashInconsistenciesRule(),
-    HasGuardPageAccessRule(),
-    MajorVersionRule(),
-    PluginRule(),
-    AccessibilityRule(),
-    AddonsRule(),
-    DatesAndTimesRule(),
-    OutOfMemoryBinaryRule(),
-    PHCRule(),
-    BreadcrumbsRule(schema=get_schema("processed_crash.schema.yaml")),
-    JavaStackTraceRule(),
-    MacBootArgsRule(),
-    MacCrashInfoRule(),
-    MozCrashReasonRule(),
-    UtilityActorsNameRule(),
-    ReportTypeRule(),
-    # post processing of the processed crash
-    CPUInfoRule(),
-    AndroidCPUInfoRule(),
-    DistributionIdRule(),
-    OSInfoRule(),
-    AndroidOSInfoRule(),
-    BetaVersionRule(
-        version_string_api=settings.BETAVERSIONRULE_VERSION_STRING_API,
-    ),
-    OSPrettyVersionRule(),
-    TopMostFilesRule(),
-    ModulesInStackRule(),
-    MissingSymbolsRule(),
-    ThemePrettyNameRule(),
-    MemoryReportExtraction(),
-    # generate signature now that we've done all the processing it depends on
-    SignatureGeneratorRule(),
-]
+def build_stackwalk_cache():
+    """Build the configured stackwalker output cache or None if it's disabled."""
+    if not settings.STACKWALK_CACHE_BACKEND:
+        return None
+    return build_instance_from_settings(
+        settings.STACKWALK_CACHE_BACKENDS[settings.STACKWALK_CACHE_BACKEND]
+    )
 
 
-REGENERATE_SIGNATURE_RULESET = [
-    SignatureGeneratorRule(),
-]
+# The default ruleset regenerates everything but the processing history, so that's all
+# it needs from the previous processed crash
+DEFAULT_RULESET = Ruleset(
+    processed_crash_fields=["processor_history", "processor_notes"],
+    rules=[
+        # fix the raw crash removing null characters and Nones
+        DeNullRule(),
+        DeNoneRule(),
+        # capture collector things
+        CrashReportKeysRule(),
+        CollectorMetadataRule(),
+        # fix ModuleSignatureInfo if it needs fixing
+        ConvertModuleSignatureInfoRule(),
+        # rules to transform a raw crash into a processed crash
+        CopyFromRawCrashRule(schema=get_schema("processed_crash.schema.yaml")),
+        FenixVersionRewriteRule(),
+        ESRVersionRewrite(),
+        SubmittedFromRule(),
+        IdentifierRule(),
+        MinidumpSha256HashRule(),
+        MinidumpStackwalkRule(
+            dump_field=settings.STACKWALKER["dump_field"],
+            symbols_urls=settings.STACKWALKER["symbols_urls"],
+            command_line=settings.STACKWALKER["command_line"],
+            command_path=settings.STACKWALKER["command_path"],
+            kill_timeout=settings.STACKWALKER["kill_timeout"],
+            symbol_cache_path=settings.STACKWALKER["symbol_cache_path"],
+            symbol_tmp_path=settings.STACKWALKER["symbol_tmp_path"],
+            max_concurrent_stackwalkers=settings.STACKWALKER[
+                "max_concurrent_stackwalkers"
+            ],
+            stackwalk_cache=build_stackwalk_cache(),
+            server_command=settings.STACKWALKER["server_command"],
+        ),
+        ModuleURLRewriteRule(),
+        CrashingThreadInfoRule(),
+        TruncateStacksRule(),
+        PossibleBitFlipsRule(),
+        CrashInconsistenciesRule(),
+        HasGuardPageAccessRule(),
+        MajorVersionRule(),
+        PluginRule(),
+        AccessibilityRule(),
+        AddonsRule(),
+        DatesAndTimesRule(),
+        OutOfMemoryBinaryRule(),
+        PHCRule(),
+        BreadcrumbsRule(schema=get_schema("processed_crash.schema.yaml")),
+        JavaStackTraceRule(),
+        MacBootArgsRule(),
+        MacCrashInfoRule(),
+        MozCrashReasonRule(),
+        UtilityActorsNameRule(),
+        ReportTypeRule(),
+        # post processing of the processed crash
+        CPUInfoRule(),
+        AndroidCPUInfoRule(),
+        DistributionIdRule(),
+        OSInfoRule(),
+        AndroidOSInfoRule(),
+        BetaVersionRule(
+            version_string_api=settings.BETAVERSIONRULE_VERSION_STRING_API,
+        ),
+        OSPrettyVersionRule(),
+        TopMostFilesRule(),
+        ModulesInStackRule(),
+        MissingSymbolsRule(),
+        ThemePrettyNameRule(),
+        MemoryReportExtraction(),
+        # generate signature now that we've done all the processing it depends on
+        SignatureGeneratorRule(),
+    ],
+)
+
+
+# Regenerating the signature saves the previous processed crash with a new signature,
+# so this ruleset needs all of it. It doesn't need the dumps and the processed crash is
+# only saved if the signature changed.
+REGENERATE_SIGNATURE_RULESET = Ruleset(
+    processed_crash_fields=None,
+    needs_dumps=False,
+    updated_fields=["signature", "proto_signature", "signature_debug"],
+    rules=[
+        SignatureGeneratorRule(),
+    ],
+)
 
 
 RULESETS = {
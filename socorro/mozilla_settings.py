@@ -81,14 +81,30 @@ STATSD_PORT = _config("STATSD_PORT", default="8125", parser=int, doc="statsd por
 # Processor configuration
 PROCESSOR = {
     "task_manager": {
-        "class": "socorro.lib.threaded_task_manager.ThreadedTaskManager",
+        "class": _config(
+            "PROCESSOR_TASK_MANAGER_CLASS",
+            default="socorro.lib.threaded_task_manager.ThreadedTaskManager",
+            doc=(
+                "Python dotted path to the task manager class for the processor. "
+                "``socorro.lib.threaded_task_manager.ThreadedTaskManager`` processes "
+                "crash reports in worker threads. "
+                "``socorro.lib.process_pool_task_manager.ProcessPoolTaskManager`` "
+                "processes crash reports in worker processes. "
+                "``socorro.lib.asyncio_task_manager.AsyncioTaskManager`` processes "
+                "crash reports in an asyncio event loop overlapping fetching, "
+                "processing, and saving."
+            ),
+        ),
         "options": {
             "idle_delay": 7,
             "number_of_threads": _config(
                 "PROCESSOR_NUMBER_OF_THREADS",
                 default="4",
                 parser=or_none(int),
-                doc="Number of worker threads for the processor.",
+                doc=(
+                    "Number of workers for the processor. These are threads or "
+                    "processes depending on the task manager class."
+                ),
             ),
             "maximum_queue_size": _config(
                 "PROCESSOR_MAXIMUM_QUEUE_SIZE",
@@ -96,6 +112,43 @@ PROCESSOR = {
                 parser=or_none(int),
                 doc="Number of items to queue up from the processing queues.",
             ),
+            "reserved_priority_threads": _config(
+                "PROCESSOR_RESERVED_PRIORITY_THREADS",
+                default="0",
+                parser=or_none(int),
+                doc=(
+                    "Number of workers that only process crashes from the priority "
+                    "queue. Must be less than the number of workers. Ignored by the "
+                    "AsyncioTaskManager."
+                ),
+            ),
+            "min_number_of_threads": _config(
+                "PROCESSOR_MIN_NUMBER_OF_THREADS",
+                default="",
+                parser=or_none(int),
+                doc=(
+                    "If set, the processor adjusts the number of active workers "
+                    "between this and PROCESSOR_NUMBER_OF_THREADS based on CPU "
+                    "utilization, queue depth, stackwalker time, and save latency. "
+                    "Must be more than PROCESSOR_RESERVED_PRIORITY_THREADS. Ignored "
+                    "by the AsyncioTaskManager."
+                ),
+            ),
+            "concurrency_interval": _config(
+                "PROCESSOR_CONCURRENCY_INTERVAL",
+                default="30",
+                parser=int,
+                doc="Seconds between adjustments to the number of active workers.",
+            ),
+            "target_cpu_utilization": _config(
+                "PROCESSOR_TARGET_CPU_UTILIZATION",
+                default="0.8",
+                parser=float,
+                doc=(
+                    "Fraction of all CPUs above which the processor reduces the "
+                    "number of active workers."
+                ),
+            ),
         },
     },
     "pipeline": {
@@ -105,6 +158,16 @@ PROCESSOR = {
             "hostname": HOSTNAME,
         },
     },
+    "destination_max_workers": _config(
+        "PROCESSOR_DESTINATION_MAX_WORKERS",
+        default="",
+        parser=or_none(int),
+        doc=(
+            "Maximum number of threads for saving processed crashes to crash storage "
+            "destinations concurrently. Defaults to the number of workers times the "
+            "number of crash storage destinations."
+        ),
+    ),
     "temporary_path": _config(
         "PROCESSOR_TEMPORARY_PATH",
         default=tempfile.gettempdir(),
@@ -151,6 +214,57 @@ QUEUE_PUBSUB = {
             default="reprocessing-queue",
             doc="Subscription name for the reprocessing queue.",
         ),
+        "ack_batch_size": _config(
+            "PUBSUB_ACK_BATCH_SIZE",
+            default="1",
+            parser=int,
+            doc=(
+                "Maximum number of acknowledgements to send in a single request. Set "
+                "to 1 to acknowledge each crash report as soon as it's processed. "
+                "Ignored when streaming pull is enabled."
+            ),
+        ),
+        "ack_batch_max_age": _config(
+            "PUBSUB_ACK_BATCH_MAX_AGE",
+            default="1",
+            parser=float,
+            doc=(
+                "Maximum time in seconds an acknowledgement waits for its batch to "
+                "fill up before it's sent."
+            ),
+        ),
+        "streaming_pull": _config(
+            "PUBSUB_STREAMING_PULL",
+            default="false",
+            parser=bool,
+            doc=(
+                "Whether to use streaming pull to receive crash ids. Streaming pull "
+                "batches acknowledgements and extends ack deadlines for crash reports "
+                "that take a long time to process."
+            ),
+        ),
+        "streaming_max_messages": _config(
+            "PUBSUB_STREAMING_MAX_MESSAGES",
+            default=str(
+                (PROCESSOR["task_manager"]["options"]["number_of_threads"] or 4)
+                + (PROCESSOR["task_manager"]["options"]["maximum_queue_size"] or 8)
+            ),
+            parser=int,
+            doc=(
+                "Maximum number of unacknowledged messages to hold per subscription "
+                "when streaming. Defaults to the number of processor workers plus the "
+                "processor queue size."
+            ),
+        ),
+        "streaming_max_lease_duration": _config(
+            "PUBSUB_STREAMING_MAX_LEASE_DURATION",
+            default="3600",
+            parser=int,
+            doc=(
+                "Maximum time in seconds to keep extending the ack deadline of a "
+                "message that hasn't been acknowledged when streaming."
+            ),
+        ),
     },
 }
 
@@ -164,6 +278,15 @@ GCS_STORAGE = {
             default="",
             doc="GCS bucket name for crash report data.",
         ),
+        "download_max_workers": _config(
+            "CRASHSTORAGE_GCS_DOWNLOAD_MAX_WORKERS",
+            default="4",
+            parser=int,
+            doc=(
+                "Maximum number of dumps the processor downloads from GCS at once "
+                "across all workers."
+            ),
+        ),
     },
 }
 
@@ -187,6 +310,24 @@ LEGACY_ES_STORAGE = {
             alternate_keys=["ELASTICSEARCH_URL"],
             doc="Elasticsearch url.",
         ),
+        "pool_maxsize": _config(
+            "ELASTICSEARCH_POOL_MAXSIZE",
+            default="10",
+            parser=int,
+            doc=(
+                "Maximum number of connections to each Elasticsearch node per "
+                "process. Requests wait for a free connection when they're all in use."
+            ),
+        ),
+        "keep_alive": _config(
+            "ELASTICSEARCH_KEEP_ALIVE",
+            default="60",
+            parser=int,
+            doc=(
+                "Seconds an Elasticsearch connection is idle before TCP keep-alive "
+                "probes are sent. Set to 0 to disable TCP keep-alive."
+            ),
+        ),
     },
 }
 
@@ -234,6 +375,60 @@ elif ELASTICSEARCH_MODE == "PREFER_NEW":
                 "ELASTICSEARCH_URL",
                 doc="Elasticsearch url.",
             ),
+            "pool_maxsize": _config(
+                "ELASTICSEARCH_POOL_MAXSIZE",
+                default="10",
+                parser=int,
+                doc=(
+                    "Maximum number of connections to each Elasticsearch node per "
+                    "process. Requests wait for a free connection when they're all "
+                    "in use."
+                ),
+            ),
+            "keep_alive": _config(
+                "ELASTICSEARCH_KEEP_ALIVE",
+                default="60",
+                parser=int,
+                doc=(
+                    "Seconds an Elasticsearch connection is idle before TCP keep-alive "
+                    "probes are sent. Set to 0 to disable TCP keep-alive."
+                ),
+            ),
+            "bulk_max_documents": _config(
+                "ELASTICSEARCH_BULK_MAX_DOCUMENTS",
+                default="0",
+                parser=int,
+                doc=(
+                    "Maximum number of crash documents to index in a single _bulk "
+                    "request. Set to 0 to index crash documents one at a time."
+                ),
+            ),
+            "bulk_max_bytes": _config(
+                "ELASTICSEARCH_BULK_MAX_BYTES",
+                default="5mb",
+                parser=parse_data_size,
+                doc="Maximum size of a _bulk request.",
+            ),
+            "bulk_max_age": _config(
+                "ELASTICSEARCH_BULK_MAX_AGE",
+                default="1",
+                parser=float,
+                doc=(
+                    "Maximum time in seconds a crash document waits for a _bulk "
+                    "request to fill up before it's sent."
+                ),
+            ),
+            "bulk_linger": _config(
+                "ELASTICSEARCH_BULK_LINGER",
+                default="0.05",
+                parser=float,
+                doc=(
+                    "Time in seconds without new crash documents after which a _bulk "
+                    "request is sent. Processor workers wait for their crash "
+                    "document to be indexed, so a _bulk request can't hold more "
+                    "crash documents than there are workers."
+                ),
+            ),
         },
     }
 
@@ -324,6 +519,28 @@ STACKWALKER = {
         parser=or_none(parse_time_period),
         doc="Timeout in seconds before the stackwalker is killed.",
     ),
+    "max_concurrent_stackwalkers": _config(
+        "STACKWALKER_MAX_CONCURRENT",
+        default="",
+        parser=or_none(int),
+        doc=(
+            "Maximum number of stackwalker processes to run at once per processor "
+            "process. Minidumps in a crash report with multiple minidumps are "
+            "stackwalked at once within this bound. Defaults to the number of CPUs."
+        ),
+    ),
+    "server_command": _config(
+        "STACKWALKER_SERVER_COMMAND",
+        default="",
+        doc=(
+            "Command line to start a long-lived stackwalker server. ``{command_path}`` "
+            "is replaced with the stackwalker command path. If set, minidumps are "
+            "sent to stackwalker servers instead of starting a stackwalker process "
+            "for each minidump. See ``socorro.processor.stackwalker_pool`` for the "
+            "protocol and ``bin/stackwalker_server.py`` for a server that wraps "
+            "minidump-stackwalk."
+        ),
+    ),
     "symbols_urls": _config(
         "STACKWALKER_SYMBOLS_URLS",
         default="",
@@ -338,6 +555,53 @@ STACKWALKER = {
     ),
 }
 
+# Stackwalker output cache configuration
+STACKWALK_CACHE_BACKEND = _config(
+    "STACKWALK_CACHE_BACKEND",
+    default="",
+    doc=(
+        "Cache for stackwalker output used when reprocessing crash reports. One of "
+        "``disk``, ``gcs``, or empty to disable caching."
+    ),
+)
+STACKWALK_CACHE_BACKENDS = {
+    "disk": {
+        "class": "socorro.processor.stackwalk_cache.DiskStackwalkCache",
+        "options": {
+            "path": _config(
+                "STACKWALK_CACHE_PATH",
+                default=os.path.join(tempfile.gettempdir(), "stackwalk_cache"),
+                doc=(
+                    "Directory to use for the on-disk stackwalker output cache. This "
+                    "must be different from the symbols cache directory."
+                ),
+            ),
+            "max_size": _config(
+                "STACKWALK_CACHE_MAX_SIZE",
+                default="1gb",
+                parser=parse_data_size,
+                doc=(
+                    "Max size (bytes) of the on-disk stackwalker output cache. You "
+                    "can use units like kb, mb, gb, tb, etc."
+                ),
+            ),
+        },
+    },
+    "gcs": {
+        "class": "socorro.processor.stackwalk_cache.GcsStackwalkCache",
+        "options": {
+            "bucket": _config(
+                "STACKWALK_CACHE_GCS_BUCKET",
+                default="",
+                doc=(
+                    "GCS bucket for the stackwalker output cache. Entries should be "
+                    "expired with a bucket lifecycle rule."
+                ),
+            ),
+        },
+    },
+}
+
 
 # BetaVersionRule configuration
 BETAVERSIONRULE_VERSION_STRING_API = _config(
@@ -9,6 +9,8 @@ The rules are applied one at a time, each doing some small part of the transform
 process.
 """
 
+import asyncio
+import itertools
 import logging
 from typing import List
 
@@ -30,6 +32,60 @@ class Status:
         self.notes.extend(notes)
 
 
+# Fields the pipeline sets every time it processes a crash
+PIPELINE_FIELDS = (
+    "success",
+    "started_datetime",
+    "signature",
+    "processor_history",
+    "processor_notes",
+    "completed_datetime",
+)
+
+
+class Ruleset(list):
+    """List of rules along with what the rules need and change.
+
+    The pipeline starts with the processed crash from the last time the crash report
+    was processed. Most rules overwrite what's there, so the processor only fetches
+    the parts of the previous processed crash the ruleset declares it needs.
+
+    Rulesets that only change a few fields can say which ones. The processor saves
+    the processed crash only if one of those changed and destinations that can
+    update part of a stored processed crash only update those fields and
+    ``PIPELINE_FIELDS``.
+
+    Plain lists of rules need the whole previous processed crash and the dumps and
+    save the whole processed crash.
+
+    """
+
+    def __init__(
+        self,
+        rules=(),
+        processed_crash_fields=None,
+        needs_dumps=True,
+        updated_fields=None,
+    ):
+        """
+        :arg rules: the rules to run in order
+        :arg processed_crash_fields: None if the ruleset needs the whole previous
+            processed crash, otherwise a list of the top-level fields it needs; an
+            empty list means the previous processed crash isn't needed at all
+        :arg needs_dumps: whether the ruleset needs the dumps
+        :arg updated_fields: None if the ruleset saves the whole processed crash,
+            otherwise a list of the top-level fields it changes
+        """
+        super().__init__(rules)
+        if processed_crash_fields is not None:
+            processed_crash_fields = tuple(processed_crash_fields)
+        self.processed_crash_fields = processed_crash_fields
+        self.needs_dumps = needs_dumps
+        if updated_fields is not None:
+            updated_fields = tuple(updated_fields)
+        self.updated_fields = updated_fields
+
+
 class Pipeline:
     """Processor pipeline for Mozilla crash ingestion."""
 
@@ -55,6 +111,23 @@ class Pipeline:
             for rule in ruleset:
                 self.logger.info("Loaded rule: %r", rule)
 
+    def get_ruleset(self, ruleset_name):
+        """Returns the Ruleset for a ruleset name.
+
+        Plain lists of rules and unknown rulesets get a Ruleset with the defaults.
+        Unknown rulesets still save the processed crash they're given, so they need
+        all of it.
+
+        :arg ruleset_name: the name of the ruleset
+
+        :returns: Ruleset
+
+        """
+        ruleset = self.rulesets.get(ruleset_name, [])
+        if not isinstance(ruleset, Ruleset):
+            ruleset = Ruleset(rules=ruleset)
+        return ruleset
+
     def process_crash(self, ruleset_name, raw_crash, dumps, processed_crash, tmpdir):
         """Process a crash
 
@@ -68,25 +141,23 @@ class Pipeline:
         # Used for keeping track of processing notes we should save later
         status = Status()
 
-        processed_crash["success"] = False
-        start_time = utc_now()
-        processed_crash["started_datetime"] = date_to_string(start_time)
-
-        status.add_note(f">>> Start processing: {start_time} ({self.hostname})")
-
-        processed_crash["signature"] = "EMPTY: crash failed to process"
-
-        crash_id = raw_crash["uuid"]
-
-        ruleset = self.rulesets.get(ruleset_name)
+        ruleset = self.start_processing(
+            ruleset_name, raw_crash, processed_crash, status
+        )
         if ruleset is None:
-            status.add_note(f"error: no ruleset: {ruleset_name}")
             return processed_crash
 
-        self.logger.info("processing with %s for crash %s", ruleset_name, crash_id)
+        self.apply_rules(
+            ruleset_name, ruleset, raw_crash, dumps, processed_crash, tmpdir, status
+        )
 
-        # Apply rules; if a rule fails, capture the error and continue onward
-        for rule in ruleset:
+        return self.finish_processing(raw_crash, processed_crash, status)
+
+    def apply_rules(
+        self, ruleset_name, rules, raw_crash, dumps, processed_crash, tmpdir, status
+    ):
+        """Apply rules; if a rule fails, capture the error and continue onward"""
+        for rule in rules:
             with sentry_sdk.new_scope() as scope:
                 scope.set_context("processor_pipeline", {"rule": rule.name})
 
@@ -100,21 +171,108 @@ class Pipeline:
                     )
 
                 except Exception as exc:
-                    sentry_sdk.capture_exception(exc)
+                    self.rule_failed(ruleset_name, rule, raw_crash, status, exc)
 
-                    self.logger.exception(
-                        "error: crash id %s: rule %s: %r",
-                        crash_id,
-                        rule.name,
-                        exc,
-                    )
+    async def process_crash_async(
+        self, ruleset_name, raw_crash, dumps, processed_crash, tmpdir
+    ):
+        """Async version of ``process_crash`` for running in an event loop
 
-                    # NOTE(willkg): notes are public, so we can't put exception
-                    # messages in them
-                    status.add_note(
-                        f"ruleset {ruleset_name!r} rule {rule.name!r} failed: "
-                        f"{exc.__class__.__name__}"
-                    )
+        Rules with ``async_action`` set run with ``Rule.act_async`` in the event loop,
+        so rules that wait on subprocesses don't take up a thread while they wait.
+        Runs of other rules run in the event loop's executor so CPU-bound rules don't
+        block fetching and saving other crashes.
+
+        """
+        # Used for keeping track of processing notes we should save later
+        status = Status()
+
+        ruleset = self.start_processing(
+            ruleset_name, raw_crash, processed_crash, status
+        )
+        if ruleset is None:
+            return processed_crash
+
+        for async_action, rules in itertools.groupby(
+            ruleset, key=lambda rule: rule.async_action
+        ):
+            if not async_action:
+                await asyncio.to_thread(
+                    self.apply_rules,
+                    ruleset_name,
+                    list(rules),
+                    raw_crash,
+                    dumps,
+                    processed_crash,
+                    tmpdir,
+                    status,
+                )
+                continue
+
+            # Apply rules; if a rule fails, capture the error and continue onward
+            for rule in rules:
+                with sentry_sdk.new_scope() as scope:
+                    scope.set_context("processor_pipeline", {"rule": rule.name})
+
+                    try:
+                        await rule.act_async(
+                            raw_crash=raw_crash,
+                            dumps=dumps,
+                            processed_crash=processed_crash,
+                            tmpdir=tmpdir,
+                            status=status,
+                        )
+
+                    except Exception as exc:
+                        self.rule_failed(ruleset_name, rule, raw_crash, status, exc)
+
+        return self.finish_processing(raw_crash, processed_crash, status)
+
+    def start_processing(self, ruleset_name, raw_crash, processed_crash, status):
+        """Set up the processed crash for processing
+
+        :returns: the ruleset or None if there's no ruleset with that name
+
+        """
+        processed_crash["success"] = False
+        start_time = utc_now()
+        processed_crash["started_datetime"] = date_to_string(start_time)
+
+        status.add_note(f">>> Start processing: {start_time} ({self.hostname})")
+
+        processed_crash["signature"] = "EMPTY: crash failed to process"
+
+        crash_id = raw_crash["uuid"]
+
+        ruleset = self.rulesets.get(ruleset_name)
+        if ruleset is None:
+            status.add_note(f"error: no ruleset: {ruleset_name}")
+            return None
+
+        self.logger.info("processing with %s for crash %s", ruleset_name, crash_id)
+        return ruleset
+
+    def rule_failed(self, ruleset_name, rule, raw_crash, status, exc):
+        """Capture and note an error from a rule; called in the except block"""
+        sentry_sdk.capture_exception(exc)
+
+        self.logger.exception(
+            "error: crash id %s: rule %s: %r",
+            raw_crash["uuid"],
+            rule.name,
+            exc,
+        )
+
+        # NOTE(willkg): notes are public, so we can't put exception
+        # messages in them
+        status.add_note(
+            f"ruleset {ruleset_name!r} rule {rule.name!r} failed: "
+            f"{exc.__class__.__name__}"
+        )
+
+    def finish_processing(self, raw_crash, processed_crash, status):
+        """Finish the processed crash after the rules have run"""
+        crash_id = raw_crash["uuid"]
 
         # The crash made it through the processor rules with no exceptions raised, call
         # it a success
@@ -16,11 +16,15 @@ It uses a fetch/transform/save model.
 
 """
 
+import asyncio
+import concurrent.futures
+import copy
 from contextlib import suppress
 from functools import partial
 import logging
 import os
 from pathlib import Path
+import shutil
 import signal
 import tempfile
 import time
@@ -37,18 +41,186 @@ from sentry_sdk.integrations.threading import ThreadingIntegration
 
 from socorro import settings
 from socorro.external.crashstorage_base import CrashIDNotFound
-from socorro.libclass import build_instance, build_instance_from_settings
+from socorro.libclass import build_instance_from_settings, import_class
 from socorro.libmarkus import set_up_metrics, METRICS
+from socorro.lib.concurrency_controller import SAVE_SIGNAL, WORKLOAD_SIGNALS
 from socorro.lib.libdatetime import isoformat_to_time
 from socorro.lib.libdockerflow import get_release_name, get_version_info
 from socorro.lib.liblogging import set_up_logging
 from socorro.lib.task_manager import respond_to_SIGTERM
+from socorro.processor.pipeline import PIPELINE_FIELDS
 
 
 def count_sentry_scrub_error(msg):
     METRICS.incr("sentry_scrub_error", value=1, tags=["service:processor"])
 
 
+def get_updated_values(ruleset, processed_crash):
+    """Returns copies of the values of the fields a ruleset updates.
+
+    :arg ruleset: the Ruleset
+    :arg processed_crash: the processed crash before processing
+
+    :returns: dict of field to value or None if the ruleset saves the whole
+        processed crash
+
+    """
+    if ruleset.updated_fields is None:
+        return None
+    return {
+        key: copy.deepcopy(processed_crash.get(key)) for key in ruleset.updated_fields
+    }
+
+
+def get_fields_to_save(ruleset, previous_values, processed_crash):
+    """Returns which fields of a processed crash to save.
+
+    :arg ruleset: the Ruleset
+    :arg previous_values: the result of ``get_updated_values`` before processing
+    :arg processed_crash: the processed crash after processing
+
+    :returns: None to save the whole processed crash, an empty tuple if nothing
+        changed, or a tuple of the fields to save
+
+    """
+    if previous_values is None:
+        return None
+    if all(processed_crash.get(key) == value for key, value in previous_values.items()):
+        return ()
+    return PIPELINE_FIELDS + tuple(
+        key for key in ruleset.updated_fields if key not in PIPELINE_FIELDS
+    )
+
+
+class DestinationDispatcher:
+    """Saves processed crashes to all crash storage destinations concurrently.
+
+    Saves run on a thread pool shared by all the processor workers, so the time it
+    takes to save a crash is the time of the slowest destination rather than the sum
+    of all of them. The pool is bounded by ``max_workers``.
+
+    If saving to any destination fails, saving the crash fails.
+
+    """
+
+    def __init__(self, destinations, max_workers):
+        """
+        :arg destinations: list of crash storage destinations; each must have a
+            ``crash_destination_name`` attribute
+        :arg max_workers: maximum number of threads to use for saving
+        """
+        self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.destinations = destinations
+        self.max_workers = max_workers
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="destination"
+        )
+
+    def save_to_destination(
+        self, dest, crash_id, raw_crash, processed_crash, fields=None
+    ):
+        """Save processed crash to a single crash storage destination.
+
+        :arg dest: the crash storage destination
+        :arg crash_id: the crash id of the crash report
+        :arg raw_crash: the raw crash data
+        :arg processed_crash: the processed crash data
+        :arg fields: None to save the whole processed crash or a list of the fields
+            that changed
+
+        :raises Exception: re-raises any exception from the destination
+
+        """
+        dest_name = dest.crash_destination_name
+        try:
+            with METRICS.timer(f"processor.{dest_name}.save_processed_crash"):
+                if fields is None:
+                    dest.save_processed_crash(raw_crash, processed_crash)
+                else:
+                    dest.update_processed_crash(raw_crash, processed_crash, fields)
+        except Exception as storage_error:
+            METRICS.incr(
+                "processor.save_processed_crash_error",
+                tags=[f"destination:{dest_name}"],
+            )
+            self.logger.error(
+                "error: crash id %s: %r (%s)",
+                crash_id,
+                storage_error,
+                dest_name,
+            )
+            # Re-raise the original exception with the correct traceback
+            raise
+
+    def _raise_first_error(self, futures):
+        # Raise the error from the first failed destination in destination order
+        for future in futures:
+            exc = future.exception()
+            if exc is not None:
+                raise exc
+
+    def save(self, crash_id, raw_crash, processed_crash, fields=None):
+        """Save processed crash to all destinations and wait for all saves to finish.
+
+        :arg crash_id: the crash id of the crash report
+        :arg raw_crash: the raw crash data
+        :arg processed_crash: the processed crash data
+        :arg fields: None to save the whole processed crash or a list of the fields
+            that changed
+
+        :raises Exception: the exception from the first destination that failed
+
+        """
+        start_time = time.perf_counter()
+        try:
+            if len(self.destinations) == 1:
+                self.save_to_destination(
+                    self.destinations[0], crash_id, raw_crash, processed_crash, fields
+                )
+                return
+
+            futures = [
+                self.executor.submit(
+                    self.save_to_destination,
+                    dest,
+                    crash_id,
+                    raw_crash,
+                    processed_crash,
+                    fields,
+                )
+                for dest in self.destinations
+            ]
+            concurrent.futures.wait(futures)
+            self._raise_first_error(futures)
+        finally:
+            WORKLOAD_SIGNALS.record(SAVE_SIGNAL, time.perf_counter() - start_time)
+
+    async def save_async(self, crash_id, raw_crash, processed_crash, fields=None):
+        """Async version of ``save``."""
+        loop = asyncio.get_running_loop()
+        start_time = time.perf_counter()
+        try:
+            futures = [
+                loop.run_in_executor(
+                    self.executor,
+                    self.save_to_destination,
+                    dest,
+                    crash_id,
+                    raw_crash,
+                    processed_crash,
+                    fields,
+                )
+                for dest in self.destinations
+            ]
+            await asyncio.wait(futures)
+            self._raise_first_error(futures)
+        finally:
+            WORKLOAD_SIGNALS.record(SAVE_SIGNAL, time.perf_counter() - start_time)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
 class ProcessorApp:
     """App that transforms raw crashes into processed crashes."""
 
@@ -171,23 +343,81 @@ class ProcessorApp:
         """
         self.logger.info("starting %s with %s", crash_id, ruleset_name)
 
+        ruleset = self.pipeline.get_ruleset(ruleset_name)
+        crash_data = self.fetch_crash(
+            crash_id,
+            tmpdir,
+            processed_crash_fields=ruleset.processed_crash_fields,
+            fetch_dumps=ruleset.needs_dumps,
+        )
+        if crash_data is None:
+            return
+        raw_crash, dumps, processed_crash, new_crash = crash_data
+        previous_values = get_updated_values(ruleset, processed_crash)
+
+        # Process the crash to generate a processed crash
+        self.logger.debug("processing %s", crash_id)
+        processed_crash = self.pipeline.process_crash(
+            ruleset_name=ruleset_name,
+            raw_crash=raw_crash,
+            dumps=dumps,
+            processed_crash=processed_crash,
+            tmpdir=tmpdir,
+        )
+
+        fields = get_fields_to_save(ruleset, previous_values, processed_crash)
+        if fields == ():
+            self.skip_crash(crash_id, ruleset_name)
+            return
+
+        # Save data to crash storage destinations
+        self.logger.debug("saving %s", crash_id)
+        self.dispatcher.save(crash_id, raw_crash, processed_crash, fields=fields)
+
+        self.finish_crash(crash_id, ruleset_name, raw_crash, new_crash)
+
+    def fetch_crash(
+        self, crash_id, tmpdir, processed_crash_fields=None, fetch_dumps=True
+    ):
+        """Fetch crash data from the crash storage source.
+
+        If the raw crash can't be fetched, this rejects the crash and returns None.
+
+        :arg crash_id: the crash id of the crash report to fetch
+        :arg tmpdir: the temporary directory to save dumps to
+        :arg processed_crash_fields: None to fetch the whole previous processed crash
+            or a list of the top-level fields to keep; if the list is empty, the
+            previous processed crash isn't fetched and ``new_crash`` is None
+        :arg fetch_dumps: whether to fetch the dumps; if False, ``dumps`` is empty
+
+        :returns: ``(raw_crash, dumps, processed_crash, new_crash)`` tuple or None
+
+        """
         self.logger.debug("fetching data %s", crash_id)
         # Fetch crash annotations and dumps
         try:
             raw_crash = self.source.get_raw_crash(crash_id)
-            dumps = self.source.get_dumps_as_files(crash_id, tmpdir)
+            if fetch_dumps:
+                dumps = self.source.get_dumps_as_files(crash_id, tmpdir)
+            else:
+                dumps = {}
         except CrashIDNotFound:
             # If the crash isn't found, we just reject it--no need to capture
             # errors here
             self.pipeline.reject_raw_crash(
                 crash_id, "crash cannot be found in raw crash storage"
             )
-            return
+            return None
         except Exception as exc:
             sentry_sdk.capture_exception(exc)
             self.logger.exception("error: crash id %s: %r", crash_id, exc)
             self.pipeline.reject_raw_crash(crash_id, f"error in loading: {exc}")
-            return
+            return None
+
+        if processed_crash_fields is not None and not processed_crash_fields:
+            # The ruleset doesn't need anything from the previous processed crash, so
+            # don't fetch it
+            return raw_crash, dumps, {}, None
 
         # Fetch processed crash data--there won't be any if this crash hasn't
         # been processed, yet
@@ -198,34 +428,28 @@ class ProcessorApp:
             new_crash = True
             processed_crash = {}
 
-        # Process the crash to generate a processed crash
-        self.logger.debug("processing %s", crash_id)
-        processed_crash = self.pipeline.process_crash(
-            ruleset_name=ruleset_name,
-            raw_crash=raw_crash,
-            dumps=dumps,
-            processed_crash=processed_crash,
-            tmpdir=tmpdir,
+        if processed_crash_fields is not None:
+            # Drop what the ruleset doesn't need so it's not carried through
+            # processing or saved
+            processed_crash = {
+                key: processed_crash[key]
+                for key in processed_crash_fields
+                if key in processed_crash
+            }
+
+        return raw_crash, dumps, processed_crash, new_crash
+
+    def skip_crash(self, crash_id, ruleset_name):
+        """Emit metrics and log for a crash that didn't change and wasn't saved."""
+        METRICS.incr(
+            "processor.save_processed_crash_unchanged", tags=[f"ruleset:{ruleset_name}"]
         )
 
-        # Save data to crash storage destinations
-        self.logger.debug("saving %s", crash_id)
-        for dest in self.destinations:
-            try:
-                with METRICS.timer(
-                    f"processor.{dest.crash_destination_name}.save_processed_crash"
-                ):
-                    dest.save_processed_crash(raw_crash, processed_crash)
-            except Exception as storage_error:
-                self.logger.error(
-                    "error: crash id %s: %r (%s)",
-                    crash_id,
-                    storage_error,
-                    dest.crash_destination_name,
-                )
-                # Re-raise the original exception with the correct traceback
-                raise
+        self.logger.info("unchanged %s", crash_id)
+        self.logger.info("completed %s", crash_id)
 
+    def finish_crash(self, crash_id, ruleset_name, raw_crash, new_crash):
+        """Emit metrics and log after a crash has been saved to all destinations."""
         METRICS.incr("processor.save_processed_crash")
 
         self.logger.info("saved %s", crash_id)
@@ -243,6 +467,99 @@ class ProcessorApp:
 
         self.logger.info("completed %s", crash_id)
 
+    async def transform_async(self, task, finished_func=(lambda: None)):
+        """Async version of ``transform`` for use with AsyncioTaskManager."""
+        try:
+            if ":" in task:
+                crash_id, ruleset_name = task.split(":", 1)
+            else:
+                crash_id, ruleset_name = task, "default"
+
+            with METRICS.timer(
+                "processor.process_crash", tags=[f"ruleset:{ruleset_name}"]
+            ):
+                with sentry_sdk.new_scope() as scope:
+                    scope.set_context(
+                        "processor",
+                        {
+                            "crash_id": crash_id,
+                            "ruleset": ruleset_name,
+                        },
+                    )
+
+                    tmpdir = await asyncio.to_thread(
+                        tempfile.mkdtemp, dir=self.temporary_path
+                    )
+                    try:
+                        await self.process_crash_async(
+                            crash_id=crash_id,
+                            ruleset_name=ruleset_name,
+                            tmpdir=tmpdir,
+                        )
+                    finally:
+                        await asyncio.to_thread(
+                            shutil.rmtree, tmpdir, ignore_errors=True
+                        )
+
+        finally:
+            # See transform--finished_func needs to get called no matter what
+            try:
+                finished_func()
+            except Exception:
+                self.logger.exception("Error calling finishing_func() on %s", task)
+
+    async def process_crash_async(self, crash_id, ruleset_name, tmpdir):
+        """Async version of ``process_crash`` that overlaps processing stages.
+
+        Fetching and saving run in executor threads and don't hold a pipeline slot,
+        so fetching the next crash overlaps running the pipeline (and the
+        stackwalker) for this one. The pipeline runs rules in executor threads except
+        for the stackwalker, which runs as an asyncio subprocess. Saves to all crash storage destinations
+        run concurrently; if any of them fails, the crash fails.
+
+        :arg crash_id: unique identifier for the crash report used to fetch the data and
+            save the processed data
+        :arg ruleset_name: the name of the ruleset to process the crash report with
+        :arg tmpdir: the temporary directory to use as a workspace
+
+        """
+        self.logger.info("starting %s with %s", crash_id, ruleset_name)
+
+        ruleset = self.pipeline.get_ruleset(ruleset_name)
+        crash_data = await asyncio.to_thread(
+            self.fetch_crash,
+            crash_id,
+            tmpdir,
+            processed_crash_fields=ruleset.processed_crash_fields,
+            fetch_dumps=ruleset.needs_dumps,
+        )
+        if crash_data is None:
+            return
+        raw_crash, dumps, processed_crash, new_crash = crash_data
+        previous_values = get_updated_values(ruleset, processed_crash)
+
+        async with self.pipeline_slots:
+            self.logger.debug("processing %s", crash_id)
+            processed_crash = await self.pipeline.process_crash_async(
+                ruleset_name=ruleset_name,
+                raw_crash=raw_crash,
+                dumps=dumps,
+                processed_crash=processed_crash,
+                tmpdir=tmpdir,
+            )
+
+        fields = get_fields_to_save(ruleset, previous_values, processed_crash)
+        if fields == ():
+            self.skip_crash(crash_id, ruleset_name)
+            return
+
+        self.logger.debug("saving %s", crash_id)
+        await self.dispatcher.save_async(
+            crash_id, raw_crash, processed_crash, fields=fields
+        )
+
+        self.finish_crash(crash_id, ruleset_name, raw_crash, new_crash)
+
     def _set_up_source_and_destination(self):
         """Instantiate classes necessary for processing."""
         self.queue = build_instance_from_settings(settings.QUEUE)
@@ -254,6 +571,17 @@ class ProcessorApp:
             destinations.append(dest_obj)
         self.destinations = destinations
 
+        max_workers = settings.PROCESSOR.get("destination_max_workers")
+        if max_workers is None:
+            number_of_threads = (
+                settings.PROCESSOR["task_manager"]["options"].get("number_of_threads")
+                or 4
+            )
+            max_workers = number_of_threads * len(destinations)
+        self.dispatcher = DestinationDispatcher(
+            destinations=destinations, max_workers=max_workers
+        )
+
         self.pipeline = build_instance_from_settings(settings.PROCESSOR["pipeline"])
 
         self.temporary_path = settings.PROCESSOR["temporary_path"]
@@ -277,9 +605,17 @@ class ProcessorApp:
                 "task_func": self.transform,
             }
         )
-        self.task_manager = build_instance(
-            class_path=manager_class, kwargs=manager_settings
-        )
+        manager_cls = import_class(manager_class)
+        is_async = getattr(manager_cls, "async_task_func", False)
+        if is_async:
+            manager_settings["task_func"] = self.transform_async
+        self.task_manager = manager_cls(**manager_settings)
+
+        if is_async:
+            # Limits how many crashes can be in the pipeline stage at once; the task
+            # manager lets more crashes than that be in flight so fetching and saving
+            # overlap with running the pipeline
+            self.pipeline_slots = asyncio.Semaphore(self.task_manager.number_of_threads)
 
     def close(self):
         """Clean up the processor on shutdown."""
@@ -292,6 +628,9 @@ class ProcessorApp:
         with suppress(AttributeError):
             self.destination.close()
 
+        with suppress(AttributeError):
+            self.dispatcher.close()
+
         with suppress(AttributeError):
             self.pipeline.close()
 
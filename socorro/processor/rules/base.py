@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import asyncio
 import logging
 
 from socorro.libmarkus import METRICS
@@ -15,6 +16,11 @@ class Rule:
 
     """
 
+    # Whether ``action_async`` is overridden with a coroutine that waits on
+    # subprocesses or I/O without blocking. When the pipeline runs in an event loop,
+    # it runs other rules in the event loop's executor so they don't block it.
+    async_action = False
+
     def __init__(self):
         self.logger = logging.getLogger(self.name)
 
@@ -79,6 +85,58 @@ class Rule:
                     status=status,
                 )
 
+    async def act_async(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        """Async version of ``act`` for pipelines running in an event loop
+
+        :arg raw_crash: the raw crash data
+        :arg dumps: any minidumps associated with this crash
+        :arg processed_crash: the processed crash
+        :arg tmpdir: a temporary directory to use
+        :arg status: any notes or bookkeeping we need to keep about
+            processing as we process
+
+        """
+        class_name = self.__class__.__name__
+        with METRICS.timer("processor.rule.act.timing", tags=["rule:%s" % class_name]):
+            ret = self.predicate(
+                raw_crash=raw_crash,
+                dumps=dumps,
+                processed_crash=processed_crash,
+                tmpdir=tmpdir,
+                status=status,
+            )
+            if ret:
+                await self.action_async(
+                    raw_crash=raw_crash,
+                    dumps=dumps,
+                    processed_crash=processed_crash,
+                    tmpdir=tmpdir,
+                    status=status,
+                )
+
+    async def action_async(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        """Async version of ``action``
+
+        By default, this runs ``action`` in the event loop's executor. Rules that
+        wait on subprocesses or I/O override this and set ``async_action``.
+
+        :arg raw_crash: the raw crash data
+        :arg dumps: any minidumps associated with this crash
+        :arg processed_crash: the processed crash
+        :arg tmpdir: a temporary directory to use
+        :arg status: any notes or bookkeeping we need to keep about
+            processing as we process
+
+        """
+        kwargs = {
+            "raw_crash": raw_crash,
+            "dumps": dumps,
+            "processed_crash": processed_crash,
+            "tmpdir": tmpdir,
+            "status": status,
+        }
+        await asyncio.to_thread(self.action, **kwargs)
+
     def close(self):
         pass
 
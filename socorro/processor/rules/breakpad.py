@@ -2,16 +2,29 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import asyncio
 from collections.abc import Mapping
+import concurrent.futures
+import hashlib
 import json
 import logging
 import os
 import shlex
 import subprocess
+import threading
+import time
 
 import glom
 
+from socorro.lib import libjson
+from socorro.lib.concurrency_controller import STACKWALKER_SIGNAL, WORKLOAD_SIGNALS
 from socorro.libmarkus import METRICS
+from socorro.processor.pipeline import Status
+from socorro.processor.stackwalk_cache import build_stackwalk_cache_key
+from socorro.processor.stackwalker_pool import (
+    PersistentStackwalkerPool,
+    StackwalkerPoolBase,
+)
 from socorro.processor.rules.base import Rule
 
 
@@ -278,6 +291,78 @@ def execute_process(command_line, timeout=120):
     return ret
 
 
+async def execute_process_async(command_line, timeout=120):
+    """Async version of ``execute_process`` using an asyncio subprocess.
+
+    :param command_line: the complete command line to run
+    :param timeout: the timeout in seconds for the command to complete before it's
+        killed; defaults to 120 seconds
+
+    :returns: dict with stdout (bytes), stderr (bytes), and returncode (signed smallint)
+        keys
+
+    """
+    args = shlex.split(command_line, comments=False, posix=True)
+    process = await asyncio.create_subprocess_exec(
+        *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        ret = {
+            "stdout": stdout,
+            "stderr": stderr,
+            "returncode": process.returncode,
+        }
+
+    except asyncio.TimeoutError:
+        # The child process gets killed below, so the returncode is -9 like with
+        # execute_process
+        ret = {
+            "stdout": b"",
+            "stderr": b"",
+            "returncode": -9,
+        }
+
+    finally:
+        # Kill the child process if it timed out or the task was cancelled
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    return ret
+
+
+class SubprocessStackwalkerPool(StackwalkerPoolBase):
+    """Runs a new stackwalker process for every minidump.
+
+    Output and logging are read from the files the stackwalker writes.
+
+    """
+
+    def run(self, command_line, output_path, log_path):
+        ret = execute_process(command_line, timeout=self.kill_timeout)
+        return self.read_results(ret["returncode"], output_path, log_path)
+
+    async def run_async(self, command_line, output_path, log_path):
+        ret = await execute_process_async(command_line, timeout=self.kill_timeout)
+        return self.read_results(ret["returncode"], output_path, log_path)
+
+    def read_results(self, returncode, output_path, log_path):
+        """Read the output and log files the stackwalker wrote."""
+        # Grab any log data
+        if os.path.exists(log_path):
+            with open(log_path, "r") as fp:
+                log_data = fp.read()
+        else:
+            log_data = ""
+
+        output = None
+        if returncode == 0 and os.path.exists(output_path):
+            with open(output_path, "r") as fp:
+                output = fp.read()
+
+        return {"returncode": returncode, "output": output, "log": log_data}
+
+
 class CommandError(Exception):
     pass
 
@@ -301,12 +386,29 @@ class MinidumpStackwalkRule(Rule):
 
     Also adds processor notes.
 
+    When a crash report has multiple minidumps, the stackwalker runs on all of them
+    at once. The number of stackwalker processes running at once across all the
+    threads using this rule is bounded by ``max_concurrent_stackwalkers``.
+
+    If ``stackwalk_cache`` is set, output from successful stackwalker runs is cached
+    keyed on the minidump sha256, the stackwalker version, the symbols configuration,
+    and the crash annotations the stackwalker reads. Reprocessing a crash report
+    with a cache hit skips running the stackwalker.
+
+    If ``server_command`` is set, minidumps are sent to long-lived stackwalker
+    servers started with that command instead of starting a stackwalker process for
+    each minidump. See ``socorro.processor.stackwalker_pool`` for the protocol.
+
     Emits:
 
-    * processor.minidumpstackwalk.*
+    * processor.minidumpstackwalk.run
+    * processor.minidumpstackwalk.cache
 
     """
 
+    # The stackwalker runs as an asyncio subprocess in action_async
+    async_action = True
+
     def __init__(
         self,
         dump_field="upload_file_minidump",
@@ -329,6 +431,9 @@ class MinidumpStackwalkRule(Rule):
         kill_timeout=600,
         symbol_tmp_path="/tmp/symbols-tmp",
         symbol_cache_path="/tmp/symbols",
+        max_concurrent_stackwalkers=None,
+        stackwalk_cache=None,
+        server_command=None,
     ):
         super().__init__()
 
@@ -336,6 +441,10 @@ class MinidumpStackwalkRule(Rule):
         if kill_timeout is None:
             kill_timeout = 600
 
+        # If max_concurrent_stackwalkers is None, allow one per CPU
+        if max_concurrent_stackwalkers is None:
+            max_concurrent_stackwalkers = os.cpu_count() or 1
+
         self.dump_field = dump_field
         self.symbols_urls = symbols_urls or []
         self.command_path = command_path
@@ -343,6 +452,23 @@ class MinidumpStackwalkRule(Rule):
         self.kill_timeout = kill_timeout
         self.symbol_tmp_path = symbol_tmp_path
         self.symbol_cache_path = symbol_cache_path
+        self.max_concurrent_stackwalkers = max_concurrent_stackwalkers
+        self.stackwalk_cache = stackwalk_cache
+        self.server_command = server_command
+
+        if server_command:
+            self.stackwalker_pool = PersistentStackwalkerPool(
+                server_command=server_command.format(command_path=command_path),
+                size=max_concurrent_stackwalkers,
+                kill_timeout=kill_timeout,
+            )
+        else:
+            self.stackwalker_pool = SubprocessStackwalkerPool(kill_timeout=kill_timeout)
+
+        self.stackwalker_slots = threading.BoundedSemaphore(max_concurrent_stackwalkers)
+        self._async_stackwalker_slots = None
+        # Created on first use so forked worker processes don't share it
+        self._executor = None
 
         self.stackwalk_version = self.get_version()
         self.build_directories()
@@ -356,6 +482,9 @@ class MinidumpStackwalkRule(Rule):
             "kill_timeout",
             "symbol_tmp_path",
             "symbol_cache_path",
+            "max_concurrent_stackwalkers",
+            "stackwalk_cache",
+            "server_command",
         )
         return self.generate_repr(keys=keys)
 
@@ -421,15 +550,37 @@ class MinidumpStackwalkRule(Rule):
     def run_stackwalker(
         self, crash_id, command_path, command_line, output_path, log_path, status
     ):
-        ret = execute_process(command_line, timeout=self.kill_timeout)
-        returncode = ret["returncode"]
+        start_time = time.perf_counter()
+        ret = self.stackwalker_pool.run(
+            command_line=command_line, output_path=output_path, log_path=log_path
+        )
+        WORKLOAD_SIGNALS.record(STACKWALKER_SIGNAL, time.perf_counter() - start_time)
+        return self.build_stackwalker_data(crash_id, command_path, ret, status)
 
-        # Grab any log data
-        if os.path.exists(log_path):
-            with open(log_path, "r") as fp:
-                log_data = fp.read()
-        else:
-            log_data = ""
+    async def run_stackwalker_async(
+        self, crash_id, command_path, command_line, output_path, log_path, status
+    ):
+        """Async version of ``run_stackwalker``."""
+        start_time = time.perf_counter()
+        ret = await self.stackwalker_pool.run_async(
+            command_line=command_line, output_path=output_path, log_path=log_path
+        )
+        WORKLOAD_SIGNALS.record(STACKWALKER_SIGNAL, time.perf_counter() - start_time)
+        return self.build_stackwalker_data(crash_id, command_path, ret, status)
+
+    def build_stackwalker_data(self, crash_id, command_path, ret, status):
+        """Build stackwalker data from what the stackwalker pool returned.
+
+        :arg crash_id: the crash id
+        :arg command_path: the stackwalker command
+        :arg ret: dict with returncode, output, and log keys
+        :arg status: the Status to add notes to
+
+        :returns: stackwalker data
+
+        """
+        returncode = ret["returncode"]
+        log_data = ret["log"]
 
         # Decode stderr and truncate to 10 lines
         if log_data.count("\n") > 10:
@@ -437,12 +588,10 @@ class MinidumpStackwalkRule(Rule):
 
         output = {}
         if returncode == 0:
-            if os.path.exists(output_path):
-                with open(output_path, "r") as fp:
-                    output_raw = fp.read()
-
+            output_raw = ret["output"]
+            if output_raw is not None:
                 try:
-                    output = json.loads(output_raw)
+                    output = libjson.decode(output_raw)
                 except Exception as exc:
                     msg = f"{command_path}: non-json output: {exc}"
                     self.logger.debug(
@@ -502,72 +651,266 @@ class MinidumpStackwalkRule(Rule):
 
         return stackwalker_data
 
-    def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
-        crash_id = raw_crash["uuid"]
+    def get_async_stackwalker_slots(self):
+        # Created on first use so it's created in the event loop that uses it
+        if self._async_stackwalker_slots is None:
+            self._async_stackwalker_slots = asyncio.BoundedSemaphore(
+                self.max_concurrent_stackwalkers
+            )
+        return self._async_stackwalker_slots
 
-        processed_crash.setdefault("additional_minidumps", [])
+    def get_executor(self):
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_concurrent_stackwalkers,
+                thread_name_prefix="stackwalker",
+            )
+        return self._executor
+
+    def get_cache_key(self, dump_checksum, dump_file_path, raw_crash_data):
+        """Build the stackwalk cache key for a minidump.
+
+        :arg dump_checksum: the sha256 of the minidump from the crash report metadata
+            or None
+        :arg dump_file_path: the path of the minidump file
+        :arg raw_crash_data: the bytes of the crash annotations file
+
+        :returns: the cache key
+
+        """
+        if not dump_checksum:
+            hasher = hashlib.sha256()
+            with open(dump_file_path, "rb") as fp:
+                for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            dump_checksum = hasher.hexdigest()
+
+        return build_stackwalk_cache_key(
+            dump_sha256=dump_checksum,
+            stackwalk_version=self.stackwalk_version,
+            symbols_config=[self.command_line, *self.symbols_urls],
+            raw_crash_data=raw_crash_data,
+        )
+
+    def get_cached(self, crash_id, cache_key):
+        """Return cached stackwalker data or None."""
+        try:
+            stackwalker_data = self.stackwalk_cache.get(cache_key)
+        except Exception:
+            self.logger.exception("error getting stackwalk cache entry (%s)", crash_id)
+            METRICS.incr("processor.minidumpstackwalk.cache", tags=["result:error"])
+            return None
+
+        result = "miss" if stackwalker_data is None else "hit"
+        METRICS.incr("processor.minidumpstackwalk.cache", tags=[f"result:{result}"])
+        return stackwalker_data
+
+    def set_cached(self, crash_id, cache_key, stackwalker_data):
+        """Cache stackwalker data if it's from a successful run with all symbols."""
+        # Failures can be transient (timeouts, symbols server trouble), so don't cache
+        # them
+        if stackwalker_data["mdsw_return_code"] != 0 or not stackwalker_data["success"]:
+            return
+
+        # Symbols can be uploaded after the crash report is processed, but that
+        # doesn't change the cache key; reprocessing should pick them up, so don't
+        # cache output that's missing symbols
+        modules = (stackwalker_data.get("json_dump") or {}).get("modules") or []
+        if any(module.get("missing_symbols") for module in modules):
+            return
+
+        try:
+            self.stackwalk_cache.set(cache_key, stackwalker_data)
+        except Exception:
+            self.logger.exception("error setting stackwalk cache entry (%s)", crash_id)
+            METRICS.incr("processor.minidumpstackwalk.cache", tags=["result:error"])
+
+    def empty_dump_data(self, dump_name, status):
+        """Returns the stackwalker data for an empty minidump."""
+        # If the dump file is empty (0-bytes), then we don't want to bother running
+        # minidump-stackwalker.
+        #
+        # This is a bad case, so we want to add a note. However, since this is a
+        # shortcut, we also include some stackwalker_data.
+        status.add_note(
+            f"MinidumpStackwalkRule: {dump_name} is empty--skipping "
+            + "minidump processing"
+        )
+        return {
+            "mdsw_status_string": "EmptyMinidump",
+            "mdsw_stderr": "Shortcut for 0-bytes minidump.",
+        }
+
+    def build_run_args(
+        self, crash_id, dump_name, dump_file_path, raw_crash_path, tmpdir
+    ):
+        """Returns the arguments for ``run_stackwalker`` for a minidump."""
+        log_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.log")
+        output_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.json")
+        command_line = self.expand_commandline(
+            dump_file_path=dump_file_path,
+            raw_crash_path=raw_crash_path,
+            output_path=output_path,
+            log_path=log_path,
+        )
+        return {
+            "crash_id": crash_id,
+            "command_path": self.command_path,
+            "command_line": command_line,
+            "output_path": output_path,
+            "log_path": log_path,
+        }
+
+    def check_stderr(self, dump_name, stackwalker_data, status):
+        """Use the error in the stackwalker log as the status string if there is one."""
+        stderr = stackwalker_data.get("mdsw_stderr", "").strip()
+        if stderr:
+            if stderr.startswith("ERROR"):
+                indicator = stderr.split(" ")[1]
+            else:
+                indicator = ""
+
+            status_string = stackwalker_data.get("mdsw_status_string", "")
+            if indicator and status_string in ["OK", "unknown error"]:
+                stackwalker_data["mdsw_status_string"] = indicator
+                status.add_note(
+                    f"MinidumpStackwalkRule: processing {dump_name} had error; "
+                    + "stomped on mdsw_status_string"
+                )
+
+    def stackwalk_dump(
+        self,
+        crash_id,
+        dump_name,
+        dump_file_path,
+        raw_crash_path,
+        tmpdir,
+        cache_key=None,
+    ):
+        """Run the stackwalker on a single minidump.
+
+        :arg crash_id: the crash id
+        :arg dump_name: the name of the minidump
+        :arg dump_file_path: the path of the minidump file
+        :arg raw_crash_path: the path of the crash annotations file
+        :arg tmpdir: the temporary directory to put output in
+        :arg cache_key: if not None, the stackwalk cache key for this minidump
+
+        :returns: ``(stackwalker_data, notes)`` tuple
+
+        """
+        status = Status()
+
+        if os.path.getsize(dump_file_path) == 0:
+            return self.empty_dump_data(dump_name, status), status.notes
+
+        run_args = self.build_run_args(
+            crash_id, dump_name, dump_file_path, raw_crash_path, tmpdir
+        )
+
+        stackwalker_data = None
+        if cache_key is not None:
+            stackwalker_data = self.get_cached(crash_id, cache_key)
+
+        if stackwalker_data is None:
+            # Bound the number of stackwalker processes across all the threads using
+            # this rule
+            with self.stackwalker_slots:
+                stackwalker_data = self.run_stackwalker(status=status, **run_args)
+
+            if cache_key is not None:
+                self.set_cached(crash_id, cache_key, stackwalker_data)
+
+        self.check_stderr(dump_name, stackwalker_data, status)
+        return stackwalker_data, status.notes
+
+    async def stackwalk_dump_async(
+        self,
+        crash_id,
+        dump_name,
+        dump_file_path,
+        raw_crash_path,
+        tmpdir,
+        cache_key=None,
+    ):
+        """Async version of ``stackwalk_dump``.
+
+        The stackwalker runs as an asyncio subprocess, so waiting for it doesn't take
+        up a thread. Stackwalk cache lookups can do network I/O, so they run in the
+        event loop's executor.
+
+        """
+        status = Status()
+
+        if os.path.getsize(dump_file_path) == 0:
+            return self.empty_dump_data(dump_name, status), status.notes
+
+        run_args = self.build_run_args(
+            crash_id, dump_name, dump_file_path, raw_crash_path, tmpdir
+        )
+
+        stackwalker_data = None
+        if cache_key is not None:
+            stackwalker_data = await asyncio.to_thread(
+                self.get_cached, crash_id, cache_key
+            )
+
+        if stackwalker_data is None:
+            # Bound the number of stackwalker processes across all the tasks using
+            # this rule
+            async with self.get_async_stackwalker_slots():
+                stackwalker_data = await self.run_stackwalker_async(
+                    status=status, **run_args
+                )
+
+            if cache_key is not None:
+                await asyncio.to_thread(
+                    self.set_cached, crash_id, cache_key, stackwalker_data
+                )
+
+        self.check_stderr(dump_name, stackwalker_data, status)
+        return stackwalker_data, status.notes
+
+    def prepare_minidumps(self, raw_crash, dumps, tmpdir):
+        """Write the crash annotations file and find the minidumps to stackwalk.
+
+        :returns: ``(raw_crash_path, minidumps)`` where ``minidumps`` is a list of
+            ``(dump_name, dump_file_path, cache_key)`` tuples
+
+        """
+        crash_id = raw_crash["uuid"]
 
         # Save crash annotations to disk for stackwalker to look at
         raw_crash_path = os.path.join(tmpdir, f"{crash_id}.json")
-        with open(raw_crash_path, "w") as fp:
-            json.dump(raw_crash, fp)
+        raw_crash_data = libjson.encode(raw_crash)
+        with open(raw_crash_path, "wb") as fp:
+            fp.write(raw_crash_data)
 
+        # This rule only works on minidumps which the crash reporter prefixes with the
+        # value of dump_field (defaults to "upload_file_minidump")
+        minidumps = []
+        checksums = raw_crash.get("metadata", {}).get("dump_checksums", {})
         for dump_name, dump_file_path in dumps.items():
-            # This rule only works on minidumps which the crash reporter prefixes
-            # with the value of dump_field (defaults to "upload_file_minidump")
             if not dump_name.startswith(self.dump_field):
                 continue
 
-            file_size = os.path.getsize(dump_file_path)
-            if file_size == 0:
-                # If the dump file is empty (0-bytes), then we don't want to bother
-                # running minidump-stackwalker.
-                #
-                # This is a bad case, so we want to add a note. However, since this
-                # is a shortcut, we also include some stackwalker_data.
-                stackwalker_data = {
-                    "mdsw_status_string": "EmptyMinidump",
-                    "mdsw_stderr": "Shortcut for 0-bytes minidump.",
-                }
-
-                status.add_note(
-                    f"MinidumpStackwalkRule: {dump_name} is empty--skipping "
-                    + "minidump processing"
-                )
-
-            else:
-                log_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.log")
-                output_path = os.path.join(tmpdir, f"{crash_id}.{dump_name}.json")
-                command_line = self.expand_commandline(
+            cache_key = None
+            if self.stackwalk_cache is not None:
+                cache_key = self.get_cache_key(
+                    dump_checksum=checksums.get(dump_name),
                     dump_file_path=dump_file_path,
-                    raw_crash_path=raw_crash_path,
-                    output_path=output_path,
-                    log_path=log_path,
+                    raw_crash_data=raw_crash_data,
                 )
+            minidumps.append((dump_name, dump_file_path, cache_key))
 
-                stackwalker_data = self.run_stackwalker(
-                    crash_id=crash_id,
-                    command_path=self.command_path,
-                    command_line=command_line,
-                    output_path=output_path,
-                    log_path=log_path,
-                    status=status,
-                )
+        return raw_crash_path, minidumps
 
-                stderr = stackwalker_data.get("mdsw_stderr", "").strip()
-                if stderr:
-                    if stderr.startswith("ERROR"):
-                        indicator = stderr.split(" ")[1]
-                    else:
-                        indicator = ""
-
-                    status_string = stackwalker_data.get("mdsw_status_string", "")
-                    if indicator and status_string in ["OK", "unknown error"]:
-                        stackwalker_data["mdsw_status_string"] = indicator
-                        status.add_note(
-                            f"MinidumpStackwalkRule: processing {dump_name} had error; "
-                            + "stomped on mdsw_status_string"
-                        )
+    def merge_results(self, minidumps, results, processed_crash, status):
+        """Merge stackwalker results into the processed crash."""
+        # Merge results in dumps order so the processed crash and notes are the same
+        # no matter which stackwalker finished first
+        for (dump_name, _, _), (stackwalker_data, notes) in zip(minidumps, results):
+            status.add_notes(notes)
 
             if dump_name == self.dump_field:
                 processed_crash.update(stackwalker_data)
@@ -577,3 +920,82 @@ class MinidumpStackwalkRule(Rule):
                     processed_crash["additional_minidumps"].append(dump_name)
                 processed_crash.setdefault(dump_name, {})
                 processed_crash[dump_name].update(stackwalker_data)
+
+    def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        crash_id = raw_crash["uuid"]
+
+        processed_crash.setdefault("additional_minidumps", [])
+
+        raw_crash_path, minidumps = self.prepare_minidumps(raw_crash, dumps, tmpdir)
+
+        # Run the stackwalker on all the minidumps at once. The first one runs in this
+        # thread and the rest run in the executor.
+        futures = [
+            self.get_executor().submit(
+                self.stackwalk_dump,
+                crash_id=crash_id,
+                dump_name=dump_name,
+                dump_file_path=dump_file_path,
+                raw_crash_path=raw_crash_path,
+                tmpdir=tmpdir,
+                cache_key=cache_key,
+            )
+            for dump_name, dump_file_path, cache_key in minidumps[1:]
+        ]
+        results = []
+        try:
+            if minidumps:
+                dump_name, dump_file_path, cache_key = minidumps[0]
+                results.append(
+                    self.stackwalk_dump(
+                        crash_id=crash_id,
+                        dump_name=dump_name,
+                        dump_file_path=dump_file_path,
+                        raw_crash_path=raw_crash_path,
+                        tmpdir=tmpdir,
+                        cache_key=cache_key,
+                    )
+                )
+        finally:
+            # Wait for everything so no stackwalker is running after this returns
+            concurrent.futures.wait(futures)
+        results.extend(future.result() for future in futures)
+
+        self.merge_results(minidumps, results, processed_crash, status)
+
+    async def action_async(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        crash_id = raw_crash["uuid"]
+
+        processed_crash.setdefault("additional_minidumps", [])
+
+        raw_crash_path, minidumps = self.prepare_minidumps(raw_crash, dumps, tmpdir)
+
+        # Run the stackwalker on all the minidumps at once and wait for everything so
+        # no stackwalker is running after this returns
+        results = await asyncio.gather(
+            *[
+                self.stackwalk_dump_async(
+                    crash_id=crash_id,
+                    dump_name=dump_name,
+                    dump_file_path=dump_file_path,
+                    raw_crash_path=raw_crash_path,
+                    tmpdir=tmpdir,
+                    cache_key=cache_key,
+                )
+                for dump_name, dump_file_path, cache_key in minidumps
+            ],
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        self.merge_results(minidumps, results, processed_crash, status)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.stackwalk_cache is not None:
+            self.stackwalk_cache.close()
+        self.stackwalker_pool.close()
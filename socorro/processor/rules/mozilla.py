@@ -8,6 +8,7 @@ import datetime
 import gzip
 import json
 import re
+import threading
 from typing import Any
 from urllib.parse import unquote_plus, urlsplit
 from zlib import error as ZlibError
@@ -23,7 +24,7 @@ from socorro.lib.libcache import ExpiringCache
 from socorro.lib.libdatetime import UTC
 from socorro.lib.libjsonschema import InvalidSchemaError, resolve_references
 from socorro.lib.librequests import session_with_retries
-from socorro.lib.libsocorrodataschema import SocorroDataReducer, validate_instance
+from socorro.lib.libsocorrodataschema import get_reducer, validate_instance
 from socorro.processor.rules.base import Rule
 from socorro.signature.generator import SignatureGenerator
 from socorro.signature.utils import convert_to_crash_data
@@ -108,7 +109,8 @@ class CopyFromRawCrashRule(Rule):
     def get_reducer(self, schema_key):
         """Return the SocorroDataReducer for this subschema
 
-        NOTE(willkg): results are cached on the CopyFromRawCrashRule instance.
+        NOTE(willkg): results are cached on the CopyFromRawCrashRule instance. The
+        compiled reducers come from the shared reducer registry.
 
         :arg schema_key: the property key in the processed crash schema to return the
             value of
@@ -119,7 +121,7 @@ class CopyFromRawCrashRule(Rule):
         cache_key = schema_key
         reducer = self._reducer_cache.get(cache_key)
         if reducer is None:
-            reducer = SocorroDataReducer(self.schema["properties"][schema_key])
+            reducer = get_reducer(self.schema["properties"][schema_key])
             self._reducer_cache[cache_key] = reducer
         return reducer
 
@@ -1042,11 +1044,50 @@ class ThemePrettyNameRule(Rule):
 
 
 class SignatureGeneratorRule(Rule):
-    """Generates a Socorro crash signature."""
+    """Generates a Socorro crash signature.
+
+    This emits the hits and misses of the signature generator's normalized function
+    cache since the last crash.
+
+    """
 
     def __init__(self):
         super().__init__()
         self.generator = SignatureGenerator(error_handler=self._error_handler)
+        self.c_signature_tools = [
+            rule.c_signature_tool
+            for rule in self.generator.pipeline
+            if hasattr(rule, "c_signature_tool")
+        ]
+        self.frame_cache_lock = threading.Lock()
+        self.frame_cache_counts = (0, 0)
+
+    def emit_frame_cache_metrics(self):
+        # Rules are shared by processor threads, so read the totals and figure out
+        # the change since the last time under a lock; otherwise a thread could
+        # store older totals after newer ones and the next change is counted twice
+        with self.frame_cache_lock:
+            hits = misses = 0
+            for tool in self.c_signature_tools:
+                cache_info = tool.cache_info()
+                hits += cache_info.hits
+                misses += cache_info.misses
+
+            last_hits, last_misses = self.frame_cache_counts
+            self.frame_cache_counts = (hits, misses)
+
+        if hits > last_hits:
+            METRICS.incr(
+                "processor.signaturegeneratorrule.frame_cache",
+                value=hits - last_hits,
+                tags=["result:hit"],
+            )
+        if misses > last_misses:
+            METRICS.incr(
+                "processor.signaturegeneratorrule.frame_cache",
+                value=misses - last_misses,
+                tags=["result:miss"],
+            )
 
     def _error_handler(self, crash_data, exc_info, extra):
         """Captures errors from signature generation"""
@@ -1063,6 +1104,7 @@ class SignatureGeneratorRule(Rule):
         if "proto_signature" in result.extra:
             processed_crash["proto_signature"] = result.extra["proto_signature"]
         processed_crash["signature_debug"] = "\n".join(result.debug_log)
+        self.emit_frame_cache_metrics()
 
 
 class PHCRule(Rule):
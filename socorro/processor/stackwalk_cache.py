@@ -0,0 +1,256 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Caches for stackwalker output.
+
+Running minidump-stackwalk is the most expensive part of processing a crash report.
+When a crash report is reprocessed and neither the minidump nor the stackwalker
+changed, the output is the same, so it can be cached.
+
+Cache keys are built by ``build_stackwalk_cache_key`` from everything the stackwalker
+output depends on. Cache values are the stackwalker data dicts.
+
+"""
+
+import contextlib
+import fcntl
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+from google.api_core.exceptions import NotFound
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+
+from socorro.lib import libjson
+
+
+def build_stackwalk_cache_key(
+    dump_sha256, stackwalk_version, symbols_config, raw_crash_data
+):
+    """Build a cache key for stackwalker output.
+
+    :arg dump_sha256: sha256 hex digest of the minidump
+    :arg stackwalk_version: the stackwalker version string
+    :arg symbols_config: list of strings with the symbols configuration and any other
+        stackwalker configuration that affects output
+    :arg raw_crash_data: the bytes of the crash annotations file the stackwalker
+        reads
+
+    :returns: key as a hex string
+
+    """
+    hasher = hashlib.sha256()
+    for part in [dump_sha256, stackwalk_version, *symbols_config]:
+        part = part.encode("utf-8")
+        # Length-prefix each part so parts can't run together
+        hasher.update(len(part).to_bytes(8, "big"))
+        hasher.update(part)
+    hasher.update(hashlib.sha256(raw_crash_data).digest())
+    return hasher.hexdigest()
+
+
+def serialize(value):
+    return gzip.compress(libjson.encode(value), compresslevel=1)
+
+
+def deserialize(data):
+    return libjson.decode(gzip.decompress(data))
+
+
+class StackwalkCacheBase:
+    """Base class for stackwalker output caches."""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+
+    def get(self, key):
+        """Return the cached stackwalker data for a key.
+
+        :arg key: the cache key
+
+        :returns: stackwalker data dict or None if it's not in the cache
+
+        """
+        raise NotImplementedError
+
+    def set(self, key, value):
+        """Cache stackwalker data.
+
+        :arg key: the cache key
+        :arg value: the stackwalker data dict
+
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Close resources used by this cache."""
+
+
+class DiskStackwalkCache(StackwalkCacheBase):
+    """Caches stackwalker output in a local directory.
+
+    When the total size of the cache goes over ``max_size``, the least recently used
+    entries are evicted. Reading an entry updates its modification time, so recency
+    survives restarts.
+
+    Several processes can share the directory. The total size is kept in a file in
+    the directory that's updated under a file lock. When it goes over ``max_size``,
+    the size is recomputed from the directory and entries are evicted, so
+    evictions and overwrites by other processes are accounted for.
+
+    """
+
+    SIZE_FILE = ".size"
+
+    def __init__(self, path, max_size=1024 * 1024 * 1024):
+        """
+        :arg path: the directory to store entries in
+        :arg max_size: the maximum size of the cache in bytes
+        """
+        super().__init__()
+        self.path = path
+        self.max_size = max_size
+
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock() as fd:
+            self._write_size(fd, self._evict())
+
+    @contextlib.contextmanager
+    def _lock(self):
+        """Lock the size file and yield its file descriptor."""
+        fd = os.open(os.path.join(self.path, self.SIZE_FILE), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield fd
+        finally:
+            # Closing the file releases the lock
+            os.close(fd)
+
+    def _read_size(self, fd):
+        os.lseek(fd, 0, os.SEEK_SET)
+        try:
+            return int(os.read(fd, 32) or b"0")
+        except ValueError:
+            return 0
+
+    def _write_size(self, fd, size):
+        os.lseek(fd, 0, os.SEEK_SET)
+        os.ftruncate(fd, 0)
+        os.write(fd, str(size).encode("ascii"))
+
+    def _get_path(self, key):
+        return os.path.join(self.path, key)
+
+    def _touch(self, path):
+        # Use the clock rather than the coarser file system timestamps so entries
+        # written or read in quick succession still sort in order
+        now = time.time_ns()
+        os.utime(path, ns=(now, now))
+
+    def _evict(self):
+        """Remove least recently used entries until the cache fits; needs the lock.
+
+        :returns: the total size of the entries left
+
+        """
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, entry.name, stat.st_size))
+
+        entries.sort()
+        total_size = sum(size for _, _, size in entries)
+        for _, key, size in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(self._get_path(key))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        return total_size
+
+    def get(self, key):
+        path = self._get_path(key)
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+            self._touch(path)
+        except FileNotFoundError:
+            return None
+        return deserialize(data)
+
+    def set(self, key, value):
+        data = serialize(value)
+        if len(data) > self.max_size:
+            return
+
+        # Write to a temporary file and rename it so readers never see a partial
+        # entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            self._touch(tmp_path)
+            os.replace(tmp_path, self._get_path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock() as fd:
+            size = self._read_size(fd) + len(data)
+            if size > self.max_size:
+                size = self._evict()
+            self._write_size(fd, size)
+
+
+class GcsStackwalkCache(StackwalkCacheBase):
+    """Caches stackwalker output in a GCS bucket.
+
+    The cache can be shared by all processor nodes. Eviction is left to the bucket's
+    lifecycle rules.
+
+    """
+
+    def __init__(self, bucket, prefix="v1/stackwalk_cache"):
+        """
+        :arg bucket: the GCS bucket to store entries in
+        :arg prefix: the key prefix for entries
+        """
+        super().__init__()
+
+        if os.environ.get("STORAGE_EMULATOR_HOST"):
+            self.client = storage.Client(
+                credentials=AnonymousCredentials(),
+                project=os.environ.get("STORAGE_PROJECT_ID"),
+            )
+        else:
+            self.client = storage.Client()
+
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def _get_blob(self, key):
+        return self.client.bucket(self.bucket).blob(f"{self.prefix}/{key}")
+
+    def get(self, key):
+        try:
+            data = self._get_blob(key).download_as_bytes()
+        except NotFound:
+            return None
+        return deserialize(data)
+
+    def set(self, key, value):
+        self._get_blob(key).upload_from_string(serialize(value))
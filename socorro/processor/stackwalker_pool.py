@@ -0,0 +1,300 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Pools of stackwalker processes.
+
+A stackwalker pool runs the stackwalker on a minidump and returns the returncode,
+output, and log. ``MinidumpStackwalkRule`` uses a pool that starts a new stackwalker
+process for every minidump unless a stackwalker server command is configured, in
+which case it uses a ``PersistentStackwalkerPool``.
+
+Stackwalker server protocol
+===========================
+
+A stackwalker server reads requests from stdin and writes responses to stdout. It
+handles one request at a time.
+
+A request is a line of JSON::
+
+    {"args": ["--evil-json=/tmp/crash.json", ..., "/tmp/upload_file_minidump"]}
+
+where ``args`` are the stackwalker command line arguments without the command
+itself and without the ``--output-file`` and ``--log-file`` options.
+
+A response is a line of JSON followed by the stackwalker output and log::
+
+    {"returncode": 0, "output_length": 12345, "log_length": 0}\\n
+    <output_length bytes of JSON output><log_length bytes of log>
+
+``returncode`` is what the stackwalker would have exited with for this minidump.
+
+``bin/stackwalker_server.py`` wraps minidump-stackwalk in a server that speaks this
+protocol.
+
+If the server doesn't respond within the kill timeout, it's killed with SIGKILL
+and the result has returncode -9. If the server dies while handling a request, the
+result has the server's returncode--for example -6 if it aborted. Either way, a new
+server is started for the next request. This matches what happens when running a
+new stackwalker process for every minidump.
+
+"""
+
+import asyncio
+import json
+import logging
+import os
+import select
+import shlex
+import subprocess
+import threading
+import time
+
+from socorro.libmarkus import METRICS
+
+
+# Options whose output comes back over the pipe instead
+PIPED_OPTIONS = ("--output-file=", "--log-file=")
+
+
+class StackwalkerPoolBase:
+    """Base class for stackwalker pools."""
+
+    def __init__(self, kill_timeout=600):
+        """
+        :arg kill_timeout: seconds to wait for the stackwalker before killing it
+        """
+        self.logger = logging.getLogger(__name__ + "." + self.__class__.__name__)
+        self.kill_timeout = kill_timeout
+
+    def run(self, command_line, output_path, log_path):
+        """Run the stackwalker.
+
+        :arg command_line: the expanded stackwalker command line
+        :arg output_path: the path the command line says to write output to
+        :arg log_path: the path the command line says to write logging to
+
+        :returns: dict with returncode (signed smallint), output (str or None), and
+            log (str) keys
+
+        """
+        raise NotImplementedError
+
+    async def run_async(self, command_line, output_path, log_path):
+        """Async version of ``run``.
+
+        This runs ``run`` in the event loop's executor. Pools that can wait for the
+        stackwalker without a thread override it.
+
+        """
+        return await asyncio.to_thread(
+            self.run,
+            command_line=command_line,
+            output_path=output_path,
+            log_path=log_path,
+        )
+
+    def close(self):
+        """Stop stackwalker processes."""
+
+
+class StackwalkerServer:
+    """A long-lived stackwalker server process."""
+
+    def __init__(self, server_command):
+        self.process = subprocess.Popen(
+            shlex.split(server_command, comments=False, posix=True),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            bufsize=0,
+        )
+        self._buffer = bytearray()
+
+    def _fill(self, deadline):
+        """Read more bytes from the server into the buffer.
+
+        :raises TimeoutError: if the deadline passes
+        :raises EOFError: if the server closed stdout
+
+        """
+        fd = self.process.stdout.fileno()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError()
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            raise TimeoutError()
+        data = os.read(fd, 1024 * 1024)
+        if not data:
+            raise EOFError()
+        self._buffer.extend(data)
+
+    def _read_line(self, deadline):
+        while b"\n" not in self._buffer:
+            self._fill(deadline)
+        index = self._buffer.index(b"\n") + 1
+        line = bytes(self._buffer[:index])
+        del self._buffer[:index]
+        return line
+
+    def _read_exactly(self, size, deadline):
+        while len(self._buffer) < size:
+            self._fill(deadline)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def request(self, args, timeout):
+        """Send a request and return the response.
+
+        :arg args: the stackwalker arguments
+        :arg timeout: seconds to wait for the response
+
+        :returns: dict with returncode, output, and log keys
+
+        :raises TimeoutError: if the server didn't respond in time
+        :raises EOFError: if the server died
+
+        """
+        deadline = time.monotonic() + timeout
+        data = memoryview(json.dumps({"args": args}).encode("utf-8") + b"\n")
+        try:
+            # stdin is unbuffered, so writes can be partial
+            while data:
+                data = data[self.process.stdin.write(data) :]
+        except BrokenPipeError as exc:
+            raise EOFError() from exc
+
+        header = json.loads(self._read_line(deadline))
+        output = self._read_exactly(header["output_length"], deadline)
+        log = self._read_exactly(header["log_length"], deadline)
+        return {
+            "returncode": header["returncode"],
+            "output": output.decode("utf-8"),
+            "log": log.decode("utf-8", errors="replace"),
+        }
+
+    def _close_pipes(self):
+        for pipe in (self.process.stdin, self.process.stdout):
+            try:
+                pipe.close()
+            except OSError:
+                pass
+
+    def kill(self):
+        """Kill the server with SIGKILL if it's running and wait for it.
+
+        :returns: the server's returncode
+
+        """
+        self.process.kill()
+        returncode = self.process.wait()
+        self._close_pipes()
+        return returncode
+
+    def stop(self, timeout=5):
+        """Ask the server to exit by closing stdin and wait for it."""
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        self.kill()
+
+
+class PersistentStackwalkerPool(StackwalkerPoolBase):
+    """Sends stackwalker requests to long-lived stackwalker servers.
+
+    This saves starting a process and warming up per-process state for every
+    minidump. Output comes back over a pipe rather than through files. Servers are
+    started as needed; at most ``size`` idle servers are kept around.
+
+    Emits:
+
+    * processor.minidumpstackwalk.server_restart
+
+    """
+
+    def __init__(self, server_command, size, kill_timeout=600):
+        """
+        :arg server_command: the command line to start a stackwalker server
+        :arg size: the number of idle servers to keep around
+        :arg kill_timeout: seconds to wait for a response before killing the server
+        """
+        super().__init__(kill_timeout=kill_timeout)
+        self.server_command = server_command
+        self.size = size
+
+        self._lock = threading.Lock()
+        self._idle = []
+        self._pid = os.getpid()
+
+    def _get_server(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # Servers started by the parent process belong to it
+                self._idle = []
+                self._pid = os.getpid()
+            if self._idle:
+                return self._idle.pop()
+        return StackwalkerServer(self.server_command)
+
+    def _put_server(self, server):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(server)
+                return
+        server.stop()
+
+    def run(self, command_line, output_path, log_path):
+        args = [
+            arg
+            for arg in shlex.split(command_line, comments=False, posix=True)[1:]
+            if not arg.startswith(PIPED_OPTIONS)
+        ]
+
+        server = self._get_server()
+        try:
+            ret = server.request(args, timeout=self.kill_timeout)
+
+        except TimeoutError:
+            server.kill()
+            self.logger.warning("stackwalker server timed out; killed it")
+            METRICS.incr(
+                "processor.minidumpstackwalk.server_restart", tags=["reason:timeout"]
+            )
+            # Same returncode as a stackwalker process killed for taking too long
+            return {"returncode": -9, "output": None, "log": ""}
+
+        except EOFError:
+            # Wait first so the returncode is the one the server died with
+            server.process.wait()
+            returncode = server.kill()
+            self.logger.warning("stackwalker server died: %s", returncode)
+            METRICS.incr(
+                "processor.minidumpstackwalk.server_restart", tags=["reason:crash"]
+            )
+            # A server that exited cleanly mid-request still failed the request
+            return {"returncode": returncode or 1, "output": None, "log": ""}
+
+        except (ValueError, KeyError):
+            server.kill()
+            self.logger.exception("stackwalker server sent a bad response; killed it")
+            METRICS.incr(
+                "processor.minidumpstackwalk.server_restart",
+                tags=["reason:bad_response"],
+            )
+            return {"returncode": 1, "output": None, "log": ""}
+
+        self._put_server(server)
+        if ret["returncode"] != 0:
+            ret["output"] = None
+        return ret
+
+    def close(self):
+        with self._lock:
+            idle = self._idle if self._pid == os.getpid() else []
+            self._idle = []
+        for server in idle:
+            server.stop()
@@ -0,0 +1,316 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+"""
+Bulk signature regeneration over a local corpus of processed crashes.
+
+Sources hand out small picklable work items (file paths, JSONL line offsets, crash
+ids) and load the processed crash in the worker process so that reading and parsing
+JSON is sharded across the pool along with signature generation. Parsing large
+processed crashes dominates the run time, so in Socorro this parses them with
+``socorro.lib.libjson`` which uses orjson when it's installed.
+
+"""
+
+import multiprocessing
+from multiprocessing.util import Finalize
+import os
+import time
+
+# This works without Socorro modules so it can be used in siggen
+try:
+    from socorro.lib.libjson import decode as loads
+except ImportError:
+    from json import loads
+
+from .generator import SignatureGenerator
+from .utils import convert_to_crash_data
+
+
+class CrashSource:
+    """Base class for bulk processed crash sources
+
+    ``items`` runs in the parent process and yields picklable work items.
+    ``setup`` and ``load`` run in the worker process.
+
+    """
+
+    def items(self):
+        """Yields work items"""
+        raise NotImplementedError
+
+    def setup(self):
+        """Prepares the source for loading in a worker process"""
+        pass
+
+    def teardown(self):
+        """Releases anything opened in ``setup``"""
+        pass
+
+    def load(self, item):
+        """Loads a processed crash for a work item
+
+        :arg item: a work item yielded by ``items``
+
+        :returns: processed crash dict
+
+        """
+        raise NotImplementedError
+
+    def item_name(self, item):
+        """Returns a name for a work item to use in error messages"""
+        return str(item)
+
+
+class DirectorySource(CrashSource):
+    """Processed crashes stored as one JSON file per crash under a directory
+
+    Only files in ``processed_crash`` directories are processed crashes, so this
+    works with the output of ``fetch_crash_data`` which puts raw crashes and dumps
+    in other directories.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def items(self):
+        for root, dirs, files in os.walk(self.path):
+            dirs.sort()
+            if os.path.basename(root) != "processed_crash":
+                continue
+            for fn in sorted(files):
+                yield os.path.join(root, fn)
+
+    def load(self, item):
+        with open(item, "rb") as fp:
+            return loads(fp.read())
+
+
+class JSONLSource(CrashSource):
+    """Processed crashes stored one per line in a JSONL file
+
+    Work items are ``(line number, offset, length)`` so lines aren't sent to workers
+    through the pool; each worker reads its lines from the file.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fp = None
+
+    def items(self):
+        offset = 0
+        with open(self.path, "rb") as fp:
+            for lineno, line in enumerate(fp, start=1):
+                if line.strip():
+                    yield (lineno, offset, len(line))
+                offset += len(line)
+
+    def setup(self):
+        self.fp = open(self.path, "rb")
+
+    def teardown(self):
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+    def load(self, item):
+        lineno, offset, length = item
+        self.fp.seek(offset)
+        return loads(self.fp.read(length))
+
+    def item_name(self, item):
+        return f"{self.path}:{item[0]}"
+
+
+class CrashStorageSource(CrashSource):
+    """Processed crashes fetched by crash id from a Socorro crash storage
+
+    This requires Socorro settings; the crash storage is built in each worker from
+    the named settings key.
+
+    """
+
+    def __init__(self, settings_key, crash_ids):
+        self.settings_key = settings_key
+        self.crash_ids = crash_ids
+        self.crashstorage = None
+
+    def items(self):
+        return iter(self.crash_ids)
+
+    def setup(self):
+        from socorro import settings
+        from socorro.libclass import build_instance_from_settings
+
+        self.crashstorage = build_instance_from_settings(
+            getattr(settings, self.settings_key)
+        )
+
+    def load(self, item):
+        return self.crashstorage.get_processed_crash(item)
+
+
+def get_source(path):
+    """Returns the source for a processed crash directory or JSONL file
+
+    :arg str path: path to a directory or a JSONL file
+
+    :returns: a ``CrashSource``
+
+    """
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    return JSONLSource(path)
+
+
+class BulkStats:
+    """Tracks counts and throughput for a bulk run"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.processed = 0
+        self.changed = 0
+        self.errors = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        return (
+            f"{self.processed:,} crashes in {self.elapsed:.1f}s "
+            + f"({self.rate:,.0f} crashes/s): {self.changed:,} changed, "
+            + f"{self.errors:,} errors"
+        )
+
+
+class Regenerator:
+    """Regenerates the signature for a processed crash
+
+    Processors are passed to each worker process. ``setup`` runs in the worker
+    and ``process`` runs for each processed crash.
+
+    """
+
+    def __init__(self, generator_kwargs=None):
+        self.generator_kwargs = generator_kwargs or {}
+        self.generator = None
+
+    def setup(self):
+        self.generator = SignatureGenerator(**self.generator_kwargs)
+
+    def process(self, processed_crash):
+        """Regenerates the signature
+
+        :arg dict processed_crash: the processed crash
+
+        :returns: ``(old_signature, result)``
+
+        """
+        old_signature = processed_crash.get("signature")
+        crash_data = convert_to_crash_data(processed_crash)
+        return old_signature, self.generator.generate(crash_data)
+
+
+# Per-process state set up by _init_worker
+_WORKER_SOURCE = None
+_WORKER_PROCESSOR = None
+
+
+def _init_worker(source, processor):
+    global _WORKER_SOURCE, _WORKER_PROCESSOR
+
+    source.setup()
+    processor.setup()
+    _WORKER_SOURCE = source
+    _WORKER_PROCESSOR = processor
+
+
+def _init_pool_worker(source, processor):
+    _init_worker(source, processor)
+    # Release what the source opened in setup when the worker process exits
+    Finalize(source, source.teardown, exitpriority=10)
+
+
+def _process(item):
+    """Loads the processed crash for a work item and runs the processor on it
+
+    :returns: ``(crash_id, value, error)`` where ``error`` is a string if the
+        processed crash could not be loaded or processed
+
+    """
+    try:
+        processed_crash = _WORKER_SOURCE.load(item)
+    except Exception as exc:
+        return (_WORKER_SOURCE.item_name(item), None, f"{type(exc).__name__}: {exc}")
+
+    crash_id = processed_crash.get("uuid") or _WORKER_SOURCE.item_name(item)
+    try:
+        value = _WORKER_PROCESSOR.process(processed_crash)
+    except Exception as exc:
+        # One bad crash shouldn't stop the run
+        return (crash_id, None, f"{type(exc).__name__}: {exc}")
+    return (crash_id, value, None)
+
+
+def run_pool(source, processor, workers=1, chunksize=50):
+    """Runs a processor over all crashes in a source
+
+    With ``workers`` greater than 1, work items are sharded across a process pool.
+    Results are yielded in source order.
+
+    :arg CrashSource source: the source of processed crashes
+    :arg processor: the processor to run on each processed crash
+    :arg int workers: number of worker processes
+    :arg int chunksize: number of work items sent to a worker at a time
+
+    :returns: generator of ``(crash_id, value, error)`` tuples
+
+    """
+    if workers <= 1:
+        _init_worker(source, processor)
+        try:
+            yield from map(_process, source.items())
+        finally:
+            source.teardown()
+        return
+
+    with multiprocessing.Pool(
+        processes=workers,
+        initializer=_init_pool_worker,
+        initargs=(source, processor),
+    ) as pool:
+        yield from pool.imap(_process, source.items(), chunksize=chunksize)
+        # Let the worker processes exit on their own so they run finalizers; leaving
+        # the with block terminates them
+        pool.close()
+        pool.join()
+
+
+def run_bulk(source, generator_kwargs=None, workers=1, chunksize=50):
+    """Regenerates signatures for all crashes in a source
+
+    :arg CrashSource source: the source of processed crashes
+    :arg dict generator_kwargs: keyword arguments for ``SignatureGenerator``
+    :arg int workers: number of worker processes
+    :arg int chunksize: number of work items sent to a worker at a time
+
+    :returns: generator of ``(crash_id, old_signature, result, error)`` tuples
+
+    """
+    results = run_pool(
+        source, Regenerator(generator_kwargs), workers=workers, chunksize=chunksize
+    )
+    for crash_id, value, error in results:
+        if error:
+            yield (crash_id, None, None, error)
+        else:
+            yield (crash_id, *value, None)
@@ -0,0 +1,345 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import argparse
+from collections import Counter
+import csv
+import json
+import os
+import sys
+
+from glom import glom
+
+from .bulk import BulkStats, get_source, run_pool
+from .generator import SignatureGenerator
+from .rules import SignatureGenerationRule, SignatureRunWatchDog
+from .siglists_utils import INCLUDED, SiglistMatcher, get_signature_list_content
+from .utils import convert_to_crash_data, get_crashing_thread
+
+
+DESCRIPTION = """
+Given a directory of proposed signature lists and a corpus of processed crashes, shows
+which signatures would change if the proposed signature lists were deployed and for how
+many crashes.
+
+The corpus is a directory of processed crash JSON files or a JSONL file with one
+processed crash per line.
+"""
+
+SIGLIST_NAMES = [
+    "irrelevant_signature_re",
+    "prefix_signature_re",
+    "signatures_with_line_numbers_re",
+    "signature_sentinels",
+]
+
+
+def _entry(line):
+    # Sentinels can be (sentinel, condition function) tuples
+    return line[0] if isinstance(line, tuple) else line
+
+
+class SiglistDiff:
+    """Differences between two signature list directories
+
+    :param current_dir: directory of the current signature lists or ``None`` for the
+        included signature lists
+    :param proposed_dir: directory of the proposed signature lists
+
+    """
+
+    def __init__(self, current_dir, proposed_dir):
+        self.current_dir = current_dir
+        self.proposed_dir = proposed_dir
+
+        # Map of siglist name -> (removed entries, added entries)
+        self.changes = {}
+        for name in SIGLIST_NAMES:
+            current = {
+                _entry(line)
+                for line in get_signature_list_content(
+                    name, source=current_dir if current_dir else INCLUDED
+                )
+            }
+            proposed = {
+                _entry(line)
+                for line in get_signature_list_content(name, source=proposed_dir)
+            }
+            self.changes[name] = (
+                sorted(current - proposed),
+                sorted(proposed - current),
+            )
+
+        changed_entries = sorted(
+            set(self.changed_entries("irrelevant_signature_re"))
+            | set(self.changed_entries("prefix_signature_re"))
+        )
+        self.changed_re = SiglistMatcher(changed_entries) if changed_entries else None
+        self.changed_sentinels = set(self.changed_entries("signature_sentinels"))
+
+    def changed_entries(self, name):
+        removed, added = self.changes[name]
+        return removed + added
+
+    @property
+    def has_changes(self):
+        return any(self.changed_entries(name) for name in SIGLIST_NAMES)
+
+    @property
+    def normalization_changed(self):
+        """Whether frame normalization differs between the two"""
+        return bool(self.changed_entries("signatures_with_line_numbers_re"))
+
+    def may_affect(self, normalized_frames):
+        """Returns whether the changes could affect a signature
+
+        Sentinels match frames exactly, and a frame is irrelevant or a prefix if it
+        matches any entry in the list. If no frame is a changed sentinel or matches a
+        changed irrelevant or prefix entry, then every frame is handled the same way
+        with either set of signature lists.
+
+        This assumes frame normalization is the same.
+
+        :param normalized_frames: list of normalized frames
+
+        :returns: bool
+
+        """
+        for frame in normalized_frames:
+            if frame in self.changed_sentinels:
+                return True
+            if self.changed_re is not None and self.changed_re.match(frame):
+                return True
+        return False
+
+
+def get_c_signature_tool(generator):
+    for rule in generator.pipeline:
+        if isinstance(rule, SignatureGenerationRule):
+            return rule.c_signature_tool
+    return None
+
+
+class ImpactAnalyzer:
+    """Generates signatures with the current and proposed signature lists
+
+    Crashes are run through the generator with the current signature lists. Only
+    crashes whose normalized frames could be affected by the changes are run through
+    the generator with the proposed signature lists. If frame normalization is the
+    same for both, the proposed generator uses the current generator's normalized
+    function cache.
+
+    """
+
+    def __init__(self, current_dir, proposed_dir):
+        self.current_dir = current_dir
+        self.proposed_dir = proposed_dir
+
+    def setup(self):
+        self.diff = SiglistDiff(self.current_dir, self.proposed_dir)
+        if self.current_dir:
+            self.current = SignatureGenerator(signature_list_dir=self.current_dir)
+        else:
+            self.current = SignatureGenerator()
+        self.proposed = SignatureGenerator(signature_list_dir=self.proposed_dir)
+
+        if not self.diff.normalization_changed:
+            proposed_tool = get_c_signature_tool(self.proposed)
+            current_tool = get_c_signature_tool(self.current)
+            if proposed_tool is not None and current_tool is not None:
+                proposed_tool.share_frame_cache(current_tool)
+
+    def process(self, processed_crash):
+        """Generates the signature with current and, if needed, proposed siglists
+
+        :arg dict processed_crash: the processed crash
+
+        :returns: ``(current signature, proposed signature, evaluated)`` where
+            ``evaluated`` is whether the proposed generator ran
+
+        """
+        crash_data = convert_to_crash_data(processed_crash)
+        current_result = self.current.generate(crash_data)
+        if not self.diff.has_changes:
+            return current_result.signature, current_result.signature, False
+
+        # Java crashes and crashes without frames don't use signature lists
+        frame_lists = self.get_frame_lists(crash_data, current_result)
+        if not any(frame_lists):
+            return current_result.signature, current_result.signature, False
+
+        if not self.diff.normalization_changed and not any(
+            self.diff.may_affect(frames) for frames in frame_lists
+        ):
+            return current_result.signature, current_result.signature, False
+
+        proposed_result = self.proposed.generate(crash_data)
+        return current_result.signature, proposed_result.signature, True
+
+    def get_frame_lists(self, crash_data, result):
+        """Returns the lists of normalized frames signature generation looked at
+
+        ``SignatureGenerationRule`` records the normalized frames of the crashing
+        thread. For shutdown hangs, ``SignatureRunWatchDog`` reruns it on thread 0
+        which replaces those, so this adds the crashing thread frames back.
+
+        :arg dict crash_data: the crash data
+        :arg Result result: the result from the current generator
+
+        :returns: list of lists of normalized frames
+
+        """
+        frame_lists = [result.extra.get("normalized_frames") or []]
+
+        watchdog_prefix = f"{SignatureRunWatchDog.__name__}: "
+        if any(line.startswith(watchdog_prefix) for line in result.debug_log):
+            tool = get_c_signature_tool(self.current)
+            try:
+                crashing_thread = get_crashing_thread(crash_data)
+                if crashing_thread is not None:
+                    frame_lists.append(
+                        tool.create_frame_list(
+                            glom(
+                                crash_data, "threads.%d" % crashing_thread, default={}
+                            ),
+                            crash_data.get("os") == "Windows NT",
+                        )
+                    )
+            except (KeyError, IndexError):
+                pass
+
+        return frame_lists
+
+
+class ImpactReport:
+    """Aggregates current -> proposed signature changes"""
+
+    def __init__(self):
+        self.stats = BulkStats()
+        self.evaluated = 0
+        self.changes = Counter()
+
+    def add(self, current_signature, proposed_signature, evaluated):
+        self.stats.processed += 1
+        if evaluated:
+            self.evaluated += 1
+        if current_signature != proposed_signature:
+            self.stats.changed += 1
+            self.changes[(current_signature, proposed_signature)] += 1
+
+    def summary(self):
+        return (
+            f"{self.stats.summary()}; {self.evaluated:,} evaluated with proposed "
+            + "signature lists"
+        )
+
+    def rows(self):
+        """Returns ``(count, current, proposed)`` rows, most crashes first"""
+        return [
+            (count, current, proposed)
+            for (current, proposed), count in sorted(
+                self.changes.items(), key=lambda item: (-item[1], item[0])
+            )
+        ]
+
+
+def output_text(diff, report):
+    print("Signature list changes:")
+    for name in SIGLIST_NAMES:
+        removed, added = diff.changes[name]
+        if not removed and not added:
+            continue
+        print(f"  {name}:")
+        for entry in removed:
+            print(f"    - {entry}")
+        for entry in added:
+            print(f"    + {entry}")
+    print("")
+    print(f"Signature changes ({len(report.changes):,}):")
+    for count, current, proposed in report.rows():
+        print(f"  {count:>8,}  {current}")
+        print(f"            -> {proposed}")
+
+
+def output_csv(diff, report):
+    out = csv.writer(sys.stdout, quoting=csv.QUOTE_ALL)
+    out.writerow(["count", "old", "new"])
+    for row in report.rows():
+        out.writerow(row)
+
+
+def output_jsonl(diff, report):
+    for count, current, proposed in report.rows():
+        print(json.dumps({"count": count, "old": current, "new": proposed}))
+
+
+OUTPUTTERS = {
+    "text": output_text,
+    "csv": output_csv,
+    "jsonl": output_jsonl,
+}
+
+
+def main(argv=None):
+    """Shows signature changes from proposed signature lists over a crash corpus"""
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument(
+        "--format",
+        default="text",
+        choices=sorted(OUTPUTTERS.keys()),
+        help="specify output format: csv, jsonl, text (default)",
+    )
+    parser.add_argument(
+        "--current-signature-list-dir",
+        required=False,
+        help=(
+            "directory of current signature list files; if not specified, uses the "
+            + "included signature list files"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="number of worker processes (default: number of cpus)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=50,
+        help="number of crashes sent to a worker at a time",
+    )
+    parser.add_argument("proposed", help="directory of proposed signature list files")
+    parser.add_argument(
+        "processed_crashes",
+        help="directory of processed crash JSON files or JSONL file of processed crashes",
+    )
+
+    if argv is None:
+        args = parser.parse_args()
+    else:
+        args = parser.parse_args(argv)
+
+    diff = SiglistDiff(args.current_signature_list_dir, args.proposed)
+    if not diff.has_changes:
+        print("No signature list changes.", file=sys.stderr)
+        return 0
+
+    report = ImpactReport()
+    results = run_pool(
+        get_source(args.processed_crashes),
+        ImpactAnalyzer(args.current_signature_list_dir, args.proposed),
+        workers=args.workers,
+        chunksize=args.chunksize,
+    )
+    for crash_id, value, error in results:
+        if error:
+            report.stats.errors += 1
+            print(f"WARNING: {crash_id}: {error}", file=sys.stderr)
+            continue
+        report.add(*value)
+
+    OUTPUTTERS[args.format](diff, report)
+    print(f"Done: {report.summary()}", file=sys.stderr)
+    return 0
@@ -4,11 +4,13 @@
 
 import argparse
 import csv
+import json
 import os
 import sys
 
 import requests
 
+from .bulk import BulkStats, CrashStorageSource, get_source, run_bulk
 from .generator import SignatureGenerator
 from .utils import convert_to_crash_data, parse_crashid
 
@@ -16,8 +18,14 @@ from .utils import convert_to_crash_data, parse_crashid
 DESCRIPTION = """
 Given one or more crash ids via command line or stdin (one per line), pulls down information from
 Socorro, generates signatures, and prints signature information.
+
+With --processed-crashes or --crashstorage, regenerates signatures in bulk across a
+pool of worker processes and prints throughput to stderr.
 """
 
+# Number of crashes between bulk progress lines
+PROGRESS_INTERVAL = 10_000
+
 # FIXME(willkg): This hits production. We might want it configurable.
 API_URL = "https://crash-stats.mozilla.org/api"
 
@@ -115,6 +123,21 @@ class CSVOutput(OutputBase):
         )
 
 
+class JSONLOutput(OutputBase):
+    def data(self, crash_id, old_sig, result, verbose):
+        data = {
+            "crashid": crash_id,
+            "old": old_sig,
+            "new": result.signature,
+            "same": old_sig == result.signature,
+            "notes": result.notes,
+        }
+        if verbose:
+            data["debug_log"] = result.debug_log
+            data["extra"] = result.extra
+        print(json.dumps(data))
+
+
 class MarkdownOutput(OutputBase):
     """Output in Markdown for use in Bugzilla and GitHub"""
 
@@ -153,6 +176,41 @@ def fetch(endpoint, crash_id, api_token=None):
     return requests.get(API_URL + endpoint, **kwargs)
 
 
+def run_bulk_mode(out, source, generator_kwargs, args):
+    """Regenerates signatures for a bulk source and prints throughput to stderr
+
+    :returns: exit code
+
+    """
+    stats = BulkStats()
+    results = run_bulk(
+        source,
+        generator_kwargs=generator_kwargs,
+        workers=args.workers,
+        chunksize=args.chunksize,
+    )
+    for index, (crash_id, old_signature, result, error) in enumerate(results):
+        if index > 0:
+            out.separator()
+
+        if error:
+            stats.errors += 1
+            out.warning(f"{crash_id}: {error}")
+            continue
+
+        stats.processed += 1
+        if old_signature != result.signature:
+            stats.changed += 1
+        if not args.different or old_signature != result.signature:
+            out.data(crash_id, old_signature, result, args.verbose)
+
+        if stats.processed % PROGRESS_INTERVAL == 0:
+            print(f"Progress: {stats.summary()}", file=sys.stderr)
+
+    print(f"Done: {stats.summary()}", file=sys.stderr)
+    return 0
+
+
 def main(argv=None):
     """Takes crash data via args and generates a Socorro signature"""
     parser = argparse.ArgumentParser(description=DESCRIPTION)
@@ -160,7 +218,7 @@ def main(argv=None):
         "-v", "--verbose", help="increase output verbosity", action="store_true"
     )
     parser.add_argument(
-        "--format", help="specify output format: csv, markdown, text (default)"
+        "--format", help="specify output format: csv, jsonl, markdown, text (default)"
     )
     parser.add_argument(
         "--different-only",
@@ -176,6 +234,33 @@ def main(argv=None):
             + "included signature list files"
         ),
     )
+    parser.add_argument(
+        "--processed-crashes",
+        help=(
+            "bulk mode: directory with processed crash JSON files in "
+            + "processed_crash directories (like fetch_crash_data output) or JSONL "
+            + "file of processed crashes to regenerate signatures for"
+        ),
+    )
+    parser.add_argument(
+        "--crashstorage",
+        help=(
+            "bulk mode: Socorro settings key for the crash storage to fetch processed "
+            + "crashes for the crash ids from (e.g. CRASH_SOURCE)"
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="bulk mode: number of worker processes (default: number of cpus)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=50,
+        help="bulk mode: number of crashes sent to a worker at a time",
+    )
     parser.add_argument(
         "crashids",
         metavar="crashid",
@@ -190,6 +275,8 @@ def main(argv=None):
 
     if args.format == "csv":
         outputter = CSVOutput
+    elif args.format == "jsonl":
+        outputter = JSONLOutput
     elif args.format == "markdown":
         outputter = MarkdownOutput
     else:
@@ -202,6 +289,13 @@ def main(argv=None):
         generator_kwargs = {
             "signature_list_dir": args.signature_list_dir,
         }
+
+    if args.processed_crashes:
+        with outputter() as out:
+            return run_bulk_mode(
+                out, get_source(args.processed_crashes), generator_kwargs, args
+            )
+
     generator = SignatureGenerator(**generator_kwargs)
 
     if args.crashids:
@@ -218,6 +312,20 @@ def main(argv=None):
         parser.print_help()
         return 0
 
+    if args.crashstorage:
+        with outputter() as out:
+            crash_ids = []
+            for crash_id in crashids_iterable:
+                crash_id = crash_id.strip()
+                parsed_crash_id = parse_crashid(crash_id)
+                if not parsed_crash_id:
+                    out.warning(f"Error: {crash_id} is not a valid crash id")
+                    continue
+                crash_ids.append(parsed_crash_id)
+
+            source = CrashStorageSource(args.crashstorage, crash_ids)
+            return run_bulk_mode(out, source, generator_kwargs, args)
+
     with outputter() as out:
         for index, crash_id in enumerate(crashids_iterable):
             if index > 0:
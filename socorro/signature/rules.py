@@ -2,15 +2,14 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
-from contextlib import suppress
-from functools import partial
+from functools import lru_cache, partial
 from itertools import islice
 import json
 import re
 
 from glom import glom
 
-from .siglists_utils import get_signature_list_content
+from .siglists_utils import get_signature_list_content, SentinelIndex, SiglistMatcher
 from .utils import (
     collapse,
     drop_bad_characters,
@@ -25,6 +24,9 @@ from .utils import (
 SIGNATURE_MAX_LENGTH = 255
 MAXIMUM_FRAMES_TO_CONSIDER = 40
 
+# Maximum number of normalized function symbols CSignatureTool keeps
+FRAME_CACHE_SIZE = 20_000
+
 
 def join_ignore_empty(delimiter, list_of_strings):
     return delimiter.join(x for x in list_of_strings if x)
@@ -73,20 +75,42 @@ class CSignatureTool:
     normalizes frames and then runs them through the siglists to determine which frames
     should be part of the signature.
 
+    The same functions show up in most crash reports, so normalized function symbols
+    are kept in a thread-safe LRU cache. The cache is cleared when the siglists are
+    loaded. ``cache_info()`` returns the cache statistics.
+
     """
 
     hang_prefixes = {-1: "hang", 1: "chromehang"}
 
-    def __init__(self, datadir=None):
+    def __init__(self, datadir=None, frame_cache_size=FRAME_CACHE_SIZE):
         """
         :param datadir: the directory holding signature lists to use or ``None`` to
             use included signature lists
+        :param frame_cache_size: maximum number of normalized function symbols to
+            cache
         """
         super().__init__()
 
         self.datadir = datadir
-        if datadir is not None:
-            get_contents = partial(get_signature_list_content, source=datadir)
+
+        self.collapse_arguments = True
+
+        self.fixup_space = re.compile(r" (?=[\*&,])")
+        self.fixup_comma = re.compile(r",(?! )")
+        self.fixup_hash = re.compile(r"::h[0-9a-fA-F]+$")
+        self.fixup_lambda_numbers = re.compile(r"::\$_\d+::")
+
+        self._normalize_function_cached = lru_cache(maxsize=frame_cache_size)(
+            self._normalize_function
+        )
+
+        self.load_signature_lists()
+
+    def load_signature_lists(self):
+        """Loads the siglists and clears the normalized function cache."""
+        if self.datadir is not None:
+            get_contents = partial(get_signature_list_content, source=self.datadir)
         else:
             get_contents = get_signature_list_content
 
@@ -99,18 +123,43 @@ class CSignatureTool:
         )
         self.signature_sentinels = get_contents("signature_sentinels")
 
-        self.collapse_arguments = True
+        # Normalized functions depend on signatures_with_line_numbers_re
+        self._normalize_function_cached.cache_clear()
 
-        self.fixup_space = re.compile(r" (?=[\*&,])")
-        self.fixup_comma = re.compile(r",(?! )")
-        self.fixup_hash = re.compile(r"::h[0-9a-fA-F]+$")
-        self.fixup_lambda_numbers = re.compile(r"::\$_\d+::")
+    def cache_info(self):
+        """Returns the normalized function cache statistics.
+
+        :returns: ``functools.lru_cache`` cache info with ``hits``, ``misses``,
+            ``maxsize``, and ``currsize``
+
+        """
+        return self._normalize_function_cached.cache_info()
+
+    def share_frame_cache(self, other):
+        """Uses another tool's normalized function cache.
+
+        Normalized functions only depend on the ``signatures_with_line_numbers_re``
+        siglist, so this is only valid when both tools load the same one. Loading
+        siglists in either tool clears the shared cache.
+
+        :param other: the ``CSignatureTool`` whose cache to use
+
+        """
+        self._normalize_function_cached = other._normalize_function_cached
+
+    @property
+    def signature_sentinels(self):
+        return self._signature_sentinels
+
+    @signature_sentinels.setter
+    def signature_sentinels(self, sentinels):
+        self._signature_sentinels = SentinelIndex(sentinels)
 
     def build_re(self, lines):
-        return re.compile("|".join(lines))
+        return SiglistMatcher(lines)
 
-    def normalize_rust_function(self, function, line):
-        """Normalizes a single Rust frame with a function."""
+    def collapse_rust_function(self, function):
+        """Collapses a Rust function symbol before line numbers and fixups."""
         # Drop the prefix and return type if there is any
         function = drop_prefix_and_return_type(function)
 
@@ -129,6 +178,10 @@ class CSignatureTool:
                 function, open_string="(", close_string=")", replacement=""
             )
 
+        return function
+
+    def finish_rust_function(self, function, line):
+        """Adds the line number if needed and fixes up a collapsed Rust function."""
         if self.signatures_with_line_numbers_re.match(function):
             function = f"{function}:{line}"
 
@@ -143,8 +196,12 @@ class CSignatureTool:
 
         return function
 
-    def normalize_cpp_function(self, function, line):
-        """Normalizes a single cpp frame with a function"""
+    def normalize_rust_function(self, function, line):
+        """Normalizes a single Rust frame with a function."""
+        return self.finish_rust_function(self.collapse_rust_function(function), line)
+
+    def collapse_cpp_function(self, function):
+        """Collapses a cpp function symbol before line numbers and fixups."""
         # Drop member function cv/ref qualifiers like const, const&, const &,
         # &, and &&
         for ref in ("const", "const&", "const &", "&&", "&"):
@@ -191,6 +248,10 @@ class CSignatureTool:
                 function, open_string="[", close_string="]", replacement=""
             )
 
+        return function
+
+    def finish_cpp_function(self, function, line):
+        """Adds the line number if needed and fixes up a collapsed cpp function."""
         if self.signatures_with_line_numbers_re.match(function):
             function = f"{function}:{line}"
 
@@ -202,6 +263,30 @@ class CSignatureTool:
 
         return function
 
+    def normalize_cpp_function(self, function, line):
+        """Normalizes a single cpp frame with a function"""
+        return self.finish_cpp_function(self.collapse_cpp_function(function), line)
+
+    def _normalize_function(self, is_rust, function, collapse_arguments):
+        """Normalizes a function symbol for the cache.
+
+        ``collapse_arguments`` is part of the cache key.
+
+        :returns: ``(collapsed function, normalized function)`` tuple where the
+            normalized function is None if it depends on the line number
+
+        """
+        if is_rust:
+            collapsed = self.collapse_rust_function(function)
+            finish = self.finish_rust_function
+        else:
+            collapsed = self.collapse_cpp_function(function)
+            finish = self.finish_cpp_function
+
+        if self.signatures_with_line_numbers_re.match(collapsed):
+            return collapsed, None
+        return collapsed, finish(collapsed, None)
+
     def normalize_frame(
         self,
         module=None,
@@ -227,12 +312,19 @@ class CSignatureTool:
         # If there's a function symbol, use that--it's the best
         if function:
             # If there's a filename and it ends in .rs, then normalize the function
-            # symbol using Rust rules
-            if file and (parse_source_file(file) or "").endswith(".rs"):
-                return self.normalize_rust_function(function=function, line=line)
+            # symbol using Rust rules; otherwise normalize the function symbol with
+            # C/C++ rules
+            is_rust = bool(file) and (parse_source_file(file) or "").endswith(".rs")
+            collapsed, normalized = self._normalize_function_cached(
+                is_rust, function, self.collapse_arguments
+            )
+            if normalized is not None:
+                return normalized
 
-            # Otherwise normalize the function symbol with C/C++ rules
-            return self.normalize_cpp_function(function=function, line=line)
+            # Functions with line numbers aren't cached with the line number
+            if is_rust:
+                return self.finish_rust_function(collapsed, line)
+            return self.finish_cpp_function(collapsed, line)
 
         # If there's a file and line number, use that
         if file and line:
@@ -347,17 +439,8 @@ class CSignatureTool:
             debug_notes.append(f"using signature lists from {self.datadir}")
 
         # Shorten source_list to the first sentinel found
-        sentinel_locations = []
-        for a_sentinel in self.signature_sentinels:
-            if type(a_sentinel) is tuple:
-                a_sentinel, condition_fn = a_sentinel
-                if not condition_fn(source_list):
-                    continue
-            with suppress(ValueError):
-                sentinel_locations.append(source_list.index(a_sentinel))
-
-        if sentinel_locations:
-            min_index = min(sentinel_locations)
+        min_index = self.signature_sentinels.find(source_list)
+        if min_index is not None:
             debug_notes.append(
                 'sentinel; starting at "{}" index {}'.format(
                     source_list[min_index], min_index
@@ -994,11 +1077,18 @@ class StackwalkerErrorSignatureRule(Rule):
 
 
 class SignatureRunWatchDog(Rule):
-    """Prepends ``shutdownhang`` to signature for shutdown hang crashes."""
+    """Prepends ``shutdownhang`` to signature for shutdown hang crashes.
 
-    def __init__(self):
+    :param signature_list_dir: path to the directory with the signature lists to use or
+        ``None`` if you want to use the included ones
+
+    """
+
+    def __init__(self, signature_list_dir=None):
         super().__init__()
-        self.signature_generation_rule = SignatureGenerationRule()
+        self.signature_generation_rule = SignatureGenerationRule(
+            signature_list_dir=signature_list_dir
+        )
 
     def predicate(self, crash_data, result):
         return "RunWatchdog" in result.signature
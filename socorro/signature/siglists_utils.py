@@ -2,6 +2,7 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+from contextlib import suppress
 from pathlib import Path
 import re
 
@@ -97,3 +98,204 @@ def get_signature_list_content(name, source=INCLUDED):
         lines = lines + _SPECIAL_EXTENDED_VALUES[source]
 
     return tuple(lines)
+
+
+# Characters that mean something in a regular expression outside of a character class
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]()|")
+
+# Metacharacters that can repeat the character before them
+_REGEX_QUANTIFIERS = frozenset("*+?{")
+
+# Things that make a regular expression mean something different when it's part of
+# an alternation: backreferences refer to groups by number and global flags apply to
+# the whole pattern
+_ALTERNATION_SENSITIVE_RE = re.compile(r"\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)")
+
+
+def _has_alternatives(line):
+    """Returns whether a regular expression has a ``|`` that isn't escaped."""
+    i = 0
+    while i < len(line):
+        if line[i] == "\\":
+            i += 2
+            continue
+        if line[i] == "|":
+            return True
+        i += 1
+    return False
+
+
+def split_literal_prefix(line):
+    """Splits a regular expression into literal text and the rest.
+
+    Every match of the regular expression starts with the literal text and the rest
+    of the regular expression matches what follows it.
+
+    :param line: the regular expression
+
+    :returns: ``(prefix, rest)`` tuple; ``rest`` is ``""`` if the regular expression
+        only matches the literal text
+
+    """
+    if _has_alternatives(line):
+        # Alternatives can start with anything
+        return "", line
+
+    # List of (character, index in line where the character starts)
+    prefix = []
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char == "\\":
+            escaped = line[i + 1 : i + 2]
+            if not escaped or escaped.isalnum() or escaped == "_":
+                # Character classes, anchors, and other special sequences
+                break
+            prefix.append((escaped, i))
+            i += 2
+            continue
+
+        if char in _REGEX_METACHARACTERS:
+            if char in _REGEX_QUANTIFIERS and prefix:
+                # The quantifier applies to the last character, so it's part of
+                # the rest
+                i = prefix.pop()[1]
+            break
+
+        prefix.append((char, i))
+        i += 1
+
+    return "".join(char for char, _ in prefix), line[i:]
+
+
+class _TrieNode:
+    __slots__ = ("children", "literal", "rests")
+
+    def __init__(self):
+        self.children = {}
+        # Whether a siglist line is exactly the text up to here
+        self.literal = False
+        # Regular expressions for the rest of siglist lines that start with the
+        # text up to here
+        self.rests = []
+
+    def build_pattern(self):
+        if self.literal:
+            # The text matches once it gets here, so nothing after this matters
+            return ""
+
+        alternatives = [f"(?:{rest})" for rest in self.rests]
+        for char, child in sorted(self.children.items()):
+            alternatives.append(re.escape(char) + child.build_pattern())
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+
+class SiglistMatcher:
+    """Matches strings against a siglist of regular expressions.
+
+    ``matcher.match(text)`` matches if and only if
+    ``re.compile("|".join(lines)).match(text)`` matches. The regular expression
+    engine tries the alternatives of that alternation one by one, so this puts the
+    siglist lines in a trie keyed on their literal prefixes and compiles the trie into
+    a regular expression that shares prefixes. Matching a frame then walks the trie
+    once and only runs the rest of a siglist line for frames that start with the
+    line's literal prefix.
+
+    Siglists with backreferences or global flags are matched with the alternation.
+
+    """
+
+    def __init__(self, lines):
+        """
+        :param lines: the siglist lines
+        """
+        self.pattern = "|".join(lines)
+        # Compile the alternation so invalid siglists raise the same errors
+        self.regex = re.compile(self.pattern)
+
+        if lines and not any(_ALTERNATION_SENSITIVE_RE.search(line) for line in lines):
+            root = _TrieNode()
+            for line in lines:
+                prefix, rest = split_literal_prefix(line)
+                node = root
+                for char in prefix:
+                    node = node.children.setdefault(char, _TrieNode())
+                if rest:
+                    node.rests.append(rest)
+                else:
+                    node.literal = True
+
+            with suppress(re.error, RecursionError):
+                self.regex = re.compile(root.build_pattern())
+
+        # Returns a match object or None
+        self.match = self.regex.match
+
+    def __repr__(self):
+        return f"<SiglistMatcher {self.pattern!r}>"
+
+
+class SentinelIndex:
+    """Finds the first signature sentinel in a list of frames.
+
+    Sentinels are frame strings or ``(frame, condition function)`` tuples where the
+    condition function takes the list of frames and returns whether the sentinel
+    applies. ``index.find(frames)`` returns the index of the first frame that is a
+    sentinel that applies, which is what calling ``frames.index(sentinel)`` for each
+    sentinel that applies and taking the smallest index returns.
+
+    Sentinels are kept in a dict so this is one pass over the frames. Condition
+    functions only run when their sentinel is one of the frames.
+
+    """
+
+    def __init__(self, sentinels):
+        """
+        :param sentinels: the sentinels
+        """
+        self.sentinels = tuple(sentinels)
+
+        # Map of sentinel -> list of condition functions; sentinels that always apply
+        # have an empty list
+        self.conditions = {}
+        unconditional = set()
+        for sentinel in self.sentinels:
+            if type(sentinel) is tuple:
+                sentinel, condition_fn = sentinel
+                self.conditions.setdefault(sentinel, []).append(condition_fn)
+            else:
+                unconditional.add(sentinel)
+        for sentinel in unconditional:
+            self.conditions[sentinel] = []
+
+    def __repr__(self):
+        return f"<SentinelIndex {self.sentinels!r}>"
+
+    def __iter__(self):
+        return iter(self.sentinels)
+
+    def __len__(self):
+        return len(self.sentinels)
+
+    def find(self, frames):
+        """Returns the index of the first sentinel in frames.
+
+        :param frames: list of normalized frames
+
+        :returns: index or ``None`` if no sentinels apply
+
+        """
+        if self.conditions.keys().isdisjoint(frames):
+            return None
+
+        rejected = set()
+        for i, frame in enumerate(frames):
+            condition_fns = self.conditions.get(frame)
+            if condition_fns is None or frame in rejected:
+                continue
+            if not condition_fns or any(fn(frames) for fn in condition_fns):
+                return i
+            rejected.add(frame)
+        return None
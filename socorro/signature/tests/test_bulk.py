@@ -0,0 +1,164 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import os
+
+import pytest
+
+from ..bulk import (
+    DirectorySource,
+    get_source,
+    JSONLSource,
+    Regenerator,
+    run_bulk,
+    run_pool,
+)
+from ..cmd_signature import main
+
+
+def build_processed_crash(crash_id, signature, function):
+    return {
+        "uuid": crash_id,
+        "signature": signature,
+        "json_dump": {
+            "crashing_thread": 0,
+            "threads": [{"frames": [{"frame": 0, "function": function}]}],
+        },
+    }
+
+
+CRASHES = [
+    build_processed_crash("de1bb258-cbbf-4589-a673-34f800160918", "foo", "foo"),
+    build_processed_crash("de1bb258-cbbf-4589-a673-34f800160919", "old", "bar"),
+    build_processed_crash("de1bb258-cbbf-4589-a673-34f800160920", "baz", "baz"),
+]
+
+
+@pytest.fixture
+def jsonl_path(tmp_path):
+    path = tmp_path / "crashes.jsonl"
+    path.write_text(
+        "\n".join(json.dumps(crash) for crash in CRASHES) + "\n",
+    )
+    return str(path)
+
+
+@pytest.fixture
+def crash_dir(tmp_path):
+    path = tmp_path / "processed_crash"
+    path.mkdir()
+    for crash in CRASHES:
+        (path / crash["uuid"]).write_text(json.dumps(crash))
+    return str(path)
+
+
+def test_get_source(jsonl_path, crash_dir):
+    assert isinstance(get_source(jsonl_path), JSONLSource)
+    assert isinstance(get_source(crash_dir), DirectorySource)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_run_bulk_jsonl(jsonl_path, workers):
+    results = list(run_bulk(JSONLSource(jsonl_path), workers=workers, chunksize=1))
+    assert [
+        (crash_id, old_sig, result.signature, error)
+        for crash_id, old_sig, result, error in results
+    ] == [
+        ("de1bb258-cbbf-4589-a673-34f800160918", "foo", "foo", None),
+        ("de1bb258-cbbf-4589-a673-34f800160919", "old", "bar", None),
+        ("de1bb258-cbbf-4589-a673-34f800160920", "baz", "baz", None),
+    ]
+
+
+def test_run_bulk_directory(crash_dir):
+    results = list(run_bulk(DirectorySource(crash_dir)))
+    assert [result.signature for _, _, result, _ in results] == ["foo", "bar", "baz"]
+
+
+def test_directory_source_only_processed_crashes(tmp_path):
+    # fetch_crash_data output has raw crashes and dumps next to processed crashes
+    crash_id = CRASHES[0]["uuid"]
+    for name in ["raw_crash", "dump_names", "upload_file_minidump", "processed_crash"]:
+        (tmp_path / "v1" / name).mkdir(parents=True)
+        (tmp_path / "v1" / name / crash_id).write_text(json.dumps(CRASHES[0]))
+
+    source = DirectorySource(str(tmp_path))
+    assert list(source.items()) == [str(tmp_path / "v1" / "processed_crash" / crash_id)]
+
+
+class FailingRegenerator(Regenerator):
+    def process(self, processed_crash):
+        if processed_crash["signature"] == "old":
+            raise ValueError("bad crash")
+        return super().process(processed_crash)
+
+
+def test_run_pool_process_error(jsonl_path):
+    results = list(run_pool(JSONLSource(jsonl_path), FailingRegenerator()))
+    assert [(crash_id, error) for crash_id, _, error in results] == [
+        ("de1bb258-cbbf-4589-a673-34f800160918", None),
+        ("de1bb258-cbbf-4589-a673-34f800160919", "ValueError: bad crash"),
+        ("de1bb258-cbbf-4589-a673-34f800160920", None),
+    ]
+
+
+class TrackingJSONLSource(JSONLSource):
+    def __init__(self, path, marker_dir):
+        super().__init__(path)
+        self.marker_dir = marker_dir
+
+    def teardown(self):
+        if self.fp is not None:
+            (self.marker_dir / str(os.getpid())).touch()
+        super().teardown()
+
+
+def test_run_pool_workers_teardown(jsonl_path, tmp_path):
+    marker_dir = tmp_path / "teardown"
+    marker_dir.mkdir()
+    source = TrackingJSONLSource(jsonl_path, marker_dir)
+    results = list(run_pool(source, Regenerator(), workers=2, chunksize=1))
+    assert len(results) == 3
+    # Every worker process closed the file it opened in setup
+    assert len(list(marker_dir.iterdir())) == 2
+
+
+def test_run_bulk_bad_line(tmp_path):
+    path = tmp_path / "crashes.jsonl"
+    path.write_text("{bad json\n" + json.dumps(CRASHES[0]) + "\n")
+
+    results = list(run_bulk(JSONLSource(str(path))))
+    crash_id, old_sig, result, error = results[0]
+    assert crash_id == f"{path}:1"
+    assert result is None
+    assert error.startswith("JSONDecodeError")
+    assert results[1][2].signature == "foo"
+
+
+def test_main_bulk(jsonl_path, capsys):
+    ret = main(
+        [
+            "--processed-crashes",
+            jsonl_path,
+            "--format=jsonl",
+            "--different-only",
+            "--workers=1",
+        ]
+    )
+    assert ret == 0
+
+    captured = capsys.readouterr()
+    lines = [json.loads(line) for line in captured.out.splitlines()]
+    assert lines == [
+        {
+            "crashid": "de1bb258-cbbf-4589-a673-34f800160919",
+            "old": "old",
+            "new": "bar",
+            "same": False,
+            "notes": [],
+        }
+    ]
+    assert "Done: 3 crashes" in captured.err
+    assert "1 changed, 0 errors" in captured.err
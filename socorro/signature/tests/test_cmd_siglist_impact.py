@@ -0,0 +1,251 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+
+import pytest
+
+from ..cmd_siglist_impact import (
+    ImpactAnalyzer,
+    ImpactReport,
+    SIGLIST_NAMES,
+    SiglistDiff,
+    get_c_signature_tool,
+    main,
+)
+from ..generator import SignatureGenerator
+from ..siglists_utils import get_filepath
+from ..utils import convert_to_crash_data
+
+
+def build_processed_crash(crash_id, functions):
+    return {
+        "uuid": crash_id,
+        "signature": "",
+        "json_dump": {
+            "crashing_thread": 0,
+            "threads": [
+                {
+                    "frames": [
+                        {"frame": i, "function": function}
+                        for i, function in enumerate(functions)
+                    ]
+                }
+            ],
+        },
+    }
+
+
+CRASHES = [
+    build_processed_crash("de1bb258-cbbf-4589-a673-34f800160918", ["foo", "caller"]),
+    build_processed_crash("de1bb258-cbbf-4589-a673-34f800160919", ["bar", "caller"]),
+    build_processed_crash(
+        "de1bb258-cbbf-4589-a673-34f800160920", ["mozalloc_abort", "baz", "caller"]
+    ),
+    {
+        "uuid": "de1bb258-cbbf-4589-a673-34f800160921",
+        "signature": "",
+        "java_stack_trace": "java.lang.NullPointerException: foo\n\tat a.b.c(d.java:1)",
+    },
+]
+
+
+@pytest.fixture
+def make_siglists(tmp_path):
+    """Returns a function that copies the included siglists and appends lines"""
+
+    def _make_siglists(name, **additions):
+        path = tmp_path / name
+        path.mkdir()
+        for siglist_name in SIGLIST_NAMES:
+            content = get_filepath(siglist_name).read_text()
+            lines = additions.get(siglist_name, [])
+            if lines:
+                content = content + "\n" + "\n".join(lines) + "\n"
+            (path / f"{siglist_name}.txt").write_text(content)
+        return str(path)
+
+    return _make_siglists
+
+
+def test_diff_no_changes(make_siglists):
+    diff = SiglistDiff(None, make_siglists("proposed"))
+    assert not diff.has_changes
+    assert not diff.normalization_changed
+    assert not diff.may_affect(["foo", "bar"])
+
+
+def test_diff(make_siglists):
+    current = make_siglists("current", signature_sentinels=["old_sentinel"])
+    proposed = make_siglists(
+        "proposed", prefix_signature_re=["foo"], irrelevant_signature_re=["ba[rz]"]
+    )
+    diff = SiglistDiff(current, proposed)
+
+    assert diff.has_changes
+    assert not diff.normalization_changed
+    assert diff.changes["prefix_signature_re"] == ([], ["foo"])
+    assert diff.changes["irrelevant_signature_re"] == ([], ["ba[rz]"])
+    assert diff.changes["signature_sentinels"] == (["old_sentinel"], [])
+
+    assert diff.may_affect(["foo"])
+    assert diff.may_affect(["caller", "baz"])
+    assert diff.may_affect(["old_sentinel"])
+    assert not diff.may_affect(["caller", "old_sentinel_not"])
+
+
+@pytest.mark.parametrize(
+    "additions",
+    [
+        {"prefix_signature_re": ["foo"]},
+        {"irrelevant_signature_re": ["baz"]},
+        {"signature_sentinels": ["caller"]},
+        {"signatures_with_line_numbers_re": ["bar"]},
+    ],
+)
+def test_analyzer_matches_proposed_generator(make_siglists, additions):
+    proposed = make_siglists("proposed", **additions)
+    analyzer = ImpactAnalyzer(None, proposed)
+    analyzer.setup()
+
+    generator = SignatureGenerator(signature_list_dir=proposed)
+    for processed_crash in CRASHES:
+        crash_data = convert_to_crash_data(processed_crash)
+        _, proposed_signature, _ = analyzer.process(processed_crash)
+        assert proposed_signature == generator.generate(crash_data).signature
+
+
+def test_analyzer_skips_unaffected(make_siglists):
+    proposed = make_siglists("proposed", prefix_signature_re=["foo"])
+    analyzer = ImpactAnalyzer(None, proposed)
+    analyzer.setup()
+
+    # The proposed generator shares the current generator's frame cache
+    assert (
+        get_c_signature_tool(analyzer.proposed)._normalize_function_cached
+        is get_c_signature_tool(analyzer.current)._normalize_function_cached
+    )
+
+    assert analyzer.process(CRASHES[0]) == ("foo", "foo | caller", True)
+    assert analyzer.process(CRASHES[1]) == ("bar", "bar", False)
+    assert analyzer.process(CRASHES[3])[2] is False
+
+
+def test_analyzer_shutdownhang(tmp_path, make_siglists):
+    # SignatureRunWatchDog regenerates the signature from thread 0, but the crashing
+    # thread frames still decide whether the crash is a shutdown hang
+    proposed = make_siglists("proposed")
+    irrelevant_path = tmp_path / "proposed" / "irrelevant_signature_re.txt"
+    irrelevant_path.write_text(
+        "\n".join(
+            line
+            for line in irrelevant_path.read_text().splitlines()
+            if line.strip() != "ashmem"
+        )
+    )
+    processed_crash = {
+        "uuid": "de1bb258-cbbf-4589-a673-34f800160922",
+        "signature": "",
+        "json_dump": {
+            "crash_info": {"crashing_thread": 1},
+            "threads": [
+                {"frames": [{"frame": 0, "function": "Thread0Func"}]},
+                {
+                    "frames": [
+                        {"frame": 0, "function": "ashmem"},
+                        {
+                            "frame": 1,
+                            "function": "mozilla::(anonymous namespace)::RunWatchdog",
+                        },
+                    ]
+                },
+            ],
+        },
+    }
+
+    analyzer = ImpactAnalyzer(None, proposed)
+    analyzer.setup()
+    assert analyzer.process(processed_crash) == (
+        "shutdownhang | Thread0Func",
+        "ashmem",
+        True,
+    )
+
+
+def test_analyzer_shutdownhang_thread_0(make_siglists):
+    # The proposed generator reruns thread 0 with the proposed signature lists
+    proposed = make_siglists("proposed", prefix_signature_re=["Thread0Func"])
+    processed_crash = {
+        "uuid": "de1bb258-cbbf-4589-a673-34f800160923",
+        "signature": "",
+        "json_dump": {
+            "crash_info": {"crashing_thread": 1},
+            "threads": [
+                {
+                    "frames": [
+                        {"frame": 0, "function": "Thread0Func"},
+                        {"frame": 1, "function": "caller"},
+                    ]
+                },
+                {
+                    "frames": [
+                        {
+                            "frame": 0,
+                            "function": "mozilla::(anonymous namespace)::RunWatchdog",
+                        },
+                    ]
+                },
+            ],
+        },
+    }
+
+    analyzer = ImpactAnalyzer(None, proposed)
+    analyzer.setup()
+    assert analyzer.process(processed_crash) == (
+        "shutdownhang | Thread0Func",
+        "shutdownhang | Thread0Func | caller",
+        True,
+    )
+
+
+def test_analyzer_normalization_changed(make_siglists):
+    proposed = make_siglists("proposed", signatures_with_line_numbers_re=["bar"])
+    analyzer = ImpactAnalyzer(None, proposed)
+    analyzer.setup()
+
+    assert (
+        get_c_signature_tool(analyzer.proposed)._normalize_function_cached
+        is not get_c_signature_tool(analyzer.current)._normalize_function_cached
+    )
+    assert analyzer.process(CRASHES[0]) == ("foo", "foo", True)
+
+
+def test_report():
+    report = ImpactReport()
+    report.add("a", "a", False)
+    report.add("b", "b | c", True)
+    report.add("d", "d | e", True)
+    report.add("d", "d | e", True)
+    report.add("f", "f", True)
+
+    assert report.stats.processed == 5
+    assert report.stats.changed == 3
+    assert report.evaluated == 4
+    assert report.rows() == [(2, "d", "d | e"), (1, "b", "b | c")]
+
+
+def test_main(make_siglists, tmp_path, capsys):
+    proposed = make_siglists("proposed", prefix_signature_re=["foo"])
+    path = tmp_path / "crashes.jsonl"
+    path.write_text("\n".join(json.dumps(crash) for crash in CRASHES * 2) + "\n")
+
+    ret = main(["--format=jsonl", "--workers=1", proposed, str(path)])
+    assert ret == 0
+
+    captured = capsys.readouterr()
+    assert [json.loads(line) for line in captured.out.splitlines()] == [
+        {"count": 2, "old": "foo", "new": "foo | caller"}
+    ]
+    assert "Done: 8 crashes" in captured.err
+    assert "2 changed, 0 errors; 2 evaluated" in captured.err
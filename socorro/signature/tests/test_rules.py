@@ -424,6 +424,63 @@ class TestCSignatureTool:
         s = self.setup_config_c_sig_tool()
         assert s.normalize_rust_function(function, line) == expected
 
+    def test_normalize_frame_cache(self):
+        s = self.setup_config_c_sig_tool()
+
+        assert s.normalize_frame(function="void Alpha<Bravo>::Echo(int)") == (
+            "Alpha<T>::Echo"
+        )
+        assert s.normalize_frame(function="void Alpha<Bravo>::Echo(int)") == (
+            "Alpha<T>::Echo"
+        )
+        cache_info = s.cache_info()
+        assert (cache_info.hits, cache_info.misses) == (1, 1)
+
+        # Rust and C/C++ rules are cached separately
+        assert (
+            s.normalize_frame(
+                function="expect_failed::h7f635057bfba806a", file="/src/a.rs"
+            )
+            == "expect_failed"
+        )
+        assert (
+            s.normalize_frame(
+                function="expect_failed::h7f635057bfba806a", file="/src/a.cpp"
+            )
+            == "expect_failed::h7f635057bfba806a"
+        )
+
+        # Line numbers are added to cached functions that need them
+        assert s.normalize_frame(function="fnNeedNumber", line=1) == "fnNeedNumber:1"
+        assert s.normalize_frame(function="fnNeedNumber", line=2) == "fnNeedNumber:2"
+
+    def test_normalize_frame_cache_cleared_on_load(self):
+        s = rules.CSignatureTool()
+        s.normalize_frame(function="js::RunScript", line=10)
+        assert s.cache_info().currsize == 1
+
+        s.load_signature_lists()
+        assert s.cache_info().currsize == 0
+
+    def test_normalize_frame_cache_disabled(self):
+        s = rules.CSignatureTool(frame_cache_size=0)
+        assert s.normalize_frame(function="void Alpha<Bravo>::Echo(int)") == (
+            "Alpha<T>::Echo"
+        )
+        assert s.cache_info().currsize == 0
+
+    def test_share_frame_cache(self):
+        s = rules.CSignatureTool()
+        other = rules.CSignatureTool()
+        other.share_frame_cache(s)
+
+        s.normalize_frame(function="void Alpha<Bravo>::Echo(int)")
+        assert other.normalize_frame(function="void Alpha<Bravo>::Echo(int)") == (
+            "Alpha<T>::Echo"
+        )
+        cache_info = other.cache_info()
+        assert (cache_info.hits, cache_info.misses) == (1, 1)
+
     def test_generate_1(self):
         """test_generate_1: simple"""
         s = self.setup_config_c_sig_tool(ig=["a", "b", "c"], pr=["d", "e", "f"])
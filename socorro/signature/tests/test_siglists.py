@@ -4,6 +4,7 @@
 
 import importlib
 from pathlib import Path
+import re
 
 import pytest
 
@@ -55,3 +56,154 @@ class TestSigLists:
         assert "BadRegularExpressionLineError: Regex error: " in msg
         assert msg.endswith("at line 3")
         assert "test-invalid-sig-list.txt" in msg
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("fooBarStuff", ("fooBarStuff", "")),
+        (r"\(anonymous namespace\)::Foo", ("(anonymous namespace)::Foo", "")),
+        ("moz::.*", ("moz::", ".*")),
+        ("@0x[0-9a-fA-F]{2,}", ("@0x", "[0-9a-fA-F]{2,}")),
+        # Quantifiers apply to the character before them
+        ("_?pthread", ("", "_?pthread")),
+        ("abc*", ("ab", "c*")),
+        (r"ab\.?c", ("ab", r"\.?c")),
+        ("abc+d", ("ab", "c+d")),
+        ("{virtual override thunk}", ("", "{virtual override thunk}")),
+        # Special sequences and alternatives aren't literal
+        (r"foo\d", ("foo", r"\d")),
+        ("lstrcat(A|W)", ("", "lstrcat(A|W)")),
+        (r"a\|b", ("a|b", "")),
+        ("", ("", "")),
+    ],
+)
+def test_split_literal_prefix(line, expected):
+    assert siglists_utils.split_literal_prefix(line) == expected
+
+
+def build_texts(lines):
+    """Builds strings that match or almost match siglist lines."""
+    texts = set()
+    for line in lines:
+        for base in (line, line.replace("\\", "")):
+            for i in range(len(base) + 1):
+                texts.add(base[:i])
+                texts.add(base[:i] + "x")
+            texts.add(base + "::Method")
+            texts.add("x" + base)
+    return sorted(texts)
+
+
+class TestSiglistMatcher:
+    @pytest.mark.parametrize(
+        "name",
+        [
+            "irrelevant_signature_re",
+            "prefix_signature_re",
+            "signatures_with_line_numbers_re",
+        ],
+    )
+    def test_included_siglists(self, name):
+        lines = siglists_utils.get_signature_list_content(name)
+        matcher = siglists_utils.SiglistMatcher(lines)
+        alternation = re.compile("|".join(lines))
+
+        assert matcher.pattern == alternation.pattern
+        for text in build_texts(lines):
+            assert bool(matcher.match(text)) == bool(alternation.match(text)), text
+
+    @pytest.mark.parametrize(
+        "lines",
+        [
+            # Empty siglists match everything
+            [],
+            [""],
+            ["fooBar", "foo", "moz::.*", "@0x[0-9a-fA-F]{2,}", "_?pthread"],
+            # Backreferences and global flags change meaning in an alternation
+            [r"(a)b", r"c\1"],
+            ["(?i)abc", "def"],
+        ],
+    )
+    def test_matches_alternation(self, lines):
+        matcher = siglists_utils.SiglistMatcher(lines)
+        alternation = re.compile("|".join(lines))
+        texts = build_texts(lines) + ["", "ABC", "DEF", "ca", "cb", "foob", "@0x1"]
+        for text in texts:
+            assert bool(matcher.match(text)) == bool(alternation.match(text)), text
+
+    def test_invalid(self):
+        with pytest.raises(re.error):
+            siglists_utils.SiglistMatcher(["(foo", "bar"])
+
+
+def find_sentinel(sentinels, frames):
+    """Finds the first sentinel by calling frames.index for each sentinel"""
+    locations = []
+    for sentinel in sentinels:
+        if type(sentinel) is tuple:
+            sentinel, condition_fn = sentinel
+            if not condition_fn(frames):
+                continue
+        if sentinel in frames:
+            locations.append(frames.index(sentinel))
+    return min(locations) if locations else None
+
+
+class TestSentinelIndex:
+    SENTINELS = (
+        "a",
+        ("b", lambda frames: "z" in frames),
+        "c",
+        ("c", lambda frames: False),
+        ("d", lambda frames: False),
+        ("d", lambda frames: "y" in frames),
+    )
+
+    @pytest.mark.parametrize(
+        "frames, expected",
+        [
+            ([], None),
+            (["x", "y"], None),
+            (["x", "a"], 1),
+            (["x", "c", "a"], 1),
+            # Conditional sentinel that doesn't apply
+            (["x", "b", "a"], 2),
+            (["x", "b", "z"], 1),
+            # Sentinel with more than one condition
+            (["d", "x"], None),
+            (["d", "y"], 0),
+        ],
+    )
+    def test_find(self, frames, expected):
+        index = siglists_utils.SentinelIndex(self.SENTINELS)
+        assert index.find(frames) == expected
+        assert find_sentinel(self.SENTINELS, frames) == expected
+
+    def test_matches_index_search(self):
+        index = siglists_utils.SentinelIndex(self.SENTINELS)
+        alphabet = ["a", "b", "c", "d", "x", "y", "z"]
+        for i in range(2000):
+            frames = [alphabet[(i * 7 + j * j) % len(alphabet)] for j in range(i % 9)]
+            assert index.find(frames) == find_sentinel(self.SENTINELS, frames), frames
+
+    def test_conditions_only_run_for_present_sentinels(self):
+        calls = []
+
+        def condition_fn(frames):
+            calls.append(frames)
+            return False
+
+        index = siglists_utils.SentinelIndex(["a", ("b", condition_fn)])
+        assert index.find(["x", "a"]) == 1
+        assert calls == []
+
+        # Conditions run once even if the sentinel is in the frames more than once
+        assert index.find(["b", "x", "b"]) is None
+        assert calls == [["b", "x", "b"]]
+
+    def test_iter(self):
+        sentinels = siglists_utils.get_signature_list_content("signature_sentinels")
+        index = siglists_utils.SentinelIndex(sentinels)
+        assert tuple(index) == sentinels
+        assert len(index) == len(sentinels)
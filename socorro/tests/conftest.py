@@ -7,11 +7,13 @@ pytest plugins for socorro/tests/ and webapp/ test suites.
 """
 
 import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 import logging
 import os
 import pathlib
 import uuid
 import sys
+import threading
 
 from elasticsearch_dsl import Search
 from elasticsearch_dsl_0_0_11 import Search as LegacySearch
@@ -455,6 +457,34 @@ def preferred_es_helper(legacy_es_helper):
         yield from _generate_es_helper()
 
 
+class FakeElasticsearchHandler(BaseHTTPRequestHandler):
+    # Use HTTP/1.1 so connections are kept alive between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'{"status": "green"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Elastic-Product", "Elasticsearch")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_es_url():
+    """Run a fake Elasticsearch server and return its url."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeElasticsearchHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
 class PubSubHelper:
     """Helper class for setting up, tearing down, and publishing to Pub/Sub."""
 
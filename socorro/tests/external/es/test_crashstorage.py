@@ -6,21 +6,38 @@ from copy import deepcopy
 from datetime import timedelta
 from unittest import mock
 
+import elasticsearch
 import glom
 from markus.testing import AnyTagValue, MetricsMock
 import pytest
 
 from socorro import settings
 from socorro.external.es.crashstorage import (
+    build_document,
+    BULK_SERIALIZER,
+    BulkIndexError,
+    DocumentPlan,
+    ESCrashStorage,
+    estimate_json_size,
     fix_boolean,
+    fix_datetime,
     fix_integer,
     fix_keyword,
     fix_long,
     fix_string,
+    MAX_KEYWORD_FIELD_VALUE_SIZE,
+    MAX_STRING_FIELD_VALUE_SIZE,
 )
 
-from socorro.external.es.super_search_fields import build_mapping
+from socorro.external.es.super_search_fields import (
+    build_mapping,
+    FIELDS,
+    get_destination_keys,
+    get_source_key,
+    is_indexable,
+)
 from socorro.libclass import build_instance_from_settings
+from socorro.lib.batcher import BatcherClosedError
 from socorro.lib.libdatetime import date_to_string, string_to_datetime, utc_now
 from socorro.lib.libooid import create_new_ooid, date_from_ooid
 
@@ -440,6 +457,575 @@ class TestESCrashStorage:
         assert glom.glom(doc, key, default=REMOVED_VALUE) == REMOVED_VALUE
 
 
+def build_bulk_crashstorage(**kwargs):
+    crashstorage = ESCrashStorage(url="http://localhost:9200", **kwargs)
+    crashstorage.create_index = mock.Mock(return_value=False)
+    conn = mock.Mock()
+    crashstorage.client = mock.MagicMock()
+    crashstorage.client.return_value.__enter__.return_value = conn
+    return crashstorage, conn
+
+
+def bulk_response(*results):
+    return {
+        "errors": any("error" in result for result in results),
+        "items": [{"index": result} for result in results],
+    }
+
+
+class TestESBulkIndexer:
+    def test_batch_by_count(self):
+        crashstorage, conn = build_bulk_crashstorage(
+            bulk_max_documents=2, bulk_linger=None
+        )
+        conn.bulk.return_value = bulk_response(
+            {"_id": "crash1", "status": 201}, {"_id": "crash2", "status": 201}
+        )
+
+        indexer = crashstorage.bulk_indexer
+        future1 = indexer.submit("crash1", "index1", {"crash_id": "crash1"})
+        assert not future1.done()
+        future2 = indexer.submit("crash2", "index1", {"crash_id": "crash2"})
+
+        assert future1.result(timeout=1)["_id"] == "crash1"
+        assert future2.result(timeout=1)["_id"] == "crash2"
+        conn.bulk.assert_called_once()
+        assert len(conn.bulk.call_args.kwargs["operations"]) == 4
+        crashstorage.create_index.assert_called_once_with("index1")
+        indexer.close()
+
+    def test_batch_by_age(self):
+        crashstorage, conn = build_bulk_crashstorage(
+            bulk_max_documents=100, bulk_max_age=0.1
+        )
+        conn.bulk.return_value = bulk_response({"_id": "crash1", "status": 201})
+
+        future = crashstorage.bulk_indexer.submit(
+            "crash1", "index1", {"crash_id": "crash1"}
+        )
+        assert future.result(timeout=5)["_id"] == "crash1"
+        crashstorage.bulk_indexer.close()
+
+    def test_batch_by_linger(self):
+        # Workers wait for their document, so a batch can't fill up past the number
+        # of workers; it's sent once no more documents arrive
+        crashstorage, conn = build_bulk_crashstorage(
+            bulk_max_documents=100, bulk_max_age=60, bulk_linger=0.05
+        )
+        conn.bulk.return_value = bulk_response({"_id": "crash1", "status": 201})
+
+        future = crashstorage.bulk_indexer.submit(
+            "crash1", "index1", {"crash_id": "crash1"}
+        )
+        assert future.result(timeout=5)["_id"] == "crash1"
+        crashstorage.bulk_indexer.close()
+
+    def test_submit_after_close(self):
+        crashstorage, conn = build_bulk_crashstorage(bulk_max_documents=100)
+        crashstorage.close()
+
+        with pytest.raises(BatcherClosedError):
+            crashstorage.bulk_indexer.submit("crash1", "index1", {"crash_id": "crash1"})
+        conn.bulk.assert_not_called()
+
+    def test_fixable_error_retried(self):
+        crashstorage, conn = build_bulk_crashstorage(bulk_max_documents=1)
+        error = {
+            "type": "document_parsing_exception",
+            "reason": (
+                "[1:30] failed to parse field "
+                + "[processed_crash.mac_available_memory_sysctl] of type [long]"
+            ),
+            "caused_by": {"type": "number_format_exception"},
+        }
+        conn.bulk.side_effect = [
+            bulk_response({"_id": "crash1", "status": 400, "error": error}),
+            bulk_response({"_id": "crash1", "status": 201}),
+        ]
+        doc = {
+            "crash_id": "crash1",
+            "processed_crash": {"mac_available_memory_sysctl": "not a number"},
+        }
+
+        with MetricsMock() as mm:
+            future = crashstorage.bulk_indexer.submit("crash1", "index1", doc)
+            future.result(timeout=1)
+            mm.assert_incr(
+                "socorro.processor.es.indexerror",
+                tags=["error:numberformatexception", AnyTagValue("host")],
+            )
+
+        assert conn.bulk.call_count == 2
+        assert doc == {
+            "crash_id": "crash1",
+            "processed_crash": {},
+            "removed_fields": "processed_crash.mac_available_memory_sysctl",
+        }
+
+    def test_unfixable_error(self):
+        crashstorage, conn = build_bulk_crashstorage(
+            bulk_max_documents=2, bulk_linger=None
+        )
+        error = {
+            "type": "some_other_exception",
+            "reason": "something bad",
+            "caused_by": {"type": "some_other_exception"},
+        }
+        conn.bulk.return_value = bulk_response(
+            {"_id": "crash1", "status": 201},
+            {"_id": "crash2", "status": 400, "error": error},
+        )
+
+        indexer = crashstorage.bulk_indexer
+        future1 = indexer.submit("crash1", "index1", {"crash_id": "crash1"})
+        future2 = indexer.submit("crash2", "index1", {"crash_id": "crash2"})
+
+        future1.result(timeout=1)
+        with pytest.raises(BulkIndexError):
+            future2.result(timeout=1)
+        indexer.close()
+
+    def test_index_not_found_retried(self):
+        crashstorage, conn = build_bulk_crashstorage(bulk_max_documents=1)
+        error = {"type": "index_not_found_exception", "reason": "no such index"}
+        conn.bulk.side_effect = [
+            bulk_response({"_id": "crash1", "status": 404, "error": error}),
+            bulk_response({"_id": "crash1", "status": 201}),
+        ]
+
+        future = crashstorage.bulk_indexer.submit(
+            "crash1", "index1", {"crash_id": "crash1"}
+        )
+        assert future.result(timeout=1)["_id"] == "crash1"
+        assert conn.bulk.call_count == 2
+        # The index was created, forgotten when it went missing, and created again
+        assert crashstorage.create_index.call_count == 2
+
+
+def build_document_per_field(src, crash_document, fields, all_keys):
+    """Builds a document to index by walking every field for the document.
+
+    This is how documents were built before DocumentPlan. It's kept here to check
+    DocumentPlan against.
+
+    :param dict src: the source document with "processed_crash" key
+    :param dict crash_document: the document to fill
+    :param list fields: the list of fields in super search fields
+    :param set all_keys: the list of valid keys
+
+    """
+    for field in fields.values():
+        # There are some fields that aren't indexable--skip those
+        if not is_indexable(field):
+            continue
+
+        src_key = get_source_key(field)
+        value = glom.glom(src, src_key, default=None)
+        if value is None:
+            continue
+
+        # Fix values so they index correctly
+        storage_type = field.get("type", field["storage_mapping"].get("type"))
+
+        if storage_type == "keyword":
+            value = fix_keyword(value, max_size=MAX_KEYWORD_FIELD_VALUE_SIZE)
+
+        elif storage_type == "text":
+            value = fix_string(value, max_size=MAX_STRING_FIELD_VALUE_SIZE)
+
+        elif storage_type == "integer":
+            value = fix_integer(value)
+            if value is None:
+                continue
+
+        elif storage_type == "long":
+            value = fix_long(value)
+            if value is None:
+                continue
+
+        elif storage_type == "date":
+            value = fix_datetime(value)
+            if value is None:
+                continue
+
+        elif storage_type == "boolean":
+            value = fix_boolean(value)
+
+        for dest_key in get_destination_keys(field):
+            if dest_key in all_keys:
+                glom.assign(crash_document, dest_key, value, missing=dict)
+
+
+def build_processed_crash_with_all_fields(values):
+    """Build a processed crash with a value for every indexable field.
+
+    :arg values: map of storage type to list of values; fields of that type cycle
+        through the values
+
+    """
+    processed_crash = {}
+    indexable_fields = [field for field in FIELDS.values() if is_indexable(field)]
+    for i, field in enumerate(indexable_fields):
+        storage_type = field.get("type", field["storage_mapping"].get("type"))
+        type_values = values.get(storage_type, values["default"])
+        src_key = get_source_key(field).removeprefix("processed_crash.")
+        glom.assign(
+            processed_crash, src_key, type_values[i % len(type_values)], missing=dict
+        )
+    return processed_crash
+
+
+def all_indexable_keys():
+    return {
+        key
+        for field in FIELDS.values()
+        if is_indexable(field)
+        for key in get_destination_keys(field)
+    }
+
+
+class TestDocumentPlan:
+    @pytest.mark.parametrize(
+        "processed_crash",
+        [
+            pytest.param(SAMPLE_PROCESSED_CRASH, id="sample"),
+            pytest.param(
+                build_processed_crash_with_all_fields(
+                    {
+                        "keyword": ["abc", ["a", "b"], []],
+                        "text": ["abc def", ["a b", "c d"]],
+                        "integer": [10, "10"],
+                        "long": [2**40, "-5"],
+                        "boolean": [True, "true", 0, "false"],
+                        "date": ["2012-04-08 10:52:42"],
+                        "default": [1, 1.5, [1, 2]],
+                    }
+                ),
+                id="good_values",
+            ),
+            pytest.param(
+                build_processed_crash_with_all_fields(
+                    {
+                        "keyword": ["a" * 40_000, 5, [5, 6]],
+                        "text": ["\xe9" * 20_000, 5, [5, 6]],
+                        "integer": [2**40, "not a number"],
+                        "long": [2**70, "not a number"],
+                        "boolean": ["yes", None],
+                        "date": [5],
+                        "default": [{"a": [1]}],
+                    }
+                ),
+                id="bad_values",
+            ),
+        ],
+    )
+    def test_matches_build_document_per_field(self, processed_crash):
+        all_keys = all_indexable_keys()
+
+        expected = {"crash_id": "crash1", "processed_crash": {}}
+        build_document_per_field(
+            {"processed_crash": deepcopy(processed_crash)},
+            expected,
+            fields=FIELDS,
+            all_keys=all_keys,
+        )
+
+        original = deepcopy(processed_crash)
+        crash_document = {"crash_id": "crash1", "processed_crash": {}}
+        DocumentPlan(fields=FIELDS, all_keys=all_keys).build(
+            {"processed_crash": processed_crash}, crash_document
+        )
+        assert crash_document == expected
+        # The processed crash isn't changed
+        assert processed_crash == original
+
+        crash_document = {"crash_id": "crash1", "processed_crash": {}}
+        build_document(
+            {"processed_crash": processed_crash},
+            crash_document,
+            fields=FIELDS,
+            all_keys=all_keys,
+        )
+        assert crash_document == expected
+
+    def test_all_keys(self):
+        processed_crash = build_processed_crash_with_all_fields({"default": ["abc"]})
+        crash_document = {}
+        DocumentPlan(fields=FIELDS, all_keys={"processed_crash.product"}).build(
+            {"processed_crash": processed_crash}, crash_document
+        )
+        assert crash_document == {"processed_crash": {"product": "abc"}}
+
+    def test_doesnt_share_values(self):
+        fields = {
+            "stuff": {
+                "name": "stuff",
+                "namespace": "processed_crash",
+                "in_database_name": "stuff",
+                "type": "object",
+                "storage_mapping": {"type": "object"},
+            }
+        }
+        processed_crash = {"stuff": {"a": [1, 2]}}
+        crash_document = {}
+        DocumentPlan(fields=fields, all_keys={"processed_crash.stuff"}).build(
+            {"processed_crash": processed_crash}, crash_document
+        )
+        assert crash_document == {"processed_crash": {"stuff": {"a": [1, 2]}}}
+
+        del crash_document["processed_crash"]["stuff"]["a"]
+        assert processed_crash == {"stuff": {"a": [1, 2]}}
+
+    def test_field_sizes(self):
+        processed_crash = build_processed_crash_with_all_fields(
+            {
+                "keyword": ["abc", ["a", "b"]],
+                "text": ["a line with \xe9 and \u2603 " * 50],
+                "date": ["2012-04-08 10:52:42"],
+                "default": [1, 1.5, True, None],
+            }
+        )
+        crash_document = {}
+        field_sizes = {}
+        DocumentPlan(fields=FIELDS, all_keys=all_indexable_keys()).build(
+            {"processed_crash": processed_crash},
+            crash_document,
+            field_sizes=field_sizes,
+        )
+        assert field_sizes
+        for key, size in field_sizes.items():
+            value = glom.glom(crash_document, key)
+            assert size == len(BULK_SERIALIZER.dumps([value])) - 2, key
+
+
+class TestCrashDocumentSize:
+    def build_crashstorage(self, **kwargs):
+        crashstorage, conn = build_bulk_crashstorage(**kwargs)
+        document_plan = DocumentPlan(fields=FIELDS, all_keys=all_indexable_keys())
+        crashstorage.get_document_plan = mock.Mock(return_value=document_plan)
+        return crashstorage, conn
+
+    def test_size_of_sent_document(self):
+        crashstorage, conn = self.build_crashstorage()
+        processed_crash = deepcopy(SAMPLE_PROCESSED_CRASH)
+        processed_crash["signature"] = "OOM | " + ("x" * 2000)
+
+        with MetricsMock() as mm:
+            crashstorage.save_processed_crash(
+                raw_crash={}, processed_crash=processed_crash
+            )
+
+        # The document is serialized once and the size is the size of what's sent
+        body = conn.index.call_args.kwargs["body"]
+        assert isinstance(body, bytes)
+        mm.assert_histogram_once(
+            "socorro.processor.es.crash_document_size", value=len(body)
+        )
+
+        # Only big fields get a size metric
+        field_sizes = mm.filter_records(
+            "histogram", stat="socorro.processor.es.crash_document_field_size"
+        )
+        assert [record.tags[0] for record in field_sizes] == [
+            "field:processed_crash.signature"
+        ]
+        assert field_sizes[0].value == 2008
+
+    def test_size_of_sent_document_bulk(self):
+        crashstorage, conn = self.build_crashstorage(bulk_max_documents=1)
+        conn.bulk.return_value = bulk_response(
+            {"_id": SAMPLE_PROCESSED_CRASH["uuid"], "status": 201}
+        )
+
+        with MetricsMock() as mm:
+            crashstorage.save_processed_crash(
+                raw_crash={}, processed_crash=deepcopy(SAMPLE_PROCESSED_CRASH)
+            )
+
+        data = conn.bulk.call_args.kwargs["operations"][1]
+        mm.assert_histogram_once(
+            "socorro.processor.es.crash_document_size", value=len(data)
+        )
+        crashstorage.bulk_indexer.close()
+
+    def test_estimated_size(self):
+        crashstorage, _ = self.build_crashstorage()
+        crash_document = {"crash_id": "crash1", "processed_crash": {"uptime": 10}}
+        with MetricsMock() as mm:
+            crashstorage.capture_crash_metrics(crash_document)
+
+        mm.assert_histogram_once(
+            "socorro.processor.es.crash_document_size",
+            value=len(BULK_SERIALIZER.dumps(crash_document)),
+        )
+
+
+class TestKnownIndices:
+    def build_crashstorage(self, indices):
+        crashstorage = ESCrashStorage(url="http://localhost:9200")
+        crashstorage.get_indices = mock.Mock(return_value=list(indices))
+        crashstorage.create_index = mock.Mock(return_value=True)
+        conn = mock.Mock()
+        crashstorage.client = mock.MagicMock()
+        crashstorage.client.return_value.__enter__.return_value = conn
+        return crashstorage, conn
+
+    def test_ensure_index(self):
+        crashstorage, _ = self.build_crashstorage(indices=["socorro202401"])
+
+        # Existing indices are loaded once and not created
+        crashstorage.ensure_index("socorro202401")
+        crashstorage.ensure_index("socorro202401")
+        crashstorage.get_indices.assert_called_once_with()
+        crashstorage.create_index.assert_not_called()
+
+        # New indices are created once
+        crashstorage.ensure_index("socorro202402")
+        crashstorage.ensure_index("socorro202402")
+        crashstorage.create_index.assert_called_once_with("socorro202402")
+
+    def test_delete_index_forgets_index(self):
+        crashstorage, _ = self.build_crashstorage(indices=["socorro202401"])
+        crashstorage.ensure_index("socorro202401")
+
+        crashstorage.delete_index("socorro202401")
+        crashstorage.ensure_index("socorro202401")
+        crashstorage.create_index.assert_called_once_with("socorro202401")
+
+    def test_submit_creates_index_on_miss(self):
+        crashstorage, conn = self.build_crashstorage(indices=["socorro202401"])
+        # The index is known, but has been deleted out from under us
+        conn.index.side_effect = [
+            elasticsearch.NotFoundError(
+                message="index_not_found_exception",
+                meta=mock.Mock(status=404),
+                body={"error": {"type": "index_not_found_exception"}},
+            ),
+            None,
+        ]
+
+        crashstorage._submit_crash_to_elasticsearch(
+            crash_id="crash1",
+            index_name="socorro202401",
+            crash_document={"crash_id": "crash1"},
+        )
+        crashstorage.create_index.assert_called_once_with("socorro202401")
+        assert conn.index.call_count == 2
+
+    def test_submit_other_not_found_raises(self):
+        crashstorage, conn = self.build_crashstorage(indices=["socorro202401"])
+        conn.index.side_effect = elasticsearch.NotFoundError(
+            message="something_else",
+            meta=mock.Mock(status=404),
+            body={"error": {"type": "something_else"}},
+        )
+
+        with pytest.raises(elasticsearch.NotFoundError):
+            crashstorage._submit_crash_to_elasticsearch(
+                crash_id="crash1",
+                index_name="socorro202401",
+                crash_document={"crash_id": "crash1"},
+            )
+        crashstorage.create_index.assert_not_called()
+        assert conn.index.call_count == 1
+
+
+class TestUpdateProcessedCrash:
+    def build_crashstorage(self):
+        crashstorage = ESCrashStorage(url="http://localhost:9200")
+        document_plan = DocumentPlan(fields=FIELDS, all_keys=all_indexable_keys())
+        crashstorage.get_document_plan = mock.Mock(return_value=document_plan)
+        crashstorage.save_processed_crash = mock.Mock()
+        conn = mock.Mock()
+        crashstorage.client = mock.MagicMock()
+        crashstorage.client.return_value.__enter__.return_value = conn
+        return crashstorage, conn
+
+    def test_update(self):
+        crashstorage, conn = self.build_crashstorage()
+        processed_crash = deepcopy(SAMPLE_PROCESSED_CRASH)
+        processed_crash["signature"] = "new signature"
+
+        with MetricsMock() as mm:
+            crashstorage.update_processed_crash(
+                raw_crash={},
+                processed_crash=processed_crash,
+                fields=["signature", "uptime"],
+            )
+
+        # Only the listed fields are sent
+        conn.update.assert_called_once_with(
+            index=crashstorage.get_index_for_date(
+                string_to_datetime(processed_crash["date_processed"])
+            ),
+            id=processed_crash["uuid"],
+            doc={
+                "processed_crash": {
+                    "signature": "new signature",
+                    "uptime": processed_crash["uptime"],
+                }
+            },
+        )
+        crashstorage.save_processed_crash.assert_not_called()
+        mm.assert_histogram_once(
+            "socorro.processor.es.update",
+            tags=["outcome:successful", AnyTagValue("host")],
+        )
+
+    def test_document_missing(self):
+        crashstorage, conn = self.build_crashstorage()
+        conn.update.side_effect = elasticsearch.NotFoundError(
+            message="document_missing_exception",
+            meta=mock.Mock(status=404),
+            body={"error": {"type": "document_missing_exception"}},
+        )
+        processed_crash = deepcopy(SAMPLE_PROCESSED_CRASH)
+
+        crashstorage.update_processed_crash(
+            raw_crash={}, processed_crash=processed_crash, fields=["signature"]
+        )
+
+        # The whole crash is indexed
+        crashstorage.save_processed_crash.assert_called_once_with({}, processed_crash)
+
+    def test_bad_request(self):
+        crashstorage, conn = self.build_crashstorage()
+        conn.update.side_effect = elasticsearch.BadRequestError(
+            message="document_parsing_exception",
+            meta=mock.Mock(status=400),
+            body={
+                "error": {
+                    "type": "document_parsing_exception",
+                    "reason": "failed to parse field [processed_crash.uptime]",
+                    "caused_by": {"type": "number_format_exception"},
+                }
+            },
+        )
+        processed_crash = deepcopy(SAMPLE_PROCESSED_CRASH)
+
+        crashstorage.update_processed_crash(
+            raw_crash={}, processed_crash=processed_crash, fields=["uptime"]
+        )
+
+        # The whole crash is indexed which removes fields that can't be indexed
+        crashstorage.save_processed_crash.assert_called_once_with({}, processed_crash)
+
+    def test_removed_field(self):
+        crashstorage, conn = self.build_crashstorage()
+        processed_crash = deepcopy(SAMPLE_PROCESSED_CRASH)
+        processed_crash.pop("proto_signature", None)
+
+        crashstorage.update_processed_crash(
+            raw_crash={},
+            processed_crash=processed_crash,
+            fields=["signature", "proto_signature"],
+        )
+
+        # Partial updates can't remove fields, so the whole crash is indexed
+        conn.update.assert_not_called()
+        crashstorage.save_processed_crash.assert_called_once_with({}, processed_crash)
+
+
 @pytest.mark.parametrize(
     "value, expected",
     [
@@ -532,3 +1118,41 @@ def test_fix_integer(value, expected):
 def test_fix_long(value, expected):
     new_value = fix_long(value)
     assert new_value == expected
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "",
+        "abc",
+        "\xe9t\xe9 \u2603 \U0001f600",
+        "\ud800",
+        0,
+        -12345,
+        2**70,
+        True,
+        False,
+        None,
+        1.5,
+        1e16,
+        -0.0,
+        float("nan"),
+        float("inf"),
+        float("-inf"),
+        [],
+        [1, "two", [3.0, None]],
+        {},
+        {"a": {"b": [1, {"c": "d"}]}, "e": "f"},
+        string_to_datetime("2012-04-08 10:56:41.558922"),
+        string_to_datetime("2012-04-08 10:56:41"),
+    ],
+)
+def test_estimate_json_size(value):
+    # The serializer passes strings through as already serialized, so wrap the value
+    assert estimate_json_size([value]) == len(BULK_SERIALIZER.dumps([value]))
+
+
+def test_estimate_json_size_escapes():
+    # Backslashes added by escaping aren't counted
+    value = 'quote " backslash \\ newline \n bell \x07'
+    assert estimate_json_size([value]) == len(BULK_SERIALIZER.dumps([value])) - 8
@@ -8,8 +8,14 @@ import os
 
 import pytest
 
-from socorro.external.gcs.crashstorage import build_keys, dict_to_str
-from socorro.external.crashstorage_base import CrashIDNotFound, MemoryDumpsMapping
+from markus.testing import AnyTagValue
+
+from socorro.external.gcs.crashstorage import build_keys, get_dump_kind
+from socorro.external.crashstorage_base import (
+    CrashIDNotFound,
+    dict_to_str,
+    MemoryDumpsMapping,
+)
 from socorro.lib import MissingArgumentError, BadArgumentError
 from socorro.libclass import build_instance_from_settings
 from socorro.lib.libdatetime import date_to_string, utc_now
@@ -70,6 +76,20 @@ def test_build_keys(kind, crashid, expected):
     assert build_keys(kind, crashid) == expected
 
 
+@pytest.mark.parametrize(
+    "dump_name, expected",
+    [
+        ("dump", "minidump"),
+        ("upload_file_minidump", "minidump"),
+        ("upload_file_minidump_browser", "minidump"),
+        ("memory_report", "memory_report"),
+        ("city_dump", "other"),
+    ],
+)
+def test_get_dump_kind(dump_name, expected):
+    assert get_dump_kind(dump_name) == expected
+
+
 class TestGcsCrashStorage:
     def test_save_raw_crash_no_dumps(self, gcs_helper):
         crashstorage = build_instance_from_settings(CRASHSTORAGE_SETTINGS)
@@ -351,6 +371,70 @@ class TestGcsCrashStorage:
             ),
         }
         assert result == expected
+        for path in expected.values():
+            assert os.path.exists(path)
+        with open(expected["city_dump"], "rb") as fp:
+            assert fp.read() == b'this is "city_dump", the last one'
+
+    def test_get_dumps_as_files_metrics(self, gcs_helper, metricsmock, tmp_path):
+        crashstorage = build_instance_from_settings(CRASHSTORAGE_SETTINGS)
+        bucket = CRASHSTORAGE_SETTINGS["options"]["bucket"]
+        crash_id = create_new_ooid()
+
+        gcs_helper.create_bucket(bucket)
+        gcs_helper.upload(
+            bucket_name=bucket,
+            key=f"v1/dump_names/{crash_id}",
+            data=b'["upload_file_minidump", "memory_report"]',
+        )
+        gcs_helper.upload(
+            bucket_name=bucket,
+            key=f"v1/dump/{crash_id}",
+            data=b"abcde",
+        )
+        gcs_helper.upload(
+            bucket_name=bucket,
+            key=f"v1/memory_report/{crash_id}",
+            data=b"abc",
+        )
+
+        with metricsmock as mm:
+            crashstorage.get_dumps_as_files(crash_id=crash_id, tmpdir=str(tmp_path))
+
+        mm.assert_timing(
+            "socorro.processor.gcs.download_dump",
+            tags=["dump_kind:minidump", AnyTagValue("host")],
+        )
+        mm.assert_histogram(
+            "socorro.processor.gcs.download_dump_size",
+            value=5,
+            tags=["dump_kind:minidump", AnyTagValue("host")],
+        )
+        mm.assert_histogram(
+            "socorro.processor.gcs.download_dump_size",
+            value=3,
+            tags=["dump_kind:memory_report", AnyTagValue("host")],
+        )
+
+    def test_get_dumps_as_files_missing_dump(self, gcs_helper, tmp_path):
+        crashstorage = build_instance_from_settings(CRASHSTORAGE_SETTINGS)
+        bucket = CRASHSTORAGE_SETTINGS["options"]["bucket"]
+        crash_id = create_new_ooid()
+
+        gcs_helper.create_bucket(bucket)
+        gcs_helper.upload(
+            bucket_name=bucket,
+            key=f"v1/dump_names/{crash_id}",
+            data=b'["dump", "content_dump"]',
+        )
+        gcs_helper.upload(
+            bucket_name=bucket,
+            key=f"v1/dump/{crash_id}",
+            data=b'this is "dump", the first one',
+        )
+
+        with pytest.raises(CrashIDNotFound):
+            crashstorage.get_dumps_as_files(crash_id=crash_id, tmpdir=str(tmp_path))
 
     def test_get_processed_crash(self, gcs_helper):
         crashstorage = build_instance_from_settings(CRASHSTORAGE_SETTINGS)
@@ -2,7 +2,10 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+from unittest import mock
+
 from socorro import settings
+from socorro.external.legacy_es.connection_context import LegacyConnectionContext
 from socorro.libclass import build_instance
 from socorro.lib.libdatetime import utc_now
 
@@ -61,3 +64,32 @@ class TestLegacyConnectionContext:
         # Delete the index and assert it's no longer there
         conn.delete_index(index_name)
         assert index_name not in list(legacy_es_helper.get_indices())
+
+    def test_client_is_shared(self, fake_es_url):
+        conn1 = LegacyConnectionContext(url=fake_es_url, metrics_prefix="processor.es")
+        conn2 = LegacyConnectionContext(url=fake_es_url, metrics_prefix="processor.es")
+        assert conn1.connection() is conn2.connection()
+
+        # Different timeouts and pool settings get a different client
+        assert conn1.connection(timeout=5) is not conn1.connection()
+        conn3 = LegacyConnectionContext(url=fake_es_url, pool_maxsize=2)
+        assert conn3.connection() is not conn1.connection()
+
+    def test_forked_process_gets_new_client(self, fake_es_url):
+        conn = LegacyConnectionContext(url=fake_es_url)
+        client = conn.connection()
+        with mock.patch("os.getpid", return_value=-1):
+            assert conn.connection() is not client
+
+    def test_pool_metrics(self, fake_es_url, metricsmock):
+        conn = LegacyConnectionContext(
+            url=fake_es_url, pool_maxsize=4, metrics_prefix="processor.es"
+        )
+        with metricsmock as mm:
+            for _ in range(3):
+                conn.health_check()
+
+            # Requests are made one at a time, so the connection is reused
+            mm.assert_incr_once(
+                "socorro.processor.es.connection_pool_new_connection", value=1
+            )
@@ -270,7 +270,7 @@ class TestLegacyESCrashStorage:
                 processed_crash=processed_crash,
             )
 
-            mm.assert_histogram("socorro.processor.es.crash_document_size", value=169)
+            mm.assert_histogram("socorro.processor.es.crash_document_size", value=163)
 
     def test_index_data_capture(self, legacy_es_helper):
         """Verify we capture index data in ES crashstorage"""
@@ -5,12 +5,18 @@
 # This is tested using test settings (docker/config/test.env) and Pub/Sub emulator.
 
 import time
+from unittest import mock
 
 import pytest
 
 from socorro import settings
-from socorro.external.pubsub.crashqueue import CrashIdsFailedToPublish
+from socorro.external.pubsub.crashqueue import (
+    AckBatcher,
+    CrashIdsFailedToPublish,
+    PubSubCrashQueue,
+)
 from socorro.libclass import build_instance_from_settings
+from socorro.lib.batcher import BatcherClosedError
 from socorro.lib.libooid import create_new_ooid
 
 
@@ -42,7 +48,7 @@ class TestPubSubCrashQueue:
             assert isinstance(item, tuple)
             assert isinstance(item[0], tuple)  # *args
             assert isinstance(item[1], dict)  # **kwargs
-            assert list(item[1].keys()) == ["finished_func"]
+            assert list(item[1].keys()) == ["finished_func", "job_source"]
 
         new_crash_args = {item[0] for item in new_crashes}
         # Assert new_crashes order is the correct order
@@ -82,6 +88,35 @@ class TestPubSubCrashQueue:
         new_crashes = list(crashqueue.new_crashes())
         assert new_crashes == []
 
+    def test_iter_streaming(self, pubsub_helper):
+        standard_crash = create_new_ooid()
+        pubsub_helper.publish("standard", standard_crash)
+
+        priority_crash = create_new_ooid()
+        pubsub_helper.publish("priority", priority_crash)
+
+        # wait for published messages to become available before pulling
+        time.sleep(PUBSUB_DELAY_PULL)
+
+        crashqueue = build_instance_from_settings(settings.QUEUE_PUBSUB)
+        crashqueue.streaming_pull = True
+        try:
+            new_crashes = []
+            # Streaming pull takes a moment to get going
+            for _ in range(10):
+                new_crashes.extend(crashqueue.new_crashes())
+                if len(new_crashes) == 2:
+                    break
+
+            assert {item[0] for item in new_crashes} == {
+                (standard_crash,),
+                (priority_crash,),
+            }
+            for _, kwargs in new_crashes:
+                kwargs["finished_func"]()
+        finally:
+            crashqueue.close()
+
     @pytest.mark.parametrize("queue", ["standard", "priority", "reprocessing"])
     def test_publish_one(self, pubsub_helper, queue):
         crash_id = create_new_ooid()
@@ -137,3 +172,150 @@ class TestPubSubCrashQueue:
             ]
 
             assert "NotFound Topic not found" in errors
+
+
+class TestAckBatcher:
+    def test_batch_by_size(self):
+        subscriber = mock.Mock()
+        ack_batcher = AckBatcher(subscriber=subscriber, max_size=3, max_age=60)
+        ack_batcher.ack("standard", "ack1")
+        ack_batcher.ack("priority", "ack2")
+        subscriber.acknowledge.assert_not_called()
+
+        ack_batcher.ack("standard", "ack3")
+        assert subscriber.acknowledge.call_args_list == [
+            mock.call(subscription="standard", ack_ids=["ack1", "ack3"]),
+            mock.call(subscription="priority", ack_ids=["ack2"]),
+        ]
+        ack_batcher.close()
+
+    def test_batch_by_age(self):
+        subscriber = mock.Mock()
+        ack_batcher = AckBatcher(subscriber=subscriber, max_size=100, max_age=0.1)
+        ack_batcher.ack("standard", "ack1")
+
+        for _ in range(50):
+            if subscriber.acknowledge.called:
+                break
+            time.sleep(0.1)
+        subscriber.acknowledge.assert_called_once_with(
+            subscription="standard", ack_ids=["ack1"]
+        )
+        ack_batcher.close()
+
+    def test_close_flushes(self):
+        subscriber = mock.Mock()
+        ack_batcher = AckBatcher(subscriber=subscriber, max_size=100, max_age=60)
+        ack_batcher.ack("standard", "ack1")
+        ack_batcher.close()
+        subscriber.acknowledge.assert_called_once_with(
+            subscription="standard", ack_ids=["ack1"]
+        )
+
+    def test_ack_after_close(self):
+        subscriber = mock.Mock()
+        ack_batcher = AckBatcher(subscriber=subscriber, max_size=100, max_age=60)
+        ack_batcher.close()
+        with pytest.raises(BatcherClosedError):
+            ack_batcher.ack("standard", "ack1")
+        subscriber.acknowledge.assert_not_called()
+
+    def test_errors_are_logged(self, caplogpp):
+        subscriber = mock.Mock()
+        subscriber.acknowledge.side_effect = Exception("intentional")
+        ack_batcher = AckBatcher(subscriber=subscriber, max_size=1, max_age=60)
+        ack_batcher.ack("standard", "ack1")
+        ack_batcher.close()
+        assert "error acking 1 from standard" in caplogpp.text
+
+
+def build_message(crash_id):
+    message = mock.Mock()
+    message.data = crash_id.encode("utf-8")
+    return message
+
+
+class TestPubSubCrashQueueStreaming:
+    @pytest.fixture
+    def subscriber(self):
+        with mock.patch("socorro.external.pubsub.crashqueue.PublisherClient"):
+            with mock.patch(
+                "socorro.external.pubsub.crashqueue.SubscriberClient"
+            ) as subscriber_class:
+                subscriber = subscriber_class.return_value
+                subscriber.subscription_path.side_effect = lambda project, name: name
+                yield subscriber
+
+    def build_crashqueue(self, **kwargs):
+        return PubSubCrashQueue(
+            project_id="test",
+            standard_topic_name="standard",
+            standard_subscription_name="standard",
+            priority_topic_name="priority",
+            priority_subscription_name="priority",
+            reprocessing_topic_name="reprocessing",
+            reprocessing_subscription_name="reprocessing",
+            streaming_pull=True,
+            streaming_wait=0.01,
+            **kwargs,
+        )
+
+    def test_priority_preferred(self, subscriber):
+        crashqueue = self.build_crashqueue(streaming_max_messages=10)
+        # Nothing is received yet
+        assert list(crashqueue.new_crashes()) == []
+
+        callbacks = {
+            call.args[0]: call.kwargs["callback"]
+            for call in subscriber.subscribe.call_args_list
+        }
+        assert set(callbacks) == {"standard", "priority", "reprocessing"}
+        flow_control = subscriber.subscribe.call_args.kwargs["flow_control"]
+        assert flow_control.max_messages == 10
+
+        standard_msg = build_message("standard_crash")
+        reprocessing_msg = build_message("reprocessing_crash")
+        priority_msg = build_message("priority_crash")
+        test_msg = build_message("test")
+        callbacks["standard"](standard_msg)
+        callbacks["reprocessing"](reprocessing_msg)
+        callbacks["priority"](test_msg)
+        callbacks["priority"](priority_msg)
+
+        new_crashes = list(crashqueue.new_crashes())
+        assert new_crashes == [
+            (
+                ("priority_crash",),
+                {"finished_func": priority_msg.ack, "job_source": "priority"},
+            ),
+            (
+                ("standard_crash",),
+                {"finished_func": standard_msg.ack, "job_source": "standard"},
+            ),
+            (
+                ("reprocessing_crash",),
+                {
+                    "finished_func": reprocessing_msg.ack,
+                    "job_source": "reprocessing",
+                },
+            ),
+        ]
+
+        # Test crash ids are acked and dropped
+        test_msg.ack.assert_called_once_with()
+
+        # Streaming pulls are only opened once
+        assert subscriber.subscribe.call_count == 3
+
+    def test_close_nacks_held_messages(self, subscriber):
+        crashqueue = self.build_crashqueue()
+        assert list(crashqueue.new_crashes()) == []
+
+        callback = subscriber.subscribe.call_args.kwargs["callback"]
+        message = build_message("crash")
+        callback(message)
+
+        crashqueue.close()
+        message.nack.assert_called_once_with()
+        future = subscriber.subscribe.return_value
+        future.cancel.assert_called_with()
@@ -6,6 +6,7 @@ import pytest
 
 from socorro.external.crashstorage_base import (
     CrashStorageBase,
+    InMemoryCrashStorage,
     MemoryDumpsMapping,
 )
 
@@ -34,6 +35,18 @@ class TestCrashStorageBase:
 
         crashstorage.close()
 
+    def test_update_processed_crash_saves(self):
+        crashstorage = InMemoryCrashStorage()
+        processed_crash = {"uuid": "0bba929f-8721-460c-dead-a43c20071025", "a": 1}
+
+        # By default, updating saves the whole processed crash
+        crashstorage.update_processed_crash(
+            raw_crash={}, processed_crash=processed_crash, fields=["a"]
+        )
+        assert crashstorage.get_processed_crash(processed_crash["uuid"]) == (
+            processed_crash
+        )
+
 
 class TestDumpsMappings:
     def test_simple(self):
@@ -0,0 +1,115 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import asyncio
+import threading
+
+from socorro.lib.asyncio_task_manager import AsyncioTaskManager
+
+
+class TestAsyncioTaskManager:
+    def test_sync_task_func(self):
+        calls = []
+
+        def task_func(index):
+            calls.append(index)
+
+        tm = AsyncioTaskManager(
+            number_of_threads=2,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            task_func=task_func,
+        )
+        tm.blocking_start()
+        assert sorted(calls) == list(range(10))
+
+    def test_async_task_func(self):
+        calls = []
+
+        async def task_func(index):
+            await asyncio.sleep(0)
+            calls.append(index)
+
+        tm = AsyncioTaskManager(
+            number_of_threads=2,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            task_func=task_func,
+        )
+        tm.blocking_start()
+        assert sorted(calls) == list(range(10))
+
+    def test_executor_size(self):
+        max_workers = {}
+
+        async def async_task_func(index):
+            executor = asyncio.get_running_loop()._default_executor
+            max_workers["async"] = executor._max_workers
+
+        # Every task in flight can use the executor, plus the job source
+        tm = AsyncioTaskManager(
+            number_of_threads=4,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            task_func=async_task_func,
+        )
+        tm.blocking_start()
+        assert max_workers["async"] == 7
+
+    def test_max_in_flight(self):
+        lock = threading.Lock()
+        running = [0]
+        max_running = [0]
+
+        async def task_func(index):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            await asyncio.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        tm = AsyncioTaskManager(
+            number_of_threads=2,
+            maximum_queue_size=1,
+            quit_on_empty_queue=True,
+            task_func=task_func,
+            job_source_iterator=(((x,), {}) for x in range(10)),
+        )
+        tm.blocking_start()
+        assert max_running[0] == 3
+
+    def test_task_errors_dont_stop_processing(self):
+        calls = []
+
+        async def task_func(index):
+            if index == 3:
+                raise ValueError("intentional error")
+            calls.append(index)
+
+        tm = AsyncioTaskManager(
+            quit_on_empty_queue=True,
+            task_func=task_func,
+        )
+        tm.blocking_start()
+        assert sorted(calls) == [0, 1, 2, 4, 5, 6, 7, 8, 9]
+
+    def test_job_source_tag_not_passed_to_task_func(self):
+        calls = []
+
+        async def task_func(index, **kwargs):
+            calls.append((index, kwargs))
+
+        def job_iterator():
+            yield ((1,), {"job_source": "priority"})
+            yield ((2,), {"job_source": "standard", "other": "value"})
+
+        tm = AsyncioTaskManager(
+            quit_on_empty_queue=True,
+            task_func=task_func,
+            job_source_iterator=job_iterator,
+            reserved_priority_threads=1,
+        )
+        tm.blocking_start()
+        assert sorted(calls) == [(1, {}), (2, {"other": "value"})]
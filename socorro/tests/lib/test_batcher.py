@@ -0,0 +1,91 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import threading
+import time
+
+import pytest
+
+from socorro.lib.batcher import Batcher, BatcherClosedError
+
+
+def wait_for(fun, timeout=5):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if fun():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestBatcher:
+    def test_batch_by_count(self):
+        batches = []
+        batcher = Batcher(send=batches.append, max_items=2, max_age=60)
+        batcher.add("a")
+        assert batches == []
+        batcher.add("b")
+        assert batches == [["a", "b"]]
+        batcher.close()
+
+    def test_batch_by_bytes(self):
+        batches = []
+        batcher = Batcher(send=batches.append, max_items=100, max_bytes=10, max_age=60)
+        batcher.add("a", size=6)
+        assert batches == []
+        batcher.add("b", size=6)
+        assert batches == [["a", "b"]]
+        batcher.close()
+
+    def test_batch_by_age(self):
+        batches = []
+        batcher = Batcher(send=batches.append, max_items=100, max_age=0.1)
+        batcher.add("a")
+        assert wait_for(lambda: batches == [["a"]])
+        batcher.close()
+
+    def test_linger(self):
+        # Callers that block until their item is sent can't fill the buffer, so it's
+        # sent once they stop adding items rather than after max_age
+        batches = []
+        batcher = Batcher(send=batches.append, max_items=100, max_age=60, linger=0.05)
+        sent = [threading.Event() for _ in range(3)]
+
+        def send(batch):
+            batches.append(batch)
+            for item in batch:
+                sent[item].set()
+
+        batcher.send = send
+
+        def producer(item):
+            batcher.add(item)
+            assert sent[item].wait(timeout=5)
+
+        start = time.monotonic()
+        threads = [threading.Thread(target=producer, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert time.monotonic() - start < 5
+        assert sorted(item for batch in batches for item in batch) == [0, 1, 2]
+        batcher.close()
+
+    def test_close_flushes(self):
+        batches = []
+        batcher = Batcher(send=batches.append, max_items=100, max_age=60)
+        batcher.add("a")
+        batcher.close()
+        assert batches == [["a"]]
+        assert not batcher._flusher_thread.is_alive()
+
+    def test_add_after_close(self):
+        batches = []
+        batcher = Batcher(send=batches.append, max_items=100, max_age=60)
+        batcher.close()
+        with pytest.raises(BatcherClosedError):
+            batcher.add("a")
+        assert batches == []
@@ -0,0 +1,280 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import threading
+import time
+from unittest import mock
+
+from markus.testing import AnyTagValue
+import pytest
+
+from socorro.lib.concurrency_controller import (
+    BUSY_SIGNAL,
+    ConcurrencyController,
+    CPU_SIGNAL,
+    SAVE_SIGNAL,
+    STACKWALKER_SIGNAL,
+    WorkerGate,
+    WorkloadSignals,
+)
+from socorro.lib.threaded_task_manager import ThreadedTaskManager
+
+
+class TestWorkloadSignals:
+    def test_record_and_take(self):
+        signals = WorkloadSignals()
+        signals.record(STACKWALKER_SIGNAL, 1.0)
+        signals.record(STACKWALKER_SIGNAL, 3.0)
+        signals.record(SAVE_SIGNAL, 0.5)
+        assert signals.take() == {
+            STACKWALKER_SIGNAL: (4.0, 2),
+            SAVE_SIGNAL: (0.5, 1),
+        }
+        # Taking resets the totals
+        assert signals.take() == {}
+
+    def test_add(self):
+        signals = WorkloadSignals()
+        signals.record(STACKWALKER_SIGNAL, 1.0)
+        signals.add({STACKWALKER_SIGNAL: (5.0, 2), CPU_SIGNAL: (2.0, 1)})
+        assert signals.take() == {
+            STACKWALKER_SIGNAL: (6.0, 3),
+            CPU_SIGNAL: (2.0, 1),
+        }
+
+
+@pytest.fixture
+def no_cpu():
+    """Make the controller see no CPU used by this process."""
+    with mock.patch(
+        "socorro.lib.concurrency_controller.get_cpu_seconds", return_value=0.0
+    ):
+        yield
+
+
+class TestConcurrencyController:
+    def build_controller(self, **kwargs):
+        self.queue_depth = 0
+        self.set_workers_calls = []
+        self.signals = WorkloadSignals()
+        controller_kwargs = {
+            "min_workers": 2,
+            "max_workers": 4,
+            "get_queue_depth": lambda: self.queue_depth,
+            "queue_capacity": lambda: 8,
+            "set_workers": self.set_workers_calls.append,
+            "signals": self.signals,
+            "cpu_count": 4,
+        }
+        controller_kwargs.update(kwargs)
+        return ConcurrencyController(**controller_kwargs)
+
+    def test_bad_bounds(self):
+        with pytest.raises(ValueError):
+            self.build_controller(min_workers=0)
+        with pytest.raises(ValueError):
+            self.build_controller(min_workers=5)
+
+    def test_grow_on_backlog(self):
+        controller = self.build_controller()
+        assert controller.decide(0.1, 4, {}, 1.0) == (3, "backlog")
+
+        controller.workers = 4
+        assert controller.decide(0.1, 8, {}, 1.0) == (4, "backlog")
+
+    def test_shrink_on_cpu(self):
+        controller = self.build_controller()
+        controller.workers = 3
+        assert controller.decide(0.95, 8, {}, 1.0) == (2, "cpu")
+
+        controller.workers = 2
+        assert controller.decide(0.95, 8, {}, 1.0) == (2, "cpu")
+
+    def test_shrink_on_slow_signal(self):
+        controller = self.build_controller()
+        controller.workers = 3
+        # The first timings set the baselines
+        assert controller.decide(0.1, 0, {STACKWALKER_SIGNAL: 1.0}, 0.0) == (2, "idle")
+
+        controller.workers = 3
+        assert controller.decide(0.1, 8, {STACKWALKER_SIGNAL: 1.5}, 1.0) == (
+            4,
+            "backlog",
+        )
+        assert controller.decide(0.1, 8, {SAVE_SIGNAL: 0.1}, 1.0) == (4, "backlog")
+        assert controller.decide(0.1, 8, {SAVE_SIGNAL: 0.5}, 1.0) == (2, SAVE_SIGNAL)
+
+    def test_baseline_drifts_up(self):
+        controller = self.build_controller()
+        controller.decide(0.1, 0, {STACKWALKER_SIGNAL: 1.0}, 1.0)
+        for _ in range(50):
+            controller.decide(0.1, 0, {STACKWALKER_SIGNAL: 3.0}, 1.0)
+        # After a long enough run of slower times, they're the new normal
+        assert controller.decide(0.1, 0, {STACKWALKER_SIGNAL: 3.0}, 1.0)[1] != (
+            STACKWALKER_SIGNAL
+        )
+
+    def test_shrink_when_idle(self):
+        controller = self.build_controller()
+        controller.workers = 3
+        assert controller.decide(0.1, 0, {}, 0.2) == (2, "idle")
+
+        controller.workers = 2
+        assert controller.decide(0.1, 0, {}, 0.0) == (2, "steady")
+
+    def test_hold_when_busy_with_empty_queue(self):
+        # An empty queue is normal when workers are keeping up
+        controller = self.build_controller()
+        controller.workers = 3
+        assert controller.decide(0.1, 0, {}, 0.9) == (3, "steady")
+        # Two workers would be busy 0.6 of the time doing what three do now
+        assert controller.decide(0.1, 0, {}, 0.4) == (3, "steady")
+
+    def test_update(self, no_cpu, metricsmock):
+        controller = self.build_controller()
+        controller.sample_queue_depth()
+        self.queue_depth = 8
+        controller.sample_queue_depth()
+        self.signals.record(STACKWALKER_SIGNAL, 1.0)
+
+        with metricsmock as mm:
+            assert controller.update() == 3
+
+        assert self.set_workers_calls == [3]
+        mm.assert_incr(
+            "socorro.processor.concurrency.decision",
+            tags=["action:grow", "reason:backlog", AnyTagValue("host")],
+        )
+        mm.assert_gauge("socorro.processor.concurrency.queue_depth", value=4)
+        mm.assert_gauge("socorro.processor.concurrency.workers", value=3)
+        mm.assert_gauge("socorro.processor.concurrency.cpu_utilization", value=0.0)
+
+    def test_update_counts_busy_time(self, no_cpu, metricsmock):
+        controller = self.build_controller()
+        controller.workers = 3
+        controller._last_time -= 10
+        # Three workers were busy for most of the last 10 seconds
+        self.signals.add({BUSY_SIGNAL: (27.0, 30)})
+
+        with metricsmock as mm:
+            assert controller.update() == 3
+
+        mm.assert_incr(
+            "socorro.processor.concurrency.decision",
+            tags=["action:hold", "reason:steady", AnyTagValue("host")],
+        )
+        # The busy signal isn't treated as a wall time signal
+        assert BUSY_SIGNAL not in controller.baselines
+
+        # No busy time at all means the workers are idle
+        with metricsmock as mm:
+            assert controller.update() == 2
+
+        mm.assert_gauge("socorro.processor.concurrency.busy_fraction", value=0.0)
+
+    def test_update_counts_worker_cpu(self, no_cpu, metricsmock):
+        controller = self.build_controller()
+        # Worker processes used 4 CPUs' worth for a long time
+        self.signals.add({CPU_SIGNAL: (1000.0, 10)})
+
+        with metricsmock as mm:
+            controller.update()
+
+        mm.assert_incr(
+            "socorro.processor.concurrency.decision",
+            tags=["action:hold", "reason:cpu", AnyTagValue("host")],
+        )
+        # The CPU signal isn't treated as a wall time signal
+        assert CPU_SIGNAL not in controller.baselines
+
+
+class TestWorkerGate:
+    def test_parks_inactive_workers(self):
+        gate = WorkerGate(limit=1)
+        gate.wait(0)
+
+        passed = threading.Event()
+
+        def worker():
+            gate.wait(1)
+            passed.set()
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not passed.wait(0.1)
+
+        gate.set_limit(2)
+        assert passed.wait(1)
+        thread.join()
+
+    def test_open(self):
+        gate = WorkerGate(limit=1)
+        thread = threading.Thread(target=gate.wait, args=(5,))
+        thread.start()
+        gate.open()
+        thread.join(timeout=1)
+        assert not thread.is_alive()
+
+
+class TestThreadedTaskManagerAdaptive:
+    def test_starts_with_min_workers(self):
+        lock = threading.Lock()
+        thread_names = set()
+        calls = []
+
+        def task_func(index):
+            with lock:
+                calls.append(index)
+                thread_names.add(threading.current_thread().name)
+            time.sleep(0.01)
+
+        tm = ThreadedTaskManager(
+            number_of_threads=4,
+            maximum_queue_size=8,
+            quit_on_empty_queue=True,
+            task_func=task_func,
+            # The None makes the task manager wait for the queue to drain before
+            # stopping; otherwise parked workers help drain it
+            job_source_iterator=[((x,), {}) for x in range(20)] + [None],
+            min_number_of_threads=2,
+        )
+        assert tm.worker_gate.limit == 2
+        assert tm.task_queue.maxsize == 4
+
+        tm.blocking_start()
+        # Parked workers were let out to stop, but only active workers did jobs
+        assert len(calls) == 20
+        assert len(tm.thread_list) == 4
+        assert thread_names <= {thread.name for thread in tm.thread_list[:2]}
+        tm.controller_thread.join(timeout=2)
+        assert not tm.controller_thread.is_alive()
+
+    def test_set_active_workers(self):
+        tm = ThreadedTaskManager(
+            number_of_threads=4,
+            maximum_queue_size=8,
+            min_number_of_threads=1,
+        )
+        tm.set_active_workers(3)
+        assert tm.worker_gate.limit == 3
+        assert tm.task_queue.maxsize == 6
+
+        tm.set_active_workers(1)
+        assert tm.worker_gate.limit == 1
+        assert tm.task_queue.maxsize == 2
+
+    def test_fixed_concurrency_by_default(self):
+        tm = ThreadedTaskManager(number_of_threads=4)
+        assert tm.worker_gate is None
+        assert tm.concurrency_controller is None
+
+    def test_min_number_of_threads_must_leave_a_worker(self):
+        with pytest.raises(ValueError):
+            ThreadedTaskManager(
+                number_of_threads=4,
+                reserved_priority_threads=1,
+                min_number_of_threads=1,
+            )
+        with pytest.raises(ValueError):
+            ThreadedTaskManager(number_of_threads=4, min_number_of_threads=5)
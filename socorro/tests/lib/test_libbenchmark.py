@@ -0,0 +1,42 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+
+from socorro.lib.libbenchmark import (
+    find_processed_crashes,
+    load_processed_crashes,
+    time_it,
+)
+
+
+def test_find_processed_crashes(tmp_path):
+    # fetch_crash_data output has raw crashes and dumps next to processed crashes
+    for name in ["raw_crash", "dump_names", "processed_crash"]:
+        (tmp_path / "v1" / name).mkdir(parents=True)
+        for crash_id in ["crash2", "crash1"]:
+            (tmp_path / "v1" / name / crash_id).write_text(
+                json.dumps({"uuid": crash_id})
+            )
+    other = tmp_path / "other.json"
+    other.write_text(json.dumps({"uuid": "crash3"}))
+
+    paths = list(find_processed_crashes([str(tmp_path / "v1"), str(other)]))
+    assert paths == [
+        tmp_path / "v1" / "processed_crash" / "crash1",
+        tmp_path / "v1" / "processed_crash" / "crash2",
+        other,
+    ]
+    assert load_processed_crashes([str(tmp_path / "v1"), str(other)]) == [
+        {"uuid": "crash1"},
+        {"uuid": "crash2"},
+        {"uuid": "crash3"},
+    ]
+
+
+def test_time_it():
+    calls = []
+    times = iter([10.0, 16.0])
+    assert time_it(calls.append, [1, 2, 3], 2, timer=lambda: next(times)) == 1.0
+    assert calls == [1, 2, 3, 1, 2, 3]
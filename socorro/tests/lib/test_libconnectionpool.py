@@ -0,0 +1,56 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import socket
+from unittest import mock
+
+from urllib3.connection import HTTPConnection
+
+from socorro.lib.libconnectionpool import ConnectionPoolMetrics, build_socket_options
+
+
+def test_build_socket_options():
+    assert build_socket_options(0) == HTTPConnection.default_socket_options
+
+    socket_options = build_socket_options(60)
+    assert socket_options[: len(HTTPConnection.default_socket_options)] == (
+        HTTPConnection.default_socket_options
+    )
+    assert (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1) in socket_options
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        assert (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60) in socket_options
+
+
+class TestConnectionPoolMetrics:
+    def test_track(self):
+        metrics = mock.MagicMock()
+        pool_metrics = ConnectionPoolMetrics(metrics=metrics, maxsize=1)
+        with pool_metrics.track(lambda: 1):
+            with pool_metrics.track(lambda: 1):
+                assert pool_metrics.in_use == 2
+        assert pool_metrics.in_use == 0
+
+        metrics.gauge.assert_any_call("connection_pool_in_use", value=1)
+        metrics.gauge.assert_any_call("connection_pool_in_use", value=2)
+        # The second request had to wait because the pool only has one connection
+        metrics.incr.assert_any_call("connection_pool_wait")
+        # One connection was opened and reused
+        metrics.incr.assert_any_call("connection_pool_new_connection", value=1)
+        assert metrics.incr.call_count == 2
+
+    def test_track_per_node(self):
+        metrics = mock.MagicMock()
+        pool_metrics = ConnectionPoolMetrics(metrics=metrics, maxsize=1)
+        with pool_metrics.track(lambda: 1, node="node1"):
+            with pool_metrics.track(lambda: 1, node="node2"):
+                assert pool_metrics.in_use == 2
+        assert pool_metrics.in_use == 0
+
+        metrics.gauge.assert_any_call("connection_pool_in_use", value=2)
+        # Each node has its own pool, so neither request had to wait; each node
+        # opened one connection
+        assert metrics.incr.call_args_list == [
+            mock.call("connection_pool_new_connection", value=1),
+            mock.call("connection_pool_new_connection", value=1),
+        ]
@@ -0,0 +1,190 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import dataclasses
+import datetime
+import io
+import json
+
+import pytest
+
+from socorro.external.crashstorage_base import dict_to_str
+from socorro.lib import libjson
+from socorro.lib.libdatetime import JsonDTEncoder
+
+
+BACKENDS = [libjson.StdlibJsonBackend(), libjson.OrjsonBackend()]
+
+
+def backend_id(backend):
+    return backend.name
+
+
+DOCUMENT = {
+    "uuid": "de1bb258-cbbf-4589-a673-34f800160918",
+    "signature": "OOM | small",
+    "user_comments": "crashed while playing 🎮 with café",
+    "uptime": 12,
+    "address_number": 2**63,
+    "ratio": 0.25,
+    "flags": [True, False, None],
+    "json_dump": {
+        "threads": [{"frames": [{"frame": 0, "module": "xul.dll"}]}],
+        "empty": {},
+    },
+}
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+def test_round_trip(backend):
+    data = backend.encode(DOCUMENT)
+    assert isinstance(data, bytes)
+    assert backend.decode(data) == DOCUMENT
+    assert backend.decode(data.decode("utf-8")) == DOCUMENT
+    assert json.loads(data) == DOCUMENT
+
+
+def test_backends_same_bytes():
+    encoded = {backend.name: backend.encode(DOCUMENT) for backend in BACKENDS}
+    assert encoded["orjson"] == encoded["json"]
+    # Compact and not escaped
+    assert b", " not in encoded["json"]
+    assert "café".encode("utf-8") in encoded["json"]
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+def test_isoformat_default(backend):
+    document = {
+        "date": datetime.date(2024, 5, 1),
+        "datetime": datetime.datetime(2024, 5, 1, 10, 1, 2, 5000),
+        "aware": datetime.datetime(2024, 5, 1, 10, 1, 2, tzinfo=datetime.timezone.utc),
+    }
+    data = backend.encode(document, default=libjson.isoformat_default)
+    assert json.loads(data) == {
+        "date": "2024-05-01",
+        "datetime": "2024-05-01T10:01:02.005000",
+        "aware": "2024-05-01T10:01:02+00:00",
+    }
+    assert json.loads(dict_to_str(document)) == json.loads(data)
+
+    with pytest.raises(NotImplementedError):
+        backend.encode({"a": object()}, default=libjson.isoformat_default)
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+def test_datetime_default(backend):
+    document = {
+        "date_processed": datetime.datetime(
+            2012, 4, 8, 10, 56, 41, 558922, tzinfo=datetime.timezone.utc
+        )
+    }
+    data = backend.encode(document, default=libjson.datetime_default)
+    assert json.loads(data) == json.loads(json.dumps(document, cls=JsonDTEncoder))
+
+    with pytest.raises(TypeError):
+        backend.encode(
+            {"a": datetime.date(2012, 4, 8)}, default=libjson.datetime_default
+        )
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+def test_encode_unknown_types(backend):
+    @dataclasses.dataclass
+    class Thing:
+        a: int
+
+    # Dataclasses aren't serialized unless the default function handles them
+    with pytest.raises(TypeError):
+        backend.encode({"a": Thing(a=1)})
+    assert backend.encode({"a": Thing(a=1)}, default=dataclasses.asdict) == (
+        b'{"a":{"a":1}}'
+    )
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+def test_encode_json_module_fallbacks(backend):
+    # Non-str keys, huge integers, and lone surrogates are handled like the json
+    # module handles them
+    assert backend.encode({1: "a"}) == b'{"1":"a"}'
+    assert backend.encode([2**70]) == str([2**70]).replace(" ", "").encode("utf-8")
+    assert backend.encode(["\ud800"]) == b'["\\ud800"]'
+
+    circular = []
+    circular.append(circular)
+    with pytest.raises(ValueError):
+        backend.encode(circular)
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+def test_decode_json_module_fallbacks(backend):
+    assert backend.decode('["\\ud800"]') == ["\ud800"]
+    value = backend.decode("[NaN]")[0]
+    assert value != value
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+@pytest.mark.parametrize(
+    "value",
+    [
+        2**63,
+        2**64 - 1,
+        2**64,
+        -(2**63) - 1,
+        -(2**64),
+        -9999999999999999999,
+        10**30,
+    ],
+)
+def test_big_integers(backend, value):
+    # orjson parses integers that don't fit in 64 bits as floats, so these go
+    # through the json module
+    document = {"a": value, "b": [value, "1234567890123456789012"]}
+    data = backend.encode(document)
+    assert data == json.dumps(document, separators=(",", ":")).encode("utf-8")
+    assert backend.decode(data) == document
+    assert type(backend.decode(data)["a"]) is int
+    assert backend.decode(data.decode("utf-8")) == document
+
+
+def test_has_big_integer():
+    assert libjson.has_big_integer(b"18446744073709551616")
+    assert libjson.has_big_integer(b'{"a":-9223372036854775809}')
+    assert libjson.has_big_integer("[1, 100000000000000000000]")
+    # Integers with few enough digits that orjson parses them as integers
+    assert not libjson.has_big_integer(b"[9999999999999999999,-999999999999999999]")
+    # Long runs of digits in strings
+    assert not libjson.has_big_integer(b'{"a":"123456789012345678901234"}')
+    assert not libjson.has_big_integer(b'["0x12345678901234567890123"]')
+
+
+@pytest.mark.parametrize("value", [float("nan"), float("inf"), float("-inf")])
+def test_non_finite_floats(value):
+    # The json module writes these as NaN and Infinity; orjson writes null
+    document = {"a": value, "b": None}
+    assert libjson.StdlibJsonBackend().encode(document) == json.dumps(
+        document, separators=(",", ":")
+    ).encode("utf-8")
+    assert libjson.OrjsonBackend().encode(document) == b'{"a":null,"b":null}'
+
+
+@pytest.mark.parametrize("backend", BACKENDS, ids=backend_id)
+@pytest.mark.parametrize("data", ["", "{", "[1,]", b"\xff"])
+def test_decode_errors(backend, data):
+    with pytest.raises(ValueError) as excinfo:
+        backend.decode(data)
+    with pytest.raises(ValueError) as expected:
+        json.loads(data)
+    assert type(excinfo.value) is type(expected.value)
+    assert str(excinfo.value) == str(expected.value)
+
+
+def test_load():
+    assert libjson.load(io.BytesIO(b'{"a": [1]}')) == {"a": [1]}
+    assert libjson.load(io.StringIO('{"a": [1]}')) == {"a": [1]}
+
+
+def test_build_backend(monkeypatch):
+    assert libjson.build_backend().name == "orjson"
+    monkeypatch.setattr(libjson, "orjson", None)
+    assert libjson.build_backend().name == "json"
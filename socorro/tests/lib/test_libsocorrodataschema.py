@@ -6,8 +6,10 @@ import copy
 import jsonschema
 import pytest
 
+from socorro.lib import libsocorrodataschema
 from socorro.lib.libsocorrodataschema import (
     FlattenKeys,
+    get_reducer,
     InvalidDocumentError,
     InvalidSchemaError,
     permissions_transform_function,
@@ -508,6 +510,55 @@ class TestSocorroDataReducer:
         with pytest.raises(InvalidSchemaError):
             assert self.schema_reduce(schema, document) == document
 
+    def test_invalid_nested_path(self):
+        schema = {
+            "$schema": "moz://mozilla.org/schemas/socorro/socorro-data/1-0-0",
+            "type": "object",
+            "properties": {
+                "threads": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "pattern_properties": {
+                            r"^frame_": {"type": "integer"},
+                        },
+                    },
+                },
+            },
+        }
+        self.validate_schema(schema)
+
+        document = {"threads": [{"frame_0": 1}, {"frame_0": 2, "frame_1": "x"}]}
+        msg_pattern = (
+            r"invalid: .threads.\[1\].frame_1: type string not in \['integer'\]"
+        )
+        with pytest.raises(InvalidDocumentError, match=msg_pattern):
+            self.schema_reduce(schema, document)
+
+    def test_pattern_lookups_bounded(self, monkeypatch):
+        monkeypatch.setattr(libsocorrodataschema, "MAX_PATTERN_LOOKUPS", 2)
+        schema = {
+            "type": "object",
+            "pattern_properties": {r"^r": {"type": "string"}},
+        }
+        reducer = SocorroDataReducer(schema=schema)
+        document = {"r1": "a", "r2": "b", "r3": "c", "pc": "d"}
+        expected_document = {"r1": "a", "r2": "b", "r3": "c"}
+        assert reducer.traverse(document) == expected_document
+        assert reducer.traverse(document) == expected_document
+        # Only the first two names are remembered
+        assert list(reducer.root._pattern_lookups) == ["r1", "r2"]
+
+
+def test_get_reducer():
+    schema = {"type": "object", "properties": {"color": {"type": "string"}}}
+    reducer = get_reducer(schema)
+    assert get_reducer(copy.deepcopy(schema)) is reducer
+    assert reducer.traverse({"color": "blue", "size": 5}) == {"color": "blue"}
+
+    other_schema = {"type": "object", "properties": {"size": {"type": "integer"}}}
+    assert get_reducer(other_schema) is not reducer
+
 
 @pytest.mark.parametrize(
     "schema, keys",
@@ -0,0 +1,211 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import copy
+import json
+
+import pytest
+
+from socorro.external.gcs.crashstorage import TelemetryGcsCrashStorage
+from socorro.lib import libjsonschema, libsocorrodataschema
+from socorro.lib.libjsonschema import JsonSchemaReducer
+from socorro.lib.libsocorrodataschema import (
+    get_schema,
+    permissions_transform_function,
+    resolve_references,
+    SocorroDataReducer,
+    transform_schema,
+)
+from socorro.lib.libtelemetry import PublicTelemetryReducer
+from socorro.schemas import TELEMETRY_SOCORRO_CRASH_SCHEMA
+
+
+RENAMED_KEYS = TelemetryGcsCrashStorage.HISTORICAL_MANUAL_KEYS
+
+
+def get_public_schema():
+    processed_crash_schema = get_schema("processed_crash.schema.yaml")
+    only_public = permissions_transform_function(
+        permissions_have=["public"],
+        default_permissions=processed_crash_schema["default_permissions"],
+    )
+    return transform_schema(
+        schema=processed_crash_schema, transform_function=only_public
+    )
+
+
+PUBLIC_SCHEMA = get_public_schema()
+
+
+def two_pass(public_schema, telemetry_schema, document, renamed_keys=()):
+    """Reduce a document the way TelemetryGcsCrashStorage used to."""
+    public = SocorroDataReducer(schema=public_schema).traverse(document)
+    result = JsonSchemaReducer(schema=copy.deepcopy(telemetry_schema)).traverse(public)
+    for source_key, target_key in renamed_keys:
+        if source_key in public:
+            result[target_key] = public[source_key]
+    return result
+
+
+def one_pass(public_schema, telemetry_schema, document, renamed_keys=()):
+    reducer = PublicTelemetryReducer(
+        public_schema=public_schema,
+        telemetry_schema=telemetry_schema,
+        renamed_keys=renamed_keys,
+    )
+    return reducer.traverse(document)
+
+
+def reduce_both_ways(public_schema, telemetry_schema, document, renamed_keys=()):
+    """Returns serialized result or exception class and message for both reducers."""
+    outcomes = []
+    for func in (two_pass, one_pass):
+        try:
+            result = func(public_schema, telemetry_schema, document, renamed_keys)
+            outcomes.append(json.dumps(result))
+        except Exception as exc:
+            outcomes.append((type(exc), str(exc)))
+    return outcomes
+
+
+def generate_document(schema_part):
+    """Generate a document that fills in every property in a schema."""
+    types = libsocorrodataschema.listify(schema_part["type"])
+    if "object" in types:
+        doc = {
+            name: generate_document(property_schema)
+            for name, property_schema in schema_part.get("properties", {}).items()
+        }
+        if not schema_part.get("pattern_properties"):
+            doc["not_in_schema"] = {"a": 1}
+        return doc
+    if "array" in types:
+        return [generate_document(schema_part["items"]) for _ in range(2)]
+    if "any" in types:
+        return {"anything": [1, "two"]}
+    if "string" in types:
+        return "abc"
+    if "integer" in types:
+        return 5
+    if "number" in types:
+        return 5.5
+    if "boolean" in types:
+        return True
+    return None
+
+
+def test_processed_crash_same_as_two_pass():
+    processed_crash_schema = resolve_references(
+        get_schema("processed_crash.schema.yaml")
+    )
+    processed_crash = generate_document(processed_crash_schema)
+
+    old, new = reduce_both_ways(
+        PUBLIC_SCHEMA, TELEMETRY_SOCORRO_CRASH_SCHEMA, processed_crash, RENAMED_KEYS
+    )
+    assert isinstance(new, str)
+    assert new == old
+    # Non-public fields were dropped and historical keys were added
+    new = json.loads(new)
+    assert "platform" in new
+    assert "user_comments" not in new
+
+
+def test_crash_report_same_as_two_pass():
+    processed_crash = {
+        "uuid": "de1bb258-cbbf-4589-a673-34f800160918",
+        "signature": "now_this_is_a_signature",
+        "os_name": "Linux",
+        "build": "20160918030202",
+        "user_comments": "not public",
+        "some_random_key": "should not appear",
+        "json_dump": {
+            "crash_info": {"address": "0x6357737b", "some_random_key": "nope"},
+            "crashing_thread": {
+                "frames": [
+                    {"frame": 0, "module": "xul.dll", "function": None},
+                ],
+            },
+        },
+    }
+    old, new = reduce_both_ways(
+        PUBLIC_SCHEMA, TELEMETRY_SOCORRO_CRASH_SCHEMA, processed_crash, RENAMED_KEYS
+    )
+    assert new == old
+    assert json.loads(new) == {
+        "uuid": "de1bb258-cbbf-4589-a673-34f800160918",
+        "signature": "now_this_is_a_signature",
+        "json_dump": {
+            "crash_info": {"address": "0x6357737b"},
+            "crashing_thread": {
+                "frames": [{"frame": 0, "module": "xul.dll", "function": None}],
+            },
+        },
+        "build_id": "20160918030202",
+        "platform": "Linux",
+    }
+
+
+PUBLIC = {
+    "type": "object",
+    "properties": {
+        "a": {"type": "string"},
+        "b": {"type": ["integer", "null"]},
+        "c": {"type": "array", "items": {"type": "integer"}},
+        "d": {"type": "any"},
+        "e": {"type": "object", "properties": {"f": {"type": "boolean"}}},
+        "h": {"type": "integer"},
+        "only_public": {"type": "integer"},
+    },
+    "pattern_properties": {"^p_": {"type": "integer"}},
+}
+TELEMETRY = {
+    "type": "object",
+    "properties": {
+        "a": {"type": "string"},
+        "b": {"type": "string", "socorroConvertTo": "string"},
+        "c": {"type": "array", "items": {"type": "integer"}},
+        "d": {"type": "object", "properties": {"g": {"type": "integer"}}},
+        "e": {"type": "string", "socorroConvertTo": "string"},
+        "h": {"type": "string"},
+        "p_1": {"type": "integer"},
+        "not_public": {"type": "string"},
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        {"a": "x", "b": 5, "c": [1, 2], "d": {"g": 1, "h": 2}, "p_1": 1, "p_2": 2},
+        {"b": None, "not_public": "x", "only_public": 3},
+        # Converting a container stringifies the public version of it
+        {"e": {"f": True, "not_in_schema": 1}},
+        # Invalid for the public schema
+        {"a": 5},
+        {"c": [1, "two"]},
+        {"p_3": "x"},
+        {"only_public": "x"},
+        # Invalid for the telemetry schema
+        {"d": {"g": "x"}},
+        {"d": [1]},
+        # Invalid for both--the public error wins no matter the order
+        {"d": {"g": "x"}, "a": 5},
+        {"a": 5, "d": {"g": "x"}},
+        # Two telemetry errors--the first one wins
+        {"d": {"g": "x"}, "h": 1},
+        {"h": 1, "d": {"g": "x"}},
+    ],
+)
+def test_same_as_two_pass(document):
+    old, new = reduce_both_ways(PUBLIC, TELEMETRY, document, [("only_public", "op")])
+    assert new == old
+
+
+def test_error_classes():
+    reducer = PublicTelemetryReducer(PUBLIC, TELEMETRY)
+    with pytest.raises(libsocorrodataschema.InvalidDocumentError):
+        reducer.traverse({"a": 5})
+    with pytest.raises(libjsonschema.InvalidDocumentError):
+        reducer.traverse({"d": {"g": "x"}})
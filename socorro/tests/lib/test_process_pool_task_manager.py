@@ -0,0 +1,179 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+from functools import partial
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from socorro.lib.process_pool_task_manager import ProcessPoolTaskManager, WorkerSpawner
+from socorro.lib.threaded_task_manager import STOP_TOKEN
+
+
+def write_pid(tmp_path, item):
+    (tmp_path / str(item)).write_text(str(os.getpid()))
+
+
+def write_kwargs(tmp_path, item, **kwargs):
+    (tmp_path / str(item)).write_text(json.dumps(kwargs))
+
+
+class TestProcessPoolTaskManager:
+    def test_start(self):
+        tm = ProcessPoolTaskManager(
+            idle_delay=1,
+            number_of_threads=1,
+            maximum_queue_size=1,
+        )
+        try:
+            tm.start()
+            time.sleep(0.2)
+            assert tm.queueing_thread.is_alive()
+            assert len(tm.thread_list) == 1
+            assert tm.thread_list[0].is_alive()
+            assert tm.thread_list[0].process.is_alive()
+            process = tm.thread_list[0].process
+            tm.stop()
+            assert not tm.queueing_thread.is_alive()
+            assert not process.is_alive()
+        finally:
+            tm.wait_for_completion()
+
+    def test_tasks_run_in_worker_processes(self, tmp_path):
+        tm = ProcessPoolTaskManager(
+            number_of_threads=2,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            task_func=partial(write_pid, tmp_path),
+        )
+        tm.blocking_start()
+
+        pids = {int(path.read_text()) for path in tmp_path.iterdir()}
+        assert len(list(tmp_path.iterdir())) == 10
+        assert os.getpid() not in pids
+        assert 1 <= len(pids) <= 2
+
+    def test_finished_func_called_in_parent(self):
+        finished = []
+
+        def task_func(item):
+            if item == 3:
+                raise ValueError("intentional error")
+
+        def job_iterator():
+            for item in range(5):
+                yield ((item,), {"finished_func": partial(finished.append, item)})
+
+        tm = ProcessPoolTaskManager(
+            number_of_threads=2,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_iterator,
+            task_func=task_func,
+        )
+        tm.blocking_start()
+
+        # finished_func is called for every job, including the one that errored
+        assert sorted(finished) == list(range(5))
+
+    def test_worker_process_restarted_after_dying(self, tmp_path, caplog):
+        finished = []
+
+        def task_func(item):
+            if item == 1:
+                os._exit(3)
+            (tmp_path / str(item)).write_text(str(os.getppid()))
+
+        def job_iterator():
+            for item in range(3):
+                yield ((item,), {"finished_func": partial(finished.append, item)})
+
+        tm = ProcessPoolTaskManager(
+            number_of_threads=1,
+            maximum_queue_size=1,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_iterator,
+            task_func=task_func,
+        )
+        tm.blocking_start()
+
+        assert finished == [0, 1, 2]
+        # The worker process was joined before its exit code was logged
+        assert any(
+            "died while processing (1,): exitcode 3" in record.getMessage()
+            for record in caplog.records
+        )
+        # Worker processes, including the replacement, were forked from the spawner
+        # process, not this one
+        parent_pids = {int((tmp_path / str(item)).read_text()) for item in [0, 2]}
+        assert len(parent_pids) == 1
+        assert os.getpid() not in parent_pids
+
+    def test_spawner_forks_workers(self):
+        spawner = WorkerSpawner(
+            task_func=partial(time.sleep), mp_context=multiprocessing.get_context()
+        )
+        spawner.start()
+        try:
+            process, conn = spawner.spawn()
+            conn.send(((0,), {}))
+            success, error, _ = conn.recv()
+            assert (success, error) == (True, None)
+
+            conn.send(STOP_TOKEN)
+            process.join()
+            conn.close()
+            assert process.exitcode == 0
+            assert not process.is_alive()
+        finally:
+            spawner.stop()
+
+    def test_job_source_tag_not_passed_to_task_func(self, tmp_path):
+        def job_iterator():
+            for item, job_source in enumerate(["priority", "standard", "reprocessing"]):
+                yield ((item,), {"job_source": job_source})
+
+        tm = ProcessPoolTaskManager(
+            number_of_threads=2,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            job_source_iterator=job_iterator,
+            task_func=partial(write_kwargs, tmp_path),
+            reserved_priority_threads=1,
+        )
+        tm.blocking_start()
+
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["0", "1", "2"]
+        assert {path.read_text() for path in tmp_path.iterdir()} == {"{}"}
+
+    def test_spawner_usable_while_waiting(self):
+        spawner = WorkerSpawner(
+            task_func=partial(time.sleep), mp_context=multiprocessing.get_context()
+        )
+        spawner.start()
+        try:
+            slow_process, slow_conn = spawner.spawn()
+            # The worker process exits after sleeping
+            slow_conn.send(((1,), {}))
+            slow_conn.send(STOP_TOKEN)
+            waiter = threading.Thread(target=slow_process.join)
+            waiter.start()
+            time.sleep(0.1)
+
+            # Waiting for the slow worker process doesn't hold up spawning another
+            start_time = time.monotonic()
+            process, conn = spawner.spawn()
+            assert time.monotonic() - start_time < 0.5
+            assert waiter.is_alive()
+
+            conn.send(STOP_TOKEN)
+            process.join()
+            conn.close()
+            waiter.join()
+            slow_conn.close()
+            assert slow_process.exitcode == 0
+        finally:
+            spawner.stop()
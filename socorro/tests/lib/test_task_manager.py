@@ -4,7 +4,20 @@
 
 from unittest import mock
 
-from socorro.lib.task_manager import TaskManager
+from socorro.lib.task_manager import pop_job_source, TaskManager
+
+
+def test_pop_job_source():
+    # Tagged jobs have the tag removed from kwargs
+    job_params = ((1,), {"job_source": "priority", "finished_func": None})
+    assert pop_job_source(job_params) == (((1,), {"finished_func": None}), "priority")
+    # and the original kwargs aren't changed
+    assert job_params[1] == {"job_source": "priority", "finished_func": None}
+
+    # Untagged jobs are returned as is
+    assert pop_job_source(((1,), {})) == (((1,), {}), None)
+    assert pop_job_source((1,)) == ((1,), None)
+    assert pop_job_source((1, 2, 3)) == ((1, 2, 3), None)
 
 
 class TestTaskManager:
@@ -2,9 +2,86 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import threading
 import time
 
-from socorro.lib.threaded_task_manager import ThreadedTaskManager
+import pytest
+
+from socorro.lib.threaded_task_manager import (
+    JobQueue,
+    STOP_TOKEN,
+    ThreadedTaskManager,
+)
+
+
+class TestJobQueue:
+    def test_priority_order(self):
+        job_queue = JobQueue(maxsize=10)
+        job_queue.put("reprocessing1", priority=2)
+        job_queue.put("standard1", priority=1)
+        job_queue.put("priority1", priority=0)
+        job_queue.put("standard2", priority=1)
+        job_queue.put("priority2", priority=0)
+
+        jobs = [job_queue.get() for _ in range(5)]
+        assert jobs == [
+            "priority1",
+            "priority2",
+            "standard1",
+            "standard2",
+            "reprocessing1",
+        ]
+        assert job_queue.empty()
+
+    def test_max_priority(self):
+        job_queue = JobQueue(maxsize=10)
+        job_queue.put("standard1", priority=1)
+        job_queue.put("priority1", priority=0)
+        job_queue.stop()
+
+        # A caller that only does priority jobs gets priority jobs and then stops even
+        # though there's a standard job left
+        assert job_queue.get(max_priority=0) == "priority1"
+        assert job_queue.get(max_priority=0) is STOP_TOKEN
+        assert job_queue.qsize() == 1
+
+        assert job_queue.get() == "standard1"
+        assert job_queue.get() is STOP_TOKEN
+
+    def test_priority_job_doesnt_wait_behind_full_queue(self):
+        job_queue = JobQueue(maxsize=2)
+        job_queue.put("reprocessing1", priority=2)
+        job_queue.put("reprocessing2", priority=2)
+
+        # The queue is full of reprocessing jobs, but there's room for a priority job
+        put_thread = threading.Thread(
+            target=job_queue.put, args=("priority1",), kwargs={"priority": 0}
+        )
+        put_thread.start()
+        put_thread.join(timeout=1)
+        assert not put_thread.is_alive()
+
+        # There isn't room for another reprocessing job until one is removed
+        put_thread = threading.Thread(
+            target=job_queue.put, args=("reprocessing3",), kwargs={"priority": 2}
+        )
+        put_thread.start()
+        put_thread.join(timeout=0.1)
+        assert put_thread.is_alive()
+
+        assert job_queue.get() == "priority1"
+        assert job_queue.get() == "reprocessing1"
+        put_thread.join(timeout=1)
+        assert not put_thread.is_alive()
+        assert job_queue.qsize() == 2
+
+    def test_stop_drains_jobs(self):
+        job_queue = JobQueue(maxsize=10)
+        job_queue.put("standard1")
+        job_queue.stop()
+        assert job_queue.get() == "standard1"
+        assert job_queue.get() is STOP_TOKEN
+        assert job_queue.get() is STOP_TOKEN
 
 
 class TestThreadedTaskManager:
@@ -86,3 +163,58 @@ class TestThreadedTaskManager:
 
         tm.blocking_start()
         assert len(calls) == 10
+
+    def test_job_source_tag_not_passed_to_task_func(self):
+        calls = []
+
+        def task_func(index, **kwargs):
+            calls.append((index, kwargs))
+
+        def job_iterator():
+            yield ((1,), {"job_source": "priority"})
+            yield ((2,), {"job_source": "standard", "other": "value"})
+
+        tm = ThreadedTaskManager(
+            number_of_threads=1,
+            maximum_queue_size=2,
+            quit_on_empty_queue=True,
+            task_func=task_func,
+            job_source_iterator=job_iterator,
+        )
+        tm.blocking_start()
+        assert sorted(calls) == [(1, {}), (2, {"other": "value"})]
+
+    def test_reserved_priority_threads(self):
+        calls = []
+        lock = threading.Lock()
+
+        def task_func(job_source):
+            with lock:
+                calls.append((threading.current_thread().name, job_source))
+            time.sleep(0.01)
+
+        def job_iterator():
+            for _ in range(10):
+                for job_source in ("priority", "standard", "reprocessing"):
+                    yield ((job_source,), {"job_source": job_source})
+
+        tm = ThreadedTaskManager(
+            number_of_threads=3,
+            maximum_queue_size=6,
+            quit_on_empty_queue=True,
+            task_func=task_func,
+            job_source_iterator=job_iterator,
+            reserved_priority_threads=1,
+        )
+        tm.blocking_start()
+        assert len(calls) == 30
+
+        reserved_thread_name = tm.thread_list[0].name
+        reserved_job_sources = {
+            job_source for name, job_source in calls if name == reserved_thread_name
+        }
+        assert reserved_job_sources <= {"priority"}
+
+    def test_reserved_priority_threads_must_leave_a_worker(self):
+        with pytest.raises(ValueError):
+            ThreadedTaskManager(number_of_threads=2, reserved_priority_threads=2)
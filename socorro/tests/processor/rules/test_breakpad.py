@@ -2,8 +2,13 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import asyncio
 import copy
 import json
+import os
+import sys
+import threading
+import time
 from unittest import mock
 
 from markus.testing import AnyTagValue, MetricsMock
@@ -11,8 +16,10 @@ import pytest
 
 from socorro.lib.libsocorrodataschema import get_schema, validate_instance
 from socorro.processor.pipeline import Status
+from socorro.processor.stackwalk_cache import DiskStackwalkCache
 from socorro.processor.rules.breakpad import (
     execute_process,
+    execute_process_async,
     CrashingThreadInfoRule,
     HasGuardPageAccessRule,
     MinidumpSha256HashRule,
@@ -184,6 +191,20 @@ def test_execute_process_timeout():
     assert ret["returncode"] == -9
 
 
+def test_execute_process_async():
+    ret = asyncio.run(execute_process_async("echo foo"))
+    assert ret["stdout"] == b"foo\n"
+    assert ret["stderr"] == b""
+    assert ret["returncode"] == 0
+
+
+def test_execute_process_async_timeout():
+    ret = asyncio.run(execute_process_async("sleep 10", timeout=1))
+    assert ret["stdout"] == b""
+    assert ret["stderr"] == b""
+    assert ret["returncode"] == -9
+
+
 class TestCrashingThreadInfoRule:
     @pytest.mark.parametrize(
         "json_dump, expected",
@@ -1010,3 +1031,451 @@ class TestMinidumpStackwalkRule:
 
         assert processed_crash["mdsw_status_string"] == "EmptyMinidump"
         assert processed_crash["mdsw_stderr"] == "Shortcut for 0-bytes minidump."
+
+
+class FakeStackwalker:
+    """Stands in for subprocess.run and writes stackwalker output for each minidump.
+
+    :arg delays: map of minidump file name -> seconds the run should take
+    :arg returncodes: map of minidump file name -> exit code
+    :arg modules: list of modules for the output
+
+    """
+
+    def __init__(self, delays=None, returncodes=None, modules=None):
+        self.delays = delays or {}
+        self.returncodes = returncodes or {}
+        self.modules = modules
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.stackwalked = []
+
+    def __call__(self, args, timeout, capture_output):
+        if args[-1] == "--version":
+            return ProcessCompletedMock(returncode=0, stdout=b"1.0", stderr=b"")
+
+        dump_file_name = args[-1].rsplit("/", 1)[-1]
+        output_path = [
+            arg.split("=", 1)[1] for arg in args if arg.startswith("--output-file=")
+        ][0]
+
+        with self.lock:
+            self.stackwalked.append(dump_file_name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delays.get(dump_file_name, 0.01))
+        with self.lock:
+            self.running -= 1
+
+        output = copy.deepcopy(MINIMAL_STACKWALKER_OUTPUT)
+        output["system_info"]["os"] = dump_file_name
+        if self.modules is not None:
+            output["modules"] = self.modules
+        with open(output_path, "w") as fp:
+            json.dump(output, fp)
+
+        return ProcessCompletedMock(
+            returncode=self.returncodes.get(dump_file_name, 0), stdout=b"", stderr=b""
+        )
+
+
+class TestMinidumpStackwalkRuleMultipleMinidumps:
+    def build_dumps(self, tmp_path, dump_names):
+        dumps = {}
+        for dump_name in dump_names:
+            dumppath = tmp_path / dump_name
+            dumppath.write_text("abcde")
+            dumps[dump_name] = str(dumppath)
+        return dumps
+
+    def test_merged_in_dumps_order(self, tmp_path):
+        # The first dumps take the longest, so they finish last
+        fake_stackwalker = FakeStackwalker(
+            delays={
+                "upload_file_minidump": 0.3,
+                "upload_file_minidump_browser": 0.2,
+                "upload_file_minidump_content": 0.1,
+            },
+            returncodes={
+                "upload_file_minidump_browser": -9,
+                "upload_file_minidump_content": -6,
+            },
+        )
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_stackwalker
+            rule = MinidumpStackwalkRule(
+                symbol_tmp_path=str(tmp_path / "tmp"),
+                symbol_cache_path=str(tmp_path / "cache"),
+                max_concurrent_stackwalkers=4,
+            )
+
+            dumps = self.build_dumps(
+                tmp_path,
+                [
+                    "upload_file_minidump",
+                    "upload_file_minidump_browser",
+                    "memory_report",
+                    "upload_file_minidump_content",
+                ],
+            )
+            raw_crash = {"uuid": example_uuid}
+            processed_crash = {}
+            status = Status()
+
+            start_time = time.perf_counter()
+            rule.act(raw_crash, dumps, processed_crash, str(tmp_path), status)
+            elapsed = time.perf_counter() - start_time
+            rule.close()
+
+        # The stackwalkers ran at the same time
+        assert fake_stackwalker.max_running == 3
+        assert elapsed < 0.6
+
+        assert processed_crash["json_dump"]["system_info"]["os"] == (
+            "upload_file_minidump"
+        )
+        assert processed_crash["additional_minidumps"] == [
+            "upload_file_minidump_browser",
+            "upload_file_minidump_content",
+        ]
+        assert processed_crash["upload_file_minidump_browser"]["mdsw_return_code"] == -9
+        assert processed_crash["upload_file_minidump_content"]["mdsw_return_code"] == -6
+        assert "memory_report" not in processed_crash
+        assert status.notes == [
+            "MinidumpStackwalkRule: minidump-stackwalk: timeout (SIGKILL)",
+            "MinidumpStackwalkRule: minidump-stackwalk: timeout (SIGABRT)",
+        ]
+
+    def test_concurrency_bounded(self, tmp_path):
+        fake_stackwalker = FakeStackwalker(
+            delays={
+                "upload_file_minidump": 0.1,
+                "upload_file_minidump_a": 0.1,
+                "upload_file_minidump_b": 0.1,
+                "upload_file_minidump_c": 0.1,
+            },
+        )
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_stackwalker
+            rule = MinidumpStackwalkRule(
+                symbol_tmp_path=str(tmp_path / "tmp"),
+                symbol_cache_path=str(tmp_path / "cache"),
+                max_concurrent_stackwalkers=2,
+            )
+
+            # Two worker threads each process a crash with four minidumps
+            def process(crash_index):
+                crash_dir = tmp_path / str(crash_index)
+                crash_dir.mkdir()
+                dumps = self.build_dumps(
+                    crash_dir,
+                    [
+                        "upload_file_minidump",
+                        "upload_file_minidump_a",
+                        "upload_file_minidump_b",
+                        "upload_file_minidump_c",
+                    ],
+                )
+                processed_crash = {}
+                rule.act(
+                    {"uuid": example_uuid},
+                    dumps,
+                    processed_crash,
+                    str(crash_dir),
+                    Status(),
+                )
+                assert len(processed_crash["additional_minidumps"]) == 3
+
+            threads = [threading.Thread(target=process, args=(i,)) for i in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            rule.close()
+
+        assert fake_stackwalker.max_running == 2
+
+
+class TestMinidumpStackwalkRuleCache:
+    def process(self, rule, tmp_path, raw_crash, dump_data=b"abcde"):
+        crash_dir = tmp_path / "crash"
+        crash_dir.mkdir(exist_ok=True)
+        dumppath = crash_dir / "upload_file_minidump"
+        dumppath.write_bytes(dump_data)
+        processed_crash = {}
+        status = Status()
+        rule.act(
+            copy.deepcopy(raw_crash),
+            {"upload_file_minidump": str(dumppath)},
+            processed_crash,
+            str(crash_dir),
+            status,
+        )
+        return processed_crash, status
+
+    def build_rule(self, tmp_path, **kwargs):
+        return MinidumpStackwalkRule(
+            symbol_tmp_path=str(tmp_path / "tmp"),
+            symbol_cache_path=str(tmp_path / "cache"),
+            stackwalk_cache=DiskStackwalkCache(path=str(tmp_path / "swcache")),
+            **kwargs,
+        )
+
+    def test_hit_skips_stackwalker(self, tmp_path):
+        fake_stackwalker = FakeStackwalker()
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_stackwalker
+            rule = self.build_rule(tmp_path)
+            raw_crash = {"uuid": example_uuid, "ProductName": "Firefox"}
+
+            with MetricsMock() as mm:
+                processed_crash, _ = self.process(rule, tmp_path, raw_crash)
+                cached_crash, _ = self.process(rule, tmp_path, raw_crash)
+            rule.close()
+
+        assert fake_stackwalker.stackwalked == ["upload_file_minidump"]
+        assert cached_crash == processed_crash
+        mm.assert_incr(
+            "socorro.processor.minidumpstackwalk.cache",
+            tags=["result:miss", AnyTagValue("host")],
+        )
+        mm.assert_incr(
+            "socorro.processor.minidumpstackwalk.cache",
+            tags=["result:hit", AnyTagValue("host")],
+        )
+
+    def test_key_changes_miss(self, tmp_path):
+        fake_stackwalker = FakeStackwalker()
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_stackwalker
+            rule = self.build_rule(tmp_path)
+            raw_crash = {"uuid": example_uuid, "ProductName": "Firefox"}
+
+            self.process(rule, tmp_path, raw_crash)
+            # Different minidump
+            self.process(rule, tmp_path, raw_crash, dump_data=b"fghij")
+            # Different crash annotations
+            self.process(rule, tmp_path, dict(raw_crash, ProductName="Fenix"))
+            rule.close()
+
+        assert len(fake_stackwalker.stackwalked) == 3
+
+    def test_uses_dump_checksum(self, tmp_path):
+        fake_stackwalker = FakeStackwalker()
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_stackwalker
+            rule = self.build_rule(tmp_path)
+            raw_crash = {
+                "uuid": example_uuid,
+                "metadata": {"dump_checksums": {"upload_file_minidump": "abc123"}},
+            }
+
+            self.process(rule, tmp_path, raw_crash)
+            # The checksum from the metadata is the minidump's identity
+            self.process(rule, tmp_path, raw_crash, dump_data=b"fghij")
+            rule.close()
+
+        assert len(fake_stackwalker.stackwalked) == 1
+
+    def test_failures_not_cached(self, tmp_path):
+        fake_stackwalker = FakeStackwalker(returncodes={"upload_file_minidump": -9})
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_stackwalker
+            rule = self.build_rule(tmp_path)
+            raw_crash = {"uuid": example_uuid}
+
+            self.process(rule, tmp_path, raw_crash)
+            processed_crash, status = self.process(rule, tmp_path, raw_crash)
+            rule.close()
+
+        assert len(fake_stackwalker.stackwalked) == 2
+        assert processed_crash["mdsw_return_code"] == -9
+        assert status.notes == [
+            "MinidumpStackwalkRule: minidump-stackwalk: timeout (SIGKILL)"
+        ]
+
+    def test_missing_symbols_not_cached(self, tmp_path):
+        fake_stackwalker = FakeStackwalker(
+            modules=[
+                {"filename": "xul.dll", "missing_symbols": False},
+                {"filename": "plugin.dll", "missing_symbols": True},
+            ]
+        )
+        with mock.patch(
+            "socorro.processor.rules.breakpad.subprocess"
+        ) as mock_subprocess:
+            mock_subprocess.run.side_effect = fake_stackwalker
+            rule = self.build_rule(tmp_path)
+            raw_crash = {"uuid": example_uuid}
+
+            self.process(rule, tmp_path, raw_crash)
+            # Symbols may have been uploaded since, so this runs the stackwalker
+            processed_crash, _ = self.process(rule, tmp_path, raw_crash)
+            rule.close()
+
+        assert len(fake_stackwalker.stackwalked) == 2
+        assert processed_crash["mdsw_return_code"] == 0
+
+
+FAKE_STACKWALKER_SCRIPT = """\
+import json
+import os
+import sys
+import time
+
+args = sys.argv[1:]
+if args == ["--version"]:
+    print("1.0")
+    sys.exit(0)
+
+options = dict(arg.split("=", 1) for arg in args if arg.startswith("--") and "=" in arg)
+dump_file_path = args[-1]
+
+# The minidump holds the number of seconds to take and the exit code
+with open(dump_file_path) as fp:
+    delay, returncode = fp.read().split()
+time.sleep(float(delay))
+
+output = {"status": "OK", "system_info": {"os": os.path.basename(dump_file_path)}}
+with open(options["--output-file"], "w") as fp:
+    json.dump(output, fp)
+with open(options["--log-file"], "w") as fp:
+    fp.write("")
+sys.exit(int(returncode))
+"""
+
+
+class TestMinidumpStackwalkRuleAsync:
+    def build_rule(self, tmp_path, **kwargs):
+        command_path = tmp_path / "minidump-stackwalk"
+        command_path.write_text(f"#!{sys.executable}\n{FAKE_STACKWALKER_SCRIPT}")
+        os.chmod(command_path, 0o755)
+        return MinidumpStackwalkRule(
+            command_path=str(command_path),
+            symbol_tmp_path=str(tmp_path / "tmp"),
+            symbol_cache_path=str(tmp_path / "cache"),
+            **kwargs,
+        )
+
+    def build_dumps(self, tmp_path, dump_contents):
+        dumps = {}
+        for dump_name, content in dump_contents.items():
+            dumppath = tmp_path / dump_name
+            dumppath.write_text(content)
+            dumps[dump_name] = str(dumppath)
+        return dumps
+
+    def test_merged_in_dumps_order(self, tmp_path):
+        rule = self.build_rule(tmp_path, max_concurrent_stackwalkers=4)
+        # The first dumps take the longest, so they finish last
+        dumps = self.build_dumps(
+            tmp_path,
+            {
+                "upload_file_minidump": "0.6 0",
+                "upload_file_minidump_browser": "0.4 0",
+                "memory_report": "",
+                "upload_file_minidump_content": "0.2 1",
+            },
+        )
+        raw_crash = {"uuid": example_uuid}
+        processed_crash = {}
+        status = Status()
+
+        start_time = time.perf_counter()
+        asyncio.run(
+            rule.act_async(raw_crash, dumps, processed_crash, str(tmp_path), status)
+        )
+        elapsed = time.perf_counter() - start_time
+        rule.close()
+
+        # The stackwalkers ran at the same time without using the rule's executor
+        assert elapsed < 1.2
+        assert rule._executor is None
+
+        assert processed_crash["mdsw_return_code"] == 0
+        assert processed_crash["json_dump"]["system_info"]["os"] == (
+            "upload_file_minidump"
+        )
+        assert processed_crash["additional_minidumps"] == [
+            "upload_file_minidump_browser",
+            "upload_file_minidump_content",
+        ]
+        assert processed_crash["upload_file_minidump_browser"]["success"] is True
+        assert processed_crash["upload_file_minidump_content"]["mdsw_return_code"] == 1
+        assert "memory_report" not in processed_crash
+        assert status.notes == [
+            "MinidumpStackwalkRule: minidump-stackwalk: failed: 1: unknown error",
+        ]
+
+    def test_timeout(self, tmp_path):
+        rule = self.build_rule(tmp_path, kill_timeout=1)
+        dumps = self.build_dumps(tmp_path, {"upload_file_minidump": "10 0"})
+        raw_crash = {"uuid": example_uuid}
+        processed_crash = {}
+        status = Status()
+
+        asyncio.run(
+            rule.act_async(raw_crash, dumps, processed_crash, str(tmp_path), status)
+        )
+        rule.close()
+
+        assert processed_crash["mdsw_return_code"] == -9
+        assert processed_crash["success"] is False
+        assert status.notes == [
+            "MinidumpStackwalkRule: minidump-stackwalk: timeout (SIGKILL)"
+        ]
+
+    def test_empty_minidump_shortcut(self, tmp_path):
+        rule = self.build_rule(tmp_path)
+        dumps = self.build_dumps(tmp_path, {"upload_file_minidump": ""})
+        raw_crash = {"uuid": example_uuid}
+        processed_crash = {}
+        status = Status()
+
+        asyncio.run(
+            rule.act_async(raw_crash, dumps, processed_crash, str(tmp_path), status)
+        )
+
+        assert processed_crash["mdsw_status_string"] == "EmptyMinidump"
+        assert processed_crash["mdsw_stderr"] == "Shortcut for 0-bytes minidump."
+
+    def test_cache_hit(self, tmp_path):
+        rule = self.build_rule(
+            tmp_path,
+            stackwalk_cache=DiskStackwalkCache(path=str(tmp_path / "swcache")),
+        )
+        dumps = self.build_dumps(tmp_path, {"upload_file_minidump": "0 0"})
+        raw_crash = {"uuid": example_uuid}
+
+        with MetricsMock() as mm:
+            for _ in range(2):
+                processed_crash = {}
+                asyncio.run(
+                    rule.act_async(
+                        raw_crash, dumps, processed_crash, str(tmp_path), Status()
+                    )
+                )
+                assert processed_crash["success"] is True
+            rule.close()
+
+            mm.assert_incr_once(
+                "socorro.processor.minidumpstackwalk.cache",
+                tags=["result:miss", AnyTagValue("host")],
+            )
+            mm.assert_incr_once(
+                "socorro.processor.minidumpstackwalk.cache",
+                tags=["result:hit", AnyTagValue("host")],
+            )
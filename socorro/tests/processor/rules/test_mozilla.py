@@ -8,6 +8,7 @@ from io import BytesIO
 import json
 from unittest import mock
 
+from markus.testing import AnyTagValue, MetricsMock
 import requests_mock
 import pytest
 
@@ -2031,6 +2032,59 @@ class TestSignatureGeneratorRule:
         )
         assert status.notes == []
 
+    def test_frame_cache_metrics(self, tmp_path):
+        rule = SignatureGeneratorRule()
+        frames = [
+            {"frame": 0, "function": "Alpha<Bravo>::Echo", "file": "foo.cpp"},
+            {"frame": 1, "function": "Alpha<Bravo>::Echo", "file": "foo.cpp"},
+        ]
+
+        with MetricsMock() as mm:
+            processed_crash = {
+                "json_dump": {
+                    "crashing_thread": 0,
+                    "threads": [{"frames": copy.deepcopy(frames)}],
+                }
+            }
+            rule.action({}, {}, processed_crash, str(tmp_path), Status())
+
+            # The first frame is a miss and the second frame is a hit
+            mm.assert_incr(
+                "socorro.processor.signaturegeneratorrule.frame_cache",
+                value=1,
+                tags=["result:miss", AnyTagValue("host")],
+            )
+            mm.assert_incr(
+                "socorro.processor.signaturegeneratorrule.frame_cache",
+                value=1,
+                tags=["result:hit", AnyTagValue("host")],
+            )
+            mm.clear_records()
+
+            processed_crash = {
+                "json_dump": {
+                    "crashing_thread": 0,
+                    "threads": [{"frames": copy.deepcopy(frames)}],
+                }
+            }
+            rule.action({}, {}, processed_crash, str(tmp_path), Status())
+
+            # Only the changes since the last crash are emitted
+            mm.assert_incr(
+                "socorro.processor.signaturegeneratorrule.frame_cache",
+                value=2,
+                tags=["result:hit", AnyTagValue("host")],
+            )
+            assert (
+                len(
+                    mm.filter_records(
+                        "incr",
+                        stat="socorro.processor.signaturegeneratorrule.frame_cache",
+                    )
+                )
+                == 1
+            )
+
     def test_empty_raw_and_processed_crashes(self, tmp_path):
         rule = SignatureGeneratorRule()
         raw_crash = {}
@@ -2,6 +2,8 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import asyncio
+import threading
 from unittest.mock import ANY
 
 import freezegun
@@ -9,7 +11,7 @@ from fillmore.test import diff_structure
 
 from socorro.lib.libdatetime import date_to_string, utc_now
 from socorro.processor.processor_app import ProcessorApp
-from socorro.processor.pipeline import Pipeline
+from socorro.processor.pipeline import Pipeline, Ruleset
 from socorro.processor.rules.general import CPUInfoRule, OSInfoRule
 from socorro.processor.rules.base import Rule
 
@@ -19,6 +21,22 @@ class BadRule(Rule):
         raise KeyError("pii")
 
 
+class ThreadNameRule(Rule):
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+
+    def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        processed_crash[self.key] = threading.current_thread().name
+
+
+class AsyncThreadNameRule(ThreadNameRule):
+    async_action = True
+
+    async def action_async(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        self.action(raw_crash, dumps, processed_crash, tmpdir, status)
+
+
 # NOTE(willkg): If this changes, we should update it and look for new things that should
 # be scrubbed. Use ANY for things that change between tests like timestamps, source code
 # data (line numbers, file names, post/pre_context), event ids, build ids, versions,
@@ -164,3 +182,97 @@ class TestPipeline:
         assert "previousnotes" not in processed_crash["processor_notes"]
         processor_history = "".join(processed_crash["processor_history"])
         assert "previousnotes" in processor_history
+
+    def test_process_crash_async(self, tmp_path):
+        raw_crash = {"uuid": "1"}
+        processed_crash = {"processor_notes": "previousnotes"}
+
+        rulesets = {
+            "default": [
+                ThreadNameRule("executor1"),
+                BadRule(),
+                ThreadNameRule("executor2"),
+                AsyncThreadNameRule("inline"),
+                ThreadNameRule("executor3"),
+            ]
+        }
+        pipeline = Pipeline(rulesets=rulesets, hostname="testhost")
+
+        processed_crash = asyncio.run(
+            pipeline.process_crash_async(
+                ruleset_name="default",
+                raw_crash=raw_crash,
+                dumps={},
+                processed_crash=processed_crash,
+                tmpdir=str(tmp_path),
+            )
+        )
+
+        # Rules run in the executor unless they have async actions
+        assert processed_crash["inline"] == threading.current_thread().name
+        for key in ["executor1", "executor2", "executor3"]:
+            assert processed_crash[key] != threading.current_thread().name
+
+        assert processed_crash["success"] is True
+        notes = processed_crash["processor_notes"].split("\n")
+        assert notes[1] == (
+            "ruleset 'default' "
+            + "rule 'socorro.tests.processor.test_pipeline.BadRule' "
+            + "failed: KeyError"
+        )
+        assert processed_crash["processor_history"] == ["previousnotes"]
+
+    def test_get_ruleset(self):
+        rules = [CPUInfoRule()]
+        rulesets = {
+            "list": rules,
+            "some": Ruleset(
+                rules=rules,
+                processed_crash_fields=["processor_notes"],
+                needs_dumps=False,
+                updated_fields=["signature"],
+            ),
+            "none": Ruleset(rules=rules, processed_crash_fields=[]),
+        }
+        pipeline = Pipeline(rulesets=rulesets, hostname="testhost")
+
+        # Plain lists and unknown rulesets need and save everything
+        for name in ["list", "unknown"]:
+            ruleset = pipeline.get_ruleset(name)
+            assert ruleset.processed_crash_fields is None
+            assert ruleset.needs_dumps is True
+            assert ruleset.updated_fields is None
+        assert pipeline.get_ruleset("list") == rules
+
+        ruleset = pipeline.get_ruleset("some")
+        assert ruleset == rules
+        assert ruleset.processed_crash_fields == ("processor_notes",)
+        assert ruleset.needs_dumps is False
+        assert ruleset.updated_fields == ("signature",)
+
+        assert pipeline.get_ruleset("none").processed_crash_fields == ()
+
+    def test_mozilla_rulesets(self):
+        pipeline = Pipeline(
+            rulesets="socorro.mozilla_rulesets.RULESETS", hostname="testhost"
+        )
+
+        # The default ruleset only needs the processing history
+        ruleset = pipeline.get_ruleset("default")
+        assert ruleset.processed_crash_fields == (
+            "processor_history",
+            "processor_notes",
+        )
+        assert ruleset.needs_dumps is True
+        assert ruleset.updated_fields is None
+
+        # Regenerating the signature saves everything else as is and only updates
+        # the signature fields
+        ruleset = pipeline.get_ruleset("regenerate_signature")
+        assert ruleset.processed_crash_fields is None
+        assert ruleset.needs_dumps is False
+        assert ruleset.updated_fields == (
+            "signature",
+            "proto_signature",
+            "signature_debug",
+        )
@@ -2,6 +2,8 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at https://mozilla.org/MPL/2.0/.
 
+import asyncio
+import threading
 from unittest import mock
 from unittest.mock import ANY
 
@@ -11,7 +13,13 @@ import pytest
 
 from socorro import settings
 from socorro.external.crashstorage_base import CrashIDNotFound
-from socorro.processor.processor_app import ProcessorApp, count_sentry_scrub_error
+from socorro.processor.pipeline import PIPELINE_FIELDS, Ruleset
+from socorro.processor.processor_app import (
+    count_sentry_scrub_error,
+    DestinationDispatcher,
+    ProcessorApp,
+)
+from socorro.processor.rules.base import Rule
 
 
 def sequencer(*args):
@@ -55,6 +63,22 @@ def get_destination(app, destination_name):
     return app.destinations[index]
 
 
+PREVIOUS_PROCESSED_CRASH = {
+    "uuid": "930b08ba-e425-49bf-adbd-7c9172220721",
+    "processor_notes": "notes",
+    "json_dump": {"threads": []},
+}
+
+
+class SetSignatureRule(Rule):
+    def __init__(self, signature):
+        super().__init__()
+        self.signature = signature
+
+    def action(self, raw_crash, dumps, processed_crash, tmpdir, status):
+        processed_crash["signature"] = self.signature
+
+
 class TestProcessorApp:
     def test_source_iterator(self, processor_settings):
         app = ProcessorApp()
@@ -78,7 +102,10 @@ class TestProcessorApp:
         mocked_get_dumps_as_files = mock.Mock(return_value=fake_dumps)
         app.source.get_dumps_as_files = mocked_get_dumps_as_files
 
-        fake_processed_crash = {"uuid": "9d8e7127-9d98-4d92-8ab1-065982200317"}
+        fake_processed_crash = {
+            "uuid": "9d8e7127-9d98-4d92-8ab1-065982200317",
+            "processor_notes": "previous notes",
+        }
         mocked_get_processed_crash = mock.Mock(return_value=fake_processed_crash)
         app.source.get_processed_crash = mocked_get_processed_crash
 
@@ -92,11 +119,12 @@ class TestProcessorApp:
 
         # test results
         app.source.get_raw_crash.assert_called_with("17")
+        # The default ruleset only gets the previous processing history
         app.pipeline.process_crash.assert_called_with(
             ruleset_name="default",
             raw_crash=fake_raw_crash,
             dumps=fake_dumps,
-            processed_crash=fake_processed_crash,
+            processed_crash={"processor_notes": "previous notes"},
             # FIXME(willkg): testing this is tricky--we'd have to mock
             # TemporaryDirectory
             tmpdir=ANY,
@@ -106,6 +134,137 @@ class TestProcessorApp:
         )
         assert finished_func.call_count == 1
 
+    @pytest.mark.parametrize(
+        "processed_crash_fields, expected",
+        [
+            (None, (PREVIOUS_PROCESSED_CRASH, False)),
+            (
+                ["processor_notes", "processor_history"],
+                ({"processor_notes": "notes"}, False),
+            ),
+            ([], ({}, None)),
+        ],
+    )
+    def test_fetch_crash_processed_crash_fields(
+        self, processor_settings, processed_crash_fields, expected
+    ):
+        app = ProcessorApp()
+        app._set_up_source_and_destination()
+
+        crash_id = "930b08ba-e425-49bf-adbd-7c9172220721"
+        app.source.save_raw_crash(
+            crash_id=crash_id, raw_crash={"uuid": crash_id}, dumps={}
+        )
+        app.source.save_processed_crash(
+            raw_crash={}, processed_crash=dict(PREVIOUS_PROCESSED_CRASH)
+        )
+        app.source.get_processed_crash = mock.Mock(
+            side_effect=app.source.get_processed_crash
+        )
+
+        raw_crash, dumps, processed_crash, new_crash = app.fetch_crash(
+            crash_id, tmpdir="/tmp", processed_crash_fields=processed_crash_fields
+        )
+        assert (processed_crash, new_crash) == expected
+        if processed_crash_fields == []:
+            app.source.get_processed_crash.assert_not_called()
+
+    def test_fetch_crash_no_previous_processed_crash(self, processor_settings):
+        app = ProcessorApp()
+        app._set_up_source_and_destination()
+
+        crash_id = "930b08ba-e425-49bf-adbd-7c9172220721"
+        app.source.save_raw_crash(
+            crash_id=crash_id, raw_crash={"uuid": crash_id}, dumps={}
+        )
+
+        raw_crash, dumps, processed_crash, new_crash = app.fetch_crash(
+            crash_id, tmpdir="/tmp", processed_crash_fields=["processor_notes"]
+        )
+        assert processed_crash == {}
+        assert new_crash is True
+
+    @pytest.mark.parametrize("use_async", [False, True])
+    def test_updated_fields_changed(self, processor_settings, use_async):
+        app = ProcessorApp()
+        app._set_up_source_and_destination()
+        app.pipeline_slots = asyncio.Semaphore(1)
+        app.pipeline.rulesets = {
+            "regenerate": Ruleset(
+                rules=[SetSignatureRule("new signature")],
+                needs_dumps=False,
+                updated_fields=["signature"],
+            )
+        }
+
+        crash_id = PREVIOUS_PROCESSED_CRASH["uuid"]
+        app.source.save_raw_crash(
+            crash_id=crash_id, raw_crash={"uuid": crash_id}, dumps={}
+        )
+        app.source.save_processed_crash(
+            raw_crash={},
+            processed_crash=dict(PREVIOUS_PROCESSED_CRASH, signature="old signature"),
+        )
+        app.source.get_dumps_as_files = mock.Mock()
+        dest = app.destinations[0]
+        dest.update_processed_crash = mock.Mock()
+
+        task = f"{crash_id}:regenerate"
+        if use_async:
+            asyncio.run(app.transform_async(task))
+        else:
+            app.transform(task)
+
+        # The dumps aren't fetched and only the changed fields are saved
+        app.source.get_dumps_as_files.assert_not_called()
+        dest.update_processed_crash.assert_called_once_with(
+            {"uuid": crash_id}, ANY, PIPELINE_FIELDS
+        )
+        processed_crash = dest.update_processed_crash.call_args[0][1]
+        assert processed_crash["signature"] == "new signature"
+        assert processed_crash["json_dump"] == PREVIOUS_PROCESSED_CRASH["json_dump"]
+
+    @pytest.mark.parametrize("use_async", [False, True])
+    def test_updated_fields_unchanged(self, processor_settings, use_async):
+        app = ProcessorApp()
+        app._set_up_source_and_destination()
+        app.pipeline_slots = asyncio.Semaphore(1)
+        app.pipeline.rulesets = {
+            "regenerate": Ruleset(
+                rules=[SetSignatureRule("old signature")],
+                needs_dumps=False,
+                updated_fields=["signature"],
+            )
+        }
+
+        crash_id = PREVIOUS_PROCESSED_CRASH["uuid"]
+        app.source.save_raw_crash(
+            crash_id=crash_id, raw_crash={"uuid": crash_id}, dumps={}
+        )
+        app.source.save_processed_crash(
+            raw_crash={},
+            processed_crash=dict(PREVIOUS_PROCESSED_CRASH, signature="old signature"),
+        )
+        dest = app.destinations[0]
+        dest.save_processed_crash = mock.Mock()
+        dest.update_processed_crash = mock.Mock()
+
+        task = f"{crash_id}:regenerate"
+        with MetricsMock() as mm:
+            if use_async:
+                asyncio.run(app.transform_async(task))
+            else:
+                app.transform(task)
+
+            # Nothing changed, so nothing is saved
+            dest.save_processed_crash.assert_not_called()
+            dest.update_processed_crash.assert_not_called()
+            mm.assert_incr(
+                "socorro.processor.save_processed_crash_unchanged",
+                tags=["ruleset:regenerate", AnyTagValue("host")],
+            )
+            mm.assert_not_incr("socorro.processor.save_processed_crash")
+
     def test_transform_crash_id_missing(self, processor_settings):
         app = ProcessorApp()
         app._set_up_source_and_destination()
@@ -143,6 +302,171 @@ class TestProcessorApp:
         )
         assert finished_func.call_count == 1
 
+    def test_set_up_task_manager_async(self, processor_settings):
+        with settings.override(
+            **{
+                "PROCESSOR.task_manager.class": (
+                    "socorro.lib.asyncio_task_manager.AsyncioTaskManager"
+                ),
+            }
+        ):
+            app = ProcessorApp()
+            with mock.patch("socorro.processor.processor_app.signal"):
+                app._set_up_task_manager()
+
+        assert app.task_manager.task_func == app.transform_async
+        assert app.pipeline_slots._value == app.task_manager.number_of_threads
+
+    def test_transform_async_success(self, processor_settings):
+        app = ProcessorApp()
+        app._set_up_source_and_destination()
+        app.pipeline_slots = asyncio.Semaphore(1)
+
+        fake_raw_crash = {"raw": "1"}
+        app.source.get_raw_crash = mock.Mock(return_value=fake_raw_crash)
+        fake_dumps = {"upload_file_minidump": "fake_dump_TEMPORARY.dump"}
+        app.source.get_dumps_as_files = mock.Mock(return_value=fake_dumps)
+        fake_processed_crash = {
+            "uuid": "9d8e7127-9d98-4d92-8ab1-065982200317",
+            "processor_notes": "previous notes",
+        }
+        app.source.get_processed_crash = mock.Mock(return_value=fake_processed_crash)
+        app.pipeline.process_crash_async = mock.AsyncMock(
+            return_value={"processed": "1"}
+        )
+        app.destinations[0].save_processed_crash = mock.Mock()
+        finished_func = mock.Mock()
+
+        asyncio.run(app.transform_async("17", finished_func))
+
+        app.source.get_raw_crash.assert_called_with("17")
+        app.pipeline.process_crash_async.assert_awaited_with(
+            ruleset_name="default",
+            raw_crash=fake_raw_crash,
+            dumps=fake_dumps,
+            processed_crash={"processor_notes": "previous notes"},
+            tmpdir=ANY,
+        )
+        app.destinations[0].save_processed_crash.assert_called_with(
+            {"raw": "1"}, {"processed": "1"}
+        )
+        assert finished_func.call_count == 1
+
+    def test_transform_async_save_error(self, processor_settings):
+        app = ProcessorApp()
+        app._set_up_source_and_destination()
+        app.pipeline_slots = asyncio.Semaphore(1)
+
+        app.source.get_raw_crash = mock.Mock(return_value={"raw": "1"})
+        app.source.get_dumps_as_files = mock.Mock(return_value={})
+        app.source.get_processed_crash = mock.Mock(side_effect=CrashIDNotFound("17"))
+        app.pipeline.process_crash_async = mock.AsyncMock(
+            return_value={"processed": "1"}
+        )
+        app.destinations[0].save_processed_crash = mock.Mock(
+            side_effect=ValueError("simulated error")
+        )
+        finished_func = mock.Mock()
+
+        with pytest.raises(ValueError):
+            asyncio.run(app.transform_async("17", finished_func))
+
+        assert finished_func.call_count == 1
+
+
+class FakeDestination:
+    def __init__(self, name, save_func=None):
+        self.crash_destination_name = name
+        self.save_func = save_func
+        self.saved = []
+        self.updated = []
+
+    def save_processed_crash(self, raw_crash, processed_crash):
+        if self.save_func is not None:
+            self.save_func()
+        self.saved.append((raw_crash, processed_crash))
+
+    def update_processed_crash(self, raw_crash, processed_crash, fields):
+        self.updated.append((raw_crash, processed_crash, fields))
+
+
+class TestDestinationDispatcher:
+    def test_saves_concurrently(self):
+        # Both saves have to be running at the same time for the barrier to pass
+        barrier = threading.Barrier(2, timeout=5)
+        destinations = [
+            FakeDestination("dest1", save_func=barrier.wait),
+            FakeDestination("storage", save_func=barrier.wait),
+        ]
+        dispatcher = DestinationDispatcher(destinations=destinations, max_workers=2)
+        try:
+            dispatcher.save("17", {"raw": "1"}, {"processed": "1"})
+        finally:
+            dispatcher.close()
+
+        for dest in destinations:
+            assert dest.saved == [({"raw": "1"}, {"processed": "1"})]
+
+    def test_failure_fails_crash_after_all_saves(self, metricsmock):
+        def fail():
+            raise ValueError("simulated error")
+
+        destinations = [
+            FakeDestination("dest1", save_func=fail),
+            FakeDestination("storage"),
+        ]
+        dispatcher = DestinationDispatcher(destinations=destinations, max_workers=2)
+        try:
+            with metricsmock as mm:
+                with pytest.raises(ValueError):
+                    dispatcher.save("17", {"raw": "1"}, {"processed": "1"})
+
+                mm.assert_incr(
+                    "socorro.processor.save_processed_crash_error",
+                    tags=["destination:dest1", AnyTagValue("host")],
+                )
+        finally:
+            dispatcher.close()
+
+        # The other destination was still saved
+        assert destinations[1].saved == [({"raw": "1"}, {"processed": "1"})]
+
+    def test_save_async(self):
+        barrier = threading.Barrier(2, timeout=5)
+        destinations = [
+            FakeDestination("dest1", save_func=barrier.wait),
+            FakeDestination("storage", save_func=barrier.wait),
+        ]
+        dispatcher = DestinationDispatcher(destinations=destinations, max_workers=2)
+        try:
+            asyncio.run(dispatcher.save_async("17", {"raw": "1"}, {"processed": "1"}))
+        finally:
+            dispatcher.close()
+
+        for dest in destinations:
+            assert dest.saved == [({"raw": "1"}, {"processed": "1"})]
+
+    def test_save_fields(self):
+        destinations = [FakeDestination("dest1"), FakeDestination("storage")]
+        dispatcher = DestinationDispatcher(destinations=destinations, max_workers=2)
+        try:
+            dispatcher.save("17", {"raw": "1"}, {"processed": "1"}, fields=("a",))
+            asyncio.run(
+                dispatcher.save_async(
+                    "17", {"raw": "1"}, {"processed": "1"}, fields=("b",)
+                )
+            )
+        finally:
+            dispatcher.close()
+
+        # Saving some fields updates the destinations
+        for dest in destinations:
+            assert dest.saved == []
+            assert dest.updated == [
+                ({"raw": "1"}, {"processed": "1"}, ("a",)),
+                ({"raw": "1"}, {"processed": "1"}, ("b",)),
+            ]
+
 
 # NOTE(willkg): If this changes, we should update it and look for new things that should
 # be scrubbed. Use ANY for things that change between tests like timestamps, source code
@@ -179,7 +503,7 @@ TRANSFORM_GET_ERROR = {
                             "abs_path": "/app/socorro/processor/processor_app.py",
                             "context_line": ANY,
                             "filename": "socorro/processor/processor_app.py",
-                            "function": "process_crash",
+                            "function": "fetch_crash",
                             "in_app": True,
                             "lineno": ANY,
                             "module": "socorro.processor.processor_app",
@@ -328,7 +652,11 @@ def test_transform_save_error(processor_settings, sentry_helper, caplogpp, tmp_p
 
             # Assert what got logged. It should be all the messages except the last
             # "completed" one because this kicked up a ValueError in saving
-            messages = [record.message for record in caplogpp.records]
+            messages = [
+                record.message
+                for record in caplogpp.records
+                if record.name.startswith("socorro.processor.processor_app")
+            ]
             assert messages == [
                 "starting 930b08ba-e425-49bf-adbd-7c9172220721 with default",
                 "fetching data 930b08ba-e425-49bf-adbd-7c9172220721",
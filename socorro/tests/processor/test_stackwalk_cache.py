@@ -0,0 +1,86 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import os
+
+from socorro.processor.stackwalk_cache import (
+    build_stackwalk_cache_key,
+    DiskStackwalkCache,
+)
+
+
+class TestBuildStackwalkCacheKey:
+    def test_stable(self):
+        args = ("abc", "1.0", ["cmd", "https://symbols"], b'{"a": 1}')
+        assert build_stackwalk_cache_key(*args) == build_stackwalk_cache_key(*args)
+
+    def test_sensitive_to_each_part(self):
+        key = build_stackwalk_cache_key("abc", "1.0", ["cmd"], b"{}")
+        assert key != build_stackwalk_cache_key("abd", "1.0", ["cmd"], b"{}")
+        assert key != build_stackwalk_cache_key("abc", "1.1", ["cmd"], b"{}")
+        assert key != build_stackwalk_cache_key("abc", "1.0", ["cmd2"], b"{}")
+        assert key != build_stackwalk_cache_key("abc", "1.0", ["cmd"], b"{ }")
+
+    def test_parts_dont_run_together(self):
+        assert build_stackwalk_cache_key(
+            "ab", "c", ["d"], b""
+        ) != build_stackwalk_cache_key("a", "bc", ["d"], b"")
+
+
+class TestDiskStackwalkCache:
+    def test_get_set(self, tmp_path):
+        cache = DiskStackwalkCache(path=str(tmp_path))
+        assert cache.get("key1") is None
+
+        cache.set("key1", {"json_dump": {"crash_info": {}}, "success": True})
+        assert cache.get("key1") == {"json_dump": {"crash_info": {}}, "success": True}
+
+        # No temporary files are left behind
+        assert sorted(os.listdir(tmp_path)) == [".size", "key1"]
+
+    def test_persists(self, tmp_path):
+        DiskStackwalkCache(path=str(tmp_path)).set("key1", {"success": True})
+        assert DiskStackwalkCache(path=str(tmp_path)).get("key1") == {"success": True}
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        value = {"data": "x" * 100}
+        cache = DiskStackwalkCache(path=str(tmp_path))
+        cache.set("key1", value)
+        entry_size = os.path.getsize(tmp_path / "key1")
+
+        cache = DiskStackwalkCache(path=str(tmp_path), max_size=entry_size * 2)
+        cache.set("key2", value)
+        # Reading key1 makes key2 the least recently used
+        assert cache.get("key1") == value
+        cache.set("key3", value)
+
+        assert cache.get("key2") is None
+        assert cache.get("key1") == value
+        assert cache.get("key3") == value
+
+    def test_too_big(self, tmp_path):
+        cache = DiskStackwalkCache(path=str(tmp_path), max_size=10)
+        cache.set("key1", {"data": "x" * 100})
+        assert cache.get("key1") is None
+
+    def test_shared_directory(self, tmp_path):
+        # Caches in different processes share the directory and its size
+        value = {"data": "x" * 100}
+        cache1 = DiskStackwalkCache(path=str(tmp_path))
+        cache1.set("key1", value)
+        entry_size = os.path.getsize(tmp_path / "key1")
+
+        cache1 = DiskStackwalkCache(path=str(tmp_path), max_size=entry_size * 2)
+        cache2 = DiskStackwalkCache(path=str(tmp_path), max_size=entry_size * 2)
+        cache2.set("key2", value)
+        cache1.set("key3", value)
+
+        assert cache2.get("key1") is None
+        assert cache2.get("key2") == value
+        assert cache1.get("key3") == value
+        assert (tmp_path / ".size").read_text() == str(entry_size * 2)
+
+        # An entry evicted by one cache is a miss for the other
+        cache2.set("key4", value)
+        assert cache1.get("key2") is None
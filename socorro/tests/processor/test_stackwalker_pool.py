@@ -0,0 +1,183 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import sys
+import textwrap
+
+from markus.testing import AnyTagValue, MetricsMock
+import pytest
+
+from socorro.processor.pipeline import Status
+from socorro.processor.rules.breakpad import MinidumpStackwalkRule
+from socorro.processor.stackwalker_pool import PersistentStackwalkerPool
+
+
+# Fake stackwalker server that follows the protocol; what it does depends on the
+# name of the minidump
+FAKE_SERVER = textwrap.dedent(
+    """\
+    import json
+    import os
+    import sys
+    import time
+
+    if "--version" in sys.argv:
+        print("0.0.1")
+        sys.exit(0)
+
+    for line in sys.stdin.buffer:
+        args = json.loads(line)["args"]
+        dump_name = os.path.basename(args[-1])
+        if dump_name == "hang":
+            time.sleep(60)
+        elif dump_name == "abort":
+            os.abort()
+        elif dump_name == "garbage":
+            sys.stdout.buffer.write(b"garbage\\n")
+            sys.stdout.buffer.flush()
+            continue
+
+        returncode = 1 if dump_name == "fail" else 0
+        output = json.dumps(
+            {"status": "OK", "args": args, "pid": os.getpid()}
+        ).encode("utf-8")
+        log = b"log line\\n"
+        header = {
+            "returncode": returncode,
+            "output_length": len(output),
+            "log_length": len(log),
+        }
+        sys.stdout.buffer.write(json.dumps(header).encode("utf-8") + b"\\n")
+        sys.stdout.buffer.write(output + log)
+        sys.stdout.buffer.flush()
+    """
+)
+
+
+@pytest.fixture
+def server_command(tmp_path):
+    script_path = tmp_path / "fake_server.py"
+    script_path.write_text(FAKE_SERVER)
+    return f"{sys.executable} {script_path}"
+
+
+def build_command_line(dump_name):
+    return (
+        "minidump-stackwalk --output-file=/tmp/out.json --log-file=/tmp/out.log "
+        + f"--json /tmp/{dump_name}"
+    )
+
+
+def run(pool, dump_name):
+    return pool.run(
+        command_line=build_command_line(dump_name),
+        output_path="/tmp/out.json",
+        log_path="/tmp/out.log",
+    )
+
+
+class TestPersistentStackwalkerPool:
+    def test_reuses_server(self, server_command):
+        pool = PersistentStackwalkerPool(server_command=server_command, size=1)
+        try:
+            ret = run(pool, "upload_file_minidump")
+            assert ret["returncode"] == 0
+            assert ret["log"] == "log line\n"
+            output = json.loads(ret["output"])
+            # Output and logging come back over the pipe
+            assert output["args"] == ["--json", "/tmp/upload_file_minidump"]
+
+            ret = run(pool, "upload_file_minidump")
+            assert json.loads(ret["output"])["pid"] == output["pid"]
+        finally:
+            pool.close()
+
+    def test_failure(self, server_command):
+        pool = PersistentStackwalkerPool(server_command=server_command, size=1)
+        try:
+            ret = run(pool, "fail")
+            assert ret["returncode"] == 1
+            assert ret["output"] is None
+            assert ret["log"] == "log line\n"
+        finally:
+            pool.close()
+
+    def test_timeout_kills_server(self, server_command):
+        pool = PersistentStackwalkerPool(
+            server_command=server_command, size=1, kill_timeout=0.5
+        )
+        try:
+            pid = json.loads(run(pool, "upload_file_minidump")["output"])["pid"]
+            with MetricsMock() as mm:
+                assert run(pool, "hang") == {
+                    "returncode": -9,
+                    "output": None,
+                    "log": "",
+                }
+            mm.assert_incr(
+                "socorro.processor.minidumpstackwalk.server_restart",
+                tags=["reason:timeout", AnyTagValue("host")],
+            )
+
+            # The next request goes to a new server
+            ret = run(pool, "upload_file_minidump")
+            assert json.loads(ret["output"])["pid"] != pid
+        finally:
+            pool.close()
+
+    def test_server_crash(self, server_command):
+        pool = PersistentStackwalkerPool(server_command=server_command, size=1)
+        try:
+            with MetricsMock() as mm:
+                assert run(pool, "abort") == {
+                    "returncode": -6,
+                    "output": None,
+                    "log": "",
+                }
+            mm.assert_incr(
+                "socorro.processor.minidumpstackwalk.server_restart",
+                tags=["reason:crash", AnyTagValue("host")],
+            )
+            assert run(pool, "upload_file_minidump")["returncode"] == 0
+        finally:
+            pool.close()
+
+    def test_bad_response(self, server_command):
+        pool = PersistentStackwalkerPool(server_command=server_command, size=1)
+        try:
+            assert run(pool, "garbage")["returncode"] == 1
+            assert run(pool, "upload_file_minidump")["returncode"] == 0
+        finally:
+            pool.close()
+
+
+def test_rule_with_server_command(tmp_path, server_command):
+    rule = MinidumpStackwalkRule(
+        command_path=server_command,
+        server_command="{command_path}",
+        symbol_tmp_path=str(tmp_path / "tmp"),
+        symbol_cache_path=str(tmp_path / "cache"),
+        kill_timeout=5,
+    )
+    dumppath = tmp_path / "upload_file_minidump"
+    dumppath.write_bytes(b"abcde")
+    processed_crash = {}
+    status = Status()
+    try:
+        rule.act(
+            {"uuid": "00000000-0000-0000-0000-000002140504"},
+            {"upload_file_minidump": str(dumppath)},
+            processed_crash,
+            str(tmp_path),
+            status,
+        )
+    finally:
+        rule.close()
+
+    assert processed_crash["stackwalk_version"] == "0.0.1"
+    assert processed_crash["mdsw_return_code"] == 0
+    assert processed_crash["mdsw_status_string"] == "OK"
+    assert processed_crash["json_dump"]["args"][-1] == str(dumppath)
+    assert status.notes == []
@@ -0,0 +1,136 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at https://mozilla.org/MPL/2.0/.
+
+import json
+import os
+import sys
+import textwrap
+
+from click.testing import CliRunner
+import pytest
+
+from socorro.processor.pipeline import Status
+from socorro.processor.rules.breakpad import MinidumpStackwalkRule
+
+import stackwalker_server
+from stackwalker_server import cmd_stackwalker_server
+
+
+# Fake minidump-stackwalk; what it does depends on the contents of the minidump
+FAKE_STACKWALKER = textwrap.dedent(
+    """\
+    import json
+    import sys
+    import time
+
+    if "--version" in sys.argv:
+        print("0.0.1")
+        sys.exit(0)
+
+    options = dict(arg.split("=", 1) for arg in sys.argv[1:] if "=" in arg)
+    with open(sys.argv[-1]) as fp:
+        behavior = fp.read()
+    if behavior == "hang":
+        time.sleep(60)
+
+    with open(options["--log-file"], "w") as fp:
+        fp.write(f"log for {behavior}\\n")
+    if behavior == "fail":
+        sys.exit(1)
+    with open(options["--output-file"], "w") as fp:
+        json.dump({"status": "OK", "behavior": behavior}, fp)
+    """
+)
+
+
+@pytest.fixture
+def command_path(tmp_path):
+    path = tmp_path / "minidump-stackwalk"
+    path.write_text(f"#!{sys.executable}\n{FAKE_STACKWALKER}")
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+def build_dump(tmp_path, behavior):
+    path = tmp_path / f"dump_{behavior}"
+    path.write_text(behavior)
+    return str(path)
+
+
+def parse_responses(data):
+    responses = []
+    while data:
+        line, data = data.split(b"\n", 1)
+        header = json.loads(line)
+        output = data[: header["output_length"]]
+        data = data[header["output_length"] :]
+        log = data[: header["log_length"]]
+        data = data[header["log_length"] :]
+        responses.append((header["returncode"], output, log))
+    return responses
+
+
+def test_it_runs():
+    """Test whether the module loads and spits out help."""
+    runner = CliRunner()
+    result = runner.invoke(cmd_stackwalker_server, ["--help"])
+    assert result.exit_code == 0
+
+
+def test_protocol(tmp_path, command_path):
+    requests = [
+        {"args": ["--json", build_dump(tmp_path, "ok")]},
+        {"args": ["--json", build_dump(tmp_path, "fail")]},
+        {"args": ["--json", build_dump(tmp_path, "hang")]},
+    ]
+    runner = CliRunner()
+    result = runner.invoke(
+        cmd_stackwalker_server,
+        ["--timeout=1", command_path],
+        input="".join(json.dumps(request) + "\n" for request in requests),
+    )
+    assert result.exit_code == 0
+
+    assert parse_responses(result.stdout_bytes) == [
+        (0, b'{"status": "OK", "behavior": "ok"}', b"log for ok\n"),
+        # Output from failed runs isn't sent
+        (1, b"", b"log for fail\n"),
+        # The stackwalker was killed
+        (-9, b"", b""),
+    ]
+
+
+def test_rule_with_server(tmp_path, command_path):
+    server_command = (
+        f"{sys.executable} {stackwalker_server.__file__} " + "{command_path}"
+    )
+    rule = MinidumpStackwalkRule(
+        command_path=command_path,
+        symbol_tmp_path=str(tmp_path / "tmp"),
+        symbol_cache_path=str(tmp_path / "cache"),
+        server_command=server_command,
+    )
+
+    try:
+        for behavior in ["ok", "fail", "ok"]:
+            raw_crash = {"uuid": "00000000-0000-0000-0000-000002140504"}
+            dumps = {rule.dump_field: build_dump(tmp_path, behavior)}
+            processed_crash = {}
+            rule.act(raw_crash, dumps, processed_crash, str(tmp_path), Status())
+
+            if behavior == "ok":
+                assert processed_crash["mdsw_return_code"] == 0
+                assert processed_crash["json_dump"] == {
+                    "status": "OK",
+                    "behavior": "ok",
+                }
+            else:
+                assert processed_crash["mdsw_return_code"] == 1
+                assert processed_crash["json_dump"] == {}
+            assert processed_crash["mdsw_stderr"] == f"log for {behavior}\n"
+
+        # One server handled all the requests
+        assert len(rule.stackwalker_pool._idle) == 1
+    finally:
+        rule.close()
@@ -28,9 +28,9 @@ from socorro.libmarkus import METRICS
 from socorro.lib.libooid import is_crash_id_valid
 from socorro.lib.librequests import session_with_retries
 from socorro.lib.libsocorrodataschema import (
+    get_reducer,
     get_schema,
     permissions_transform_function,
-    SocorroDataReducer,
     transform_schema,
 )
 
@@ -567,7 +567,7 @@ def get_raw_crash_permissions_reducer(permissions_tuple):
         ),
     )
 
-    return SocorroDataReducer(schema=permissioned_schema)
+    return get_reducer(permissioned_schema)
 
 
 @functools.cache
@@ -592,7 +592,7 @@ def get_processed_crash_permissions_reducer(permissions_tuple):
         ),
     )
 
-    return SocorroDataReducer(schema=permissioned_schema)
+    return get_reducer(permissioned_schema)
 
 
 class ProcessedCrash(SocorroMiddleware):